@@ -29,6 +29,7 @@ from nova.api.metadata import password
 from nova.api.metadata import vendordata_dynamic
 from nova.api.metadata import vendordata_json
 from nova import block_device
+from nova import cache_utils
 import nova.conf
 from nova import context
 from nova import exception
@@ -98,8 +99,14 @@ PASS_NAME = "password"
 MIME_TYPE_TEXT_PLAIN = "text/plain"
 MIME_TYPE_APPLICATION_JSON = "application/json"
 
+# The key of the cached InstanceMetadata of an instance, by IP address or
+# instance UUID.
+CACHE_KEY = 'metadata-%s'
+
 LOG = logging.getLogger(__name__)
 
+_CACHE = None
+
 
 class InvalidMetadataVersion(Exception):
     pass
@@ -202,15 +209,28 @@ class InstanceMetadata(object):
 
         self.route_configuration = None
 
-        # NOTE(mikal): the decision to not pass extra_md here like we
-        # do to the StaticJSON driver is deliberate. extra_md will
-        # contain the admin password for the instance, and we shouldn't
-        # pass that to external services.
-        self.vendordata_providers = {
-            'StaticJSON': vendordata_json.JsonFileVendorData(),
-            'DynamicJSON': vendordata_dynamic.DynamicVendorData(
-                instance=instance)
-        }
+        # The OpenStack metadata documents, by version, rendered without the
+        # parts which must change with each request.
+        self.rendered_metadata = {}
+
+        # The vendordata providers are built on first use, by the metadata
+        # API service, as they depend on its configuration. An object
+        # rendered ahead of time by another service is cached without them.
+        self._vendordata_providers = None
+
+    @property
+    def vendordata_providers(self):
+        if self._vendordata_providers is None:
+            # NOTE(mikal): the decision to not pass extra_md here like we
+            # do to the StaticJSON driver is deliberate. extra_md will
+            # contain the admin password for the instance, and we shouldn't
+            # pass that to external services.
+            self._vendordata_providers = {
+                'StaticJSON': vendordata_json.JsonFileVendorData(),
+                'DynamicJSON': vendordata_dynamic.DynamicVendorData(
+                    instance=self.instance)
+            }
+        return self._vendordata_providers
 
     def _route_configuration(self):
         if self.route_configuration:
@@ -315,6 +335,19 @@ class InstanceMetadata(object):
         return self._route_configuration().handle_path(path_tokens)
 
     def _metadata_as_json(self, version, path):
+        metadata = self.rendered_metadata.get(version)
+        if metadata is None:
+            metadata = self._render_metadata(version)
+            self.rendered_metadata[version] = metadata
+        metadata = dict(metadata)
+
+        if self._check_os_version(GRIZZLY, version):
+            metadata['random_seed'] = base64.encode_as_text(os.urandom(512))
+
+        self.set_mimetype(MIME_TYPE_APPLICATION_JSON)
+        return jsonutils.dump_as_bytes(metadata)
+
+    def _render_metadata(self, version):
         metadata = {'uuid': self.uuid}
         if self.launch_metadata:
             metadata['meta'] = self.launch_metadata
@@ -353,9 +386,6 @@ class InstanceMetadata(object):
         metadata['launch_index'] = self.instance.launch_index
         metadata['availability_zone'] = self.availability_zone
 
-        if self._check_os_version(GRIZZLY, version):
-            metadata['random_seed'] = base64.encode_as_text(os.urandom(512))
-
         if self._check_os_version(LIBERTY, version):
             metadata['project_id'] = self.instance.project_id
 
@@ -365,8 +395,7 @@ class InstanceMetadata(object):
         if self._check_os_version(VICTORIA, version):
             metadata['dedicated_cpus'] = self._get_instance_dedicated_cpus()
 
-        self.set_mimetype(MIME_TYPE_APPLICATION_JSON)
-        return jsonutils.dump_as_bytes(metadata)
+        return metadata
 
     def _get_device_metadata(self, version):
         """Build a device metadata dict based on the metadata objects. This is
@@ -587,6 +616,18 @@ class InstanceMetadata(object):
 
         return data
 
+    def prerender(self):
+        """Render the OpenStack metadata documents of every version.
+
+        The rendered documents are kept with the object, so that they are
+        cached along with it instead of being rendered again for each
+        request.
+        """
+        for version in OPENSTACK_VERSIONS:
+            if version not in self.rendered_metadata:
+                self.rendered_metadata[version] = self._render_metadata(
+                    version)
+
     def metadata_for_config_drive(self):
         """Yields (path, value) tuples for metadata elements."""
         # EC2 style metadata
@@ -702,6 +743,48 @@ def get_metadata_by_instance_id(instance_id, address, ctxt=None):
         return InstanceMetadata(instance, address)
 
 
+def _get_cache():
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = cache_utils.get_client(
+            expiration_time=CONF.api.metadata_cache_expiration)
+    return _CACHE
+
+
+def warm_cache(instance, network_info=None):
+    """Store the pre-rendered metadata of an instance in the cache.
+
+    The metadata API service then answers the requests of the guest made
+    through the neutron metadata proxy with a single cache read, instead of
+    building its metadata on a cache miss. This is a no-op unless
+    ``[api]metadata_cache_warming`` is enabled, as the cache must be shared
+    with the metadata API service.
+
+    Only the entry keyed by the instance UUID is warmed. Fixed IP addresses
+    may overlap between networks, so an entry keyed by address could be
+    served to the guest of another project using the same address. The
+    vendordata is not rendered, it is built by the metadata API service from
+    its own configuration when the guest requests it.
+
+    :param instance: the Instance, which is not modified
+    :param network_info: the network info of the instance, None to use its
+        info cache
+    """
+    if not (CONF.api.metadata_cache_warming and CONF.cache.enabled and
+            CONF.api.metadata_cache_expiration):
+        return
+
+    try:
+        md = InstanceMetadata(instance.obj_clone(), network_info=network_info)
+        md.prerender()
+        _get_cache().set(CACHE_KEY % md.uuid, md)
+    except Exception:
+        LOG.exception('Failed to warm the metadata cache', instance=instance)
+        return
+
+    LOG.debug('Warmed the metadata cache', instance=instance)
+
+
 def _format_instance_mapping(instance):
     bdms = instance.get_bdms()
     return block_device.instance_block_mapping(instance, bdms)
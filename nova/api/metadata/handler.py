@@ -19,9 +19,11 @@ import hashlib
 import hmac
 import os
 
+from oslo_concurrency import lockutils
 from oslo_log import log as logging
 from oslo_utils import encodeutils
 from oslo_utils import strutils
+from oslo_utils import timeutils
 import webob.dec
 import webob.exc
 
@@ -44,6 +46,17 @@ LOG = logging.getLogger(__name__)
 MAX_QUERY_NETWORKS = 160
 
 
+class NegativeCacheEntry(object):
+    """Cached result of a metadata lookup which found nothing."""
+
+    def __init__(self, expiration, explanation=None):
+        self.expires_at = timeutils.utcnow_ts(microsecond=True) + expiration
+        self.explanation = explanation
+
+    def expired(self):
+        return timeutils.utcnow_ts(microsecond=True) >= self.expires_at
+
+
 class MetadataRequestHandler(wsgi.Application):
     """Serve metadata."""
 
@@ -56,43 +69,88 @@ class MetadataRequestHandler(wsgi.Application):
                         "the metadata information returned by the proxy "
                         "cannot be trusted")
 
-    def get_metadata_by_remote_address(self, address):
-        if not address:
-            raise exception.FixedIpNotFoundForAddress(address=address)
-
-        cache_key = 'metadata-%s' % address
-        data = self._cache.get(cache_key)
-        if data:
-            LOG.debug("Using cached metadata for %s", address)
+    def _get_cached(self, cache_key, get_data, *args):
+        """Return the data of a cache key, getting it on a cache miss.
+
+        Concurrent requests missing the cache for the same key are coalesced
+        into a single call to get_data. Lookups which found nothing are
+        cached for ``[api]metadata_negative_cache_expiration`` seconds, so
+        that booting or misconfigured guests do not multiply the load on the
+        database and on neutron.
+
+        :param cache_key: the key of the data in the cache
+        :param get_data: the callable getting the data on a cache miss, which
+            returns None or raises HTTPBadRequest when nothing is found
+        :param args: the arguments of get_data
+        :returns: the data, or None if nothing was found
+        :raises: webob.exc.HTTPBadRequest if get_data raised it
+        """
+        if CONF.api.metadata_cache_expiration <= 0:
+            return get_data(*args)
+
+        found, data = self._cache_get(cache_key)
+        if found:
             return data
 
-        try:
-            data = base.get_metadata_by_address(address)
-        except exception.NotFound:
-            LOG.exception('Failed to get metadata for IP %s', address)
-            return None
+        with lockutils.lock(cache_key):
+            # Another request may have got the data while we were waiting
+            found, data = self._cache_get(cache_key)
+            if found:
+                return data
 
-        if CONF.api.metadata_cache_expiration > 0:
-            self._cache.set(cache_key, data)
+            try:
+                data = get_data(*args)
+            except webob.exc.HTTPBadRequest as ex:
+                self._cache_miss(cache_key, ex.explanation)
+                raise
 
-        return data
+            if data is None:
+                self._cache_miss(cache_key)
+            else:
+                self._cache.set(cache_key, data)
+            return data
 
-    def get_metadata_by_instance_id(self, instance_id, address):
-        cache_key = 'metadata-%s' % instance_id
+    def _cache_get(self, cache_key):
+        """Return whether a cache key was found, and its data."""
         data = self._cache.get(cache_key)
+        if isinstance(data, NegativeCacheEntry):
+            if data.expired():
+                return False, None
+            LOG.debug("Using cached metadata miss for %s", cache_key)
+            if data.explanation is not None:
+                raise webob.exc.HTTPBadRequest(explanation=data.explanation)
+            return True, None
         if data:
-            LOG.debug("Using cached metadata for instance %s", instance_id)
-            return data
+            LOG.debug("Using cached metadata for %s", cache_key)
+            return True, data
+        return False, None
 
-        try:
-            data = base.get_metadata_by_instance_id(instance_id, address)
-        except exception.NotFound:
-            return None
+    def _cache_miss(self, cache_key, explanation=None):
+        if CONF.api.metadata_negative_cache_expiration > 0:
+            self._cache.set(cache_key, NegativeCacheEntry(
+                CONF.api.metadata_negative_cache_expiration, explanation))
+
+    def get_metadata_by_remote_address(self, address):
+        if not address:
+            raise exception.FixedIpNotFoundForAddress(address=address)
 
-        if CONF.api.metadata_cache_expiration > 0:
-            self._cache.set(cache_key, data)
+        def get_metadata():
+            try:
+                return base.get_metadata_by_address(address)
+            except exception.NotFound:
+                LOG.exception('Failed to get metadata for IP %s', address)
+                return None
 
-        return data
+        return self._get_cached(base.CACHE_KEY % address, get_metadata)
+
+    def get_metadata_by_instance_id(self, instance_id, address):
+        def get_metadata():
+            try:
+                return base.get_metadata_by_instance_id(instance_id, address)
+            except exception.NotFound:
+                return None
+
+        return self._get_cached(base.CACHE_KEY % instance_id, get_metadata)
 
     @webob.dec.wsgify(RequestClass=wsgi.Request)
     def __call__(self, req):
@@ -280,18 +338,11 @@ class MetadataRequestHandler(wsgi.Application):
                                          instance_address)
 
         cache_key = 'provider-%s-%s' % (provider_id, instance_address)
-        data = self._cache.get(cache_key)
-        if data:
-            LOG.debug("Using cached metadata for %s for %s",
-                      provider_id, instance_address)
-            instance_id, tenant_id = data
-        else:
-            instance_id, tenant_id = self._get_instance_id_from_lb(
-                provider_id, instance_address)
-            if CONF.api.metadata_cache_expiration > 0:
-                self._cache.set(cache_key, (instance_id, tenant_id))
-            LOG.debug('Instance %s with address %s matches provider %s',
-                      instance_id, remote_address, provider_id)
+        instance_id, tenant_id = self._get_cached(
+            cache_key, self._get_instance_id_from_lb, provider_id,
+            instance_address)
+        LOG.debug('Instance %s with address %s matches provider %s',
+                  instance_id, remote_address, provider_id)
         return self._get_meta_by_instance_id(instance_id, tenant_id,
                                              instance_address)
 
@@ -15,8 +15,10 @@
 
 """Render vendordata as stored fetched from REST microservices."""
 
+import functools
 import sys
 
+import futurist.waiters
 from keystoneauth1 import exceptions as ks_exceptions
 from oslo_log import log as logging
 from oslo_serialization import jsonutils
@@ -24,6 +26,7 @@ from oslo_serialization import jsonutils
 from nova.api.metadata import vendordata
 import nova.conf
 from nova import service_auth
+from nova import utils
 
 CONF = nova.conf.CONF
 LOG = logging.getLogger(__name__)
@@ -54,6 +57,8 @@ class DynamicVendorData(vendordata.VendorDataDriver):
         self.instance = instance
         # We only create the session if we make a request.
         self.session = None
+        # The vendordata of the targets, fetched on the first call to get()
+        self.vendordata = None
 
     def _do_request(self, service_name, url):
         if self.session is None:
@@ -104,9 +109,9 @@ class DynamicVendorData(vendordata.VendorDataDriver):
 
             return {}
 
-    def get(self):
-        j = {}
-
+    def _get_targets(self):
+        targets = []
+        names = set()
         for target in CONF.api.vendordata_dynamic_targets:
             # NOTE(mikal): a target is composed of the following:
             #    name@url
@@ -122,12 +127,67 @@ class DynamicVendorData(vendordata.VendorDataDriver):
             name = tokens[0]
             url = '@'.join(tokens[1:])
 
-            if name in j:
+            if name in names:
                 LOG.warning('Vendordata already contains an entry named '
                             '%(target)s. Skipping',
                             {'target': target}, instance=self.instance)
                 continue
 
-            j[name] = self._do_request(name, url)
+            names.add(name)
+            targets.append((name, url))
+
+        return targets
+
+    def _fetch(self):
+        targets = self._get_targets()
+        if len(targets) <= 1:
+            return {name: self._do_request(name, url)
+                    for name, url in targets}
+
+        # NOTE: The targets are fetched concurrently through the same
+        # session, and so through its pool of connections.
+        if self.session is None:
+            self.session = _load_ks_session(CONF)
+
+        executor = utils.create_executor(len(targets))
+        executor.name = 'vendordata_dynamic'
+        try:
+            futures = [(name, utils.spawn_on(executor, self._do_request,
+                                             name, url))
+                       for name, url in targets]
+        finally:
+            # Do not wait for the targets which miss the deadline
+            executor.shutdown(wait=False)
+
+        timeout = CONF.api.vendordata_dynamic_total_timeout or None
+        if CONF.api.vendordata_dynamic_failure_fatal:
+            timeout = None
+        futurist.waiters.wait_for_all(
+            [future for name, future in futures], timeout=timeout)
+
+        j = {}
+        for name, future in futures:
+            if future.done():
+                j[name] = future.result()
+                continue
+
+            LOG.warning('Dynamic vendordata service %(service_name)s did not '
+                        'return data within %(timeout)d seconds',
+                        {'service_name': name, 'timeout': timeout},
+                        instance=self.instance)
+            j[name] = {}
+            # The late data is used by the next requests for this instance
+            future.add_done_callback(
+                functools.partial(self._add_late_data, j, name))
 
         return j
+
+    @staticmethod
+    def _add_late_data(j, name, future):
+        if future.exception() is None:
+            j[name] = future.result()
+
+    def get(self):
+        if self.vendordata is None:
+            self.vendordata = self._fetch()
+        return dict(self.vendordata)
@@ -148,6 +148,7 @@ class HypervisorsController(wsgi.Controller):
         :param links: If True, return links in the response for paging.
         """
         context = req.environ['nova.context']
+        context.replica_read_path = 'hypervisors'
 
         # The 2.53 microversion moves the search and servers routes into
         # GET /os-hypervisors and GET /os-hypervisors/detail with query
@@ -341,6 +342,7 @@ class HypervisorsController(wsgi.Controller):
 
     def _show(self, req, id, with_servers=False):
         context = req.environ['nova.context']
+        context.replica_read_path = 'hypervisors'
         context.can(hv_policies.BASE_POLICY_NAME % 'show', target={})
 
         self._validate_id(req, id)
@@ -390,6 +392,7 @@ class HypervisorsController(wsgi.Controller):
         unnecessary.
         """
         context = req.environ['nova.context']
+        context.replica_read_path = 'hypervisors'
         context.can(hv_policies.BASE_POLICY_NAME % 'uptime', target={})
 
         self._validate_id(req, id)
@@ -444,6 +447,7 @@ class HypervisorsController(wsgi.Controller):
         index and detail methods.
         """
         context = req.environ['nova.context']
+        context.replica_read_path = 'hypervisors'
         context.can(hv_policies.BASE_POLICY_NAME % 'search', target={})
 
         # Get all compute nodes with a hypervisor_hostname that matches
@@ -485,6 +489,7 @@ class HypervisorsController(wsgi.Controller):
         GET /os-hypervisors index and detail methods.
         """
         context = req.environ['nova.context']
+        context.replica_read_path = 'hypervisors'
         context.can(hv_policies.BASE_POLICY_NAME % 'servers', target={})
 
         # Get all compute nodes with a hypervisor_hostname that matches
@@ -530,6 +535,7 @@ class HypervisorsController(wsgi.Controller):
         that aren't as misleading and frequently misunderstood.
         """
         context = req.environ['nova.context']
+        context.replica_read_path = 'hypervisors'
         context.can(hv_policies.BASE_POLICY_NAME % 'statistics', target={})
         stats = self.host_api.compute_node_statistics(context)
         return {'hypervisor_statistics': stats}
@@ -89,6 +89,7 @@ class InstanceActionsController(wsgi.Controller):
     def index(self, req, server_id):
         """Returns the list of actions recorded for a given instance."""
         context = req.environ["nova.context"]
+        context.replica_read_path = 'instance-actions'
         instance = self._get_instance(req, context, server_id)
         context.can(ia_policies.BASE_POLICY_NAME % 'list',
                     target={'project_id': instance.project_id})
@@ -149,6 +150,7 @@ class InstanceActionsController(wsgi.Controller):
     def show(self, req, server_id, id):
         """Return data about the given instance action."""
         context = req.environ['nova.context']
+        context.replica_read_path = 'instance-actions'
         instance = self._get_instance(req, context, server_id)
         context.can(ia_policies.BASE_POLICY_NAME % 'show',
                     target={'project_id': instance.project_id})
@@ -154,6 +154,7 @@ class ServersController(wsgi.Controller):
     def detail(self, req):
         """Returns a list of server details for a given user."""
         context = req.environ['nova.context']
+        context.replica_read_path = 'servers-detail'
         context.can(server_policies.SERVERS % 'detail')
         try:
             servers = self._get_servers(req, is_detail=True)
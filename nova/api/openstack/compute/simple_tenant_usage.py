@@ -278,6 +278,7 @@ class SimpleTenantUsageController(wsgi.Controller):
 
     def _index(self, req, links=False):
         context = req.environ['nova.context']
+        context.replica_read_path = 'simple-tenant-usage'
 
         context.can(stu_policies.POLICY_ROOT % 'list')
 
@@ -328,6 +329,7 @@ class SimpleTenantUsageController(wsgi.Controller):
     def _show(self, req, id, links=False):
         tenant_id = id
         context = req.environ['nova.context']
+        context.replica_read_path = 'simple-tenant-usage'
 
         context.can(stu_policies.POLICY_ROOT % 'show',
                     {'project_id': tenant_id})
@@ -27,6 +27,7 @@ from nova import context
 from nova import exception
 from nova import objects
 from nova.pci import request
+from nova import rpc
 from nova import service
 from nova import utils
 from nova import version
@@ -86,6 +87,8 @@ def _setup_service(host, name):
             # fail here.
             pass
 
+    rpc.update_compression_allowed(ctxt)
+
 
 def error_application(exc, name):
     # TODO(cdent): make this something other than a stub
@@ -114,6 +117,8 @@ def init_global_data(conf_files, service_name, prog):
     gmr_opts.set_defaults(CONF)
     gmr.TextGuruMeditation.setup_autorun(
         version, conf=CONF, service_name=service_name)
+    gmr.TextGuruMeditation.register_section(
+        'RPC Payload Compression', rpc.get_compression_report)
 
     # FIXME(mriedem): This is gross but we don't have a public hook into
     # oslo.service to register these options, so we are doing it manually for
@@ -30,12 +30,14 @@ from oslo_reports import guru_meditation_report as gmr
 from oslo_reports import opts as gmr_opts
 
 from nova.compute import rpcapi as compute_rpcapi
+from nova.compute import utils as compute_utils
 from nova.conductor import rpcapi as conductor_rpcapi
 import nova.conf
 from nova import config
 import nova.db.main.api
 from nova import objects
 from nova.objects import base as objects_base
+from nova import rpc
 from nova import service
 from nova import utils
 from nova import version
@@ -54,6 +56,11 @@ def main():
     os_vif.initialize()
 
     gmr.TextGuruMeditation.setup_autorun(version, conf=CONF)
+    gmr.TextGuruMeditation.register_section(
+        'RPC Payload Compression', rpc.get_compression_report)
+    gmr.TextGuruMeditation.register_section(
+        'Instance Event Buffer',
+        compute_utils.get_instance_event_buffer_report)
 
     # disable database access for this service
     nova.db.main.api.DISABLE_DB_ACCESS = True
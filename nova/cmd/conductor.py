@@ -28,6 +28,7 @@ from nova.conductor import rpcapi
 import nova.conf
 from nova import config
 from nova import objects
+from nova import rpc
 from nova import service
 from nova import utils
 from nova import version
@@ -43,6 +44,8 @@ def main():
     objects.Service.enable_min_version_cache()
 
     gmr.TextGuruMeditation.setup_autorun(version, conf=CONF)
+    gmr.TextGuruMeditation.register_section(
+        'RPC Payload Compression', rpc.get_compression_report)
 
     server = service.Service.create(binary='nova-conductor',
                                     topic=rpcapi.RPC_TOPIC)
@@ -26,17 +26,20 @@ from nova import monkey_patch; monkey_patch.patch()  # noqa
 
 import collections
 from contextlib import contextmanager
+import datetime
 import functools
 import os
 import re
 import sys
 import textwrap
+import threading
 import time
 import traceback
 import typing as ty
 from urllib import parse as urlparse
 
 from dateutil import parser as dateutil_parser
+import futurist.waiters
 from keystoneauth1 import exceptions as ks_exc
 from neutronclient.common import exceptions as neutron_client_exc
 from os_brick.initiator import connector
@@ -47,6 +50,7 @@ from oslo_log import log as logging
 import oslo_messaging as messaging
 from oslo_serialization import jsonutils
 from oslo_utils import encodeutils
+from oslo_utils import timeutils
 from oslo_utils import uuidutils
 import prettytable
 from sqlalchemy.engine import url as sqla_url
@@ -181,6 +185,71 @@ def locked_instance(cell_mapping, instance, reason):
                 compute_api.unlock(cctxt, instance)
 
 
+class _ArchiveCheckpoint(object):
+    """The progress of archive_deleted_rows, saved to a file.
+
+    For each cell, this records whether all of its deleted rows have been
+    archived, and the UUIDs of the instances archived from its database whose
+    API database records have not been removed yet.
+    """
+
+    def __init__(self, path, before_date, task_log):
+        self.path = path
+        self._lock = threading.Lock()
+        options = {
+            'before': before_date.isoformat() if before_date else None,
+            'task_log': task_log,
+        }
+        self._cells = {}
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                data = jsonutils.load(f)
+            self._cells = data.get('cells', {})
+            if data.get('options') != options:
+                # Cells archived with other options can have rows left to
+                # archive, but pending instances must still be cleaned up.
+                for cell in self._cells.values():
+                    cell.pop('complete', None)
+        self._options = options
+
+    def _cell(self, cell_uuid):
+        return self._cells.setdefault(cell_uuid or 'default', {})
+
+    def _save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            jsonutils.dump({'options': self._options, 'cells': self._cells},
+                           f)
+        os.replace(tmp_path, self.path)
+
+    def is_complete(self, cell_uuid):
+        with self._lock:
+            return self._cell(cell_uuid).get('complete', False)
+
+    def set_complete(self, cell_uuid):
+        with self._lock:
+            self._cell(cell_uuid)['complete'] = True
+            self._save()
+
+    def get_pending_instances(self, cell_uuid):
+        with self._lock:
+            return list(self._cell(cell_uuid).get('pending_instances', []))
+
+    def set_pending_instances(self, cell_uuid, instance_uuids):
+        with self._lock:
+            if instance_uuids:
+                self._cell(cell_uuid)['pending_instances'] = list(
+                    instance_uuids)
+            else:
+                self._cell(cell_uuid).pop('pending_instances', None)
+            self._save()
+
+    def remove(self):
+        with self._lock:
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+
 class DbCommands(object):
     """Class for managing the main database."""
 
@@ -297,18 +366,46 @@ class DbCommands(object):
     @args('--sleep', type=int, metavar='<seconds>', dest='sleep',
           help='The amount of time in seconds to sleep between batches when '
                '``--until-complete`` is used. Defaults to 0.')
+    @args('--parallel', type=int, metavar='<number>', dest='parallel',
+          help='The number of cells to archive concurrently when '
+               '``--all-cells`` is used. Note that ``--max_rows`` then '
+               'applies to each cell rather than to all of them. Defaults '
+               'to 1.')
+    @args('--max-rows-per-second', type=int, metavar='<number>',
+          dest='max_rows_per_second',
+          help='Throttle archiving to about this number of rows per second '
+               'in each cell, by sleeping between batches when '
+               '``--until-complete`` is used. Defaults to no limit.')
+    @args('--max-replica-lag', type=int, metavar='<seconds>',
+          dest='max_replica_lag',
+          help='Pause between batches while the database replica configured '
+               'with ``[database]/slave_connection`` is more than this many '
+               'seconds behind. Only MySQL replicas report their lag. This '
+               'replica only replicates the ``[database]/connection`` '
+               'database, so this cannot be used with ``--all-cells``. '
+               'Defaults to no limit.')
+    @args('--checkpoint', metavar='<path>', dest='checkpoint',
+          help='Save the progress of the archive to this file, so that a run '
+               'which was interrupted can be resumed by running the command '
+               'again with the same file: the API database records of the '
+               'instances which were archived are removed if that did not '
+               'happen, and cells which were completely archived with '
+               '``--until-complete`` are skipped. The file is removed once '
+               'the command completes.')
     def archive_deleted_rows(
         self, max_rows=1000, verbose=False,
         until_complete=False, purge=False,
         before=None, all_cells=False, task_log=False, sleep=0,
+        parallel=1, max_rows_per_second=None, max_replica_lag=None,
+        checkpoint=None,
     ):
         """Move deleted rows from production tables to shadow tables.
 
         Returns 0 if nothing was archived, 1 if some number of rows were
-        archived, 2 if max_rows is invalid, 3 if no connection could be
-        established to the API DB, 4 if before date is invalid. If automating,
-        this should be run continuously while the result
-        is 1, stopping at 0.
+        archived, 2 if max_rows or another limit is invalid, 3 if no
+        connection could be established to the API DB, 4 if before date is
+        invalid. If automating, this should be run continuously while the
+        result is 1, stopping at 0.
         """
         max_rows = int(max_rows)
         if max_rows < 0:
@@ -318,6 +415,21 @@ class DbCommands(object):
             print(_('max rows must be <= %(max_value)d') %
                   {'max_value': db_const.MAX_INT})
             return 2
+        for name, value in (('parallel', parallel),
+                            ('max-rows-per-second', max_rows_per_second)):
+            if value is not None and value < 1:
+                print(_('Must supply a positive value for %s') % name)
+                return 2
+        if max_replica_lag is not None and max_replica_lag < 0:
+            print(_('Must supply a positive value for max-replica-lag'))
+            return 2
+        if max_replica_lag is not None and all_cells:
+            # NOTE: [database]/slave_connection only replicates the
+            # [database] connection. The cell databases do not have a replica
+            # of their own, so the lag of that replica says nothing about
+            # them.
+            print(_('--max-replica-lag cannot be used with --all-cells'))
+            return 2
 
         ctxt = context.get_admin_context()
         try:
@@ -341,7 +453,12 @@ class DbCommands(object):
         else:
             before_date = None
 
+        if checkpoint:
+            checkpoint = _ArchiveCheckpoint(checkpoint, before_date, task_log)
+
         table_to_rows_archived = {}
+        # {<cell_name>.<table name>: seconds spent archiving the table}
+        table_to_seconds = {}
         if until_complete and verbose:
             sys.stdout.write(_('Archiving') + '..')  # noqa
 
@@ -367,7 +484,40 @@ class DbCommands(object):
         else:
             cell_mappings = [None]
             print_sort_func = None
+        if until_complete and checkpoint:
+            cell_mappings = [
+                cell_mapping for cell_mapping in cell_mappings
+                if not checkpoint.is_complete(
+                    cell_mapping.uuid if cell_mapping else None)]
+
+        def archive_cell(cell_mapping, max_rows_to_archive,
+                         table_to_rows_archived, table_to_seconds,
+                         stop=None):
+            # If all_cells=False, cell_mapping is None
+            with context.target_cell(ctxt, cell_mapping) as cctxt:
+                return self._do_archive(
+                    table_to_rows_archived,
+                    cctxt,
+                    max_rows_to_archive,
+                    until_complete,
+                    verbose,
+                    before_date,
+                    cell_mapping.name if cell_mapping else None,
+                    task_log,
+                    sleep,
+                    max_rows_per_second=max_rows_per_second,
+                    max_replica_lag=max_replica_lag,
+                    checkpoint=checkpoint,
+                    cell_uuid=cell_mapping.uuid if cell_mapping else None,
+                    table_to_seconds=table_to_seconds,
+                    stop=stop)
+
         total_rows_archived = 0
+        if parallel and parallel > 1 and len(cell_mappings) > 1:
+            total_rows_archived, interrupt = self._archive_cells_parallel(
+                archive_cell, cell_mappings, parallel, max_rows,
+                table_to_rows_archived, table_to_seconds)
+            cell_mappings = []
         for cell_mapping in cell_mappings:
             # NOTE(Kevin_Zheng): No need to calculate limit for each
             # cell if until_complete=True.
@@ -382,26 +532,19 @@ class DbCommands(object):
                 max_rows_to_archive = max_rows - total_rows_archived
             else:
                 break
-            # If all_cells=False, cell_mapping is None
-            with context.target_cell(ctxt, cell_mapping) as cctxt:
-                cell_name = cell_mapping.name if cell_mapping else None
-                try:
-                    rows_archived = self._do_archive(
-                        table_to_rows_archived,
-                        cctxt,
-                        max_rows_to_archive,
-                        until_complete,
-                        verbose,
-                        before_date,
-                        cell_name,
-                        task_log,
-                        sleep)
-                except KeyboardInterrupt:
-                    interrupt = True
-                    break
-                # TODO(melwitt): Handle skip/warn for unreachable cells. Note
-                # that cell_mappings = [None] if not --all-cells
-                total_rows_archived += rows_archived
+            try:
+                rows_archived = archive_cell(
+                    cell_mapping, max_rows_to_archive,
+                    table_to_rows_archived, table_to_seconds)
+            except KeyboardInterrupt:
+                interrupt = True
+                break
+            # TODO(melwitt): Handle skip/warn for unreachable cells. Note
+            # that cell_mappings = [None] if not --all-cells
+            total_rows_archived += rows_archived
+
+        if checkpoint and not interrupt:
+            checkpoint.remove()
 
         if until_complete and verbose:
             if interrupt:
@@ -419,6 +562,18 @@ class DbCommands(object):
                 ))
             else:
                 print(_('Nothing was archived.'))
+            table_to_throughput = {
+                table_name: '%.1f' % (
+                    table_to_rows_archived[table_name] / seconds)
+                for table_name, seconds in table_to_seconds.items()
+                if seconds and table_to_rows_archived.get(table_name)}
+            if table_to_throughput:
+                print(format_dict(
+                    table_to_throughput,
+                    dict_property=_('Table'),
+                    dict_value=_('Rows Archived per Second'),
+                    sort_key=print_sort_func,
+                ))
 
         if table_to_rows_archived and purge:
             if verbose:
@@ -428,9 +583,125 @@ class DbCommands(object):
         # NOTE(danms): Return nonzero if we archived something
         return int(bool(table_to_rows_archived))
 
+    def _archive_cells_parallel(
+        self, archive_cell, cell_mappings, parallel, max_rows,
+        table_to_rows_archived, table_to_seconds,
+    ):
+        """Archive deleted rows from cells concurrently.
+
+        :param archive_cell: The function archiving rows from a cell
+        :param cell_mappings: The CellMappings of the cells to archive
+        :param parallel: The number of cells to archive concurrently
+        :param max_rows: Maximum number of deleted rows to archive in each
+            cell
+        :param table_to_rows_archived: Dict tracking the number of rows
+            archived by <cell_name>.<table name>
+        :param table_to_seconds: Dict tracking the time spent archiving rows
+            by <cell_name>.<table name>
+        :returns: A tuple of the number of rows archived and whether the
+            archive was interrupted
+        """
+        stop = threading.Event()
+        lock = threading.Lock()
+        cells = iter(cell_mappings)
+        results = []
+
+        def worker():
+            while not stop.is_set():
+                with lock:
+                    cell_mapping = next(cells, None)
+                if cell_mapping is None:
+                    return
+                # Each cell gets its own counters, which are merged once done
+                result = ({}, {}, [0])
+                results.append(result)
+                try:
+                    result[2][0] = archive_cell(
+                        cell_mapping, max_rows, result[0], result[1],
+                        stop=stop)
+                except KeyboardInterrupt:
+                    stop.set()
+                except Exception:
+                    stop.set()
+                    raise
+
+        executor = utils.create_executor(parallel)
+        futures = [utils.spawn_on(executor, worker)
+                   for i in range(min(parallel, len(cell_mappings)))]
+        executor.shutdown(wait=False)
+        try:
+            futurist.waiters.wait_for_all(futures)
+        except KeyboardInterrupt:
+            # Let the cells finish their current batch
+            stop.set()
+            futurist.waiters.wait_for_all(futures)
+        interrupt = stop.is_set()
+
+        total_rows_archived = 0
+        for cell_rows, cell_seconds, cell_total in results:
+            for table_name, rows in cell_rows.items():
+                table_to_rows_archived[table_name] = (
+                    table_to_rows_archived.get(table_name, 0) + rows)
+            for table_name, seconds in cell_seconds.items():
+                table_to_seconds[table_name] = (
+                    table_to_seconds.get(table_name, 0) + seconds)
+            total_rows_archived += cell_total[0]
+        for future in futures:
+            # Raise any error which stopped a cell
+            future.result()
+        return total_rows_archived, interrupt
+
+    def _destroy_api_records(
+        self, ctxt, instance_uuids, table_to_rows_archived,
+    ):
+        """Remove the API database records of archived instances."""
+        table_to_rows_archived.setdefault('API_DB.instance_mappings', 0)
+        table_to_rows_archived.setdefault('API_DB.request_specs', 0)
+        table_to_rows_archived.setdefault('API_DB.instance_group_member', 0)
+        deleted_mappings = objects.InstanceMappingList.destroy_bulk(
+            ctxt, instance_uuids)
+        table_to_rows_archived['API_DB.instance_mappings'] += deleted_mappings
+        deleted_specs = objects.RequestSpec.destroy_bulk(ctxt, instance_uuids)
+        table_to_rows_archived['API_DB.request_specs'] += deleted_specs
+        deleted_group_members = objects.InstanceGroup.destroy_members_bulk(
+            ctxt, instance_uuids)
+        table_to_rows_archived[
+            'API_DB.instance_group_member'] += deleted_group_members
+
+    def _throttle_archive(
+        self, cctxt, rows, elapsed, max_rows_per_second, max_replica_lag,
+        stop,
+    ):
+        """Wait before archiving the next batch of deleted rows, if needed.
+
+        :param cctxt: Cell-targeted nova.context.RequestContext
+        :param rows: The number of rows archived by the last batch
+        :param elapsed: The time in seconds spent archiving the last batch
+        :param max_rows_per_second: The maximum rate of rows to archive
+        :param max_replica_lag: The maximum replication lag in seconds of the
+            [database]/slave_connection replica, which is only honoured when
+            archiving the default database
+        :param stop: threading.Event set when archiving should stop
+        """
+        if max_rows_per_second:
+            delay = rows / max_rows_per_second - elapsed
+            if delay > 0:
+                time.sleep(delay)
+        if max_replica_lag is None:
+            return
+        while stop is None or not stop.is_set():
+            lag = db.get_replica_lag(cctxt)
+            if lag is None or lag <= max_replica_lag:
+                break
+            LOG.info('Database replica is %(lag)d seconds behind, pausing '
+                     'archive', {'lag': lag})
+            time.sleep(min(lag - max_replica_lag, 60))
+
     def _do_archive(
         self, table_to_rows_archived, cctxt, max_rows,
         until_complete, verbose, before_date, cell_name, task_log, sleep,
+        max_rows_per_second=None, max_replica_lag=None, checkpoint=None,
+        cell_uuid=None, table_to_seconds=None, stop=None,
     ):
         """Helper function for archiving deleted rows for a cell.
 
@@ -456,20 +727,50 @@ class DbCommands(object):
         :param task_log: Whether to archive task_log table rows
         :param sleep: The amount of time in seconds to sleep between batches
             when ``until_complete`` is True.
+        :param max_rows_per_second: Throttle archiving to about this number
+            of rows per second when ``until_complete`` is True
+        :param max_replica_lag: Wait between batches while the database
+            replica is more than this number of seconds behind
+        :param checkpoint: _ArchiveCheckpoint recording the progress of the
+            archive, if any
+        :param cell_uuid: UUID of the cell or None if not archiving across all
+            cells
+        :param table_to_seconds: Dict tracking the time spent archiving rows
+            by <cell_name>.<table name>
+        :param stop: threading.Event which is set when archiving should stop
+            before the next batch
         """
         ctxt = context.get_admin_context()
+        if checkpoint:
+            # Finish the cleanup of an interrupted previous run
+            pending_instance_uuids = checkpoint.get_pending_instances(
+                cell_uuid)
+            if pending_instance_uuids:
+                self._destroy_api_records(
+                    ctxt, pending_instance_uuids, table_to_rows_archived)
+                checkpoint.set_pending_instances(cell_uuid, [])
+        if table_to_seconds is None:
+            table_to_seconds = {}
         while True:
             # table_to_rows = {table_name: number_of_rows_archived}
             # deleted_instance_uuids = ['uuid1', 'uuid2', ...]
-            table_to_rows, deleted_instance_uuids, total_rows_archived = \
-                db.archive_deleted_rows(
-                    cctxt, max_rows, before=before_date, task_log=task_log)
+            table_elapsed = {}
+            with timeutils.StopWatch() as timer:
+                table_to_rows, deleted_instance_uuids, total_rows_archived = \
+                    db.archive_deleted_rows(
+                        cctxt, max_rows, before=before_date,
+                        task_log=task_log, table_elapsed=table_elapsed)
 
             for table_name, rows_archived in table_to_rows.items():
                 if cell_name:
                     table_name = cell_name + '.' + table_name
                 table_to_rows_archived.setdefault(table_name, 0)
                 table_to_rows_archived[table_name] += rows_archived
+            for table_name, seconds in table_elapsed.items():
+                if cell_name:
+                    table_name = cell_name + '.' + table_name
+                table_to_seconds.setdefault(table_name, 0)
+                table_to_seconds[table_name] += seconds
 
             # deleted_instance_uuids does not necessarily mean that any
             # instances rows were archived because it is obtained by a query
@@ -479,36 +780,31 @@ class DbCommands(object):
             # though deleted instances rows were found.
             instances_archived = table_to_rows.get('instances', 0)
             if deleted_instance_uuids and instances_archived:
-                table_to_rows_archived.setdefault(
-                    'API_DB.instance_mappings', 0)
-                table_to_rows_archived.setdefault(
-                    'API_DB.request_specs', 0)
-                table_to_rows_archived.setdefault(
-                    'API_DB.instance_group_member', 0)
-                deleted_mappings = objects.InstanceMappingList.destroy_bulk(
-                            ctxt, deleted_instance_uuids)
-                table_to_rows_archived[
-                    'API_DB.instance_mappings'] += deleted_mappings
-                deleted_specs = objects.RequestSpec.destroy_bulk(
-                    ctxt, deleted_instance_uuids)
-                table_to_rows_archived[
-                    'API_DB.request_specs'] += deleted_specs
-                deleted_group_members = (
-                    objects.InstanceGroup.destroy_members_bulk(
-                        ctxt, deleted_instance_uuids))
-                table_to_rows_archived[
-                    'API_DB.instance_group_member'] += deleted_group_members
+                if checkpoint:
+                    checkpoint.set_pending_instances(
+                        cell_uuid, deleted_instance_uuids)
+                self._destroy_api_records(
+                    ctxt, deleted_instance_uuids, table_to_rows_archived)
+                if checkpoint:
+                    checkpoint.set_pending_instances(cell_uuid, [])
 
             # If we're not archiving until there is nothing more to archive, we
             # have reached max_rows in this cell DB or there was nothing to
             # archive. We check the values() in case we get something like
             # table_to_rows = {'instances': 0} back somehow.
             if not until_complete or not any(table_to_rows.values()):
+                if until_complete and checkpoint:
+                    checkpoint.set_complete(cell_uuid)
                 break
             if verbose:
                 sys.stdout.write('.')
             # Optionally sleep between batches to throttle the archiving.
             time.sleep(sleep)
+            self._throttle_archive(
+                cctxt, total_rows_archived, timer.elapsed(),
+                max_rows_per_second, max_replica_lag, stop)
+            if stop is not None and stop.is_set():
+                break
         return total_rows_archived
 
     @args('--before', metavar='<before>', dest='before',
@@ -522,11 +818,29 @@ class DbCommands(object):
           help='Print information about purged records')
     @args('--all-cells', dest='all_cells', action='store_true', default=False,
           help='Run against all cell databases')
+    @args('--batch-size', type=int, metavar='<rows>', dest='batch_size',
+          help='Delete the rows of each shadow table in primary key ranges '
+               'of at most this many rows, each in its own transaction, '
+               'rather than with a single statement per table.')
+    @args('--max-rows-per-second', type=int, metavar='<number>',
+          dest='max_rows_per_second',
+          help='Throttle the purge to about this number of rows per second '
+               'in each database by sleeping between batches. Requires '
+               '``--batch-size``. Defaults to no limit.')
+    @args('--interval', type=int, metavar='<seconds>', dest='interval',
+          help='Keep running, purging the shadow tables again this many '
+               'seconds after each pass completes, until interrupted. The '
+               'age of the rows to purge given by ``--before`` is kept, so '
+               'that rows get purged as they become older than that.')
     def purge(self, before=None, purge_all=False, verbose=False,
-              all_cells=False):
+              all_cells=False, batch_size=None, max_rows_per_second=None,
+              interval=None):
         if before is None and purge_all is False:
             print(_('Either --before or --all is required'))
             return 1
+        if max_rows_per_second is not None and batch_size is None:
+            print(_('--max-rows-per-second requires --batch-size'))
+            return 1
         if before:
             try:
                 before_date = dateutil_parser.parse(before, fuzzy=True)
@@ -535,12 +849,14 @@ class DbCommands(object):
                 return 2
         else:
             before_date = None
+        for name, value in (('--batch-size', batch_size),
+                            ('--max-rows-per-second', max_rows_per_second),
+                            ('--interval', interval)):
+            if value is not None and value < 1:
+                print(_('Invalid value for %(name)s: %(value)s, it must be '
+                        'greater than zero') % {'name': name, 'value': value})
+                return 2
 
-        def status(msg):
-            if verbose:
-                print('%s: %s' % (identity, msg))
-
-        deleted = 0
         admin_ctxt = context.get_admin_context()
 
         if all_cells:
@@ -550,15 +866,51 @@ class DbCommands(object):
                 print(_('Unable to get cell list from API DB. '
                         'Is it configured?'))
                 return 4
-            for cell in cells:
-                identity = _('Cell %s') % cell.identity
-                with context.target_cell(admin_ctxt, cell) as cctxt:
-                    deleted += db.purge_shadow_tables(
-                        cctxt, before_date, status_fn=status)
+
+        def status(msg):
+            if verbose:
+                print('%s: %s' % (identity, msg))
+
+        kwargs = {}
+        if batch_size is not None:
+            kwargs['batch_size'] = batch_size
+            kwargs['max_rows_per_second'] = max_rows_per_second
+
+        def purge_once(before_date):
+            nonlocal identity
+            deleted = 0
+            if all_cells:
+                for cell in cells:
+                    identity = _('Cell %s') % cell.identity
+                    with context.target_cell(admin_ctxt, cell) as cctxt:
+                        deleted += db.purge_shadow_tables(
+                            cctxt, before_date, status_fn=status, **kwargs)
+            else:
+                identity = _('DB')
+                deleted += db.purge_shadow_tables(
+                    admin_ctxt, before_date, status_fn=status, **kwargs)
+            return deleted
+
+        identity = None
+        if interval is None:
+            deleted = purge_once(before_date)
         else:
-            identity = _('DB')
-            deleted = db.purge_shadow_tables(
-                admin_ctxt, before_date, status_fn=status)
+            deleted = 0
+            timer = timeutils.StopWatch()
+            timer.start()
+            try:
+                while True:
+                    # Keep purging rows older than the age given by
+                    # --before, moving the date along as time passes.
+                    if before_date is not None:
+                        deleted += purge_once(before_date + datetime.timedelta(
+                            seconds=timer.elapsed()))
+                    else:
+                        deleted += purge_once(None)
+                    time.sleep(interval)
+            except KeyboardInterrupt:
+                pass
+
         if deleted:
             return 0
         else:
@@ -2988,6 +3340,83 @@ class LibvirtCommands(object):
             return 0
 
 
+class HostCommands:
+    """Commands for managing compute hosts"""
+
+    @action_description(
+        _("Live migrate all the instances off a compute host. The compute "
+          "service of the host should be disabled first. The host is drained "
+          "in the background by the conductor service."))
+    @args('host', metavar='<host>', help='Name of the compute host to drain')
+    @args('--concurrency', metavar='<number>', type=int, dest='concurrency',
+          help='Maximum number of concurrent live migrations, bounded by '
+               '[DEFAULT]max_concurrent_live_migrations')
+    def drain(self, host=None, concurrency=None):
+        """Start draining a compute host.
+
+        Return codes:
+
+        * 0: The drain of the host was started.
+        * 1: An unexpected error happened.
+        * 2: Unable to find the compute host.
+        * 3: The compute service of the host is down.
+        * 4: The conductor services are too old to drain a host.
+        """
+        ctxt = context.get_admin_context()
+        try:
+            api.HostAPI().drain_host(ctxt, host, concurrency=concurrency)
+        except (exception.HostMappingNotFound,
+                exception.HostNotFound,
+                exception.ComputeHostNotFound) as e:
+            print(str(e))
+            return 2
+        except exception.ComputeServiceUnavailable as e:
+            print(str(e))
+            return 3
+        except exception.ServiceTooOld as e:
+            print(str(e))
+            return 4
+        except Exception as e:
+            print('Unexpected error, see nova-manage.log for the full '
+                  'trace: %s ' % str(e))
+            LOG.exception('Unexpected error')
+            return 1
+
+        print(_("Draining host %s. Use 'nova-manage host drain_progress' to "
+                "follow its progress.") % host)
+        return 0
+
+    @action_description(
+        _("Show the progress of draining a compute host."))
+    @args('host', metavar='<host>', help='Name of the compute host')
+    def drain_progress(self, host=None):
+        """Show the progress of draining a compute host.
+
+        Return codes:
+
+        * 0: The host has no instance left to live migrate.
+        * 1: An unexpected error happened.
+        * 2: Unable to find the compute host.
+        * 3: The host still has instances to live migrate.
+        """
+        ctxt = context.get_admin_context()
+        try:
+            progress = api.HostAPI().get_drain_host_progress(ctxt, host)
+        except (exception.HostMappingNotFound,
+                exception.HostNotFound,
+                exception.ComputeHostNotFound) as e:
+            print(str(e))
+            return 2
+        except Exception as e:
+            print('Unexpected error, see nova-manage.log for the full '
+                  'trace: %s ' % str(e))
+            LOG.exception('Unexpected error')
+            return 1
+
+        print(format_dict(progress))
+        return 3 if progress['instances'] else 0
+
+
 class VolumeAttachmentCommands(object):
 
     @action_description(_("Show the details of a given volume attachment."))
@@ -3799,6 +4228,7 @@ CATEGORIES = {
     'db': DbCommands,
     'placement': PlacementCommands,
     'libvirt': LibvirtCommands,
+    'host': HostCommands,
     'volume_attachment': VolumeAttachmentCommands,
     'image_property': ImagePropertyCommands,
     'limits': LimitsCommands,
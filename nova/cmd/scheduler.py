@@ -29,6 +29,7 @@ from oslo_reports import opts as gmr_opts
 import nova.conf
 from nova import config
 from nova import objects
+from nova import rpc
 from nova.scheduler import rpcapi
 from nova import service
 from nova import utils
@@ -45,6 +46,8 @@ def main():
     objects.Service.enable_min_version_cache()
 
     gmr.TextGuruMeditation.setup_autorun(version, conf=CONF)
+    gmr.TextGuruMeditation.register_section(
+        'RPC Payload Compression', rpc.get_compression_report)
 
     server = service.Service.create(
         binary='nova-scheduler', topic=rpcapi.RPC_TOPIC)
@@ -37,6 +37,7 @@ from oslo_utils import units
 from oslo_utils import uuidutils
 
 from nova.accelerator import cyborg
+from nova.api.metadata import base as metadata_base
 from nova import availability_zones
 from nova import block_device
 from nova.compute import flavors
@@ -1249,17 +1250,25 @@ class API:
 
     @staticmethod
     @api_db_api.context_manager.writer
-    def _create_reqspec_buildreq_instmapping(context, rs, br, im):
-        """Create the request spec, build request, and instance mapping in a
-        single database transaction.
+    def _create_reqspecs_buildreqs_instmappings(context, instances_to_build):
+        """Create the request specs, build requests, and instance mappings in
+        a single database transaction.
+
+        The records of each type are inserted in one batched statement rather
+        than one instance at a time.
 
         The RequestContext must be passed in to this method so that the
         database transaction context manager decorator will nest properly and
-        include each create() into the same transaction context.
+        include each create_all() into the same transaction context.
+
+        :param instances_to_build: list of (RequestSpec, BuildRequest,
+            InstanceMapping) tuples
         """
-        rs.create()
-        br.create()
-        im.create()
+        req_specs, build_reqs, inst_mappings = (
+            zip(*instances_to_build) if instances_to_build else ([], [], []))
+        objects.RequestSpec.create_all(context, req_specs)
+        objects.BuildRequest.create_all(context, build_reqs)
+        objects.InstanceMapping.create_all(context, inst_mappings)
 
     def _validate_host_or_node(self, context, host, hypervisor_hostname):
         """Check whether compute nodes exist by validating the host
@@ -1470,6 +1479,9 @@ class API:
         if dp_name:
             dp_request_groups = cyborg.get_device_profile_request_groups(
                 context, dp_name)
+        # The records to create for each instance, they are created together
+        # once every instance has been validated.
+        to_create = []
         try:
             for idx in range(num_instances):
                 # Create a uuid for the instance so we can store the
@@ -1543,69 +1555,66 @@ class API:
                 inst_mapping.user_id = context.user_id
                 inst_mapping.cell_mapping = None
 
-                # Create the request spec, build request, and instance mapping
-                # records in a single transaction so that if a DBError is
-                # raised from any of them, all INSERTs will be rolled back and
-                # no orphaned records will be left behind.
-                self._create_reqspec_buildreq_instmapping(context, req_spec,
-                                                          build_request,
-                                                          inst_mapping)
-
-                instances_to_build.append(
-                    (req_spec, build_request, inst_mapping))
-
-                if instance_group:
-                    if check_server_group_quota:
-                        try:
-                            objects.Quotas.check_deltas(
-                                context, {'server_group_members': 1},
-                                instance_group, context.user_id)
-                            local_limit.enforce_db_limit(
-                                context, local_limit.SERVER_GROUP_MEMBERS,
-                                entity_scope=instance_group.uuid, delta=1)
-                        except exception.GroupMemberLimitExceeded:
-                            raise
-                        except exception.OverQuota:
-                            msg = _("Quota exceeded, too many servers in "
-                                    "group")
-                            raise exception.OverQuota(msg)
-
-                    members = objects.InstanceGroup.add_members(
-                        context, instance_group.uuid, [instance.uuid])
-
-                    # NOTE(melwitt): We recheck the quota after creating the
-                    # object to prevent users from allocating more resources
-                    # than their allowed quota in the event of a race. This is
-                    # configurable because it can be expensive if strict quota
-                    # limits are not required in a deployment.
-                    if CONF.quota.recheck_quota and check_server_group_quota:
-                        try:
-                            objects.Quotas.check_deltas(
-                                context, {'server_group_members': 0},
-                                instance_group, context.user_id)
-                            # TODO(johngarbutt): decide if we need this check
-                            # The quota rechecking of limits is really just to
-                            # protect against denial of service attacks that
-                            # aim to fill up the database. Its usefulness could
-                            # be debated.
-                            local_limit.enforce_db_limit(
-                                context, local_limit.SERVER_GROUP_MEMBERS,
-                                entity_scope=instance_group.uuid, delta=0)
-                        except exception.GroupMemberLimitExceeded:
-                            with excutils.save_and_reraise_exception():
-                                objects.InstanceGroup._remove_members_in_db(
-                                    context, instance_group.id,
-                                    [instance.uuid])
-                        except exception.OverQuota:
+                to_create.append((req_spec, build_request, inst_mapping))
+
+            if instance_group and check_server_group_quota:
+                try:
+                    objects.Quotas.check_deltas(
+                        context, {'server_group_members': num_instances},
+                        instance_group, context.user_id)
+                    local_limit.enforce_db_limit(
+                        context, local_limit.SERVER_GROUP_MEMBERS,
+                        entity_scope=instance_group.uuid,
+                        delta=num_instances)
+                except exception.GroupMemberLimitExceeded:
+                    raise
+                except exception.OverQuota:
+                    msg = _("Quota exceeded, too many servers in group")
+                    raise exception.OverQuota(msg)
+
+            # Create the request spec, build request, and instance mapping
+            # records of all the instances in a single transaction so that if
+            # a DBError is raised from any of them, all INSERTs will be rolled
+            # back and no orphaned records will be left behind.
+            self._create_reqspecs_buildreqs_instmappings(context, to_create)
+            instances_to_build = to_create
+
+            if instance_group:
+                instance_uuids = [
+                    build_request.instance_uuid
+                    for _rs, build_request, _im in instances_to_build]
+                members = objects.InstanceGroup.add_members(
+                    context, instance_group.uuid, instance_uuids)
+
+                # NOTE(melwitt): We recheck the quota after creating the
+                # object to prevent users from allocating more resources
+                # than their allowed quota in the event of a race. This is
+                # configurable because it can be expensive if strict quota
+                # limits are not required in a deployment.
+                if CONF.quota.recheck_quota and check_server_group_quota:
+                    try:
+                        objects.Quotas.check_deltas(
+                            context, {'server_group_members': 0},
+                            instance_group, context.user_id)
+                        # TODO(johngarbutt): decide if we need this check
+                        # The quota rechecking of limits is really just to
+                        # protect against denial of service attacks that
+                        # aim to fill up the database. Its usefulness could
+                        # be debated.
+                        local_limit.enforce_db_limit(
+                            context, local_limit.SERVER_GROUP_MEMBERS,
+                            entity_scope=instance_group.uuid, delta=0)
+                    except exception.GroupMemberLimitExceeded:
+                        with excutils.save_and_reraise_exception():
                             objects.InstanceGroup._remove_members_in_db(
-                                context, instance_group.id, [instance.uuid])
-                            msg = _("Quota exceeded, too many servers in "
-                                    "group")
-                            raise exception.OverQuota(msg)
-                    # list of members added to servers group in this iteration
-                    # is needed to check quota of server group during add next
-                    # instance
-                    instance_group.members.extend(members)
+                                context, instance_group.id, instance_uuids)
+                    except exception.OverQuota:
+                        objects.InstanceGroup._remove_members_in_db(
+                            context, instance_group.id, instance_uuids)
+                        msg = _("Quota exceeded, too many servers in "
+                                "group")
+                        raise exception.OverQuota(msg)
+                instance_group.members.extend(members)
 
         # In the case of any exceptions, attempt DB cleanup
         except Exception:
@@ -5524,6 +5533,7 @@ class API:
     def delete_instance_metadata(self, context, instance, key):
         """Delete the given metadata item from an instance."""
         instance.delete_metadata_key(key)
+        self._warm_metadata_cache(instance)
 
     @check_instance_lock
     @check_instance_state(vm_state=[vm_states.ACTIVE, vm_states.PAUSED,
@@ -5546,9 +5556,16 @@ class API:
         self._check_metadata_properties_quota(context, _metadata)
         instance.metadata = _metadata
         instance.save()
+        self._warm_metadata_cache(instance)
 
         return _metadata
 
+    @staticmethod
+    def _warm_metadata_cache(instance):
+        """Refresh the metadata of an instance in the metadata API cache."""
+        if CONF.api.metadata_cache_warming:
+            utils.spawn(metadata_base.warm_cache, instance)
+
     @block_shares_not_supported()
     @block_extended_resource_request
     @block_port_accelerators()
@@ -6172,6 +6189,7 @@ class HostAPI:
     def __init__(self, rpcapi=None, servicegroup_api=None):
         self.rpcapi = rpcapi or compute_rpcapi.ComputeAPI()
         self.servicegroup_api = servicegroup_api or servicegroup.API()
+        self.compute_task_api = conductor.ComputeTaskAPI()
 
     def _assert_host_exists(self, context, host_name, must_be_up=False):
         """Raise HostNotFound if compute host doesn't exist."""
@@ -6239,6 +6257,27 @@ class HostAPI:
                                                payload)
         return result
 
+    @target_host_cell
+    def drain_host(self, context, host_name, concurrency=None):
+        """Live migrates all the instances off a compute host.
+
+        The compute service of the host should be disabled first, so that no
+        new instance is scheduled to it while it is drained.
+        """
+        host_name = self._assert_host_exists(context, host_name,
+                                             must_be_up=True)
+        self.compute_task_api.drain_host(context, host_name,
+                                         concurrency=concurrency)
+
+    @target_host_cell
+    def get_drain_host_progress(self, context, host_name):
+        """Returns the progress of draining a compute host.
+
+        See nova.compute.utils.get_drain_host_progress for the details.
+        """
+        host_name = self._assert_host_exists(context, host_name)
+        return compute_utils.get_drain_host_progress(context, host_name)
+
     def _service_get_all_cells(self, context, disabled, set_zones,
                                cell_down_support):
         services = []
@@ -45,6 +45,8 @@ class InstanceSortContext(multi_cell_list.RecordSortContext):
 
 
 class InstanceLister(multi_cell_list.CrossCellLister):
+    keyset_pagination = True
+
     def __init__(self, sort_keys, sort_dirs, cells=None, batch_size=None):
         super(InstanceLister, self).__init__(
             InstanceSortContext(sort_keys, sort_dirs), cells=cells,
@@ -86,6 +88,15 @@ class InstanceLister(multi_cell_list.CrossCellLister):
             sort_dirs=self.sort_ctx.sort_dirs,
             **kwargs)
 
+    def get_by_sort_values(self, ctx, filters, limit, values, **kwargs):
+        # NOTE: The sort keys always end with uuid, so the values uniquely
+        # identify the position in the sort order to continue from.
+        return db.instance_get_all_by_filters_sort(
+            ctx, filters, limit=limit, marker_values=values,
+            sort_keys=self.sort_ctx.sort_keys,
+            sort_dirs=self.sort_ctx.sort_dirs,
+            **kwargs)
+
 
 # NOTE(danms): These methods are here for legacy glue reasons. We should not
 # replicate these for every data type we implement.
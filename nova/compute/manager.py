@@ -53,6 +53,7 @@ from oslo_utils import timeutils
 from oslo_utils import units
 
 from nova.accelerator import cyborg
+from nova.api.metadata import base as metadata_base
 from nova import block_device
 from nova.compute import api as compute
 from nova.compute import build_results
@@ -2955,6 +2956,8 @@ class ComputeManager(manager.Manager):
                     phase=fields.NotificationPhase.ERROR, exception=e,
                     bdms=block_device_mapping)
 
+        if CONF.api.metadata_cache_warming:
+            utils.spawn(metadata_base.warm_cache, instance)
         self._update_scheduler_instance_info(context, instance)
         self._notify_about_instance_usage(context, instance, 'create.end',
                 extra_usage_info={'message': _('Success')},
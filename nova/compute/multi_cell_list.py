@@ -12,7 +12,9 @@
 
 import abc
 import copy
+import functools
 import heapq
+import math
 import time
 
 from oslo_log import log as logging
@@ -27,12 +29,39 @@ LOG = logging.getLogger(__name__)
 CONF = nova.conf.CONF
 
 
+class _Reversed(object):
+    """Wrap a sort key value to invert its ordering."""
+
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+
 class RecordSortContext(object):
     def __init__(self, sort_keys, sort_dirs):
         self.sort_keys = sort_keys
         self.sort_dirs = sort_dirs
         self.start_time = time.monotonic()
 
+        # Records are merged by tuples of their sort key values (see
+        # get_sort_key()), which compare natively and so much faster than
+        # compare_records(). If most keys are sorted descending, the whole
+        # merge is reversed so that only the values of keys sorted in the
+        # minority direction need wrapping to invert their ordering.
+        self._custom_compare = (type(self).compare_records is not
+                                RecordSortContext.compare_records)
+        self.reverse = (not self._custom_compare and
+                        sort_dirs.count('desc') * 2 > len(sort_dirs))
+        minority_dir = 'asc' if self.reverse else 'desc'
+        self._reversed = [sdir == minority_dir for sdir in sort_dirs]
+
     @property
     def timeout_expired(self):
         return time.monotonic() - self.start_time > context.CELL_TIMEOUT
@@ -51,19 +80,31 @@ class RecordSortContext(object):
                 return resultflag * -1
         return 0
 
+    def get_sort_key(self, record):
+        """Return the key a record is merged by.
+
+        Records are ordered by their keys in ascending order, or descending
+        order if self.reverse is set, which is equivalent to ordering them
+        with compare_records().
+        """
+        if self._custom_compare:
+            return functools.cmp_to_key(self.compare_records)(record)
+        return tuple(_Reversed(record[skey]) if rev else record[skey]
+                     for skey, rev in zip(self.sort_keys, self._reversed))
+
 
 class RecordWrapper(object):
     """Wrap a DB object from the database so it is sortable.
 
     We use heapq.merge() below to do the merge sort of things from the
-    cell databases. That routine assumes it can use regular python
-    operators (> and <) on the contents. Since that won't work with
-    instances from the database (and depends on the sort keys/dirs),
-    we need this wrapper class to provide that.
-
-    Implementing __lt__ is enough for heapq.merge() to do its work.
+    cell databases. This keeps track of which cell a record came from,
+    which the merge needs for its accounting. The merge itself orders
+    records by their precomputed sort keys, but __lt__ is implemented so
+    that the wrappers can still be compared directly.
     """
 
+    __slots__ = ('cell_uuid', '_sort_ctx', '_db_record')
+
     def __init__(self, ctx, sort_ctx, db_record):
         self.cell_uuid = ctx.cell_uuid
         self._sort_ctx = sort_ctx
@@ -101,6 +142,11 @@ class CrossCellLister(metaclass=abc.ABCMeta):
 
     """
 
+    # Set this to True if get_by_sort_values() is implemented, in which case
+    # cells are paginated by the values of the sort keys of the last record
+    # returned rather than by looking up a marker record in each cell.
+    keyset_pagination = False
+
     def __init__(self, sort_ctx, cells=None, batch_size=None):
         self.sort_ctx = sort_ctx
         self.cells = cells
@@ -108,6 +154,8 @@ class CrossCellLister(metaclass=abc.ABCMeta):
         self._cells_responded = set()
         self._cells_failed = set()
         self._cells_timed_out = set()
+        self._records_returned = 0
+        self._cell_records_returned = {}
 
     @property
     def cells_responded(self):
@@ -188,10 +236,64 @@ class CrossCellLister(metaclass=abc.ABCMeta):
         :param filters: A dict of column=filter items
         :param limit: A numeric limit on the number of results, or None
         :param marker: The marker identifier, or None
-        :returns: A list of records
+        :returns: A list of records, with fewer than limit records only if
+                  there are no more records to list
         """
         pass
 
+    def get_by_sort_values(self, ctx, filters, limit, values, **kwargs):
+        """List records sorted after the given sort key values.
+
+        This is like get_by_filters(), except that the page starts after
+        the position the given values of the sort keys would have in the
+        sort order, whether a record with those values exists in the
+        database or not. It only needs to be implemented if
+        keyset_pagination is True.
+
+        :param ctx: A RequestContext
+        :param filters: A dict of column=filter items
+        :param limit: A numeric limit on the number of results, or None
+        :param values: The values of the sort_keys properties of the last
+                       record of the previous page
+        :returns: A list of records, with fewer than limit records only if
+                  there are no more records to list
+        """
+        raise NotImplementedError()
+
+    def _get_sort_values(self, record):
+        """Return the values of the sort keys of a record for a keyset query.
+
+        :returns: A list of values, or None if the record cannot be used as
+                  a keyset cursor because some of the values are NULL, which
+                  cannot be compared in the database.
+        """
+        values = [record[key] for key in self.sort_ctx.sort_keys]
+        if any(value is None for value in values):
+            return None
+        return values
+
+    def _get_batch_size(self, cell_uuid, limit, batch_size):
+        """Calculate the size of the next batch to query from a cell.
+
+        The first batch from each cell is the configured batch size. When a
+        cell runs out of records before the limit is reached, the size of
+        its next batch is estimated from the share of the records returned
+        so far which came from that cell, since that is likely to be how
+        many more of the remaining records it will provide. This avoids
+        many small round trips to the cells holding most of the results,
+        while never asking for more than could possibly still be returned.
+        """
+        if limit is None:
+            return batch_size
+
+        remaining = limit - self._records_returned
+        cell_returned = self._cell_records_returned.get(cell_uuid, 0)
+        if cell_returned and self._records_returned:
+            share = cell_returned / self._records_returned
+            batch_size = max(batch_size,
+                             int(math.ceil(remaining * share * 1.10)))
+        return min(batch_size, remaining)
+
     def query_wrapper(self, ctx, fn, *args, **kwargs):
         """This is a helper to run a query with predictable fail semantics.
 
@@ -226,8 +328,8 @@ class CrossCellLister(metaclass=abc.ABCMeta):
         This iterates cells in parallel generating a unified and sorted
         list of records as efficiently as possible. It takes care to
         iterate the list as infrequently as possible. We wrap the results
-        in RecordWrapper objects so that they are sortable by
-        heapq.merge(), which requires that the '<' operator just works.
+        in RecordWrapper objects to keep track of their cell, and merge
+        them with heapq.merge() by sort keys computed once per record.
 
         Our sorting requirements are encapsulated into the
         RecordSortContext provided to the constructor for this object.
@@ -237,8 +339,10 @@ class CrossCellLister(metaclass=abc.ABCMeta):
 
         NOTE: Since we do these in parallel, a nonzero limit will be passed
         to each database query, although the limit will be enforced in the
-        output of this function. Meaning, we will still query $limit from each
-        database, but only return $limit total results.
+        output of this function. Meaning, we may query up to $limit from each
+        database, but only return $limit total results. If a batch size was
+        provided, each cell is queried in batches, sized according to how
+        many of the results that cell has provided so far.
 
         :param cell_down_support: True if the API (and caller) support
                                   returning a minimal instance
@@ -264,6 +368,9 @@ class CrossCellLister(metaclass=abc.ABCMeta):
             global_marker_values = [global_marker_record[key]
                                     for key in self.sort_ctx.sort_keys]
 
+        self._records_returned = 0
+        self._cell_records_returned = {}
+
         def do_query(cctx):
             """Generate RecordWrapper(record) objects from a cell.
 
@@ -289,7 +396,15 @@ class CrossCellLister(metaclass=abc.ABCMeta):
 
             marker_id = self.marker_identifier
 
-            if marker:
+            # When paginating by keyset, these are the values of the sort
+            # keys of the last record returned, which each batch starts
+            # after. That spares us from finding a local marker record.
+            last_values = None
+
+            if marker and self.keyset_pagination:
+                last_values = self._get_sort_values(global_marker_record)
+
+            if marker and last_values is None:
                 if cctx.cell_uuid == global_marker_cell:
                     local_marker = marker
                 else:
@@ -349,24 +464,38 @@ class CrossCellLister(metaclass=abc.ABCMeta):
                 batch_count = 0
 
                 # Do not query a full batch if it would cause our total
-                # to exceed the limit
+                # to exceed the limit. Since this generator is only
+                # iterated again once the last record of the previous
+                # batch has been returned, everything that was already
+                # returned from any cell counts towards that limit.
                 if limit:
-                    query_size = min(batch_size, limit - return_count)
+                    query_size = self._get_batch_size(
+                        cctx.cell_uuid, limit, batch_size)
+                    if query_size <= 0:
+                        break
                 else:
                     query_size = batch_size
 
                 # Get one batch
-                query_result = self.get_by_filters(
-                    cctx, filters,
-                    limit=query_size or None, marker=local_marker,
-                    **kwargs)
+                if last_values is not None:
+                    query_result = self.get_by_sort_values(
+                        cctx, filters,
+                        limit=query_size or None, values=last_values,
+                        **kwargs)
+                else:
+                    query_result = self.get_by_filters(
+                        cctx, filters,
+                        limit=query_size or None, marker=local_marker,
+                        **kwargs)
 
                 # Yield wrapped results from the batch, counting as we go
                 # (to avoid traversing the list to count). Also, update our
-                # local_marker each time so that local_marker is the end of
-                # this batch in order to find the next batch.
+                # local_marker (or last_values) each time so that it is the
+                # end of this batch in order to find the next batch.
                 for item in query_result:
                     local_marker = item[self.marker_identifier]
+                    if self.keyset_pagination:
+                        last_values = self._get_sort_values(item)
                     yield RecordWrapper(cctx, self.sort_ctx, item)
                     batch_count += 1
 
@@ -382,6 +511,11 @@ class CrossCellLister(metaclass=abc.ABCMeta):
                            'total': return_count,
                            'limit': limit or 'no'})
 
+                # A batch which was unlimited or did not fill up means the
+                # cell has nothing more to give, so do not poll it again.
+                if not query_size or batch_count < query_size:
+                    break
+
         # NOTE(danms): The calls to do_query() will return immediately
         # with a generator. There is no point in us checking the
         # results for failure or timeout since we have not actually
@@ -407,10 +541,27 @@ class CrossCellLister(metaclass=abc.ABCMeta):
         # at the original provided limit.
         total_limit = limit or 0
 
+        # This makes us always sort failure sentinels
+        # ahead of actual results, for the reasons explained in
+        # RecordWrapper.__lt__(). Real records get keys prefixed with 1,
+        # so that tuple comparison decides that on the first element.
+        sentinel_key = (2,) if self.sort_ctx.reverse else (0,)
+        get_sort_key = self.sort_ctx.get_sort_key
+
+        def merge_key(item):
+            if context.is_cell_failure_sentinel(item._db_record):
+                return sentinel_key
+            return (1, get_sort_key(item._db_record))
+
         # Generate results from heapq so we can return the inner
         # instance instead of the wrapper. This is basically free
         # as it works as our caller iterates the results.
-        feeder = heapq.merge(*results.values())
+        if len(results) == 1:
+            # Nothing to merge, so do not bother computing sort keys
+            feeder = iter(next(iter(results.values())))
+        else:
+            feeder = heapq.merge(*results.values(), key=merge_key,
+                                 reverse=self.sort_ctx.reverse)
         while True:
             try:
                 item = next(feeder)
@@ -445,6 +596,9 @@ class CrossCellLister(metaclass=abc.ABCMeta):
                     self._cells_responded.remove(item.cell_uuid)
                 continue
 
+            self._records_returned += 1
+            self._cell_records_returned[item.cell_uuid] = (
+                self._cell_records_returned.get(item.cell_uuid, 0) + 1)
             yield item._db_record
             self._cells_responded.add(item.cell_uuid)
             total_limit -= 1
@@ -20,11 +20,16 @@ import inspect
 import itertools
 import math
 import socket
+import threading
 import traceback
 
 from oslo_log import log
+from oslo_reports.models import with_default_views
+from oslo_reports.views.text import generic as text_views
 from oslo_serialization import jsonutils
 from oslo_utils import excutils
+from oslo_utils import timeutils
+from oslo_utils import units
 import psutil
 
 from nova.accelerator import cyborg
@@ -33,6 +38,7 @@ from nova.compute import power_state
 from nova.compute import task_states
 from nova.compute import vm_states
 import nova.conf
+from nova import context as nova_context
 from nova import exception
 from nova import notifications
 from nova.notifications.objects import aggregate as aggregate_notification
@@ -49,6 +55,7 @@ from nova.notifications.objects import scheduler as scheduler_notification
 from nova.notifications.objects import server_group as sg_notification
 from nova.notifications.objects import volume as volume_notification
 from nova import objects
+from nova.objects import base as objects_base
 from nova.objects import fields
 from nova import rpc
 from nova import safe_utils
@@ -57,6 +64,13 @@ from nova import utils
 CONF = nova.conf.CONF
 LOG = log.getLogger(__name__)
 
+# Statuses of the live migrations which are not finished yet
+LIVE_MIGRATION_IN_PROGRESS_STATUSES = (
+    'accepted', 'queued', 'preparing', 'running', 'running (post-copy)')
+
+# States of the instances which are live migrated off a host being drained
+DRAIN_HOST_VM_STATES = (vm_states.ACTIVE, vm_states.PAUSED)
+
 # These properties are specific to a particular image by design.  It
 # does not make sense for them to be inherited by server snapshots.
 # This list is distinct from the configuration option of the same
@@ -141,6 +155,172 @@ def _get_fault_details(exc_info, error_code):
     return str(details)
 
 
+# Totals of the instance event buffer of this service, see
+# get_instance_event_buffer_stats().
+_EVENT_BUFFER_STATS = {'buffered': 0, 'written': 0, 'skipped': 0,
+                       'dropped': 0, 'flushes': 0, 'errors': 0}
+
+# Number of batches worth of records kept in the buffer when the conductor
+# cannot be reached, after which the oldest records are dropped.
+_EVENT_BUFFER_MAX_BATCHES = 10
+
+
+class _InstanceEventBuffer(object):
+    """Write-behind buffer of instance action events and instance faults.
+
+    Records are written to the database in batches, through the conductor,
+    either ``[compute]instance_event_buffer_delay`` seconds after the first
+    of them was buffered or as soon as ``[compute]instance_event_buffer_size``
+    of them are buffered, whichever comes first.
+    """
+
+    def __init__(self):
+        # Protects the buffered records, the timer and the stats.
+        self._lock = threading.Lock()
+        # Serializes the flushes so the batches are written in order.
+        self._flush_lock = threading.Lock()
+        self._events = []
+        self._faults = []
+        self._timer = None
+
+    def __len__(self):
+        return len(self._events) + len(self._faults)
+
+    def add_event(self, record):
+        """Buffer an event record returned by
+        InstanceActionEventList.pack_record().
+        """
+        self._add(self._events, record)
+
+    def add_fault(self, values):
+        """Buffer the values of an instance fault."""
+        self._add(self._faults, values)
+
+    def _add(self, records, record):
+        with self._lock:
+            records.append(record)
+            _EVENT_BUFFER_STATS['buffered'] += 1
+            full = len(self) >= CONF.compute.instance_event_buffer_size
+            if not full:
+                self._schedule_flush()
+        if full:
+            self.flush()
+
+    def _schedule_flush(self):
+        # Must be called with self._lock held.
+        if self._timer is None:
+            self._timer = threading.Timer(
+                CONF.compute.instance_event_buffer_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _requeue(self, records, failed):
+        # Put back the records of a failed write ahead of the ones buffered
+        # since, so they are retried in order by the next flush.
+        with self._lock:
+            records[:0] = failed
+            overflow = len(records) - (
+                CONF.compute.instance_event_buffer_size *
+                _EVENT_BUFFER_MAX_BATCHES)
+            if overflow > 0:
+                LOG.error('Dropping %d buffered instance action events or '
+                          'faults which could not be written.', overflow)
+                del records[:overflow]
+                _EVENT_BUFFER_STATS['dropped'] += overflow
+            _EVENT_BUFFER_STATS['errors'] += 1
+            self._schedule_flush()
+
+    def flush(self):
+        """Write the buffered records to the database."""
+        with self._flush_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                events, self._events = self._events, []
+                faults, self._faults = self._faults, []
+            if not events and not faults:
+                return
+
+            ctxt = nova_context.get_admin_context()
+            written = skipped = 0
+            if faults:
+                try:
+                    skipped_faults = objects.InstanceFaultList.create_bulk(
+                        ctxt, faults)
+                    written += len(faults) - skipped_faults
+                    skipped += skipped_faults
+                except Exception:
+                    LOG.exception('Failed to write %d buffered instance '
+                                  'faults.', len(faults))
+                    self._requeue(self._faults, faults)
+            if events:
+                try:
+                    skipped_events = (
+                        objects.InstanceActionEventList.record_bulk(
+                            ctxt, events))
+                    written += len(events) - skipped_events
+                    skipped += skipped_events
+                except Exception:
+                    LOG.exception('Failed to write %d buffered instance '
+                                  'action events.', len(events))
+                    self._requeue(self._events, events)
+
+            with self._lock:
+                _EVENT_BUFFER_STATS['written'] += written
+                _EVENT_BUFFER_STATS['skipped'] += skipped
+                _EVENT_BUFFER_STATS['flushes'] += 1
+            LOG.debug('Wrote %(written)d buffered instance action events and '
+                      'faults, skipped %(skipped)d.',
+                      {'written': written, 'skipped': skipped})
+
+
+_EVENT_BUFFER = _InstanceEventBuffer()
+
+
+def _instance_event_buffer_enabled():
+    # Only buffer in services which write to the database through the
+    # conductor, so the batches are written to the cell database of the
+    # service whatever the context the records were buffered with.
+    return (CONF.compute.instance_event_buffer_delay > 0 and
+            objects_base.NovaObject.indirection_api is not None)
+
+
+def flush_instance_event_buffer():
+    """Write the buffered instance action events and faults to the database.
+
+    This is called when the service stops so that no record is lost.
+    """
+    _EVENT_BUFFER.flush()
+    if len(_EVENT_BUFFER):
+        LOG.error('%d buffered instance action events or faults could not '
+                  'be written.', len(_EVENT_BUFFER))
+
+
+def get_instance_event_buffer_stats():
+    """Return the instance event buffer totals of this service.
+
+    :returns: A dict with the number of records currently ``pending`` in the
+        buffer, and the total number of records ``buffered``, ``written``,
+        ``skipped`` because their action, event or instance did not exist and
+        ``dropped`` because they could not be written, the number of
+        ``flushes`` and the number of failed writes (``errors``).
+    """
+    with _EVENT_BUFFER._lock:
+        return dict(_EVENT_BUFFER_STATS, pending=len(_EVENT_BUFFER))
+
+
+def get_instance_event_buffer_report():
+    """Return the instance event buffer totals as a report model.
+
+    This is registered as a section of the Guru Meditation Reports of the
+    compute service.
+    """
+    return with_default_views.ModelWithDefaultViews(
+        get_instance_event_buffer_stats(),
+        text_view=text_views.KeyValueView())
+
+
 def add_instance_fault_from_exc(context, instance, fault, exc_info=None,
                                 fault_message=None):
     """Adds the specified fault to the database."""
@@ -151,6 +331,16 @@ def add_instance_fault_from_exc(context, instance, fault, exc_info=None,
     fault_obj.update(exception_to_dict(fault, message=fault_message))
     code = fault_obj.code
     fault_obj.details = _get_fault_details(exc_info, code)
+    if _instance_event_buffer_enabled():
+        _EVENT_BUFFER.add_fault({
+            'instance_uuid': fault_obj.instance_uuid,
+            'code': fault_obj.code,
+            'message': fault_obj.message,
+            'details': fault_obj.details,
+            'host': fault_obj.host,
+            'created_at': timeutils.utcnow(),
+        })
+        return
     fault_obj.create()
 
 
@@ -1431,6 +1621,15 @@ class EventReporter(object):
         self.graceful_exit = graceful_exit
 
     def __enter__(self):
+        if _instance_event_buffer_enabled():
+            for uuid in self.instance_uuids:
+                values = objects.InstanceActionEvent.pack_action_event_start(
+                    self.context, uuid, self.event_name, host=self.host)
+                _EVENT_BUFFER.add_event(
+                    objects.InstanceActionEventList.pack_record(
+                        self.context, values))
+            return self
+
         for uuid in self.instance_uuids:
             objects.InstanceActionEvent.event_start(
                 self.context, uuid, self.event_name, want_result=False,
@@ -1439,6 +1638,18 @@ class EventReporter(object):
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        if _instance_event_buffer_enabled():
+            if exc_tb is not None:
+                exc_tb = ''.join(traceback.format_tb(exc_tb))
+            for uuid in self.instance_uuids:
+                values = objects.InstanceActionEvent.pack_action_event_finish(
+                    self.context, uuid, self.event_name, exc_val=exc_val,
+                    exc_tb=exc_tb)
+                _EVENT_BUFFER.add_event(
+                    objects.InstanceActionEventList.pack_record(
+                        self.context, values, finish=True))
+            return False
+
         for uuid in self.instance_uuids:
             try:
                 objects.InstanceActionEvent.event_finish_with_failure(
@@ -1673,3 +1884,85 @@ def check_attach_and_reserve_volume(context, volume_api, volume, instance,
     # is "ok".
     if bdm.obj_attr_is_set('id'):
         bdm.save()
+
+
+def get_live_migration_dirty_ratios(context, instance_uuids):
+    """Estimate how fast instances dirty their memory
+
+    The ratio between the memory processed and the total memory of the last
+    completed live migration of an instance tells how much memory the guest
+    dirtied while it was migrated: 1.0 for an idle guest, more for a busy
+    one.
+
+    :param context: nova auth RequestContext
+    :param instance_uuids: list of instance UUIDs
+    :returns: dict, keyed by instance UUID, of the ratio of the last
+        completed live migration of the instance, or 1.0 if there is none
+    """
+    ratios = dict.fromkeys(instance_uuids, 1.0)
+    migrations = objects.MigrationList.get_by_filters(
+        context, {'instance_uuid': list(instance_uuids),
+                  'migration_type': fields.MigrationType.LIVE_MIGRATION,
+                  'status': 'completed'},
+        sort_keys=['created_at'], sort_dirs=['desc'])
+    seen = set()
+    for migration in migrations:
+        if migration.instance_uuid in seen:
+            continue
+        seen.add(migration.instance_uuid)
+        if migration.memory_total and migration.memory_processed:
+            ratios[migration.instance_uuid] = max(
+                1.0, migration.memory_processed / migration.memory_total)
+    return ratios
+
+
+def get_drain_host_progress(context, host):
+    """Report the progress of live migrating all instances off a host
+
+    Only the instances in one of the DRAIN_HOST_VM_STATES are live migrated
+    when draining a host, so the other ones are counted separately.
+
+    :param context: nova auth RequestContext targeted at the cell of the host
+    :param host: name of the compute host being drained
+    :returns: dict with the number of ``instances`` left to live migrate off
+        the host, of ``other_instances`` on the host which are not live
+        migrated, e.g. stopped ones, of live ``migrations`` in progress, their
+        ``memory_total``, ``memory_processed`` and ``memory_remaining`` in
+        bytes, the aggregate ``throughput`` in bytes per second and the
+        ``eta`` in seconds to drain the host, or None if unknown
+    """
+    instances = objects.InstanceList.get_by_host(
+        context, host, expected_attrs=['flavor'])
+    other_instances = [instance for instance in instances
+                       if instance.vm_state not in DRAIN_HOST_VM_STATES]
+    instances = [instance for instance in instances
+                 if instance.vm_state in DRAIN_HOST_VM_STATES]
+    migrations = objects.MigrationList.get_by_filters(
+        context, {'source_compute': host,
+                  'migration_type': fields.MigrationType.LIVE_MIGRATION,
+                  'status': list(LIVE_MIGRATION_IN_PROGRESS_STATUSES)})
+
+    now = timeutils.utcnow(with_timezone=True)
+    progress = {'instances': len(instances),
+                'other_instances': len(other_instances),
+                'migrations': len(migrations),
+                'memory_total': 0, 'memory_processed': 0,
+                'memory_remaining': 0, 'throughput': 0, 'eta': None}
+    migrating = set()
+    for migration in migrations:
+        migrating.add(migration.instance_uuid)
+        progress['memory_total'] += migration.memory_total or 0
+        progress['memory_processed'] += migration.memory_processed or 0
+        progress['memory_remaining'] += migration.memory_remaining or 0
+        elapsed = (now - migration.created_at).total_seconds()
+        if migration.memory_processed and elapsed > 0:
+            progress['throughput'] += migration.memory_processed / elapsed
+
+    # The memory of the instances not migrated yet is still to be copied
+    remaining = progress['memory_remaining'] + sum(
+        instance.flavor.memory_mb * units.Mi for instance in instances
+        if instance.uuid not in migrating)
+    if progress['throughput']:
+        progress['eta'] = int(remaining / progress['throughput'])
+        progress['throughput'] = int(progress['throughput'])
+    return progress
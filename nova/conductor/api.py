@@ -196,3 +196,14 @@ class ComputeTaskAPI(object):
             volume, device, disk_bus, device_type, tag=tag,
             supports_multiattach=supports_multiattach,
             delete_on_termination=delete_on_termination, do_cast=do_cast)
+
+    def drain_host(self, context, host, concurrency=None):
+        """Live migrate all the instances off a compute host.
+
+        :param context: The RequestContext
+        :param host: The name of the compute host to drain
+        :param concurrency: The maximum number of concurrent live migrations,
+                            None to use max_concurrent_live_migrations
+        """
+        self.conductor_compute_rpcapi.drain_host(
+            context, host, concurrency=concurrency)
@@ -69,6 +69,12 @@ from nova.volume import cinder
 LOG = logging.getLogger(__name__)
 CONF = cfg.CONF
 
+# Interval in seconds between two checks of the live migrations started to
+# drain a host
+DRAIN_HOST_POLL_INTERVAL = 5
+# Maximum number of hosts drained at the same time by a conductor worker
+DRAIN_HOST_MAX_WORKERS = 4
+
 
 def targets_cell(fn):
     """Wrap a method and automatically target the instance's cell.
@@ -260,7 +266,7 @@ class ComputeTaskManager:
     may involve coordinating activities on multiple compute nodes.
     """
 
-    target = messaging.Target(namespace='compute_task', version='1.26')
+    target = messaging.Target(namespace='compute_task', version='1.27')
 
     def __init__(self):
         self.compute_rpcapi = compute_rpcapi.ComputeAPI()
@@ -272,6 +278,10 @@ class ComputeTaskManager:
         self.notifier = rpc.get_notifier('compute')
         # Help us to record host in EventReporter
         self.host = CONF.host
+        # The hosts being drained by this worker, see drain_host()
+        self._drain_host_executor = None
+        self._drain_host_futures = {}
+        self._drain_host_lock = threading.Lock()
 
         try:
             # Test our placement client during initialization
@@ -555,6 +565,7 @@ class ComputeTaskManager:
             migration.status = 'error'
             migration.save()
             raise exception.MigrationError(reason=str(ex))
+        return migration
 
     def _build_live_migrate_task(self, context, instance, destination,
                                  block_migration, disk_over_commit, migration,
@@ -1688,6 +1699,11 @@ class ComputeTaskManager:
         cell_mapping_cache = {}
         instances = []
         host_az = {}  # host=az cache to optimize multi-create
+        # Check that the build requests are still around and were not
+        # deleted by the user already, all at once rather than before
+        # creating each instance.
+        existing_build_requests = objects.BuildRequestList.get_instance_uuids(
+            context, instance_uuids)
 
         for (build_request, request_spec, host_list) in zip(
                 build_requests, request_specs, host_lists):
@@ -1721,10 +1737,7 @@ class ComputeTaskManager:
             # Before we create the instance, let's make one final check that
             # the build request is still around and wasn't deleted by the user
             # already.
-            try:
-                objects.BuildRequest.get_by_instance_uuid(
-                    context, instance.uuid)
-            except exception.BuildRequestNotFound:
+            if instance.uuid not in existing_build_requests:
                 # the build request is gone so we're done for this instance
                 LOG.debug('While scheduling instance, the build request '
                           'was already deleted.', instance=instance)
@@ -1742,16 +1755,16 @@ class ComputeTaskManager:
                 self.report_client.delete_allocation_for_instance(
                     context, instance.uuid, force=True)
                 continue
-            else:
-                if host.service_host not in host_az:
-                    host_az[host.service_host] = (
-                        availability_zones.get_host_availability_zone(
-                            context, host.service_host))
-                instance.availability_zone = host_az[host.service_host]
-                with obj_target_cell(instance, cell):
-                    instance.create()
-                    instances.append(instance)
-                    cell_mapping_cache[instance.uuid] = cell
+
+            if host.service_host not in host_az:
+                host_az[host.service_host] = (
+                    availability_zones.get_host_availability_zone(
+                        context, host.service_host))
+            instance.availability_zone = host_az[host.service_host]
+            with obj_target_cell(instance, cell):
+                instance.create()
+                instances.append(instance)
+                cell_mapping_cache[instance.uuid] = cell
 
         # NOTE(melwitt): We recheck the quota after allocating the
         # resources to prevent users from allocating more resources
@@ -1771,6 +1784,9 @@ class ComputeTaskManager:
                     block_device_mapping, tags, cell_mapping_cache)
 
         zipped = zip(build_requests, request_specs, host_lists, instances)
+        to_build = []
+        cells_by_uuid = {}
+        instances_by_cell = collections.defaultdict(list)
         for (build_request, request_spec, host_list, instance) in zipped:
             if instance is None:
                 # Skip placeholders that were buried in cell0 or had their
@@ -1821,15 +1837,35 @@ class ComputeTaskManager:
             instance.tags = instance_tags if instance_tags \
                 else objects.TagList()
 
-            # Update mapping for instance.
-            self._map_instance_to_cell(context, instance, cell)
+            to_build.append((request_spec, host, host_list, filter_props,
+                             instance, cell, instance_bdms, instance_tags))
+            cells_by_uuid[cell.uuid] = cell
+            instances_by_cell[cell.uuid].append(instance)
 
-            if not self._delete_build_request(
-                    context, build_request, instance, cell, instance_bdms,
-                    instance_tags):
+        if not to_build:
+            return
+
+        # Update the mappings of the instances, with one query per cell, now
+        # that their records are complete in the cells.
+        mapped_uuids = []
+        for cell_uuid, cell_instances in instances_by_cell.items():
+            self._map_instances_to_cell(
+                context, cell_instances, cells_by_uuid[cell_uuid])
+            mapped_uuids.extend(instance.uuid for instance in cell_instances)
+
+        # Then delete all the build requests at once.
+        deleted_build_requests = objects.BuildRequestList.destroy_bulk(
+            context, mapped_uuids)
+
+        to_cast = []
+        for (request_spec, host, host_list, filter_props, instance, cell,
+                instance_bdms, instance_tags) in to_build:
+            if instance.uuid not in deleted_build_requests:
                 # The build request was deleted before/during scheduling so
-                # the instance is gone and we don't have anything to build for
+                # clean up the instance, we don't have anything to build for
                 # this one.
+                self._cleanup_deleted_build_request(
+                    context, instance, cell, instance_bdms, instance_tags)
                 continue
 
             try:
@@ -1842,24 +1878,48 @@ class ComputeTaskManager:
                         context, exc, instances, build_requests, request_specs,
                         block_device_mapping, tags, cell_mapping_cache)
 
-            # NOTE(danms): Compute RPC expects security group names or ids
-            # not objects, so convert this to a list of names until we can
-            # pass the objects.
-            legacy_secgroups = [s.identifier
-                                for s in request_spec.security_groups]
-            with obj_target_cell(instance, cell) as cctxt:
-                self.compute_rpcapi.build_and_run_instance(
-                    cctxt, instance=instance, image=image,
-                    request_spec=request_spec,
-                    filter_properties=filter_props,
-                    admin_password=admin_password,
-                    injected_files=injected_files,
-                    requested_networks=requested_networks,
-                    security_groups=legacy_secgroups,
-                    block_device_mapping=instance_bdms,
-                    host=host.service_host, node=host.nodename,
-                    limits=host.limits, host_list=host_list,
-                    accel_uuids=accel_uuids)
+            to_cast.append((request_spec, host, host_list, filter_props,
+                            instance, cell, instance_bdms, accel_uuids))
+
+        # Cast to the computes in parallel when building several instances.
+        if len(to_cast) > 1:
+            futures = [utils.spawn(self._build_and_run_instance, *args,
+                                   image=image, admin_password=admin_password,
+                                   injected_files=injected_files,
+                                   requested_networks=requested_networks)
+                       for args in to_cast]
+            concurrent.futures.wait(futures)
+            for future in futures:
+                future.result()
+        elif to_cast:
+            self._build_and_run_instance(
+                *to_cast[0], image=image, admin_password=admin_password,
+                injected_files=injected_files,
+                requested_networks=requested_networks)
+
+    def _build_and_run_instance(self, request_spec, host, host_list,
+                                filter_props, instance, cell, instance_bdms,
+                                accel_uuids, image, admin_password,
+                                injected_files, requested_networks):
+        """Cast to the selected compute to build an instance in its cell."""
+        # NOTE(danms): Compute RPC expects security group names or ids
+        # not objects, so convert this to a list of names until we can
+        # pass the objects.
+        legacy_secgroups = [s.identifier
+                            for s in request_spec.security_groups]
+        with obj_target_cell(instance, cell) as cctxt:
+            self.compute_rpcapi.build_and_run_instance(
+                cctxt, instance=instance, image=image,
+                request_spec=request_spec,
+                filter_properties=filter_props,
+                admin_password=admin_password,
+                injected_files=injected_files,
+                requested_networks=requested_networks,
+                security_groups=legacy_secgroups,
+                block_device_mapping=instance_bdms,
+                host=host.service_host, node=host.nodename,
+                limits=host.limits, host_list=host_list,
+                accel_uuids=accel_uuids)
 
     def _create_and_bind_arqs(
             self, cyclient, instance_uuid, extra_specs,
@@ -1935,35 +1995,46 @@ class ComputeTaskManager:
         return bindings
 
     @staticmethod
-    def _map_instance_to_cell(context, instance, cell):
-        """Update the instance mapping to point at the given cell.
+    def _map_instances_to_cell(context, instances, cell):
+        """Update the instance mappings to point at the given cell.
 
         During initial scheduling once a host and cell is selected in which
-        to build the instance this method is used to update the instance
-        mapping to point at that cell.
+        to build the instances this method is used to update the instance
+        mappings to point at that cell. The mappings of all the instances are
+        updated with a single query.
 
         :param context: nova auth RequestContext
-        :param instance: Instance object being built
-        :param cell: CellMapping representing the cell in which the instance
-            was created and is being built.
-        :returns: InstanceMapping object that was updated.
+        :param instances: list of Instance objects being built
+        :param cell: CellMapping representing the cell in which the instances
+            were created and are being built.
+        :returns: InstanceMappingList of the updated InstanceMapping objects
+        :raises: InstanceMappingNotFound if an instance has no mapping
         """
-        inst_mapping = objects.InstanceMapping.get_by_instance_uuid(
-            context, instance.uuid)
-        # Perform a final sanity check that the instance is not mapped
-        # to some other cell already because of maybe some crazy
-        # clustered message queue weirdness.
-        if inst_mapping.cell_mapping is not None:
-            LOG.error('During scheduling instance is already mapped to '
-                      'another cell: %s. This should not happen and is an '
-                      'indication of bigger problems. If you see this you '
-                      'should report it to the nova team. Overwriting '
-                      'the mapping to point at cell %s.',
-                      inst_mapping.cell_mapping.identity, cell.identity,
-                      instance=instance)
-        inst_mapping.cell_mapping = cell
-        inst_mapping.save()
-        return inst_mapping
+        instance_uuids = [instance.uuid for instance in instances]
+        inst_mappings = objects.InstanceMappingList.get_by_instance_uuids(
+            context, instance_uuids)
+        mappings_by_uuid = {im.instance_uuid: im for im in inst_mappings}
+        for instance in instances:
+            inst_mapping = mappings_by_uuid.get(instance.uuid)
+            if inst_mapping is None:
+                raise exception.InstanceMappingNotFound(uuid=instance.uuid)
+            # Perform a final sanity check that the instance is not mapped
+            # to some other cell already because of maybe some crazy
+            # clustered message queue weirdness.
+            if inst_mapping.cell_mapping is not None:
+                LOG.error('During scheduling instance is already mapped to '
+                          'another cell: %s. This should not happen and is '
+                          'an indication of bigger problems. If you see this '
+                          'you should report it to the nova team. '
+                          'Overwriting the mapping to point at cell %s.',
+                          inst_mapping.cell_mapping.identity, cell.identity,
+                          instance=instance)
+        objects.InstanceMappingList.update_cell_bulk(
+            context, instance_uuids, cell)
+        for inst_mapping in inst_mappings:
+            inst_mapping.cell_mapping = cell
+            inst_mapping.obj_reset_changes(['cell_mapping'])
+        return inst_mappings
 
     def _cleanup_build_artifacts(self, context, exc, instances, build_requests,
                                  request_specs, block_device_mappings, tags,
@@ -2018,18 +2089,17 @@ class ComputeTaskManager:
             except exception.RequestSpecNotFound:
                 pass
 
-    def _delete_build_request(self, context, build_request, instance, cell,
-                              instance_bdms, instance_tags):
-        """Delete a build request after creating the instance in the cell.
+    def _cleanup_deleted_build_request(self, context, instance, cell,
+                                       instance_bdms, instance_tags):
+        """Clean up an instance which build request was already deleted.
 
-        This method handles cleaning up the instance in case the build request
-        is already deleted by the time we try to delete it.
+        This indicates an instance deletion request has been processed while
+        the instance was being scheduled and created in the cell, so the
+        build should halt here. Clean up the bdm, tags and instance record.
 
         :param context: the context of the request being handled
         :type context: nova.context.RequestContext
-        :param build_request: the build request to delete
-        :type build_request: nova.objects.BuildRequest
-        :param instance: the instance created from the build_request
+        :param instance: the instance created from the build request
         :type instance: nova.objects.Instance
         :param cell: the cell in which the instance was created
         :type cell: nova.objects.CellMapping
@@ -2037,45 +2107,35 @@ class ComputeTaskManager:
         :type instance_bdms: nova.objects.BlockDeviceMappingList
         :param instance_tags: list of tags for the instance
         :type instance_tags: nova.objects.TagList
-        :returns: True if the build request was successfully deleted, False if
-            the build request was already deleted and the instance is now gone.
         """
-        try:
-            build_request.destroy()
-        except exception.BuildRequestNotFound:
-            # This indicates an instance deletion request has been
-            # processed, and the build should halt here. Clean up the
-            # bdm, tags and instance record.
-            with obj_target_cell(instance, cell) as cctxt:
-                with compute_utils.notify_about_instance_delete(
-                        self.notifier, cctxt, instance,
-                        source=fields.NotificationSource.CONDUCTOR):
+        with obj_target_cell(instance, cell) as cctxt:
+            with compute_utils.notify_about_instance_delete(
+                    self.notifier, cctxt, instance,
+                    source=fields.NotificationSource.CONDUCTOR):
+                try:
+                    instance.destroy()
+                except exception.InstanceNotFound:
+                    pass
+                except exception.ObjectActionError:
+                    # NOTE(melwitt): Instance became scheduled during
+                    # the destroy, "host changed". Refresh and re-destroy.
                     try:
+                        instance.refresh()
                         instance.destroy()
                     except exception.InstanceNotFound:
                         pass
-                    except exception.ObjectActionError:
-                        # NOTE(melwitt): Instance became scheduled during
-                        # the destroy, "host changed". Refresh and re-destroy.
-                        try:
-                            instance.refresh()
-                            instance.destroy()
-                        except exception.InstanceNotFound:
-                            pass
-            for bdm in instance_bdms:
-                with obj_target_cell(bdm, cell):
-                    try:
-                        bdm.destroy()
-                    except exception.ObjectActionError:
-                        pass
-            if instance_tags:
-                with try_target_cell(context, cell) as target_ctxt:
-                    try:
-                        objects.TagList.destroy(target_ctxt, instance.uuid)
-                    except exception.InstanceNotFound:
-                        pass
-            return False
-        return True
+        for bdm in instance_bdms:
+            with obj_target_cell(bdm, cell):
+                try:
+                    bdm.destroy()
+                except exception.ObjectActionError:
+                    pass
+        if instance_tags:
+            with try_target_cell(context, cell) as target_ctxt:
+                try:
+                    objects.TagList.destroy(target_ctxt, instance.uuid)
+                except exception.InstanceNotFound:
+                    pass
 
     def cache_images(self, context, aggregate, image_ids):
         """Cache a set of images on the set of hosts in an aggregate.
@@ -2207,6 +2267,182 @@ class ComputeTaskManager:
             fields.NotificationAction.IMAGE_CACHE,
             fields.NotificationPhase.END)
 
+    def drain_host(self, context, host, concurrency=None):
+        """Live migrate all the instances off a compute host.
+
+        The instances are migrated from the cheapest to the most expensive to
+        move, estimated from their memory size and from how much memory they
+        dirtied during their last live migration, so most of them leave the
+        host quickly. Up to ``concurrency`` live migrations are run at the
+        same time, bounded by ``[DEFAULT]max_concurrent_live_migrations`` for
+        the source and for each destination host.
+
+        The host is drained in the background, on an executor owned by this
+        conductor worker, so this returns right away. The state of the drain
+        is kept in the database, as the instances left on the host and the
+        Migration records of their live migrations, so a drain interrupted by
+        a restart of the conductor picks up the live migrations still in
+        progress when it is requested again.
+
+        :param context: The RequestContext
+        :param host: The name of the compute host to drain
+        :param concurrency: The maximum number of concurrent live migrations,
+            None to use ``[DEFAULT]max_concurrent_live_migrations``
+        """
+        with self._drain_host_lock:
+            future = self._drain_host_futures.get(host)
+            if future is not None and not future.done():
+                LOG.info('Host %s is already being drained', host)
+                return
+            if self._drain_host_executor is None:
+                self._drain_host_executor = utils.create_executor(
+                    DRAIN_HOST_MAX_WORKERS)
+                self._drain_host_executor.name = 'drain_host'
+            self._drain_host_futures[host] = utils.spawn_on(
+                self._drain_host_executor, self._drain_host_in_cell,
+                context, host, concurrency)
+
+    def _drain_host_in_cell(self, context, host, concurrency):
+        try:
+            hmap = objects.HostMapping.get_by_host(context, host)
+            with nova_context.target_cell(
+                    context, hmap.cell_mapping) as cctxt:
+                self._drain_host(cctxt, host, concurrency)
+        except Exception:
+            LOG.exception('Failed to drain host %s', host)
+
+    def _drain_host(self, context, host, concurrency):
+        in_progress = compute_utils.LIVE_MIGRATION_IN_PROGRESS_STATUSES
+        # Pick up the live migrations started by an earlier drain of the
+        # host which was interrupted, e.g. by a restart of the conductor.
+        in_flight = {
+            migration.id: migration
+            for migration in objects.MigrationList.get_by_filters(
+                context, {'source_compute': host,
+                          'migration_type':
+                              fields.MigrationType.LIVE_MIGRATION,
+                          'status': list(in_progress)})}
+        migrating = {migration.instance_uuid
+                     for migration in in_flight.values()}
+        instances = [
+            instance for instance in objects.InstanceList.get_by_filters(
+                context, {'host': host, 'deleted': False,
+                          'vm_state': list(
+                              compute_utils.DRAIN_HOST_VM_STATES)},
+                expected_attrs=['flavor'])
+            if instance.uuid not in migrating]
+        ratios = compute_utils.get_live_migration_dirty_ratios(
+            context, [instance.uuid for instance in instances])
+        pending = collections.deque(sorted(
+            instances,
+            key=lambda i: i.flavor.memory_mb * ratios[i.uuid]))
+
+        max_per_host = CONF.max_concurrent_live_migrations
+        if not concurrency:
+            concurrency = max_per_host or len(instances)
+        elif max_per_host:
+            concurrency = min(concurrency, max_per_host)
+
+        LOG.info('Draining host %(host)s of %(count)d instances with up to '
+                 '%(concurrency)d concurrent live migrations, %(resumed)d '
+                 'already in progress',
+                 {'host': host, 'count': len(instances),
+                  'concurrency': concurrency, 'resumed': len(in_flight)})
+        clock = timeutils.StopWatch()
+        clock.start()
+        stats = collections.Counter()
+        while pending or in_flight:
+            for migration_id in list(in_flight):
+                migration = objects.Migration.get_by_id(context, migration_id)
+                in_flight[migration_id] = migration
+                if migration.status not in in_progress:
+                    del in_flight[migration_id]
+                    stats[migration.status] += 1
+
+            while pending and len(in_flight) < concurrency:
+                instance = pending.popleft()
+                migration = self._drain_live_migrate(
+                    context, instance,
+                    self._get_busy_destinations(context, max_per_host))
+                if migration is None:
+                    stats['skipped'] += 1
+                    continue
+                in_flight[migration.id] = migration
+
+            if in_flight:
+                progress = compute_utils.get_drain_host_progress(
+                    context, host)
+                LOG.info('Draining host %(host)s: %(instances)d instances '
+                         'left, %(migrations)d live migrations in progress, '
+                         '%(memory_remaining)d bytes of memory remaining '
+                         'at %(throughput)d bytes/s, ETA %(eta)s secs',
+                         dict(progress, host=host))
+                time.sleep(DRAIN_HOST_POLL_INTERVAL)
+
+        clock.stop()
+        LOG.info('Draining host %(host)s completed in %(time).2f seconds; '
+                 '%(completed)d instances migrated, %(failed)d failed, '
+                 '%(skipped)d skipped',
+                 {'host': host, 'time': clock.elapsed(),
+                  'completed': stats['completed'],
+                  'failed': (stats['failed'] + stats['error'] +
+                             stats['cancelled']),
+                  'skipped': stats['skipped']})
+
+    @staticmethod
+    def _get_busy_destinations(context, max_per_host):
+        """Return the hosts which cannot take another live migration.
+
+        :param context: The RequestContext targeted at the cell
+        :param max_per_host: The maximum number of concurrent live
+            migrations per host, 0 for unlimited
+        :returns: the list of the names of the hosts which are already the
+            destination of max_per_host live migrations
+        """
+        if not max_per_host:
+            return []
+        migrations = objects.MigrationList.get_by_filters(
+            context, {'migration_type': fields.MigrationType.LIVE_MIGRATION,
+                      'status': list(
+                          compute_utils.LIVE_MIGRATION_IN_PROGRESS_STATUSES)})
+        counts = collections.Counter(
+            migration.dest_compute for migration in migrations
+            if migration.dest_compute)
+        return [dest for dest, count in counts.items()
+                if count >= max_per_host]
+
+    def _drain_live_migrate(self, context, instance, ignore_hosts):
+        """Start the live migration of an instance off a drained host.
+
+        :returns: the Migration, or None if the instance could not be live
+            migrated
+        """
+        try:
+            instance.task_state = task_states.MIGRATING
+            instance.save(expected_task_state=[None])
+        except (exception.UnexpectedTaskStateError,
+                exception.InstanceNotFound) as ex:
+            LOG.info('Not draining instance: %s', ex, instance=instance)
+            return None
+
+        objects.InstanceAction.action_start(
+            context, instance.uuid, instance_actions.LIVE_MIGRATION,
+            want_result=False)
+        request_spec = objects.RequestSpec.get_by_instance_uuid(
+            context, instance.uuid)
+        request_spec.ignore_hosts = ignore_hosts
+        try:
+            with compute_utils.EventReporter(
+                    context, 'conductor_live_migrate_instance', self.host,
+                    instance.uuid):
+                return self._live_migrate(
+                    context, instance, {'host': None}, block_migration=None,
+                    disk_over_commit=None, request_spec=request_spec)
+        except Exception as ex:
+            LOG.warning('Failed to live migrate instance while draining its '
+                        'host: %s', ex, instance=instance)
+            return None
+
     @targets_cell
     @wrap_instance_event(prefix='conductor')
     def confirm_snapshot_based_resize(self, context, instance, migration):
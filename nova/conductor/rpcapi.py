@@ -289,6 +289,7 @@ class ComputeTaskAPI(object):
     1.24 - Add reimage_boot_volume parameter to rebuild_instance()
     1.25 - Add target_state parameter to rebuild_instance()
     1.26 - Added attach_volume()
+    1.27 - Added drain_host()
     """
 
     def __init__(self):
@@ -515,3 +516,10 @@ class ComputeTaskAPI(object):
             version=version, call_monitor_timeout=CONF.rpc_response_timeout,
             timeout=CONF.long_rpc_timeout)
         return cctxt.call(ctxt, 'attach_volume', **kw)
+
+    def drain_host(self, ctxt, host, concurrency=None):
+        version = '1.27'
+        if not self.client.can_send_version(version):
+            raise exception.ServiceTooOld(_('nova-conductor too old'))
+        cctxt = self.client.prepare(version=version)
+        cctxt.cast(ctxt, 'drain_host', host=host, concurrency=concurrency)
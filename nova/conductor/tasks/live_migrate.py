@@ -533,13 +533,19 @@ class LiveMigrationTask(base.TaskBase):
     def _find_destination(self):
         # TODO(johngarbutt) this retry loop should be shared
         attempted_hosts = [self.source]
+        # NOTE: Hosts the caller asked to avoid, e.g. the destinations
+        # already busy with other migrations when draining a host, are not
+        # scheduling attempts.
+        busy_hosts = []
+        if 'ignore_hosts' in self.request_spec:
+            busy_hosts = list(self.request_spec.ignore_hosts or [])
         request_spec = self._get_request_spec_for_select_destinations(
             attempted_hosts)
 
         host = None
         while host is None:
             self._check_not_over_max_retries(attempted_hosts)
-            request_spec.ignore_hosts = attempted_hosts
+            request_spec.ignore_hosts = attempted_hosts + busy_hosts
             try:
                 selection_lists = self.query_client.select_destinations(
                         self.context, request_spec, [self.instance.uuid],
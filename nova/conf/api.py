@@ -141,6 +141,29 @@ Related options:
 * vendordata_dynamic_ssl_certfile
 * vendordata_dynamic_connect_timeout
 * vendordata_dynamic_failure_fatal
+"""),
+    cfg.IntOpt('vendordata_dynamic_total_timeout',
+        default=10,
+        min=0,
+        help="""
+Maximum wait time for all the external REST services to return data.
+
+The dynamic vendordata targets are called concurrently. The targets which did
+not return data within this time are left out of the vendordata of that
+request, and added to it once they answer.
+
+Possible values:
+
+* Any integer. 0 waits for all the targets, bounded by their connect and read
+  timeouts. This timeout is ignored when failures to fetch dynamic
+  vendordata are fatal.
+
+Related options:
+
+* vendordata_dynamic_targets
+* vendordata_dynamic_connect_timeout
+* vendordata_dynamic_read_timeout
+* vendordata_dynamic_failure_fatal
 """),
     cfg.BoolOpt('vendordata_dynamic_failure_fatal',
         default=False,
@@ -164,6 +187,44 @@ metadata caching is disabled entirely; this is generally not recommended for
 performance reasons. Increasing this setting should improve response times
 of the metadata API when under heavy load. Higher values may increase memory
 usage, and result in longer times for host metadata changes to take effect.
+"""),
+    cfg.IntOpt("metadata_negative_cache_expiration",
+        default=5,
+        min=0,
+        help="""
+This option is the time (in seconds) to cache the metadata lookups which did
+not find an instance, such as the requests of a guest whose address is not
+known yet. Concurrent lookups of the same instance are always coalesced into
+a single one. When set to 0, the lookups which did not find an instance are
+not cached. The value is capped by ``metadata_cache_expiration``, and ignored
+when that option is 0.
+
+Related options:
+
+* metadata_cache_expiration
+"""),
+    cfg.BoolOpt("metadata_cache_warming",
+        default=False,
+        help="""
+Pre-render the metadata of instances into the cache of the metadata API.
+
+When enabled, the metadata of an instance is rendered and stored in the cache
+by the compute service once the instance is active, and by the API service
+when the metadata of the instance is changed. The requests of the guest made
+through the neutron metadata proxy are then served with a single cache read,
+instead of building its metadata on a cache miss, which reduces the load on the
+database and the network service when many instances boot at once. Requests
+looked up by the fixed IP address of the guest are not warmed, since addresses
+may overlap between networks. The vendordata is not warmed, it is still built
+by the metadata API service from its own configuration.
+
+This requires the ``[cache]`` section to be configured, on the compute, API
+and metadata API services, with a cache backend shared by all of them, such
+as memcached.
+
+Related options:
+
+* metadata_cache_expiration
 """),
     cfg.BoolOpt("local_metadata_per_cell",
                 default=False,
@@ -968,6 +968,29 @@ image format conversions, etc.) that we will do in parallel.  If this is set
 too high then response time suffers.
 The default value of 0 means no limit.
  """),
+    cfg.IntOpt('volume_connection_concurrency',
+        default=4,
+        min=1,
+        help="""
+Maximum number of volumes of a single instance to handle in parallel.
+
+When an instance is spawned, the volume attachments of the instance are
+updated in the block storage service (``attachment_update``) in parallel,
+which reduces the time needed to boot instances with many volumes. The same
+applies to the volume connection info refreshes.
+
+The connections of the volumes to the compute host, at spawn and on the
+destination host before a live migration, are also dispatched in parallel.
+However, os-brick serializes the connection of iSCSI and Fibre Channel volumes
+with an external lock, so those connections still effectively happen one
+after the other.
+
+Possible values:
+
+* 1 to handle the volumes one after the other.
+* Any integer greater than 1 to handle up to that many volumes of an instance
+  in parallel.
+"""),
     cfg.IntOpt('max_disk_devices_to_attach',
         default=-1,
         min=-1,
@@ -1078,6 +1101,50 @@ Possible values:
 * ``True``: Packing VM's NUMA cell on most used host NUMA cell.
 * ``False``: Spreading VM's NUMA cell on host's NUMA cells with more resources
   available.
+"""),
+    cfg.FloatOpt('instance_event_buffer_delay',
+        default=0.0,
+        min=0.0,
+        help="""
+Maximum time in seconds that instance action events and instance faults are
+kept in memory before being written to the database.
+
+By default the compute service writes every instance action event start and
+finish, and every instance fault, as soon as it occurs, each through its own
+call to the conductor. Operations on many instances at once, such as
+evacuating a host or rebooting all its instances, then send the conductor and
+the database a large number of small writes. When this option is set, the
+events and faults are buffered and written in batches, with one call to the
+conductor and one database transaction per batch, at most this many seconds
+after they occurred. The buffer is also written when the service stops.
+
+While an event or fault is buffered it is not visible through the API, and a
+missing instance action no longer fails the operation which records the
+event, it is only logged when the batch is written.
+
+Possible values:
+
+* 0 to write the events and faults as soon as they occur.
+* Any positive number of seconds to buffer them.
+
+Related options:
+
+* ``[compute]instance_event_buffer_size``
+"""),
+    cfg.IntOpt('instance_event_buffer_size',
+        default=100,
+        min=1,
+        help="""
+Number of buffered instance action events and instance faults that triggers
+writing them to the database before ``[compute]instance_event_buffer_delay``
+has elapsed.
+
+The write then happens in the thread which buffered the last record, so this
+also bounds the amount of memory used by the buffer.
+
+Related options:
+
+* ``[compute]instance_event_buffer_delay``
 """),
 ]
 
@@ -39,6 +39,20 @@ release (13.0.0).
 This group should **not** be configured for the ``nova-compute`` service.
 """)
 
+database_replica_group = cfg.OptGroup(
+    name='database_replica',
+    title='Database Replica Routing Options',
+    help="""
+Options under this group control which read-only code paths use the database
+replica configured with ``[database]/slave_connection`` rather than the
+``[database]/connection`` database it replicates.
+
+These options have no effect unless ``[database]/slave_connection`` is set.
+Only the reads from the ``[database]/connection`` database are sent to the
+replica: the reads from the other cell databases always use the cell database
+itself.
+""")
+
 # NOTE(stephenfin): We cannot simply use 'oslo_db_options.database_opts'
 # directly. If we reuse a db config option for two different groups
 # ("api_database" and "database") and deprecate or rename a config option in
@@ -53,13 +67,85 @@ main_db_opts = [opt for opt in main_db_opts if opt.name != 'use_db_reconnect']
 api_db_opts = [opt for opt in api_db_opts if opt.name != 'use_db_reconnect']
 
 
+database_replica_opts = [
+    cfg.ListOpt('read_paths',
+        item_type=cfg.types.String(choices=[
+            ('servers-detail', 'Listing servers with details, i.e. '
+             '``GET /servers/detail``.'),
+            ('hypervisors', 'Listing and showing hypervisors and their '
+             'statistics with the ``os-hypervisors`` API.'),
+            ('simple-tenant-usage', 'Reporting usage with the '
+             '``os-simple-tenant-usage`` API.'),
+            ('instance-actions', 'Listing and showing server actions with '
+             'the ``os-instance-actions`` API.'),
+        ]),
+        default=[],
+        help="""
+The read-only code paths whose database queries are sent to the replica.
+
+Reads from a replica may return data which is slightly out of date, so only
+paths where that is acceptable are offered. Within a single request, once
+anything has been written to the database all further reads go to the primary
+database, so that a request always sees its own writes.
+
+Possible values:
+
+* A list of zero or more of the paths listed above. By default, all reads go
+  to the primary database unless the caller explicitly asks for the replica.
+
+Related options:
+
+* ``[database]/slave_connection``
+* ``max_lag``
+"""),
+    cfg.IntOpt('max_lag',
+        default=0,
+        min=0,
+        help="""
+The maximum replication lag, in seconds, for reads to be sent to the replica.
+
+When set, the lag of the replica is checked periodically and the paths listed
+in ``read_paths`` use the primary database while the replica is further behind
+than this, or while the lag cannot be determined. Only MySQL replicas report
+their lag.
+
+Possible values:
+
+* 0: Do not check the lag of the replica.
+* Any positive integer representing the maximum lag in seconds.
+
+Related options:
+
+* ``read_paths``
+* ``lag_check_interval``
+"""),
+    cfg.IntOpt('lag_check_interval',
+        default=10,
+        min=1,
+        help="""
+How often, in seconds, to check the replication lag of the replica.
+
+Possible values:
+
+* Any positive integer representing a number of seconds.
+
+Related options:
+
+* ``max_lag``
+"""),
+]
+
+
 def register_opts(conf):
     conf.register_opts(main_db_opts, group=main_db_group)
     conf.register_opts(api_db_opts, group=api_db_group)
+    conf.register_group(database_replica_group)
+    conf.register_opts(database_replica_opts, group=database_replica_group)
 
 
 def list_opts():
     return {
         main_db_group: main_db_opts,
         api_db_group: api_db_opts,
+        database_replica_group: database_replica_opts,
     }
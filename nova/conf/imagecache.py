@@ -91,6 +91,37 @@ will happen in parallel. Higher numbers will cause more computes to work
 in parallel and may result in reduced time to complete the operation, but
 may also DDoS the image service. Lower numbers will result in more sequential
 operation, lower image service load, but likely longer runtime to completion.
+"""),
+    cfg.BoolOpt('deduplicate_base_images',
+        default=False,
+        help="""
+Deduplicate cached base images by content.
+
+When enabled, base images fetched into the image cache are also stored in a
+content addressed store, keyed on the hash of the image data reported by the
+image service (``os_hash_algo``/``os_hash_value``, or ``checksum`` for older
+images). The per image id cache entries are hard links to the entries of that
+store, so images with identical content, like re-uploaded images or images
+only differing by their metadata, share a single file on disk and are only
+downloaded once.
+
+An image is only added to the content store once its data has been checked
+against the hash reported by the image service. As the data of images
+converted to raw while being fetched, see ``[DEFAULT]/force_raw_images``, no
+longer matches that hash, these images are never shared.
+
+Content store entries are removed by the image cache manager once no image id
+entry links to them anymore, following the same aging rules as the other base
+images.
+
+This is only supported by the libvirt driver with the ``qcow2``, ``flat`` and
+``raw`` image backends, and requires the file system of the image cache to
+support hard links.
+
+Related options:
+
+* ``[image_cache]/remove_unused_original_minimum_age_seconds``
+* ``[DEFAULT]/force_raw_images``
 """),
 ]
 
@@ -352,6 +352,30 @@ downtime.
 
 Minimum delay is 3 seconds. Value is per GiB of guest RAM + disk to be
 transferred, with lower bound of a minimum of 2 GiB per device.
+"""),
+    cfg.BoolOpt('live_migration_adaptive_convergence',
+                default=False,
+                mutable=True,
+                help="""
+Adapt the live migration downtime to the observed guest behaviour.
+
+By default the max downtime of a live migration is increased following the
+static schedule defined by ``live_migration_downtime_steps`` and
+``live_migration_downtime_delay``, and the ``live_migration_timeout_action``
+is only taken once ``live_migration_completion_timeout`` expires, even if the
+guest dirties its memory faster than it can be transferred.
+
+If this option is set to True, the rate at which the guest dirties its memory
+and the transfer bandwidth are sampled instead. The max downtime is raised,
+up to ``live_migration_downtime``, as soon as that allows the migration to
+switch over. If the migration is predicted to not converge before the
+completion timeout, the timeout action is taken right away.
+
+Related options:
+
+* live_migration_downtime
+* live_migration_completion_timeout
+* live_migration_timeout_action
 """),
     cfg.IntOpt('live_migration_completion_timeout',
                default=800,
@@ -1077,6 +1101,23 @@ Requires:
 * Libvirt >= 1.0.6
 * Qemu >= 1.5 (raw format)
 * Qemu >= 1.6 (qcow2 format)
+"""),
+    cfg.IntOpt('disk_creation_concurrency',
+               default=4,
+               min=1,
+               help="""
+Maximum number of local disks of a single instance created concurrently.
+
+When spawning an instance the root disk, the kernel and ramdisk images, the
+ephemeral disks and the swap disk do not depend on each other. With a value
+greater than 1 they are fetched, converted and created in parallel, which
+reduces the time to boot instances with several local disks, especially when
+the root image is not yet in the image cache. Set this to 1 to create the
+disks one after the other.
+
+Related options:
+
+* ``[image_cache]/precache_concurrency``
 """),
 ]
 
@@ -298,6 +298,36 @@ query during each quota check, if this configuration option is set to True.
 Operators who want to avoid the performance hit from the EXISTS queries should
 wait to set this configuration option to True until after they have completed
 their online data migrations via ``nova-manage db online_data_migrations``.
+"""),
+    cfg.IntOpt(
+        'placement_usage_cache_ttl',
+        default=0,
+        min=0,
+        help="""
+Number of seconds the usages of a project or user reported by the API are
+cached when they are retrieved from the placement service.
+
+When quota usage is counted from placement, or when unified limits are used,
+every limits API request and quota set show request retrieves the usages of the
+project, and possibly of the user, from placement. When this option is set,
+each API process caches these usages for the given number of seconds, so the
+reported usages may lag behind the actual usages by that much.
+
+The cache is only used to report usages. Quota checks done when creating or
+resizing servers, including the quota recheck done when
+``[quota]recheck_quota`` is enabled, always retrieve the current usages from
+placement.
+
+Possible values:
+
+* 0 to always retrieve the usages from placement.
+* Any positive number of seconds to cache them.
+
+Related options:
+
+* ``[quota]count_usage_from_placement``
+* ``[quota]driver``
+* ``[quota]recheck_quota``
 """),
     cfg.StrOpt(
         'unified_limits_resource_strategy',
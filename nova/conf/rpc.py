@@ -37,6 +37,33 @@ Operations with RPC calls that utilize this value:
 Related options:
 
 * rpc_response_timeout
+"""),
+    cfg.IntOpt("rpc_compression_threshold",
+        default=0,
+        min=0,
+        help="""
+Compress RPC payloads larger than about this many bytes.
+
+Arguments of RPC calls and casts made by this service, and the results of
+RPC calls it serves, which are larger than about this many bytes once encoded
+as JSON are sent compressed with zlib. This reduces the load on the message
+broker and the network for large messages, such as instances and request
+specs sent between the API, conductor, scheduler and compute services, at
+the cost of some CPU time on both ends.
+
+Compressed payloads can only be read by services running this release or
+newer. This service only compresses payloads if the minimum version of the
+nova services, checked when it starts or receives SIGHUP, shows that all of
+them can read compressed payloads. Services can always read compressed
+payloads, whatever the value of this option.
+
+The number, raw size and compressed size of the payloads compressed by a
+service are reported, per payload type, in its Guru Meditation Reports.
+
+Possible values:
+
+* 0: Disables compression (default)
+* Any positive integer: The minimum payload size in bytes to compress
 """),
 ]
 
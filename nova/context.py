@@ -94,7 +94,8 @@ class RequestContext(context.RequestContext):
     def __init__(self, user_id=None, project_id=None, is_admin=None,
                  read_deleted="no", remote_address=None, timestamp=None,
                  quota_class=None, service_catalog=None,
-                 user_auth_plugin=None, **kwargs):
+                 user_auth_plugin=None, replica_read_path=None,
+                 db_written=False, **kwargs):
         """:param read_deleted: 'no' indicates deleted records are hidden,
                 'yes' indicates deleted records are visible,
                 'only' indicates that *only* deleted records are visible.
@@ -104,6 +105,14 @@ class RequestContext(context.RequestContext):
 
            :param user_auth_plugin: The auth plugin for the current request's
                 authentication data.
+
+           :param replica_read_path: The name of the read-only code path this
+                context is used for. Database reads are sent to the replica
+                if the path is listed in ``[database_replica]/read_paths``.
+
+           :param db_written: Whether the request wrote to the database while
+                its reads could be sent to the replica. Its further reads then
+                use the primary database so that it sees its own writes.
         """
         if user_id:
             kwargs['user_id'] = user_id
@@ -143,6 +152,17 @@ class RequestContext(context.RequestContext):
         self.mq_connection = None
         self.cell_uuid = None
 
+        self.replica_read_path = replica_read_path
+        self.db_written = db_written
+
+        # Quota usage counts already done for this request, keyed by
+        # resource name, project_id and user_id. Only used to report usages,
+        # quota checks always count the usages again.
+        self.quota_usages = {}
+        # Set while usages are counted to be reported rather than enforced,
+        # which allows serving them from the placement usages cache.
+        self.reporting_quota_usages = False
+
         self.user_auth_plugin = user_auth_plugin
         if self.is_admin is None:
             self.is_admin = policy.check_is_admin(self)
@@ -186,6 +206,8 @@ class RequestContext(context.RequestContext):
             'user_name': getattr(self, 'user_name', None),
             'service_catalog': getattr(self, 'service_catalog', None),
             'project_name': getattr(self, 'project_name', None),
+            'replica_read_path': getattr(self, 'replica_read_path', None),
+            'db_written': getattr(self, 'db_written', False),
         })
         # NOTE(tonyb): This can be removed once we're certain to have a
         # RequestContext contains 'is_admin_project', We can only get away with
@@ -210,6 +232,8 @@ class RequestContext(context.RequestContext):
             timestamp=values.get('timestamp'),
             quota_class=values.get('quota_class'),
             service_catalog=values.get('service_catalog'),
+            replica_read_path=values.get('replica_read_path'),
+            db_written=values.get('db_written', False),
         )
 
     def elevated(self, read_deleted=None):
@@ -426,7 +450,12 @@ def target_cell(context, cell_mapping):
     # any existing cell targeting.
     cctxt = RequestContext.from_dict(context.to_dict())
     set_target_cell(cctxt, cell_mapping)
-    yield cctxt
+    try:
+        yield cctxt
+    finally:
+        # Make sure the request reads its writes made through the copy.
+        if cctxt.db_written:
+            context.db_written = True
 
 
 def scatter_gather_cells(context, cell_mappings, timeout, fn, *args, **kwargs):
@@ -22,7 +22,9 @@ import copy
 import datetime
 import functools
 import inspect
+import time
 import traceback
+import weakref
 
 from oslo_db import api as oslo_db_api
 from oslo_db import exception as db_exc
@@ -117,6 +119,12 @@ def configure(conf):
             lambda eng: profiler_sqlalchemy.add_tracing(sa, eng, "db"))
 
 
+# The connection of the context managers created for cell databases, to tell
+# whether they target the [database] connection, whose replica is
+# [database]/slave_connection.
+_CELL_CONNECTIONS = weakref.WeakKeyDictionary()
+
+
 def create_context_manager(connection=None):
     """Create a database context manager object for a cell database connection.
 
@@ -124,6 +132,7 @@ def create_context_manager(connection=None):
     """
     ctxt_mgr = enginefacade.transaction_context()
     ctxt_mgr.configure(**_get_db_conf(CONF.database, connection=connection))
+    _CELL_CONNECTIONS[ctxt_mgr] = connection
     return ctxt_mgr
 
 
@@ -152,12 +161,89 @@ _DEFAULT_QUOTA_NAME = 'default'
 PER_PROJECT_QUOTAS = ['fixed_ips', 'floating_ips', 'networks']
 
 
+# The last replication lag measured for each replica engine, as a tuple of
+# the monotonic time of the check and the lag.
+_REPLICA_LAG_CACHE = {}
+
+
+def _record_replica_write(context):
+    # The flag is carried by to_dict()/from_dict(), so the copies of the
+    # context made to target cells or over RPC read from the primary too.
+    if getattr(context, 'replica_read_path', None):
+        context.db_written = True
+
+
+def _get_cached_replica_lag(context):
+    engine = get_engine(use_slave=True, context=context)
+    now = time.monotonic()
+    checked_at, lag = _REPLICA_LAG_CACHE.get(engine, (None, None))
+    if (checked_at is not None and
+            now - checked_at < CONF.database_replica.lag_check_interval):
+        return lag
+
+    try:
+        lag = get_replica_lag(context)
+    except db_exc.DBError:
+        LOG.warning('Unable to check the replication lag of the database '
+                    'replica', exc_info=True)
+        lag = None
+    _REPLICA_LAG_CACHE[engine] = (now, lag)
+    return lag
+
+
+def _targets_main_database(context):
+    """Whether the context targets the [database] connection.
+
+    The context managers of the cells are configured with all of the
+    [database] options, so their asynchronous reader uses
+    [database]/slave_connection even when they target another database.
+    """
+    ctxt_mgr = _context_manager_from_context(context)
+    if ctxt_mgr is None or ctxt_mgr is context_manager:
+        return True
+    if ctxt_mgr not in _CELL_CONNECTIONS:
+        return False
+    connection = _CELL_CONNECTIONS[ctxt_mgr]
+    return connection is None or connection == CONF.database.connection
+
+
+def _use_replica(context):
+    """Whether the reads made for the given context go to the replica.
+
+    This is the case when the read-only path the context is used for is
+    listed in ``[database_replica]/read_paths`` and the context targets the
+    ``[database]`` connection, unless the request already wrote to the
+    database or the replica is lagging too far behind.
+    """
+    path = getattr(context, 'replica_read_path', None)
+    if not path or path not in CONF.database_replica.read_paths:
+        return False
+
+    if not _targets_main_database(context):
+        return False
+
+    if getattr(context, 'db_written', False):
+        return False
+
+    max_lag = CONF.database_replica.max_lag
+    if max_lag:
+        lag = _get_cached_replica_lag(context)
+        if lag is None or lag > max_lag:
+            LOG.debug('Reading from the primary database for %(path)s as the '
+                      'replica lag is %(lag)s seconds',
+                      {'path': path, 'lag': lag})
+            return False
+    return True
+
+
 def select_db_reader_mode(f):
     """Decorator to select synchronous or asynchronous reader mode.
 
     The kwarg argument 'use_slave' defines reader mode. Asynchronous reader
     will be used if 'use_slave' is True and synchronous reader otherwise.
     If 'use_slave' is not specified default value 'False' will be used.
+    Asynchronous reader is also used if the context is routed to the replica
+    by ``[database_replica]/read_paths``.
 
     Wrapped function must have a context in the arguments.
     """
@@ -170,7 +256,7 @@ def select_db_reader_mode(f):
         context = keyed_args['context']
         use_slave = keyed_args.get('use_slave', False)
 
-        if use_slave:
+        if use_slave or _use_replica(context):
             reader_mode = get_context_manager(context).async_
         else:
             reader_mode = get_context_manager(context).reader
@@ -202,6 +288,7 @@ def pick_context_manager_writer(f):
     @functools.wraps(f)
     def wrapper(context, *args, **kwargs):
         _check_db_access()
+        _record_replica_write(context)
         ctxt_mgr = get_context_manager(context)
         with ctxt_mgr.writer.using(context):
             return f(context, *args, **kwargs)
@@ -212,7 +299,9 @@ def pick_context_manager_writer(f):
 def pick_context_manager_reader(f):
     """Decorator to use a reader db context manager.
 
-    The db context manager will be picked from the RequestContext.
+    The db context manager will be picked from the RequestContext. The
+    asynchronous reader is used instead if the context is routed to the
+    replica by ``[database_replica]/read_paths``.
 
     Wrapped function must have a RequestContext in the arguments.
     """
@@ -220,7 +309,11 @@ def pick_context_manager_reader(f):
     def wrapper(context, *args, **kwargs):
         _check_db_access()
         ctxt_mgr = get_context_manager(context)
-        with ctxt_mgr.reader.using(context):
+        if _use_replica(context):
+            reader_mode = ctxt_mgr.async_
+        else:
+            reader_mode = ctxt_mgr.reader
+        with reader_mode.using(context):
             return f(context, *args, **kwargs)
     wrapper.__signature__ = inspect.signature(f)
     return wrapper
@@ -229,7 +322,9 @@ def pick_context_manager_reader(f):
 def pick_context_manager_reader_allow_async(f):
     """Decorator to use a reader.allow_async db context manager.
 
-    The db context manager will be picked from the RequestContext.
+    The db context manager will be picked from the RequestContext. The
+    asynchronous reader is used instead if the context is routed to the
+    replica by ``[database_replica]/read_paths``.
 
     Wrapped function must have a RequestContext in the arguments.
     """
@@ -237,7 +332,11 @@ def pick_context_manager_reader_allow_async(f):
     def wrapper(context, *args, **kwargs):
         _check_db_access()
         ctxt_mgr = get_context_manager(context)
-        with ctxt_mgr.reader.allow_async.using(context):
+        if _use_replica(context):
+            reader_mode = ctxt_mgr.async_
+        else:
+            reader_mode = ctxt_mgr.reader.allow_async
+        with reader_mode.using(context):
             return f(context, *args, **kwargs)
     wrapper.__signature__ = inspect.signature(f)
     return wrapper
@@ -291,6 +390,53 @@ def model_query(
     return query
 
 
+# Statements for hot queries, keyed by their shape. They are built once and
+# then executed with bound parameters, which saves building the query and
+# generating its SQL cache key again on each call.
+_STATEMENT_CACHE = {}
+
+
+def _cached_statement(key, build):
+    """Get a statement from the statement cache, building it if needed.
+
+    :param key: A hashable key identifying the statement. It must cover
+        everything that the statement built by ``build`` depends on.
+    :param build: A callable returning the statement, which must take any
+        value varying between calls as a bind parameter.
+    """
+    try:
+        return _STATEMENT_CACHE[key]
+    except KeyError:
+        stmt = _STATEMENT_CACHE[key] = build()
+        return stmt
+
+
+def _model_select(model, read_deleted, args=None):
+    """Statement helper equivalent to model_query() without a project filter.
+
+    :param model: Model to select. Must be a subclass of ModelBase.
+    :param read_deleted: One of 'no', 'only' or 'yes', as for model_query().
+    :param args: Arguments to select. If None - model is used.
+    """
+    stmt = sql.select(*(args or [model]))
+    clause = _read_deleted_clause(model, read_deleted)
+    if clause is not None:
+        stmt = stmt.where(clause)
+    return stmt
+
+
+def _read_deleted_clause(model, read_deleted):
+    """The filter model_query() applies for read_deleted, or None."""
+    default_deleted_value = model.__table__.c.deleted.default.arg
+    if 'no' == read_deleted:
+        return model.deleted == default_deleted_value
+    elif 'only' == read_deleted:
+        return model.deleted != default_deleted_value
+    elif 'yes' != read_deleted:
+        raise ValueError(_("Unrecognized read_deleted value '%s'")
+                           % read_deleted)
+
+
 def convert_objects_related_datetimes(values, *datetime_keys):
     if not datetime_keys:
         datetime_keys = ('created_at', 'deleted_at', 'updated_at')
@@ -1635,7 +1781,7 @@ def _get_query_nova_resource_by_changes_time(query, filters, model_object):
 @pick_context_manager_reader_allow_async
 def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
                                      columns_to_join=None, sort_keys=None,
-                                     sort_dirs=None):
+                                     sort_dirs=None, marker_values=None):
     """Get all instances that match all filters sorted by the given keys.
 
     Deleted instances will be returned by default, unless there's a filter that
@@ -1838,7 +1984,16 @@ def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
     query_prefix = _regex_instance_filter(query_prefix, filters)
 
     # paginate query
-    if marker is not None:
+    if marker_values is not None:
+        if marker is not None:
+            raise exception.InvalidInput(
+                reason=_('marker and marker_values are mutually exclusive'))
+        try:
+            query_prefix = query_prefix.filter(_sort_keys_seek_criteria(
+                models.Instance, sort_keys, sort_dirs, marker_values))
+        except AttributeError:
+            raise exception.InvalidSortKey()
+    elif marker is not None:
         try:
             marker = _instance_get_by_uuid(
                 context.elevated(read_deleted='yes'), marker,
@@ -1879,17 +2034,21 @@ def instance_get_by_sort_filters(context, sort_keys, sort_dirs, values):
                                            sort_dirs, values)
 
 
-def _model_get_uuid_by_sort_filters(context, model, sort_keys, sort_dirs,
-                                    values):
-    query = context.session.query(model.uuid)
+def _sort_keys_seek_criteria(model, sort_keys, sort_dirs, values,
+                             inclusive=False):
+    """Build the criteria selecting rows after a set of sort key values.
 
-    # NOTE(danms): Below is a re-implementation of our
-    # oslo_db.sqlalchemy.utils.paginate_query() utility. We can't use that
-    # directly because it does not return the marker and we need it to.
-    # The below is basically the same algorithm, stripped down to just what
-    # we need, and augmented with the filter criteria required for us to
-    # get back the instance that would correspond to our query.
+    Only the leading sort keys for which a value is provided are considered,
+    so the caller should make sure they uniquely identify a row if the
+    result is to be used as a keyset pagination cursor.
 
+    :param model: The model being queried
+    :param sort_keys: The keys the query is sorted by
+    :param sort_dirs: The directions of the sort keys
+    :param values: The values of the leading sort keys of the reference row
+    :param inclusive: Whether a row matching all of the values is selected
+    :returns: A SQL expression to filter the query with
+    """
     # This is our position in sort_keys,sort_dirs,values for the loop below
     key_index = 0
 
@@ -1901,17 +2060,12 @@ def _model_get_uuid_by_sort_filters(context, model, sort_keys, sort_dirs,
     #     AND(row.key1 == val1, row.key2 == val2, row.key3 >= val3),
     #  )
     #
-    # The final key is compared with the "or equal" variant so that
-    # a complete match instance is still returned.
+    # The final key is compared with the "or equal" variant if inclusive
+    # so that a complete match is still returned.
     criteria = []
+    sort_keys = sort_keys[:len(values)]
 
     for skey, sdir, val in zip(sort_keys, sort_dirs, values):
-        # Apply ordering to our query for the key, direction we're processing
-        if sdir == 'desc':
-            query = query.order_by(expression.desc(getattr(model, skey)))
-        else:
-            query = query.order_by(expression.asc(getattr(model, skey)))
-
         # Build a list of equivalence requirements on keys we've already
         # processed through the loop. In other words, if we're adding
         # key2 > val2, make sure that key1 == val1
@@ -1925,7 +2079,7 @@ def _model_get_uuid_by_sort_filters(context, model, sort_keys, sort_dirs,
             model_attr = expression.cast(model_attr, sa.Integer)
             val = int(val)
 
-        if skey == sort_keys[-1]:
+        if inclusive and key_index == len(sort_keys) - 1:
             # If we are the last key, then we should use or-equal to
             # allow a complete match to be returned
             if sdir == 'asc':
@@ -1933,8 +2087,7 @@ def _model_get_uuid_by_sort_filters(context, model, sort_keys, sort_dirs,
             else:
                 crit = (model_attr <= val)
         else:
-            # If we're not the last key, then strict greater or less than
-            # so we order strictly.
+            # Otherwise strict greater or less than so we order strictly.
             if sdir == 'asc':
                 crit = (model_attr > val)
             else:
@@ -1946,7 +2099,29 @@ def _model_get_uuid_by_sort_filters(context, model, sort_keys, sort_dirs,
         key_index += 1
 
     # OR together all the ANDs
-    query = query.filter(sql.or_(*criteria))
+    return sql.or_(*criteria)
+
+
+def _model_get_uuid_by_sort_filters(context, model, sort_keys, sort_dirs,
+                                    values):
+    query = context.session.query(model.uuid)
+
+    # NOTE(danms): Below is a re-implementation of our
+    # oslo_db.sqlalchemy.utils.paginate_query() utility. We can't use that
+    # directly because it does not return the marker and we need it to.
+    # The below is basically the same algorithm, stripped down to just what
+    # we need, and augmented with the filter criteria required for us to
+    # get back the instance that would correspond to our query.
+
+    for skey, sdir in zip(sort_keys, sort_dirs):
+        # Apply ordering to our query for the key, direction we're processing
+        if sdir == 'desc':
+            query = query.order_by(expression.desc(getattr(model, skey)))
+        else:
+            query = query.order_by(expression.asc(getattr(model, skey)))
+
+    query = query.filter(_sort_keys_seek_criteria(
+        model, sort_keys, sort_dirs, values, inclusive=True))
 
     # We can't raise InstanceNotFound because we don't have a uuid to
     # be looking for, so just return nothing if no match.
@@ -2103,6 +2278,20 @@ def instance_get_active_by_window_joined(context, begin, end=None,
     return _instances_fill_metadata(context, instances, manual_joins)
 
 
+def _instance_get_all_options(joins):
+    options = []
+    for column in joins:
+        if 'extra.' in column:
+            column_ref = getattr(models.InstanceExtra, column.split('.')[1])
+            options.append(
+                orm.joinedload(models.Instance.extra).undefer(column_ref)
+            )
+        else:
+            column_ref = getattr(models.Instance, column)
+            options.append(orm.joinedload(column_ref))
+    return options
+
+
 def _instance_get_all_query(context, project_only=False, joins=None):
     if joins is None:
         joins = ['info_cache', 'security_groups']
@@ -2112,23 +2301,25 @@ def _instance_get_all_query(context, project_only=False, joins=None):
         models.Instance,
         project_only=project_only,
     )
-    for column in joins:
-        if 'extra.' in column:
-            column_ref = getattr(models.InstanceExtra, column.split('.')[1])
-            query = query.options(
-                orm.joinedload(models.Instance.extra).undefer(column_ref)
-            )
-        else:
-            column_ref = getattr(models.Instance, column)
-            query = query.options(orm.joinedload(column_ref))
-    return query
+    return query.options(*_instance_get_all_options(joins))
 
 
 @pick_context_manager_reader_allow_async
 def instance_get_all_by_host(context, host, columns_to_join=None):
     """Get all instances belonging to a host."""
-    query = _instance_get_all_query(context, joins=columns_to_join)
-    instances = query.filter_by(host=host).all()
+    # NOTE: columns_to_join=None also means the default manual joins of
+    # _instances_fill_metadata() below, so keep it as given.
+    joins = columns_to_join
+    if joins is None:
+        joins = ['info_cache', 'security_groups']
+    read_deleted = context.read_deleted
+    stmt = _cached_statement(
+        ('instance_get_all_by_host', read_deleted, tuple(joins)),
+        lambda: _model_select(models.Instance, read_deleted).options(
+            *_instance_get_all_options(joins)
+        ).where(models.Instance.host == sa.bindparam('host')))
+    instances = context.session.execute(
+        stmt, {'host': host}).unique().scalars().all()
     return _instances_fill_metadata(
         context,
         instances,
@@ -2262,6 +2453,75 @@ def instance_update_and_get_original(context, instance_uuid, values,
         context, instance_uuid, values, expected, original=instance_ref))
 
 
+@require_context
+@_retry_instance_update()
+@pick_context_manager_writer
+def instance_update_on_match(context, instance_uuid, values,
+                             columns_to_join=None, expected=None,
+                             extra_values=None):
+    """Set the given properties on an instance and update it.
+
+    Unlike instance_update_and_get_original(), the instance is not read
+    before being updated: the expected values, including "expected_task_state"
+    and "expected_vm_state" in values, are checked by the UPDATE statement
+    itself. The updated instance is read afterwards, in the same transaction
+    as any update of its instance_extra record.
+
+    :param context: request context object
+    :param instance_uuid: instance uuid
+    :param values: dict containing column values
+    :param columns_to_join: the columns to join when reading the updated
+        instance
+    :param expected: dict of the expected column values
+    :param extra_values: dict containing instance_extra column values
+    :returns: the updated instance ref
+    :raises: NotFound if instance does not exist.
+    """
+    if not uuidutils.is_uuid_like(instance_uuid):
+        raise exception.InvalidUUID(uuid=instance_uuid)
+
+    updates, expected, metadata, system_metadata = _instance_update_prepare(
+        context, values, expected)
+
+    stmt = sql.update(models.Instance).where(
+        models.Instance.uuid == instance_uuid)
+    deleted_clause = _read_deleted_clause(
+        models.Instance, context.read_deleted)
+    if deleted_clause is not None:
+        stmt = stmt.where(deleted_clause)
+    if nova.context.is_user_context(context):
+        stmt = stmt.where(models.Instance.project_id == context.project_id)
+    for field, expected_values in expected.items():
+        column = getattr(models.Instance, field)
+        clauses = []
+        not_none = [value for value in expected_values if value is not None]
+        if not_none:
+            clauses.append(column.in_(not_none))
+        if len(not_none) != len(expected_values):
+            clauses.append(column.is_(None))
+        stmt = stmt.where(sql.or_(*clauses))
+
+    # The statement needs something to set even if only the expected values
+    # are being checked.
+    updates.setdefault('updated_at', timeutils.utcnow())
+    result = context.session.execute(
+        stmt.values(**updates).execution_options(synchronize_session=False))
+    if not result.rowcount:
+        # We have not read the instance in this transaction, so this reads
+        # its current state.
+        original = _instance_get_by_uuid(context, instance_uuid)
+        raise _instance_update_conflict(instance_uuid, expected, original)
+
+    if extra_values:
+        _instance_extra_update_by_uuid(context, instance_uuid, extra_values)
+
+    instance_ref = _instance_get_by_uuid(context, instance_uuid,
+                                         columns_to_join=columns_to_join)
+    _instance_metadata_update(context, instance_ref, metadata,
+                              system_metadata)
+    return instance_ref
+
+
 # NOTE(danms): This updates the instance's metadata list in-place and in
 # the database to avoid stale data and refresh issues. It assumes the
 # delete=True behavior of instance_metadata_update(...)
@@ -2296,10 +2556,13 @@ def _instance_metadata_update_in_place(context, instance, metadata_type, model,
         instance[metadata_type].append(newitem)
 
 
-def _instance_update(context, instance_uuid, values, expected, original=None):
-    if not uuidutils.is_uuid_like(instance_uuid):
-        raise exception.InvalidUUID(uuid=instance_uuid)
+def _instance_update_prepare(context, values, expected):
+    """Split the values of an instance update.
 
+    :returns: a tuple of the column updates, the expected column values
+        including the "expected_" ones from values, and the metadata and
+        system metadata to update if any.
+    """
     # NOTE(mdbooth): We pop values from this dict below, so we copy it here to
     # ensure there are no side effects for the caller or if we retry the
     # function due to a db conflict.
@@ -2337,6 +2600,76 @@ def _instance_update(context, instance_uuid, values, expected, original=None):
     if 'hostname' in updates:
         _validate_unique_server_name(context, updates['hostname'])
 
+    return updates, expected, metadata, system_metadata
+
+
+def _instance_update_conflict(instance_uuid, expected, original):
+    """Get the error to raise for an instance update which matched no rows.
+
+    :param expected: dict of the expected lists of values of columns
+    :param original: the instance, as read after the update failed
+    """
+    conflicts_expected = {}
+    conflicts_actual = {}
+    for (field, expected_values) in expected.items():
+        actual = original[field]
+        if actual not in expected_values:
+            conflicts_expected[field] = expected_values
+            conflicts_actual[field] = actual
+
+    # Exception properties
+    exc_props = {
+        'instance_uuid': instance_uuid,
+        'expected': conflicts_expected,
+        'actual': conflicts_actual
+    }
+
+    # There was a conflict, but something (probably the MySQL read view,
+    # but possibly an exceptionally unlikely second race) is preventing us
+    # from seeing what it is. When we go round again we'll get a fresh
+    # transaction and a fresh read view.
+    if len(conflicts_actual) == 0:
+        return exception.UnknownInstanceUpdateConflict(**exc_props)
+
+    # Task state gets special handling for convenience. We raise the
+    # specific error UnexpectedDeletingTaskStateError or
+    # UnexpectedTaskStateError as appropriate
+    if 'task_state' in conflicts_actual:
+        conflict_task_state = conflicts_actual['task_state']
+        if conflict_task_state == task_states.DELETING:
+            exc = exception.UnexpectedDeletingTaskStateError
+        else:
+            exc = exception.UnexpectedTaskStateError
+
+    # Everything else is an InstanceUpdateConflict
+    else:
+        exc = exception.InstanceUpdateConflict
+
+    return exc(**exc_props)
+
+
+def _instance_metadata_update(context, instance_ref, metadata,
+                              system_metadata):
+    if metadata is not None:
+        _instance_metadata_update_in_place(context, instance_ref,
+                                           'metadata',
+                                           models.InstanceMetadata,
+                                           metadata)
+
+    if system_metadata is not None:
+        _instance_metadata_update_in_place(context, instance_ref,
+                                           'system_metadata',
+                                           models.InstanceSystemMetadata,
+                                           system_metadata)
+
+
+def _instance_update(context, instance_uuid, values, expected, original=None):
+    if not uuidutils.is_uuid_like(instance_uuid):
+        raise exception.InvalidUUID(uuid=instance_uuid)
+
+    updates, expected, metadata, system_metadata = _instance_update_prepare(
+        context, values, expected)
+
     compare = models.Instance(uuid=instance_uuid, **expected)
     try:
         instance_ref = model_query(context, models.Instance,
@@ -2364,55 +2697,10 @@ def _instance_update(context, instance_uuid, values, expected, original=None):
         if original is None:
             original = _instance_get_by_uuid(context, instance_uuid)
 
-        conflicts_expected = {}
-        conflicts_actual = {}
-        for (field, expected_values) in expected.items():
-            actual = original[field]
-            if actual not in expected_values:
-                conflicts_expected[field] = expected_values
-                conflicts_actual[field] = actual
-
-        # Exception properties
-        exc_props = {
-            'instance_uuid': instance_uuid,
-            'expected': conflicts_expected,
-            'actual': conflicts_actual
-        }
-
-        # There was a conflict, but something (probably the MySQL read view,
-        # but possibly an exceptionally unlikely second race) is preventing us
-        # from seeing what it is. When we go round again we'll get a fresh
-        # transaction and a fresh read view.
-        if len(conflicts_actual) == 0:
-            raise exception.UnknownInstanceUpdateConflict(**exc_props)
-
-        # Task state gets special handling for convenience. We raise the
-        # specific error UnexpectedDeletingTaskStateError or
-        # UnexpectedTaskStateError as appropriate
-        if 'task_state' in conflicts_actual:
-            conflict_task_state = conflicts_actual['task_state']
-            if conflict_task_state == task_states.DELETING:
-                exc = exception.UnexpectedDeletingTaskStateError
-            else:
-                exc = exception.UnexpectedTaskStateError
-
-        # Everything else is an InstanceUpdateConflict
-        else:
-            exc = exception.InstanceUpdateConflict
-
-        raise exc(**exc_props)
-
-    if metadata is not None:
-        _instance_metadata_update_in_place(context, instance_ref,
-                                           'metadata',
-                                           models.InstanceMetadata,
-                                           metadata)
+        raise _instance_update_conflict(instance_uuid, expected, original)
 
-    if system_metadata is not None:
-        _instance_metadata_update_in_place(context, instance_ref,
-                                           'system_metadata',
-                                           models.InstanceSystemMetadata,
-                                           system_metadata)
+    _instance_metadata_update(context, instance_ref, metadata,
+                              system_metadata)
 
     return instance_ref
 
@@ -2520,6 +2808,10 @@ def instance_extra_update_by_uuid(context, instance_uuid, updates):
     :param instance_uuid: UUID of the instance tied to the record
     :param updates: A dict of updates to apply
     """
+    return _instance_extra_update_by_uuid(context, instance_uuid, updates)
+
+
+def _instance_extra_update_by_uuid(context, instance_uuid, updates):
     rows_updated = model_query(context, models.InstanceExtra).\
         filter_by(instance_uuid=instance_uuid).\
         update(updates)
@@ -3310,36 +3602,39 @@ def migration_get_in_progress_by_host_and_node(context, host, node):
     # 'finished' means a resize is finished on the destination host
     # and the instance is in VERIFY_RESIZE state, so the end state
     # for a resize is actually 'confirmed' or 'reverted'.
-    return model_query(
-        context, models.Migration,
-    ).filter(
-        sql.or_(
-            sql.and_(
-                models.Migration.source_compute == host,
-                models.Migration.source_node == node,
-            ),
-            sql.and_(
-                models.Migration.dest_compute == host,
-                models.Migration.dest_node == node,
-            ),
-        )
-    ).filter(
-        ~models.Migration.status.in_(
-            [
-                'confirmed',
-                'reverted',
-                'error',
-                'failed',
-                'completed',
-                'cancelled',
-                'done',
-            ]
-        )
-    ).options(
-        orm.joinedload(
-            models.Migration.instance
-        ).joinedload(models.Instance.system_metadata)
-    ).all()
+    read_deleted = context.read_deleted
+    stmt = _cached_statement(
+        ('migration_get_in_progress_by_host_and_node', read_deleted),
+        lambda: _model_select(models.Migration, read_deleted).where(
+            sql.or_(
+                sql.and_(
+                    models.Migration.source_compute == sa.bindparam('host'),
+                    models.Migration.source_node == sa.bindparam('node'),
+                ),
+                sql.and_(
+                    models.Migration.dest_compute == sa.bindparam('host'),
+                    models.Migration.dest_node == sa.bindparam('node'),
+                ),
+            )
+        ).where(
+            ~models.Migration.status.in_(
+                [
+                    'confirmed',
+                    'reverted',
+                    'error',
+                    'failed',
+                    'completed',
+                    'cancelled',
+                    'done',
+                ]
+            )
+        ).options(
+            orm.joinedload(
+                models.Migration.instance
+            ).joinedload(models.Instance.system_metadata)
+        ))
+    return context.session.execute(
+        stmt, {'host': host, 'node': node}).unique().scalars().all()
 
 
 @pick_context_manager_reader
@@ -3406,7 +3701,9 @@ def migration_get_all_by_filters(context, filters,
         query = query.filter(models.Migration.hidden == hidden)
     if "instance_uuid" in filters:
         instance_uuid = filters["instance_uuid"]
-        query = query.filter(models.Migration.instance_uuid == instance_uuid)
+        instance_uuid = ([instance_uuid] if isinstance(instance_uuid, str)
+                         else instance_uuid)
+        query = query.filter(models.Migration.instance_uuid.in_(instance_uuid))
     if 'user_id' in filters:
         user_id = filters['user_id']
         query = query.filter(models.Migration.user_id == user_id)
@@ -3508,8 +3805,14 @@ def migration_get_in_progress_and_error_by_host_and_node(context, host, node):
 def _instance_metadata_get_multi(context, instance_uuids):
     if not instance_uuids:
         return []
-    return model_query(context, models.InstanceMetadata).filter(
-        models.InstanceMetadata.instance_uuid.in_(instance_uuids))
+    read_deleted = context.read_deleted
+    stmt = _cached_statement(
+        ('instance_metadata_get_multi', read_deleted),
+        lambda: _model_select(models.InstanceMetadata, read_deleted).where(
+            models.InstanceMetadata.instance_uuid.in_(
+                sa.bindparam('instance_uuids', expanding=True))))
+    return context.session.execute(
+        stmt, {'instance_uuids': list(instance_uuids)}).scalars().all()
 
 
 def _instance_metadata_get_query(context, instance_uuid):
@@ -3572,9 +3875,13 @@ def instance_metadata_update(context, instance_uuid, metadata, delete):
 def _instance_system_metadata_get_multi(context, instance_uuids):
     if not instance_uuids:
         return []
-    return model_query(context, models.InstanceSystemMetadata,
-                       read_deleted='yes').filter(
-        models.InstanceSystemMetadata.instance_uuid.in_(instance_uuids))
+    stmt = _cached_statement(
+        'instance_system_metadata_get_multi',
+        lambda: _model_select(models.InstanceSystemMetadata, 'yes').where(
+            models.InstanceSystemMetadata.instance_uuid.in_(
+                sa.bindparam('instance_uuids', expanding=True))))
+    return context.session.execute(
+        stmt, {'instance_uuids': list(instance_uuids)}).scalars().all()
 
 
 def _instance_system_metadata_get_query(context, instance_uuid):
@@ -3800,26 +4107,51 @@ def instance_fault_create(context, values):
     return dict(fault_ref)
 
 
-@pick_context_manager_reader
-def instance_fault_get_by_instance_uuids(
-    context, instance_uuids, latest=False,
-):
-    """Get all instance faults for the provided instance_uuids.
+@pick_context_manager_writer
+def instance_faults_create(context, values_list):
+    """Create several instance faults with a single INSERT statement.
 
-    :param instance_uuids: List of UUIDs of instances to grab faults for
-    :param latest: Optional boolean indicating we should only return the latest
-        fault for the instance
+    If a fault cannot be created, for instance because its instance was
+    purged in the meantime, the faults are created one at a time instead and
+    the ones which cannot be created are logged and skipped rather than
+    failing the others.
+
+    :param values_list: List of dicts of the values of each fault, all with
+        the same keys.
+    :returns: The number of skipped faults.
     """
-    if not instance_uuids:
-        return {}
+    if not values_list:
+        return 0
+    for values in values_list:
+        convert_objects_related_datetimes(values, 'created_at')
+    try:
+        with context.session.begin_nested():
+            context.session.execute(
+                sql.insert(models.InstanceFault), values_list)
+        return 0
+    except (db_exc.DBReferenceError, db_exc.DBDataError):
+        pass
+
+    skipped = 0
+    for values in values_list:
+        try:
+            with context.session.begin_nested():
+                context.session.execute(
+                    sql.insert(models.InstanceFault), [values])
+        except (db_exc.DBReferenceError, db_exc.DBDataError) as e:
+            LOG.warning('Unable to record instance fault: %s', e,
+                        instance_uuid=values['instance_uuid'])
+            skipped += 1
+    return skipped
 
+
+def _instance_fault_get_by_instance_uuids_stmt(latest):
     faults_tbl = models.InstanceFault.__table__
+    instance_uuids = sa.bindparam('instance_uuids', expanding=True)
     # NOTE(rpodolyaka): filtering by instance_uuids is performed in both
     # code branches below for the sake of a better query plan. On change,
     # make sure to update the other one as well.
-    query = model_query(context, models.InstanceFault,
-                        [faults_tbl],
-                        read_deleted='no')
+    stmt = _model_select(models.InstanceFault, 'no', [faults_tbl])
 
     if latest:
         # NOTE(jaypipes): We join instance_faults to a derived table of the
@@ -3836,29 +4168,49 @@ def instance_fault_get_by_instance_uuids(
         #    GROUP BY instance_uuid
         #  ) AS latest_faults
         #    ON instance_faults.id = latest_faults.max_id;
-        latest_faults = model_query(
-            context, models.InstanceFault,
+        latest_faults = _model_select(
+            models.InstanceFault, 'no',
             [faults_tbl.c.instance_uuid,
              sql.func.max(faults_tbl.c.id).label('max_id')],
-            read_deleted='no'
-        ).filter(
+        ).where(
             faults_tbl.c.instance_uuid.in_(instance_uuids)
         ).group_by(
             faults_tbl.c.instance_uuid
         ).subquery(name="latest_faults")
 
-        query = query.join(latest_faults,
-                           faults_tbl.c.id == latest_faults.c.max_id)
+        stmt = stmt.join(latest_faults,
+                         faults_tbl.c.id == latest_faults.c.max_id)
     else:
-        query = query.filter(
+        stmt = stmt.where(
             models.InstanceFault.instance_uuid.in_(instance_uuids)
         ).order_by(expression.desc("id"))
+    return stmt
+
+
+@pick_context_manager_reader
+def instance_fault_get_by_instance_uuids(
+    context, instance_uuids, latest=False,
+):
+    """Get all instance faults for the provided instance_uuids.
+
+    :param instance_uuids: List of UUIDs of instances to grab faults for
+    :param latest: Optional boolean indicating we should only return the latest
+        fault for the instance
+    """
+    if not instance_uuids:
+        return {}
+
+    stmt = _cached_statement(
+        ('instance_fault_get_by_instance_uuids', latest),
+        functools.partial(_instance_fault_get_by_instance_uuids_stmt, latest))
+    rows = context.session.execute(
+        stmt, {'instance_uuids': list(instance_uuids)})
 
     output = {}
     for instance_uuid in instance_uuids:
         output[instance_uuid] = []
 
-    for row in query:
+    for row in rows:
         output[row.instance_uuid].append(row._asdict())
 
     return output
@@ -3945,11 +4297,11 @@ def _action_get_last_created_by_instance_uuid(context, instance_uuid):
     return result
 
 
-@oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
-@pick_context_manager_writer
-def action_event_start(context, values):
-    """Start an event on an instance action."""
-    convert_objects_related_datetimes(values, 'start_time')
+def _action_get_for_event(context, values, find_last_action):
+    """Get the action of an instance action event.
+
+    :returns: A tuple of the action and whether it should be updated.
+    """
     action = _action_get_by_request_id(context, values['instance_uuid'],
                                        values['request_id'])
     # When nova-compute restarts, the context is generated again in
@@ -3959,7 +4311,7 @@ def action_event_start(context, values):
     # init_instance can continue to finish the recovery action, like:
     # powering_off, unpausing, and so on.
     update_action = True
-    if not action and not context.project_id:
+    if not action and find_last_action:
         action = _action_get_last_created_by_instance_uuid(
             context, values['instance_uuid'])
         # If we couldn't find an action by the request_id, we don't want to
@@ -3970,6 +4322,13 @@ def action_event_start(context, values):
         raise exception.InstanceActionNotFound(
                                     request_id=values['request_id'],
                                     instance_uuid=values['instance_uuid'])
+    return action, update_action
+
+
+def _action_event_start(context, values, find_last_action):
+    convert_objects_related_datetimes(values, 'start_time')
+    action, update_action = _action_get_for_event(context, values,
+                                                  find_last_action)
 
     values['action_id'] = action['id']
 
@@ -3985,34 +4344,10 @@ def action_event_start(context, values):
     return event_ref
 
 
-# NOTE: We need the retry_on_deadlock decorator for cases like resize where
-# a lot of events are happening at once between multiple hosts trying to
-# update the same action record in a small time window.
-@oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
-@pick_context_manager_writer
-def action_event_finish(context, values):
-    """Finish an event on an instance action."""
+def _action_event_finish(context, values, find_last_action):
     convert_objects_related_datetimes(values, 'start_time', 'finish_time')
-    action = _action_get_by_request_id(context, values['instance_uuid'],
-                                       values['request_id'])
-    # When nova-compute restarts, the context is generated again in
-    # init_host workflow, the request_id was different with the request_id
-    # recorded in InstanceAction, so we can't get the original record
-    # according to request_id. Try to get the last created action so that
-    # init_instance can continue to finish the recovery action, like:
-    # powering_off, unpausing, and so on.
-    update_action = True
-    if not action and not context.project_id:
-        action = _action_get_last_created_by_instance_uuid(
-            context, values['instance_uuid'])
-        # If we couldn't find an action by the request_id, we don't want to
-        # update this action since it likely represents an inactive action.
-        update_action = False
-
-    if not action:
-        raise exception.InstanceActionNotFound(
-                                    request_id=values['request_id'],
-                                    instance_uuid=values['instance_uuid'])
+    action, update_action = _action_get_for_event(context, values,
+                                                  find_last_action)
 
     event_ref = model_query(context, models.InstanceActionEvent).\
                             filter_by(action_id=action['id']).\
@@ -4035,6 +4370,57 @@ def action_event_finish(context, values):
     return event_ref
 
 
+@oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
+@pick_context_manager_writer
+def action_event_start(context, values):
+    """Start an event on an instance action."""
+    return _action_event_start(context, values, not context.project_id)
+
+
+# NOTE: We need the retry_on_deadlock decorator for cases like resize where
+# a lot of events are happening at once between multiple hosts trying to
+# update the same action record in a small time window.
+@oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
+@pick_context_manager_writer
+def action_event_finish(context, values):
+    """Finish an event on an instance action."""
+    return _action_event_finish(context, values, not context.project_id)
+
+
+@oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
+@pick_context_manager_writer
+def action_events_record(context, records):
+    """Record the starts and finishes of several instance action events in a
+    single transaction.
+
+    The records are applied in the order they are given, so an event can be
+    started and finished by the same call. A record which action or event
+    cannot be found is logged and skipped rather than failing the others.
+
+    :param records: List of dicts with the keys ``finish`` (False to start an
+        event, True to finish it), ``values`` (the values passed to
+        action_event_start or action_event_finish) and ``find_last_action``
+        (True to fall back to the last action of the instance when there is
+        none for the request, as done for contexts without a project).
+    :returns: The number of skipped records.
+    """
+    skipped = 0
+    for record in records:
+        record_event = (_action_event_finish if record['finish']
+                        else _action_event_start)
+        try:
+            record_event(context, record['values'],
+                         record['find_last_action'])
+        except (exception.InstanceActionNotFound,
+                exception.InstanceActionEventNotFound) as e:
+            LOG.warning('Unable to record instance action event %(event)s: '
+                        '%(error)s',
+                        {'event': record['values']['event'], 'error': e},
+                        instance_uuid=record['values']['instance_uuid'])
+            skipped += 1
+    return skipped
+
+
 @pick_context_manager_reader
 def action_events_get(context, action_id):
     """Get the events by action id."""
@@ -4505,7 +4891,7 @@ def _archive_deleted_rows_for_table(
 
 
 def archive_deleted_rows(context=None, max_rows=None, before=None,
-                         task_log=False):
+                         task_log=False, table_elapsed=None):
     """Move up to max_rows rows from production tables to the corresponding
     shadow tables.
 
@@ -4514,6 +4900,9 @@ def archive_deleted_rows(context=None, max_rows=None, before=None,
     :param before: optional datetime which when specified filters the records
         to only archive those records deleted before the given date
     :param task_log: Optional for whether to archive task_log table records
+    :param table_elapsed: Optional dict which is updated with the time in
+        seconds spent archiving rows from each table, including the rows
+        referring to them by FK, for the tables rows were archived from
     :returns: 3-item tuple:
 
         - dict that maps table name to number of rows archived from that table,
@@ -4553,12 +4942,16 @@ def archive_deleted_rows(context=None, max_rows=None, before=None,
         if tablename in models.REMOVED_TABLES:
             continue
 
-        rows_archived, _deleted_instance_uuids, extras = (
-            _archive_deleted_rows_for_table(
-                meta, engine, tablename,
-                max_rows=max_rows - total_rows_archived,
-                before=before,
-                task_log=task_log))
+        with timeutils.StopWatch() as timer:
+            rows_archived, _deleted_instance_uuids, extras = (
+                _archive_deleted_rows_for_table(
+                    meta, engine, tablename,
+                    max_rows=max_rows - total_rows_archived,
+                    before=before,
+                    task_log=task_log))
+        if rows_archived and table_elapsed is not None:
+            table_elapsed[tablename] = (
+                table_elapsed.get(tablename, 0) + timer.elapsed())
         total_rows_archived += rows_archived
         if tablename == 'instances':
             deleted_instance_uuids = _deleted_instance_uuids
@@ -4573,6 +4966,43 @@ def archive_deleted_rows(context=None, max_rows=None, before=None,
     return table_to_rows_archived, deleted_instance_uuids, total_rows_archived
 
 
+def get_replica_lag(context):
+    """Return how far behind the database replica is, in seconds.
+
+    The replica is the [database]/slave_connection database, which
+    replicates the [database]/connection database. The context managers of
+    the cells are configured with it too, whatever database they target, so
+    None is returned for contexts targeting the database of another cell
+    rather than the lag of a replica of another database.
+
+    :param context: nova.context.RequestContext for database access
+    :returns: The replication lag of the replica in seconds, or None if there
+        is no replica of the targeted database or its lag is unknown, which
+        is the case for replicas other than MySQL ones and for stopped
+        replicas
+    """
+    if not _targets_main_database(context):
+        return None
+    ctxt_mgr = get_context_manager(context)
+    engine = ctxt_mgr.reader.get_engine()
+    if (engine is ctxt_mgr.writer.get_engine() or
+            engine.dialect.name != 'mysql'):
+        return None
+
+    row = None
+    with engine.connect() as conn:
+        # MySQL 8.0.22 renamed SHOW SLAVE STATUS, which was then removed
+        for statement in ('SHOW REPLICA STATUS', 'SHOW SLAVE STATUS'):
+            try:
+                row = conn.execute(sql.text(statement)).mappings().first()
+                break
+            except db_exc.DBError:
+                continue
+    if not row:
+        return None
+    return row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master'))
+
+
 def _purgeable_tables(metadata):
     return [
         t for t in metadata.sorted_tables if (
@@ -4582,7 +5012,74 @@ def _purgeable_tables(metadata):
     ]
 
 
-def purge_shadow_tables(context, before_date, status_fn=None):
+def _purge_table_chunked(conn, table, where, batch_size, throttle,
+                         status_fn):
+    """Delete the rows of a shadow table in primary key ranges.
+
+    Each batch looks up the ids of the next ``batch_size`` rows to purge and
+    deletes the rows within that id range in its own transaction, so that
+    no single transaction holds locks on or replicates more than
+    ``batch_size`` rows.
+
+    :returns: The number of rows deleted from the table, or None if the
+        table does not have a single integer primary key and so cannot be
+        purged in chunks.
+    """
+    pk_columns = list(table.primary_key.columns)
+    if (len(pk_columns) != 1 or
+            not isinstance(pk_columns[0].type, sa.Integer)):
+        return None
+    pk = pk_columns[0]
+
+    deleted = 0
+    marker = None
+    while True:
+        select = sa.select(pk).order_by(pk).limit(batch_size)
+        if where is not None:
+            select = select.where(where)
+        if marker is not None:
+            select = select.where(pk > marker)
+        with conn.begin():
+            ids = [row[0] for row in conn.execute(select)]
+        if not ids:
+            break
+
+        # Every purgeable row between the first and the last id found was
+        # returned by the query above, so the range covers exactly those.
+        delete = table.delete().where(pk.between(ids[0], ids[-1]))
+        if where is not None:
+            delete = delete.where(where)
+        with conn.begin():
+            result = conn.execute(delete)
+        deleted += result.rowcount
+        marker = ids[-1]
+        status_fn(_('Deleted %(rows)i rows from %(table)s with %(pk)s up '
+                    'to %(marker)s') % {
+                        'rows': result.rowcount, 'table': table.name,
+                        'pk': pk.name, 'marker': marker})
+        throttle(result.rowcount)
+        if len(ids) < batch_size:
+            break
+    return deleted
+
+
+def purge_shadow_tables(context, before_date, status_fn=None,
+                        batch_size=None, max_rows_per_second=None):
+    """Purge rows from the shadow tables.
+
+    :param context: The request context used to pick the database.
+    :param before_date: Only purge rows whose timestamp is older than this,
+        or purge all rows if None.
+    :param status_fn: Called with a message describing the progress of the
+        purge.
+    :param batch_size: If set, delete the rows of each table in primary key
+        ranges of at most this many rows, each in its own transaction,
+        rather than with a single statement per table.
+    :param max_rows_per_second: If set along with ``batch_size``, sleep
+        between batches so that no more than about this many rows are
+        deleted per second.
+    :returns: The total number of rows deleted.
+    """
     engine = get_engine(context=context)
     conn = engine.connect()
     metadata = sa.MetaData()
@@ -4592,6 +5089,19 @@ def purge_shadow_tables(context, before_date, status_fn=None):
     if status_fn is None:
         status_fn = lambda m: None
 
+    timer = timeutils.StopWatch()
+    timer.start()
+    throttled_rows = 0
+
+    def throttle(rows):
+        nonlocal throttled_rows
+        throttled_rows += rows
+        if not max_rows_per_second:
+            return
+        delay = throttled_rows / max_rows_per_second - timer.elapsed()
+        if delay > 0:
+            time.sleep(delay)
+
     # Some things never get formally deleted, and thus deleted_at
     # is never set. So, prefer specific timestamp columns here
     # for those special cases.
@@ -4618,8 +5128,19 @@ def purge_shadow_tables(context, before_date, status_fn=None):
                             'table': table.name})
             continue
 
-        if col is not None:
-            delete = table.delete().where(col < before_date)
+        where = col < before_date if col is not None else None
+
+        if batch_size:
+            deleted = _purge_table_chunked(
+                conn, table, where, batch_size, throttle, status_fn)
+            if deleted is not None:
+                total_deleted += deleted
+                continue
+            LOG.debug('Unable to purge table %s in chunks because it has '
+                      'no integer primary key', table.name)
+
+        if where is not None:
+            delete = table.delete().where(where)
         else:
             delete = table.delete()
 
@@ -4695,9 +5216,16 @@ def pci_device_get_all_by_instance_uuid(context, instance_uuid):
 def _instance_pcidevs_get_multi(context, instance_uuids):
     if not instance_uuids:
         return []
-    return model_query(context, models.PciDevice).\
-        filter_by(status='allocated').\
-        filter(models.PciDevice.instance_uuid.in_(instance_uuids))
+    read_deleted = context.read_deleted
+    stmt = _cached_statement(
+        ('instance_pcidevs_get_multi', read_deleted),
+        lambda: _model_select(models.PciDevice, read_deleted).where(
+            models.PciDevice.status == 'allocated'
+        ).where(
+            models.PciDevice.instance_uuid.in_(
+                sa.bindparam('instance_uuids', expanding=True))))
+    return context.session.execute(
+        stmt, {'instance_uuids': list(instance_uuids)}).scalars().all()
 
 
 @pick_context_manager_writer
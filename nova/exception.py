@@ -1606,6 +1606,11 @@ class UnsupportedRPCVersion(Invalid):
                 "Required >= %(required)s")
 
 
+class UnsupportedRPCPayloadCompression(Invalid):
+    msg_fmt = _("Unsupported RPC payload compression %(codec)s version "
+                "%(version)s")
+
+
 class Base64Exception(NovaException):
     msg_fmt = _("Invalid Base 64 data for file %(path)s")
 
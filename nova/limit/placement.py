@@ -39,16 +39,18 @@ LEGACY_LIMITS = {
 
 
 def _get_placement_usages(
-    context: 'nova.context.RequestContext', project_id: str
+    context: 'nova.context.RequestContext', project_id: str,
+    use_cache: bool = False,
 ) -> dict[str, int]:
     return report.report_client_singleton().get_usages_counts_for_limits(
-        context, project_id)
+        context, project_id, use_cache=use_cache)
 
 
 def _get_usage(
     context: 'nova.context.RequestContext',
     project_id: str,
     resource_names: list[str],
+    use_cache: bool = False,
 ) -> dict[str, int]:
     """Called by oslo_limit's enforcer"""
     if not limit_utils.use_unified_limits():
@@ -90,7 +92,8 @@ def _get_usage(
         resource_counts['servers'] = mappings['project']['instances']
 
     try:
-        usages = _get_placement_usages(context, project_id)
+        usages = _get_placement_usages(context, project_id,
+                                       use_cache=use_cache)
     except exception.UsagesRetrievalFailed as e:
         msg = ("Failed to retrieve usages from placement while enforcing "
                "%s quota limits." % ", ".join(resource_names))
@@ -216,5 +219,8 @@ def get_legacy_project_limits(project_id):
 def get_legacy_counts(context, project_id):
     resource_names = list(LEGACY_LIMITS.keys())
     resource_names.sort()
-    new_usage = _get_usage(context, project_id, resource_names)
+    # The legacy counts are only reported by the API, never enforced, so
+    # they may come from the placement usages cache.
+    new_usage = _get_usage(context, project_id, resource_names,
+                           use_cache=True)
     return _convert_keys_to_legacy_name(new_usage)
@@ -25,6 +25,7 @@ import oslo_messaging as messaging
 from oslo_utils import versionutils
 from oslo_versionedobjects import base as ovoo_base
 from oslo_versionedobjects import exception as ovoo_exc
+from oslo_versionedobjects import fields as ovoo_fields
 
 from nova import exception
 from nova import objects
@@ -122,6 +123,20 @@ def object_id(obj):
     return '%s<%s>' % (obj.obj_name(), ident)
 
 
+_UNSET = object()
+
+
+@functools.lru_cache(maxsize=None)
+def _field_type_is_passthrough(field_cls, type_cls):
+    return (field_cls.to_primitive is ovoo_fields.Field.to_primitive and
+            type_cls.to_primitive is ovoo_fields.FieldType.to_primitive)
+
+
+def _field_is_passthrough(field):
+    """Whether a field serializes any value as the value itself."""
+    return _field_type_is_passthrough(type(field), type(field._type))
+
+
 def lazy_load_counter(fn):
     """Increment lazy-load counter and warn if over threshold"""
     @functools.wraps(fn)
@@ -178,6 +193,82 @@ class NovaObject(ovoo_base.VersionedObject):
         finally:
             self._context = original_context
 
+    @classmethod
+    def _obj_primitive_plan(cls):
+        """Return the cached serialization plan for this class.
+
+        The plan is a tuple of (name, attrname, field, passthrough) for each
+        field, where passthrough means that the field serializes a value as
+        itself so the per-value Field.to_primitive() dispatch can be skipped.
+        It is rebuilt if the class fields are replaced.
+        """
+        cached = cls.__dict__.get('_obj_primitive_plan_cache')
+        if cached is None or cached[0] is not cls.fields:
+            plan = tuple(
+                (name, get_attrname(name), field,
+                 _field_is_passthrough(field))
+                for name, field in cls.fields.items())
+            cached = (cls.fields, plan)
+            cls._obj_primitive_plan_cache = cached
+        return cached[1]
+
+    # NOTE: The following are equivalent to their oslo.versionedobjects
+    # counterparts but avoid rebuilding obj_fields and going through the
+    # field properties for every attribute, which dominates the cost of
+    # serializing large objects like Instance and RequestSpec over RPC.
+    def obj_attr_is_set(self, attrname):
+        if attrname in self.fields or attrname in self.obj_extra_fields:
+            return hasattr(self, get_attrname(attrname))
+        return super(NovaObject, self).obj_attr_is_set(attrname)
+
+    def obj_what_changed(self):
+        fields = self.fields
+        changes = {field for field in self._changed_fields
+                   if field in fields}
+        for name, attrname, field, passthrough in self._obj_primitive_plan():
+            if name in changes:
+                continue
+            value = getattr(self, attrname, None)
+            if (isinstance(value, ovoo_base.VersionedObject) and
+                    value.obj_what_changed()):
+                changes.add(name)
+        return changes
+
+    def obj_to_primitive(self, target_version=None, version_manifest=None):
+        if target_version is None:
+            target_version = self.VERSION
+        elif (versionutils.convert_version_to_tuple(target_version) >
+                versionutils.convert_version_to_tuple(self.VERSION)):
+            raise ovoo_exc.InvalidTargetVersion(version=target_version)
+        primitive = {}
+        missing = _UNSET
+        for name, attrname, field, passthrough in self._obj_primitive_plan():
+            value = getattr(self, attrname, missing)
+            if value is missing:
+                continue
+            if passthrough or value is None:
+                primitive[name] = value
+            else:
+                primitive[name] = field.to_primitive(self, name, value)
+        if target_version != self.VERSION or version_manifest:
+            self.obj_make_compatible_from_manifest(
+                primitive, target_version, version_manifest)
+        key = self._obj_primitive_key
+        obj = {
+            key('name'): self.obj_name(),
+            key('namespace'): self.OBJ_PROJECT_NAMESPACE,
+            key('version'): target_version,
+            key('data'): primitive,
+        }
+        # NOTE(cfriesen): if we're downgrading to a lower version, then
+        # it's possible that self.obj_what_changed() includes fields that
+        # no longer exist in the lower version.  If so, filter them out.
+        changes = [field for field in self.obj_what_changed()
+                   if field in primitive]
+        if changes:
+            obj[key('changes')] = changes
+        return obj
+
 
 class NovaPersistentObject(object):
     """Mixin class for Persistent objects.
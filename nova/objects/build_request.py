@@ -17,6 +17,7 @@ from oslo_log import log as logging
 from oslo_serialization import jsonutils
 from oslo_utils import versionutils
 from oslo_versionedobjects import exception as ovoo_exc
+from sqlalchemy import sql
 
 from nova.db.api import api as api_db_api
 from nova.db.api import models as api_models
@@ -212,6 +213,37 @@ class BuildRequest(base.NovaObject):
         db_req = self._create_in_db(self._context, updates)
         self._from_db_object(self._context, self, db_req)
 
+    @staticmethod
+    @api_db_api.context_manager.writer
+    def _create_all_in_db(context, updates):
+        context.session.execute(sql.insert(api_models.BuildRequest), updates)
+        instance_uuids = [req['instance_uuid'] for req in updates]
+        return context.session.query(api_models.BuildRequest).filter(
+            api_models.BuildRequest.instance_uuid.in_(instance_uuids)).all()
+
+    @classmethod
+    def create_all(cls, context, reqs):
+        """Create several build requests with a single INSERT statement.
+
+        This is the batched equivalent of calling create() on each of the
+        build requests.
+        """
+        updates = []
+        for req in reqs:
+            if req.obj_attr_is_set('id'):
+                raise exception.ObjectActionError(action='create',
+                                                  reason='already created')
+            if not req.obj_attr_is_set('instance_uuid'):
+                raise exception.ObjectActionError(action='create',
+                        reason='instance_uuid must be set')
+            updates.append(req._get_update_primitives())
+        if not updates:
+            return
+        db_reqs = {db_req['instance_uuid']: db_req
+                   for db_req in cls._create_all_in_db(context, updates)}
+        for req in reqs:
+            cls._from_db_object(context, req, db_reqs[req.instance_uuid])
+
     @staticmethod
     @api_db_api.context_manager.writer
     def _destroy_in_db(context, instance_uuid):
@@ -285,6 +317,51 @@ class BuildRequestList(base.ObjectListBase, base.NovaObject):
         return base.obj_make_list(context, cls(context), objects.BuildRequest,
                                   db_build_reqs)
 
+    @staticmethod
+    @api_db_api.context_manager.reader
+    def _get_instance_uuids_from_db(context, instance_uuids):
+        query = context.session.query(
+            api_models.BuildRequest.instance_uuid).filter(
+            api_models.BuildRequest.instance_uuid.in_(instance_uuids))
+        return {row.instance_uuid for row in query}
+
+    @classmethod
+    def get_instance_uuids(cls, context, instance_uuids):
+        """Return which of the given instances still have a build request.
+
+        Only the existence of the build requests is checked, the instances
+        they hold are not loaded.
+
+        :param instance_uuids: List of instance UUIDs to check
+        :returns: A set of the instance UUIDs that have a build request
+        """
+        return cls._get_instance_uuids_from_db(context, instance_uuids)
+
+    @staticmethod
+    @api_db_api.context_manager.writer
+    def _destroy_bulk_in_db(context, instance_uuids):
+        query = context.session.query(api_models.BuildRequest).filter(
+            api_models.BuildRequest.instance_uuid.in_(instance_uuids))
+        # Lock the rows so that a concurrent delete of one of the build
+        # requests waits for this one and then finds it gone.
+        found = {row.instance_uuid for row in query.with_entities(
+            api_models.BuildRequest.instance_uuid).with_for_update()}
+        query.delete(synchronize_session=False)
+        return found
+
+    @classmethod
+    def destroy_bulk(cls, context, instance_uuids):
+        """Delete the build requests of several instances at once.
+
+        Unlike BuildRequest.destroy(), a build request which is already gone
+        is not an error.
+
+        :param instance_uuids: List of instance UUIDs which build requests
+            should be deleted
+        :returns: A set of the instance UUIDs which build request was deleted
+        """
+        return cls._destroy_bulk_in_db(context, instance_uuids)
+
     @staticmethod
     def _pass_exact_filters(instance, filters):
         for filter_key, filter_val in filters.items():
@@ -13,6 +13,7 @@
 #    under the License.
 
 import contextlib
+import weakref
 
 from oslo_config import cfg
 from oslo_db import exception as db_exc
@@ -66,6 +67,13 @@ INSTANCE_OPTIONAL_ATTRS = (_INSTANCE_OPTIONAL_JOINED_FIELDS +
                            _INSTANCE_OPTIONAL_NON_COLUMN_FIELDS +
                            _INSTANCE_EXTRA_FIELDS)
 
+# These are fields that, when lazy-loaded on an instance in an InstanceList,
+# are loaded for all of the instances in the list at once
+_INSTANCE_BULK_LOADABLE_FIELDS = (['metadata', 'system_metadata',
+                                   'info_cache', 'pci_devices', 'tags',
+                                   'fault', 'old_flavor', 'new_flavor'] +
+                                  _INSTANCE_EXTRA_FIELDS)
+
 __all__ = [
     'Instance',
     'InstanceList',
@@ -259,6 +267,9 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
     def __init__(self, *args, **kwargs):
         super(Instance, self).__init__(*args, **kwargs)
         self._reset_metadata_tracking()
+        # A weak reference to the InstanceList we were loaded as part of,
+        # used to lazy-load attributes for the whole list at once
+        self._instance_list = None
 
     @property
     def image_meta(self):
@@ -852,7 +863,12 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
             elif field in changes:
                 updates[field] = self[field]
 
-        if self._extra_values_to_save:
+        # The original instance is only needed for the
+        # notification.send_update() below, which does nothing unless state
+        # change notifications are enabled. Otherwise we can update the
+        # instance without reading it first, along with its extra values.
+        notify = CONF.notifications.notify_on_state_change
+        if self._extra_values_to_save and (notify or not updates):
             db.instance_extra_update_by_uuid(context, self.uuid,
                                              self._extra_values_to_save)
 
@@ -877,6 +893,16 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
             # NOTE(danms): We don't refresh pci_devices on save right now
             expected_attrs.remove('pci_devices')
 
+        if not notify:
+            inst_ref = db.instance_update_on_match(
+                context, self.uuid, updates,
+                columns_to_join=_expected_cols(expected_attrs),
+                extra_values=self._extra_values_to_save)
+            self._from_db_object(context, self, inst_ref,
+                                 expected_attrs=expected_attrs)
+            self.obj_reset_changes()
+            return
+
         # NOTE(alaski): We need to pull system_metadata for the
         # notification.send_update() below.  If we don't there's a KeyError
         # when it tries to extract the flavor.
@@ -1152,7 +1178,23 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
                    })
 
         with utils.temporary_mutation(self._context, read_deleted='yes'):
-            self._obj_load_attr(attrname)
+            if not self._bulk_load_attr(attrname):
+                self._obj_load_attr(attrname)
+
+    def _bulk_load_attr(self, attrname):
+        """Try to load an attribute for our whole InstanceList at once.
+
+        :param attrname: The name of the attribute to be loaded
+        :returns: True if the attribute was loaded, False otherwise
+        """
+        if (attrname not in _INSTANCE_BULK_LOADABLE_FIELDS or
+                self._instance_list is None):
+            return False
+        inst_list = self._instance_list()
+        if inst_list is None:
+            return False
+        inst_list.bulk_load_attr(attrname)
+        return attrname in self
 
     def _obj_load_attr(self, attrname):
         """Internal method for loading attributes from instances.
@@ -1344,6 +1386,7 @@ def _make_instance_list(context, inst_list, db_inst_list, expected_attrs):
             inst_obj.fault = inst_faults.get(inst_obj.uuid, None)
         inst_list.objects.append(inst_obj)
     inst_list.obj_reset_changes()
+    inst_list._link_instances()
     return inst_list
 
 
@@ -1402,6 +1445,65 @@ class InstanceList(base.ObjectListBase, base.NovaObject):
         'objects': fields.ListOfObjectsField('Instance'),
     }
 
+    @classmethod
+    def _obj_from_primitive(cls, context, objver, primitive):
+        self = super(InstanceList, cls)._obj_from_primitive(context, objver,
+                                                            primitive)
+        self._link_instances()
+        return self
+
+    def _link_instances(self):
+        ref = weakref.ref(self)
+        for instance in self.objects:
+            instance._instance_list = ref
+
+    @base.lazy_load_counter
+    def bulk_load_attr(self, attrname):
+        """Lazy-load an attribute for all of our instances missing it at once.
+
+        This is called when an attribute is lazy-loaded on one of our
+        instances, to load it for all of the instances in a single query
+        rather than one query per instance.
+
+        :param attrname: The name of the attribute to be loaded
+        """
+        expected_attr = 'flavor' if 'flavor' in attrname else attrname
+        if expected_attr == 'flavor':
+            attrs = ['flavor', 'old_flavor', 'new_flavor']
+        else:
+            attrs = [attrname]
+
+        instances = {inst.uuid: inst for inst in self
+                     if 'uuid' in inst and attrname not in inst and
+                     inst._context is self._context}
+        if len(instances) < 2:
+            # Nothing to be gained, leave it to the regular lazy-load
+            return
+
+        LOG.debug("Lazy-loading '%(attr)s' on %(count)i instances of "
+                  "%(name)s at once",
+                  {'attr': attrname, 'count': len(instances),
+                   'name': base.object_id(self)})
+
+        with utils.temporary_mutation(self._context, read_deleted='yes'):
+            loaded = self.__class__.get_by_filters(
+                self._context, {'uuid': list(instances)},
+                expected_attrs=[expected_attr])
+
+        for inst in loaded:
+            instance = instances.get(inst.uuid)
+            if instance is None:
+                continue
+            for attr in attrs:
+                if attr in inst and attr not in instance:
+                    setattr(instance, attr, getattr(inst, attr))
+                    instance.obj_reset_changes([attr])
+            if expected_attr == 'keypairs' and 'keypairs' not in instance:
+                # NOTE: Instances without keypairs in the database do not
+                # get them set, but we know there are none. We leave the
+                # attribute dirty like _load_keypairs() does.
+                instance.keypairs = objects.KeyPairList(objects=[])
+
     @classmethod
     @db.select_db_reader_mode
     def _get_by_filters_impl(cls, context, filters,
@@ -1661,30 +1763,41 @@ class InstanceList(base.ObjectListBase, base.NovaObject):
             models.Instance.vm_state != vm_states.SOFT_DELETED,
             models.Instance.vm_state == sql.null()
             )
-        project_query = context.session.query(
+        columns = [
             func.count(models.Instance.id),
             func.sum(models.Instance.vcpus),
-            func.sum(models.Instance.memory_mb)).\
+            func.sum(models.Instance.memory_mb),
+        ]
+        if user_id:
+            # Count the instances of the user in the same statement as the
+            # ones of the project rather than with a second query.
+            is_user = models.Instance.user_id == user_id
+            columns += [
+                func.sum(sa.case((is_user, 1), else_=0)),
+                func.sum(sa.case((is_user, models.Instance.vcpus), else_=0)),
+                func.sum(
+                    sa.case((is_user, models.Instance.memory_mb), else_=0)),
+            ]
+        query = context.session.query(*columns).\
             filter_by(deleted=0).\
             filter(not_soft_deleted).\
             filter_by(project_id=project_id)
         # NOTE(mriedem): Filter out hidden instances since there should be a
         # non-hidden version of the instance in another cell database and the
         # API will only show one of them, so we don't count the hidden copy.
-        project_query = project_query.filter(
+        query = query.filter(
             sa.or_(
                 models.Instance.hidden == sql.false(),
                 models.Instance.hidden == sql.null(),
             ))
 
-        project_result = project_query.first()
+        result = query.first()
         fields = ('instances', 'cores', 'ram')
-        project_counts = {field: int(project_result[idx] or 0)
+        project_counts = {field: int(result[idx] or 0)
                           for idx, field in enumerate(fields)}
         counts = {'project': project_counts}
         if user_id:
-            user_result = project_query.filter_by(user_id=user_id).first()
-            user_counts = {field: int(user_result[idx] or 0)
+            user_counts = {field: int(result[len(fields) + idx] or 0)
                            for idx, field in enumerate(fields)}
             counts['user'] = user_counts
         return counts
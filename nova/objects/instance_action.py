@@ -281,7 +281,8 @@ class InstanceActionEvent(base.NovaPersistentObject, base.NovaObject,
 class InstanceActionEventList(base.ObjectListBase, base.NovaObject):
     # Version 1.0: Initial version
     # Version 1.1: InstanceActionEvent <= 1.1
-    VERSION = '1.1'
+    # Version 1.2: Added record_bulk()
+    VERSION = '1.2'
     fields = {
         'objects': fields.ListOfObjectsField('InstanceActionEvent'),
         }
@@ -291,3 +292,28 @@ class InstanceActionEventList(base.ObjectListBase, base.NovaObject):
         db_events = db.action_events_get(context, action_id)
         return base.obj_make_list(context, cls(context),
                                   objects.InstanceActionEvent, db_events)
+
+    @staticmethod
+    def pack_record(context, values, finish=False):
+        """Pack the values of an event start or finish for record_bulk().
+
+        :param context: The context of the request the event belongs to
+        :param values: The values returned by
+            InstanceActionEvent.pack_action_event_start() or
+            pack_action_event_finish()
+        :param finish: True if the event is finished, False if it is started
+        """
+        return {'finish': finish,
+                'values': values,
+                'find_last_action': not context.project_id}
+
+    @base.remotable_classmethod
+    def record_bulk(cls, context, records):
+        """Record the starts and finishes of several events at once.
+
+        :param records: List of records returned by pack_record(), in the
+            order the events were started and finished
+        :returns: The number of records that were skipped because their
+            action or event does not exist
+        """
+        return db.action_events_record(context, records)
@@ -89,7 +89,8 @@ class InstanceFaultList(base.ObjectListBase, base.NovaObject):
     #              InstanceFault <= version 1.1
     # Version 1.1: InstanceFault version 1.2
     # Version 1.2: Added get_latest_by_instance_uuids() method
-    VERSION = '1.2'
+    # Version 1.3: Added create_bulk() method
+    VERSION = '1.3'
 
     fields = {
         'objects': fields.ListOfObjectsField('InstanceFault'),
@@ -111,3 +112,14 @@ class InstanceFaultList(base.ObjectListBase, base.NovaObject):
         db_faultlist = itertools.chain(*db_faultdict.values())
         return base.obj_make_list(context, cls(context), objects.InstanceFault,
                                   db_faultlist)
+
+    @base.remotable_classmethod
+    def create_bulk(cls, context, faults):
+        """Create several instance faults at once.
+
+        :param faults: List of dicts with the instance_uuid, code, message,
+            details, host and created_at values of each fault
+        :returns: The number of faults that were skipped because they could
+            not be created, for instance because their instance does not exist
+        """
+        return db.instance_faults_create(context, faults)
@@ -133,8 +133,7 @@ class InstanceMapping(base.NovaTimestampObject, base.NovaObject):
         db_mapping.cell_mapping
         return db_mapping
 
-    @base.remotable
-    def create(self):
+    def _get_create_changes(self):
         changes = self.obj_get_changes()
         changes = self._update_with_cell_id(changes)
         if 'queued_for_delete' not in changes:
@@ -142,9 +141,43 @@ class InstanceMapping(base.NovaTimestampObject, base.NovaObject):
             # not queued_for_delete (unless we are being asked to
             # create one in deleted state for some reason).
             changes['queued_for_delete'] = False
+        return changes
+
+    @base.remotable
+    def create(self):
+        changes = self._get_create_changes()
         db_mapping = self._create_in_db(self._context, changes)
         self._from_db_object(self._context, self, db_mapping)
 
+    @staticmethod
+    @api_db_api.context_manager.writer
+    def _create_all_in_db(context, changes):
+        context.session.execute(
+            sql.insert(api_models.InstanceMapping), changes)
+        instance_uuids = [mapping['instance_uuid'] for mapping in changes]
+        return context.session.query(api_models.InstanceMapping)\
+            .options(orm.joinedload(api_models.InstanceMapping.cell_mapping))\
+            .filter(api_models.InstanceMapping.instance_uuid.in_(
+                instance_uuids))\
+            .all()
+
+    @classmethod
+    def create_all(cls, context, mappings):
+        """Create several instance mappings with a single INSERT statement.
+
+        This is the batched equivalent of calling create() on each of the
+        instance mappings.
+        """
+        changes = [mapping._get_create_changes() for mapping in mappings]
+        if not changes:
+            return
+        db_mappings = {
+            db_mapping['instance_uuid']: db_mapping
+            for db_mapping in cls._create_all_in_db(context, changes)}
+        for mapping in mappings:
+            cls._from_db_object(context, mapping,
+                                db_mappings[mapping.instance_uuid])
+
     @staticmethod
     @api_db_api.context_manager.writer
     def _save_in_db(context, instance_uuid, updates):
@@ -368,6 +401,26 @@ class InstanceMappingList(base.ObjectListBase, base.NovaObject):
     def destroy_bulk(cls, context, instance_uuids):
         return cls._destroy_bulk_in_db(context, instance_uuids)
 
+    @staticmethod
+    @api_db_api.context_manager.writer
+    def _update_cell_bulk_in_db(context, instance_uuids, cell_id):
+        return context.session.query(api_models.InstanceMapping).filter(
+                api_models.InstanceMapping.instance_uuid.in_(instance_uuids)).\
+                update({'cell_id': cell_id}, synchronize_session=False)
+
+    @classmethod
+    def update_cell_bulk(cls, context, instance_uuids, cell_mapping):
+        """Point the mappings of several instances at the given cell with a
+        single UPDATE statement.
+
+        :param instance_uuids: List of instance UUIDs which mappings should be
+            updated
+        :param cell_mapping: The CellMapping of the cell the instances are in
+        :returns: The number of updated instance mappings
+        """
+        return cls._update_cell_bulk_in_db(context, instance_uuids,
+                                           cell_mapping.id)
+
     @staticmethod
     @api_db_api.context_manager.reader
     def _get_not_deleted_by_cell_and_project_from_db(context, cell_uuid,
@@ -414,15 +467,20 @@ class InstanceMappingList(base.ObjectListBase, base.NovaObject):
     @staticmethod
     @api_db_api.context_manager.reader
     def _get_counts_in_db(context, project_id, user_id=None):
-        project_query = context.session.query(
-            func.count(api_models.InstanceMapping.id)).\
+        columns = [func.count(api_models.InstanceMapping.id)]
+        if user_id:
+            # Count the instances of the user in the same statement as the
+            # ones of the project rather than with a second query.
+            columns.append(func.sum(sql.case(
+                (api_models.InstanceMapping.user_id == user_id, 1),
+                else_=0)))
+        result = context.session.query(*columns).\
             filter_by(queued_for_delete=False).\
-            filter_by(project_id=project_id)
-        project_result = project_query.scalar()
-        counts = {'project': {'instances': project_result}}
+            filter_by(project_id=project_id).\
+            first()
+        counts = {'project': {'instances': result[0]}}
         if user_id:
-            user_result = project_query.filter_by(user_id=user_id).scalar()
-            counts['user'] = {'instances': user_result}
+            counts['user'] = {'instances': int(result[1] or 0)}
         return counts
 
     @base.remotable_classmethod
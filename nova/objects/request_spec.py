@@ -20,6 +20,7 @@ import os_resource_classes as orc
 from oslo_log import log as logging
 from oslo_serialization import jsonutils
 from oslo_utils import versionutils
+from sqlalchemy import sql
 
 from nova.compute import pci_placement_translator
 import nova.conf
@@ -873,6 +874,38 @@ class RequestSpec(base.NovaObject):
         db_spec = self._create_in_db(self._context, updates)
         self._from_db_object(self._context, self, db_spec)
 
+    @staticmethod
+    @api_db_api.context_manager.writer
+    def _create_all_in_db(context, updates):
+        context.session.execute(sql.insert(api_models.RequestSpec), updates)
+        instance_uuids = [spec['instance_uuid'] for spec in updates]
+        return context.session.query(api_models.RequestSpec).filter(
+            api_models.RequestSpec.instance_uuid.in_(instance_uuids)).all()
+
+    @classmethod
+    def create_all(cls, context, specs):
+        """Create several request specs with a single INSERT statement.
+
+        This is the batched equivalent of calling create() on each of the
+        request specs, which must all have an instance_uuid set.
+        """
+        updates = []
+        for spec in specs:
+            if spec.obj_attr_is_set('id'):
+                raise exception.ObjectActionError(action='create',
+                                                  reason='already created')
+            spec_updates = spec._get_update_primitives()
+            if not spec_updates:
+                raise exception.ObjectActionError(action='create',
+                                                  reason='no fields are set')
+            updates.append(spec_updates)
+        if not updates:
+            return
+        db_specs = {db_spec['instance_uuid']: db_spec
+                    for db_spec in cls._create_all_in_db(context, updates)}
+        for spec in specs:
+            cls._from_db_object(context, spec, db_specs[spec.instance_uuid])
+
     @staticmethod
     @api_db_api.context_manager.writer
     def _save_in_db(context, instance_uuid, updates):
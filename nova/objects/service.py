@@ -37,7 +37,7 @@ __all__ = [
 
 
 # NOTE(danms): This is the global service version counter
-SERVICE_VERSION = 72
+SERVICE_VERSION = 73
 
 
 # NOTE(danms): This is our SERVICE_VERSION history. The idea is that any
@@ -255,12 +255,19 @@ SERVICE_VERSION_HISTORY = (
     # Version 72: Compute RPC v6.5:
     # Add support for vTPM live migration
     {'compute_rpc': '6.5'},
+    # Version 73: Compute RPC v6.5:
+    # Services read compressed RPC payloads
+    {'compute_rpc': '6.5'},
 )
 
 # This is the version after which we can rely on having a persistent
 # local node identity for single-node systems.
 NODE_IDENTITY_VERSION = 65
 
+# This is the version after which services can read compressed RPC payloads,
+# see [DEFAULT]rpc_compression_threshold.
+RPC_PAYLOAD_COMPRESSION_VERSION = 73
+
 # This is used to raise an error at service startup if older than supported
 # computes are detected.
 # NOTE(sbauza) : Please modify it this way :
@@ -187,16 +187,11 @@ class DbQuotaDriver(object):
                     resource.name in
                     main_db_api.quota_get_per_project_resources()
                 ):
-                    count = resource.count_as_dict(context, project_id)
+                    count = self._count_usages(context, resource, project_id)
                     key = 'project'
                 else:
-                    # NOTE(melwitt): This assumes a specific signature for
-                    # count_as_dict(). Usages used to be records in the
-                    # database but now we are counting resources. The
-                    # count_as_dict() function signature needs to match this
-                    # call, else it should get a conditional in this function.
-                    count = resource.count_as_dict(context, project_id,
-                                                   user_id=user_id)
+                    count = self._count_usages(context, resource, project_id,
+                                               user_id=user_id)
                     key = 'user' if user_id else 'project'
                 # Example count_as_dict() return value:
                 #   {'project': {'instances': 5},
@@ -207,6 +202,40 @@ class DbQuotaDriver(object):
                     usages[res] = {'in_use': count_value}
         return usages
 
+    @staticmethod
+    def _count_usages(context, resource, project_id, user_id=None):
+        """Count a resource once per request.
+
+        The counts are cached in the request context, and a count scoped to
+        a user is reused for a count scoped to the project of the user since
+        it contains the project counts too.
+
+        :returns: The value returned by the count_as_dict() function of the
+                  resource.
+        """
+        cache = context.quota_usages
+        key = (resource.name, project_id, user_id)
+        if key not in cache and user_id is None:
+            key = next((k for k in cache
+                        if k[:2] == (resource.name, project_id)), key)
+        if key not in cache:
+            context.reporting_quota_usages = True
+            try:
+                if user_id is None:
+                    cache[key] = resource.count_as_dict(context, project_id)
+                else:
+                    # NOTE(melwitt): This assumes a specific signature for
+                    # count_as_dict(). Usages used to be records in the
+                    # database but now we are counting resources. The
+                    # count_as_dict() function signature needs to match
+                    # this call, else it should get a conditional in this
+                    # function.
+                    cache[key] = resource.count_as_dict(context, project_id,
+                                                        user_id=user_id)
+            finally:
+                context.reporting_quota_usages = False
+        return cache[key]
+
     def get_user_quotas(self, context, resources, project_id, user_id,
                         quota_class=None,
                         usages=True, project_quotas=None,
@@ -313,16 +342,19 @@ class DbQuotaDriver(object):
 
         settable_quotas = {}
         db_proj_quotas = objects.Quotas.get_all_by_project(context, project_id)
-        project_quotas = self.get_project_quotas(context, resources,
-                                                 project_id, remains=True,
-                                                 project_quotas=db_proj_quotas)
         if user_id:
+            # Get the user quotas first so that the project usages are taken
+            # from the usages counted for the user, which include them.
             setted_quotas = objects.Quotas.get_all_by_project_and_user(
                 context, project_id, user_id)
             user_quotas = self.get_user_quotas(context, resources,
                                                project_id, user_id,
                                                project_quotas=db_proj_quotas,
                                                user_quotas=setted_quotas)
+        project_quotas = self.get_project_quotas(context, resources,
+                                                 project_id, remains=True,
+                                                 project_quotas=db_proj_quotas)
+        if user_id:
             for key, value in user_quotas.items():
                 # Maximum is the remaining quota for a project (class/default
                 # minus the sum of all user quotas in the project), plus the
@@ -1341,7 +1373,8 @@ def _instances_cores_ram_count_legacy(context, project_id, user_id=None):
 
 def _cores_ram_count_placement(context, project_id, user_id=None):
     return report.report_client_singleton().get_usages_counts_for_quota(
-        context, project_id, user_id=user_id)
+        context, project_id, user_id=user_id,
+        use_cache=context.reporting_quota_usages)
 
 
 def _instances_cores_ram_count_api_db_placement(context, project_id,
@@ -12,11 +12,17 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import base64
+import collections
 import functools
+import threading
+import zlib
 
 from oslo_log import log as logging
 import oslo_messaging as messaging
 from oslo_messaging.rpc import dispatcher
+from oslo_reports.models import with_default_views
+from oslo_reports.views.text import generic as text_views
 from oslo_serialization import jsonutils
 from oslo_service import periodic_task
 from oslo_utils import importutils
@@ -35,6 +41,8 @@ __all__ = [
     'clear_extra_exmods',
     'get_allowed_exmods',
     'RequestContextSerializer',
+    'get_compression_stats',
+    'update_compression_allowed',
     'get_client',
     'get_server',
     'get_notifier',
@@ -143,19 +151,217 @@ class JsonPayloadSerializer(messaging.NoOpSerializer):
                                       fallback=self.fallback)
 
 
+# NOTE: A compressed payload is sent in place of an RPC argument or result
+# as a dict with these keys. The version must be bumped if the format of the
+# data changes, so that receivers can detect payloads they cannot decode.
+COMPRESSED_PAYLOAD_VERSION = 1
+COMPRESSED_PAYLOAD_CODEC = 'zlib'
+_COMPRESSED_PAYLOAD_KEYS = {
+    'nova_compressed.version', 'nova_compressed.codec',
+    'nova_compressed.data'}
+
+# The services which send or receive RPC payloads, and which must all be able
+# to read compressed payloads before this service sends any
+_COMPRESSION_BINARIES = [
+    'nova-compute', 'nova-conductor', 'nova-scheduler', 'nova-osapi_compute',
+    'nova-metadata']
+# Whether all the services can read compressed payloads, as determined by the
+# last call to update_compression_allowed()
+_COMPRESSION_ALLOWED = False
+
+# Per payload type totals of the payloads compressed by this service
+_COMPRESSION_STATS = collections.defaultdict(
+    lambda: {'count': 0, 'raw_bytes': 0, 'compressed_bytes': 0})
+_COMPRESSION_STATS_LOCK = threading.Lock()
+
+
+def update_compression_allowed(ctxt):
+    """Determine whether this service may compress the RPC payloads it sends.
+
+    Compressed payloads are only sent once the minimum version of the nova
+    services, across all cells if this service can reach them, shows that they
+    can all read them. This is checked when services start and on SIGHUP,
+    like the automatic compute RPC version cap, so services must be restarted
+    once all of them have been upgraded for compression to be enabled.
+
+    :param ctxt: A RequestContext
+    :returns: Whether this service may compress the RPC payloads it sends
+    """
+    global _COMPRESSION_ALLOWED
+    if not CONF.rpc_compression_threshold:
+        _COMPRESSION_ALLOWED = False
+        return False
+
+    # to avoid circular imports
+    from nova.objects import service as service_obj
+
+    service_version = None
+    if CONF.api_database.connection is not None:
+        try:
+            service_version = service_obj.get_minimum_version_all_cells(
+                ctxt, _COMPRESSION_BINARIES)
+        except nova.exception.DBNotAllowed:
+            # This service is not allowed to look at the other cells, only
+            # check the services of its own cell.
+            pass
+    if service_version is None:
+        service_version = service_obj.Service.get_minimum_version_multi(
+            ctxt, _COMPRESSION_BINARIES)
+
+    needed = service_obj.RPC_PAYLOAD_COMPRESSION_VERSION
+    _COMPRESSION_ALLOWED = service_version >= needed
+    if not _COMPRESSION_ALLOWED:
+        LOG.warning('Not compressing RPC payloads despite '
+                    '[DEFAULT]rpc_compression_threshold because the minimum '
+                    'nova service version is %(version)i and version '
+                    '%(needed)i is needed to read them. Restart this service '
+                    'once all services are upgraded to enable compression.',
+                    {'version': service_version, 'needed': needed})
+    return _COMPRESSION_ALLOWED
+
+
+def get_compression_stats():
+    """Return the RPC payload compression totals of this service.
+
+    :returns: A dict, keyed by payload type, of dicts with the number of
+        payloads compressed and their total raw and compressed sizes in bytes.
+        The payload type is the name of the serialized object, or the type of
+        the serialized value for anything else.
+    """
+    with _COMPRESSION_STATS_LOCK:
+        return {payload_type: dict(stats)
+                for payload_type, stats in _COMPRESSION_STATS.items()}
+
+
+def get_compression_report():
+    """Return the RPC payload compression totals as a report model.
+
+    This is registered as a section of the Guru Meditation Reports of the
+    services.
+    """
+    return with_default_views.ModelWithDefaultViews(
+        get_compression_stats(), text_view=text_views.KeyValueView())
+
+
+def _payload_type(entity):
+    if isinstance(entity, dict) and 'nova_object.name' in entity:
+        return entity['nova_object.name']
+    return type(entity).__name__
+
+
+def _is_payload_larger(entity, threshold):
+    """Return whether the JSON encoding of entity is about threshold bytes or
+    more, without encoding it.
+
+    The estimate only accounts for the strings and the JSON syntax, so it is
+    slightly lower than the actual size, and the walk stops as soon as the
+    threshold is reached.
+    """
+    size = 0
+    entities = [entity]
+    while entities:
+        entity = entities.pop()
+        if isinstance(entity, str):
+            size += len(entity) + 2
+        elif isinstance(entity, dict):
+            size += 2 + 2 * len(entity)
+            entities.extend(entity.keys())
+            entities.extend(entity.values())
+        elif isinstance(entity, (list, tuple)):
+            size += 2 + len(entity)
+            entities.extend(entity)
+        else:
+            size += 1
+        if size >= threshold:
+            return True
+    return False
+
+
+def compress_payload(entity, threshold):
+    """Compress a serialized RPC payload if it is larger than threshold bytes.
+
+    The size of the payload is estimated without encoding it, so only the
+    payloads which are compressed are encoded as JSON here.
+
+    :param entity: The serialized RPC argument or result
+    :param threshold: The approximate minimum size in bytes of the JSON
+        encoded entity which is compressed
+    :returns: The compressed payload, or entity if it was not compressed
+    """
+    if entity is None or isinstance(entity, (bool, int, float)):
+        return entity
+    if not _is_payload_larger(entity, threshold):
+        return entity
+    raw = jsonutils.dump_as_bytes(entity)
+    data = base64.b64encode(zlib.compress(raw))
+    if len(data) >= len(raw):
+        return entity
+
+    payload_type = _payload_type(entity)
+    with _COMPRESSION_STATS_LOCK:
+        stats = _COMPRESSION_STATS[payload_type]
+        stats['count'] += 1
+        stats['raw_bytes'] += len(raw)
+        stats['compressed_bytes'] += len(data)
+    LOG.debug('Compressed %(type)s RPC payload from %(raw)d to '
+              '%(compressed)d bytes',
+              {'type': payload_type, 'raw': len(raw),
+               'compressed': len(data)})
+    return {
+        'nova_compressed.version': COMPRESSED_PAYLOAD_VERSION,
+        'nova_compressed.codec': COMPRESSED_PAYLOAD_CODEC,
+        'nova_compressed.data': data.decode('ascii'),
+    }
+
+
+def decompress_payload(entity):
+    """Return the original payload of a compressed RPC payload.
+
+    :param entity: An RPC argument or result as received
+    :returns: The decompressed payload, or entity if it was not compressed
+    :raises: UnsupportedRPCPayloadCompression if the payload was compressed
+        in a format this service does not support
+    """
+    if not (isinstance(entity, dict) and
+            entity.keys() == _COMPRESSED_PAYLOAD_KEYS):
+        return entity
+    version = entity['nova_compressed.version']
+    codec = entity['nova_compressed.codec']
+    if (version != COMPRESSED_PAYLOAD_VERSION or
+            codec != COMPRESSED_PAYLOAD_CODEC):
+        raise nova.exception.UnsupportedRPCPayloadCompression(
+            codec=codec, version=version)
+    data = base64.b64decode(entity['nova_compressed.data'])
+    return jsonutils.loads(zlib.decompress(data))
+
+
 class RequestContextSerializer(messaging.Serializer):
 
-    def __init__(self, base):
+    def __init__(self, base, compress=False):
+        """Create a serializer wrapping a base serializer.
+
+        :param base: The serializer for RPC arguments and results, if any
+        :param compress: Whether to compress large serialized arguments and
+            results, depending on [DEFAULT]rpc_compression_threshold and on
+            update_compression_allowed(). Compressed payloads are always
+            decompressed.
+        """
         self._base = base
+        self._compress = compress
 
     def serialize_entity(self, context, entity):
         if not self._base:
             return entity
-        return self._base.serialize_entity(context, entity)
+        entity = self._base.serialize_entity(context, entity)
+        if (self._compress and CONF.rpc_compression_threshold and
+                _COMPRESSION_ALLOWED):
+            entity = compress_payload(entity, CONF.rpc_compression_threshold)
+        return entity
 
     def deserialize_entity(self, context, entity):
         if not self._base:
             return entity
+        entity = decompress_payload(entity)
         return self._base.deserialize_entity(context, entity)
 
     def serialize_context(self, context):
@@ -201,9 +407,10 @@ def get_client(target, version_cap=None, serializer=None,
     assert TRANSPORT is not None
 
     if profiler:
-        serializer = ProfilerRequestContextSerializer(serializer)
+        serializer = ProfilerRequestContextSerializer(serializer,
+                                                      compress=True)
     else:
-        serializer = RequestContextSerializer(serializer)
+        serializer = RequestContextSerializer(serializer, compress=True)
 
     return messaging.get_rpc_client(TRANSPORT, target,
         version_cap=version_cap, serializer=serializer,
@@ -214,9 +421,10 @@ def get_server(target, endpoints, serializer=None):
     assert TRANSPORT is not None
 
     if profiler:
-        serializer = ProfilerRequestContextSerializer(serializer)
+        serializer = ProfilerRequestContextSerializer(serializer,
+                                                      compress=True)
     else:
-        serializer = RequestContextSerializer(serializer)
+        serializer = RequestContextSerializer(serializer, compress=True)
     access_policy = dispatcher.DefaultRPCAccessPolicy
     exc = "threading" if utils.concurrency_mode_threading() else "eventlet"
     return messaging.get_rpc_server(TRANSPORT,
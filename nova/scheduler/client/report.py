@@ -237,6 +237,11 @@ class SchedulerReportClient(object):
         self._client = self._create_client()
         # NOTE(danms): Keep track of how naggy we've been
         self._warn_count = 0
+        # Usages retrieved from placement for quota, keyed by project_id and
+        # user_id, with the time they were retrieved at. Only used when
+        # [quota]placement_usage_cache_ttl is set.
+        self._usages_cache: dict[
+            tuple[str, str | None], tuple[float, dict[str, int]]] = {}
 
     def clear_provider_cache(self, init=False):
         if not init:
@@ -289,6 +294,7 @@ class SchedulerReportClient(object):
                                 global_request_id=global_request_id)
 
     def post(self, url, data, version=None, global_request_id=None):
+        self._invalidate_usages_cache(url)
         # NOTE(sdague): using json= instead of data= sets the
         # media type to application/json for us. Placement API is
         # more sensitive to this than other APIs in the OpenStack
@@ -297,6 +303,7 @@ class SchedulerReportClient(object):
                                  global_request_id=global_request_id)
 
     def put(self, url, data, version=None, global_request_id=None):
+        self._invalidate_usages_cache(url)
         # NOTE(sdague): using json= instead of data= sets the
         # media type to application/json for us. Placement API is
         # more sensitive to this than other APIs in the OpenStack
@@ -305,9 +312,17 @@ class SchedulerReportClient(object):
                                 global_request_id=global_request_id)
 
     def delete(self, url, version=None, global_request_id=None):
+        self._invalidate_usages_cache(url)
         return self._client.delete(url, microversion=version,
                                    global_request_id=global_request_id)
 
+    def _invalidate_usages_cache(self, url):
+        # Any allocation written by this process may change the usages of
+        # any project, including those of the consumers being moved or
+        # deleted, so drop all the cached usages.
+        if self._usages_cache and '/allocations' in url:
+            self._usages_cache.clear()
+
     @safe_connect
     def get_allocation_candidates(self, context, resources):
         """Returns a tuple of (allocation_requests, provider_summaries,
@@ -2565,7 +2580,45 @@ class SchedulerReportClient(object):
         return self.get(url, version=GET_USAGES_VERSION,
                         global_request_id=context.global_id)
 
-    def get_usages_counts_for_limits(self, context, project_id):
+    def _get_usages_counts(self, context, project_id, user_id=None,
+                           use_cache=False):
+        """Get the usages of a project or user from placement.
+
+        If use_cache is True, the usages are cached for
+        [quota]placement_usage_cache_ttl seconds. This must only be used to
+        report usages, quota checks must always see the current usages.
+
+        :returns: A dict of usages keyed by resource class, which does not
+                  contain the resource classes without usage.
+        :raises: `exception.UsagesRetrievalFailed` if a placement API call
+                 fails
+        """
+        ttl = CONF.quota.placement_usage_cache_ttl if use_cache else 0
+        key = (project_id, user_id)
+        if ttl:
+            cached = self._usages_cache.get(key)
+            if cached and time.monotonic() - cached[0] < ttl:
+                LOG.debug('Using cached usages for project_id %s and '
+                          'user_id %s', project_id, user_id)
+                return dict(cached[1])
+
+        retrieved_at = time.monotonic()
+        resp = self._get_usages(context, project_id, user_id=user_id)
+        if not resp:
+            self._handle_usages_error_from_placement(resp, project_id,
+                                                     user_id=user_id)
+        usages = resp.json()['usages']
+        if ttl:
+            # Drop the expired usages so the cache only holds the projects
+            # and users counted during the last ttl seconds.
+            self._usages_cache = {
+                k: v for k, v in self._usages_cache.items()
+                if retrieved_at - v[0] < ttl}
+            self._usages_cache[key] = (retrieved_at, dict(usages))
+        return usages
+
+    def get_usages_counts_for_limits(self, context, project_id,
+                                     use_cache=False):
         """Get the usages counts for the purpose of enforcing unified limits
 
         The response from placement will not contain a resource class if
@@ -2576,6 +2629,9 @@ class SchedulerReportClient(object):
 
         :param context: The request context
         :param project_id: The project_id to count across
+        :param use_cache: Whether the usages may be served from the
+                          [quota]placement_usage_cache_ttl cache. Only set
+                          this when the usages are reported, not enforced.
         :return: A dict containing the project-scoped counts, for example:
                 {'VCPU': 2, 'MEMORY_MB': 1024}
         :raises: `exception.UsagesRetrievalFailed` if a placement API call
@@ -2583,18 +2639,19 @@ class SchedulerReportClient(object):
         """
         LOG.debug('Getting usages for project_id %s from placement',
                   project_id)
-        resp = self._get_usages(context, project_id)
-        if resp:
-            data = resp.json()
-            return data['usages']
-        self._handle_usages_error_from_placement(resp, project_id)
+        return self._get_usages_counts(context, project_id,
+                                       use_cache=use_cache)
 
-    def get_usages_counts_for_quota(self, context, project_id, user_id=None):
+    def get_usages_counts_for_quota(self, context, project_id, user_id=None,
+                                    use_cache=False):
         """Get the usages counts for the purpose of counting quota usage.
 
         :param context: The request context
         :param project_id: The project_id to count across
         :param user_id: The user_id to count across
+        :param use_cache: Whether the usages may be served from the
+                          [quota]placement_usage_cache_ttl cache. Only set
+                          this when the usages are reported, not enforced.
         :returns: A dict containing the project-scoped and user-scoped counts
                   if user_id is specified. For example:
                     {'project': {'cores': <count across project>,
@@ -2609,35 +2666,29 @@ class SchedulerReportClient(object):
             on flavor.vcpus. That included the shared and dedicated CPU. So
             we need to count both the orc.VCPU and orc.PCPU at here.
             """
-            vcpus = usages['usages'].get(orc.VCPU, 0)
-            pcpus = usages['usages'].get(orc.PCPU, 0)
+            vcpus = usages.get(orc.VCPU, 0)
+            pcpus = usages.get(orc.PCPU, 0)
             return vcpus + pcpus
 
         total_counts: dict[str, dict[str, int]] = {'project': {}}
         # First query counts across all users of a project
         LOG.debug('Getting usages for project_id %s from placement',
                   project_id)
-        resp = self._get_usages(context, project_id)
-        if resp:
-            data = resp.json()
-            # The response from placement will not contain a resource class if
-            # there is no usage. We can consider a missing class to be 0 usage.
-            cores = _get_core_usages(data)
-            ram = data['usages'].get(orc.MEMORY_MB, 0)
-            total_counts['project'] = {'cores': cores, 'ram': ram}
-        else:
-            self._handle_usages_error_from_placement(resp, project_id)
+        usages = self._get_usages_counts(context, project_id,
+                                         use_cache=use_cache)
+        # The response from placement will not contain a resource class if
+        # there is no usage. We can consider a missing class to be 0 usage.
+        cores = _get_core_usages(usages)
+        ram = usages.get(orc.MEMORY_MB, 0)
+        total_counts['project'] = {'cores': cores, 'ram': ram}
         # If specified, second query counts across one user in the project
         if user_id:
             LOG.debug('Getting usages for project_id %s and user_id %s from '
                       'placement', project_id, user_id)
-            resp = self._get_usages(context, project_id, user_id=user_id)
-            if resp:
-                data = resp.json()
-                cores = _get_core_usages(data)
-                ram = data['usages'].get(orc.MEMORY_MB, 0)
-                total_counts['user'] = {'cores': cores, 'ram': ram}
-            else:
-                self._handle_usages_error_from_placement(resp, project_id,
-                                                         user_id=user_id)
+            usages = self._get_usages_counts(context, project_id,
+                                             user_id=user_id,
+                                             use_cache=use_cache)
+            cores = _get_core_usages(usages)
+            ram = usages.get(orc.MEMORY_MB, 0)
+            total_counts['user'] = {'cores': cores, 'ram': ram}
         return total_counts
@@ -28,6 +28,7 @@ from oslo_service import service
 from oslo_utils import importutils
 
 from nova import baserpc
+from nova.compute import utils as compute_utils
 from nova import conductor
 import nova.conf
 from nova import context
@@ -177,6 +178,8 @@ class Service(service.Service):
                 self.service_ref = objects.Service.get_by_host_and_binary(
                     ctxt, self.host, self.binary)
 
+        rpc.update_compression_allowed(ctxt)
+
         self.manager.pre_start_hook(self.service_ref)
 
         if self.backdoor_port is not None:
@@ -345,6 +348,10 @@ class Service(service.Service):
             self._shutdown_rpc_server(
                     self.rpcserver_alt, self.topic_alt)
 
+        # Write the instance action events and faults recorded by the
+        # in-progress tasks which are still buffered.
+        compute_utils.flush_instance_event_buffer()
+
         LOG.debug('%s service graceful shutdown finished.', self.binary)
         super(Service, self).stop()
 
@@ -366,6 +373,7 @@ class Service(service.Service):
     def reset(self):
         """reset the service."""
         self.manager.reset()
+        rpc.update_compression_allowed(context.get_admin_context())
         # Reset the cell cache that holds database transaction context managers
         context.CELL_CACHE = {}
 
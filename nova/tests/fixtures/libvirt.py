@@ -93,6 +93,8 @@ VIR_DOMAIN_EVENT_PMSUSPENDED = 7
 VIR_DOMAIN_EVENT_ID_DEVICE_REMOVED = 15
 VIR_DOMAIN_EVENT_ID_DEVICE_REMOVAL_FAILED = 22
 
+VIR_NODE_DEVICE_EVENT_ID_LIFECYCLE = 0
+
 VIR_DOMAIN_EVENT_SUSPENDED_MIGRATED = 1
 VIR_DOMAIN_EVENT_SUSPENDED_POSTCOPY = 7
 
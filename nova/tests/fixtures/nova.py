@@ -559,7 +559,7 @@ class CellDatabases(fixtures.Fixture):
 
     def _wrap_get_server(self, target, endpoints, serializer=None):
         """Mirror rpc.get_server() but with our special sauce."""
-        serializer = CheatingSerializer(serializer)
+        serializer = CheatingSerializer(serializer, compress=True)
         exc = "threading" if utils.concurrency_mode_threading() else "eventlet"
         return messaging.get_rpc_server(rpc.TRANSPORT,
                                         target,
@@ -570,7 +570,7 @@ class CellDatabases(fixtures.Fixture):
     def _wrap_get_client(self, target, version_cap=None, serializer=None,
                          call_monitor_timeout=None):
         """Mirror rpc.get_client() but with our special sauce."""
-        serializer = CheatingSerializer(serializer)
+        serializer = CheatingSerializer(serializer, compress=True)
         return messaging.get_rpc_client(rpc.TRANSPORT, target,
             version_cap=version_cap,
             serializer=serializer,
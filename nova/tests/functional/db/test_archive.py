@@ -337,6 +337,30 @@ class TestDatabaseArchive(integrated_helpers._IntegratedTestBase):
         results = self._get_table_counts()
         self.assertFalse(any(results.values()))
 
+    def test_archive_then_purge_in_batches(self):
+        server = self._create_server()
+        server_id = server['id']
+        self._delete_server(server)
+        results, deleted_ids, archived = db.archive_deleted_rows(max_rows=1000)
+        self.assertEqual([server_id], deleted_ids)
+
+        lines = []
+        admin_context = context.get_admin_context()
+        future = timeutils.utcnow() + datetime.timedelta(hours=1)
+        deleted = db.purge_shadow_tables(
+            admin_context, future, status_fn=lines.append, batch_size=1)
+        self.assertEqual(archived, deleted)
+        # Each row was deleted in its own batch
+        lines = [line for line in lines if line.startswith('Deleted')]
+        self.assertEqual(deleted, len(lines))
+        for line in lines:
+            self.assertIsNotNone(re.match(r'Deleted 1 rows from .* with id '
+                                          r'up to [0-9]+', line))
+
+        # There should be no rows in any table if we purged everything
+        results = self._get_table_counts()
+        self.assertFalse(any(results.values()))
+
     def test_purge_with_real_date(self):
         """Make sure the result of dateutil's parser works with the
            query we're making to sqlalchemy.
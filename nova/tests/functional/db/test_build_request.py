@@ -144,6 +144,33 @@ class BuildRequestListTestCase(test.NoDBTestCase):
             self.assertTrue(objects.base.obj_equal_prims(reqs[i].instance,
                                                          req_list[i].instance))
 
+    def test_get_instance_uuids(self):
+        reqs = [self._create_req(), self._create_req()]
+        # Create a third that we won't include
+        self._create_req()
+        uuids = [req.instance_uuid for req in reqs]
+
+        existing = build_request.BuildRequestList.get_instance_uuids(
+            self.context, uuids + [uuidutils.generate_uuid()])
+
+        self.assertEqual(set(uuids), existing)
+
+    def test_destroy_bulk(self):
+        reqs = [self._create_req(), self._create_req()]
+        kept = self._create_req()
+        uuids = [req.instance_uuid for req in reqs]
+
+        deleted = build_request.BuildRequestList.destroy_bulk(
+            self.context, uuids + [uuidutils.generate_uuid()])
+
+        # Build requests which are already gone are not reported.
+        self.assertEqual(set(uuids), deleted)
+        req_list = build_request.BuildRequestList.get_all(self.context)
+        self.assertEqual([kept.instance_uuid],
+                         [req.instance_uuid for req in req_list])
+        self.assertEqual(set(), build_request.BuildRequestList.destroy_bulk(
+            self.context, uuids))
+
     def test_get_all_filter_by_project_id(self):
         reqs = [self._create_req(), self._create_req(project_id='filter')]
 
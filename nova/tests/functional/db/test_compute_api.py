@@ -29,11 +29,45 @@ class ComputeAPITestCase(test.NoDBTestCase):
         super(ComputeAPITestCase, self).setUp()
         self.useFixture(nova_fixtures.Database(database='api'))
 
-    @mock.patch('nova.objects.instance_mapping.InstanceMapping.create')
+    def test_reqspecs_buildreqs_instmappings_create(self):
+        ctxt = nova_context.RequestContext('fake-user', 'fake-project')
+        instances_to_build = []
+        for instance_uuid in (uuids.inst1, uuids.inst2):
+            rs = objects.RequestSpec(context=ctxt,
+                                     instance_uuid=instance_uuid)
+            br = objects.BuildRequest(context=ctxt,
+                                      instance_uuid=instance_uuid,
+                                      project_id=ctxt.project_id,
+                                      instance=objects.Instance())
+            im = objects.InstanceMapping(context=ctxt,
+                                         instance_uuid=instance_uuid,
+                                         project_id=ctxt.project_id,
+                                         cell_mapping=None)
+            instances_to_build.append((rs, br, im))
+
+        compute_api.API._create_reqspecs_buildreqs_instmappings(
+            ctxt, instances_to_build)
+
+        for rs, br, im in instances_to_build:
+            self.assertIn('id', rs)
+            self.assertIn('id', br)
+            self.assertIn('id', im)
+            self.assertFalse(im.queued_for_delete)
+            self.assertEqual(
+                rs.id, objects.RequestSpec.get_by_instance_uuid(
+                    ctxt, rs.instance_uuid).id)
+            self.assertEqual(
+                br.id, objects.BuildRequest.get_by_instance_uuid(
+                    ctxt, br.instance_uuid).id)
+            self.assertEqual(
+                im.id, objects.InstanceMapping.get_by_instance_uuid(
+                    ctxt, im.instance_uuid).id)
+
+    @mock.patch('nova.objects.instance_mapping.InstanceMapping.create_all')
     def test_reqspec_buildreq_instmapping_single_transaction(self,
                                                              mock_create):
         # Simulate a DBError during an INSERT by raising an exception from the
-        # InstanceMapping.create method.
+        # InstanceMapping.create_all method.
         mock_create.side_effect = test.TestingException('oops')
 
         ctxt = nova_context.RequestContext('fake-user', 'fake-project')
@@ -46,8 +80,8 @@ class ComputeAPITestCase(test.NoDBTestCase):
 
         self.assertRaises(
             test.TestingException,
-            compute_api.API._create_reqspec_buildreq_instmapping, ctxt, rs, br,
-            im)
+            compute_api.API._create_reqspecs_buildreqs_instmappings, ctxt,
+            [(rs, br, im)])
 
         # Since the instance mapping failed to INSERT, we should not have
         # written a request spec record or a build request record.
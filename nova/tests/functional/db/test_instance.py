@@ -214,6 +214,27 @@ class InstanceObjectTestCase(test.TestCase):
         self.assertEqual(0, counts['cores'])
         self.assertEqual(0, counts['ram'])
 
+    def test_get_counts_by_user(self):
+        self._create_instance(vcpus=1, memory_mb=512)
+        self._create_instance(vcpus=2, memory_mb=1024, user_id='other-user')
+        self._create_instance(vcpus=4, memory_mb=2048, project_id='other')
+        self._create_instance(vcpus=8, memory_mb=4096,
+                              vm_state=vm_states.SOFT_DELETED)
+
+        counts = objects.InstanceList.get_counts(
+            self.context, self.context.project_id,
+            user_id=self.context.user_id)
+        self.assertEqual({'instances': 2, 'cores': 3, 'ram': 1536},
+                         counts['project'])
+        self.assertEqual({'instances': 1, 'cores': 1, 'ram': 512},
+                         counts['user'])
+
+        # A user without instances in the project is counted as zero.
+        counts = objects.InstanceList.get_counts(
+            self.context, self.context.project_id, user_id='foo')
+        self.assertEqual({'instances': 0, 'cores': 0, 'ram': 0},
+                         counts['user'])
+
     def test_numa_topology_online_migration(self):
         """Ensure legacy NUMA topology objects are reserialized to o.vo's."""
         instance = self._create_instance(host='fake-host', node='fake-node',
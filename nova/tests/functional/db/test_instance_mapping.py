@@ -459,6 +459,27 @@ class InstanceMappingListTestCase(test.NoDBTestCase):
         self.assertEqual(sorted(uuids),
                          sorted([m.instance_uuid for m in mappings]))
 
+    def test_update_cell_bulk(self):
+        cell = cell_mapping.CellMapping._from_db_object(
+            self.context, cell_mapping.CellMapping(), create_cell_mapping())
+        db_inst_mapping1 = create_mapping(cell_id=None)
+        db_inst_mapping2 = create_mapping(cell_id=None)
+        # Create a third that we won't include
+        db_inst_mapping3 = create_mapping(cell_id=None)
+        uuids = [db_inst_mapping1.instance_uuid,
+                 db_inst_mapping2.instance_uuid]
+
+        updated = instance_mapping.InstanceMappingList.update_cell_bulk(
+            self.context, uuids + [uuidsentinel.deleted_instance], cell)
+
+        self.assertEqual(2, updated)
+        mappings = instance_mapping.InstanceMappingList.get_by_instance_uuids(
+            self.context, uuids + [db_inst_mapping3.instance_uuid])
+        cells = {m.instance_uuid: m.cell_mapping for m in mappings}
+        for uuid in uuids:
+            self.assertEqual(cell.uuid, cells[uuid].uuid)
+        self.assertIsNone(cells[db_inst_mapping3.instance_uuid])
+
     def test_get_not_deleted_by_cell_and_project(self):
         cells = []
         # Create two cells
@@ -606,3 +627,9 @@ class InstanceMappingListTestCase(test.NoDBTestCase):
             self.context, 'fake-project', user_id='fake-user')
         self.assertEqual(2, counts['project']['instances'])
         self.assertEqual(1, counts['user']['instances'])
+
+        # Count across a project and a user without instances
+        counts = instance_mapping.InstanceMappingList.get_counts(
+            self.context, 'fake-project', user_id='no-user')
+        self.assertEqual(2, counts['project']['instances'])
+        self.assertEqual(0, counts['user']['instances'])
@@ -110,6 +110,13 @@ def instance_update_and_get_original(context, instance_uuid, values,
     return (inst, inst)
 
 
+def instance_update_on_match(context, instance_uuid, values,
+                             columns_to_join=None, extra_values=None):
+    inst = fakes.stub_instance(INSTANCE_IDS.get(instance_uuid),
+                               name=values.get('display_name'))
+    return dict(inst, **values)
+
+
 def instance_update(context, instance_uuid, values):
     inst = fakes.stub_instance(INSTANCE_IDS.get(instance_uuid),
                                name=values.get('display_name'))
@@ -207,6 +214,8 @@ class ControllerTest(test.TestCase):
             compute_api.API, 'get', side_effect=return_server)).mock
         self.stub_out('nova.db.main.api.instance_update_and_get_original',
                       instance_update_and_get_original)
+        self.stub_out('nova.db.main.api.instance_update_on_match',
+                      instance_update_on_match)
         self.stub_out('nova.db.main.api.'
                       'block_device_mapping_get_all_by_instance_uuids',
                       fake_bdms_get_all_by_instance_uuids)
@@ -830,6 +839,14 @@ class ServersControllerTest(_ServersControllerTest):
             sort_dirs=['desc'], sort_keys=['created_at'],
             cell_down_support=False, all_tenants=False)
 
+    def test_get_server_details_replica_read_path(self):
+        req = self.req(self.path_detail)
+        self.controller.detail(req)
+        self.assertEqual('servers-detail',
+                         req.environ['nova.context'].replica_read_path)
+        self.assertEqual('servers-detail',
+                         self.mock_get_all.call_args.args[0].replica_read_path)
+
     def test_get_server_details_with_bad_name(self):
         req = self.req(self.path_detail_with_query % 'name=%2Binstance')
         self.assertRaises(exception.ValidationError,
@@ -3482,7 +3499,7 @@ class ServersControllerRebuildTestV257(_ServersControllerRebuildTest):
         self.assertIn('user_data', str(ex))
 
     @mock.patch.object(context.RequestContext, 'can')
-    @mock.patch('nova.db.main.api.instance_update_and_get_original')
+    @mock.patch('nova.db.main.api.instance_update_on_match')
     def test_rebuild_reset_user_data(self, mock_update, mock_policy):
         """Tests that passing user_data=None resets the user_data on the
         instance.
@@ -3499,16 +3516,16 @@ class ServersControllerRebuildTestV257(_ServersControllerRebuildTest):
             context.RequestContext(self.req_user_id, self.req_project_id),
             user_data='ZWNobyAiaGVsbG8gd29ybGQi')
 
-        def fake_instance_update_and_get_original(
+        def fake_instance_update_on_match(
                 ctxt, instance_uuid, values, **kwargs):
             # save() is called twice and the second one has system_metadata
             # in the updates, so we can ignore that one.
             if 'system_metadata' not in values:
                 self.assertIn('user_data', values)
                 self.assertIsNone(values['user_data'])
-            return instance_update_and_get_original(
+            return instance_update_on_match(
                 ctxt, instance_uuid, values, **kwargs)
-        mock_update.side_effect = fake_instance_update_and_get_original
+        mock_update.side_effect = fake_instance_update_on_match
         self.controller._rebuild(self.req, FAKE_UUID, body=body)
         self.assertEqual(2, mock_update.call_count)
 
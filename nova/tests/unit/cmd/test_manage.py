@@ -15,6 +15,7 @@
 
 import datetime
 from io import StringIO
+import os
 import sys
 import textwrap
 from unittest import mock
@@ -167,12 +168,12 @@ class DbCommandsTestCase(test.NoDBTestCase):
             # Called with max_rows=30 but only 15 were archived.
             mock.call(
                 test.MatchType(context.RequestContext), 30, before=None,
-                task_log=False),
+                task_log=False, table_elapsed={}),
             # So the total from the last call was 15 and the new max_rows=15
             # for the next call in the second cell.
             mock.call(
                 test.MatchType(context.RequestContext), 15, before=None,
-                task_log=False)
+                task_log=False, table_elapsed={})
         ])
         output = self.output.getvalue()
         expected = '''\
@@ -246,26 +247,26 @@ class DbCommandsTestCase(test.NoDBTestCase):
             # Called with max_rows=30 but only 15 were archived.
             mock.call(
                 test.MatchType(context.RequestContext), 30, before=None,
-                task_log=False),
+                task_log=False, table_elapsed={}),
             # Called with max_rows=30 but 0 were archived (nothing left to
             # archive in this cell)
             mock.call(
                 test.MatchType(context.RequestContext), 30, before=None,
-                task_log=False),
+                task_log=False, table_elapsed={}),
             # So the total from the last call was 0 and the new max_rows=30
             # because until_complete=True.
             mock.call(
                 test.MatchType(context.RequestContext), 30, before=None,
-                task_log=False),
+                task_log=False, table_elapsed={}),
             # Called with max_rows=30 but 0 were archived (nothing left to
             # archive in this cell)
             mock.call(
                 test.MatchType(context.RequestContext), 30, before=None,
-                task_log=False),
+                task_log=False, table_elapsed={}),
             # Called one final time with max_rows=30
             mock.call(
                 test.MatchType(context.RequestContext), 30, before=None,
-                task_log=False)
+                task_log=False, table_elapsed={})
         ])
         output = self.output.getvalue()
         expected = '''\
@@ -289,7 +290,7 @@ Archiving.....complete
         result = self.commands.archive_deleted_rows(20, verbose=verbose)
         mock_db_archive.assert_called_once_with(
             test.MatchType(context.RequestContext), 20, before=None,
-            task_log=False)
+            task_log=False, table_elapsed={})
         output = self.output.getvalue()
         if verbose:
             expected = '''\
@@ -346,13 +347,13 @@ Archiving.....complete
         mock_db_archive.assert_has_calls([
             mock.call(
                 test.MatchType(context.RequestContext), 20, before=None,
-                task_log=False),
+                task_log=False, table_elapsed={}),
             mock.call(
                 test.MatchType(context.RequestContext), 20, before=None,
-                task_log=False),
+                task_log=False, table_elapsed={}),
             mock.call(
                 test.MatchType(context.RequestContext), 20, before=None,
-                task_log=False),
+                task_log=False, table_elapsed={}),
         ])
         self.assertEqual(2, mock_sleep.call_count)
         mock_sleep.assert_has_calls([mock.call(sleep), mock.call(sleep)])
@@ -397,13 +398,13 @@ Rows were archived, running purge...
         mock_db_archive.assert_has_calls([
             mock.call(
                 test.MatchType(context.RequestContext), 20, before=None,
-                task_log=False),
+                task_log=False, table_elapsed={}),
             mock.call(
                 test.MatchType(context.RequestContext), 20, before=None,
-                task_log=False),
+                task_log=False, table_elapsed={}),
             mock.call(
                 test.MatchType(context.RequestContext), 20, before=None,
-                task_log=False),
+                task_log=False, table_elapsed={}),
         ])
         mock_db_purge.assert_called_once_with(mock.ANY, None,
                                               status_fn=mock.ANY)
@@ -464,10 +465,10 @@ Archiving....stopped
         mock_db_archive.assert_has_calls([
             mock.call(
                 test.MatchType(context.RequestContext), 20, before=None,
-                task_log=False),
+                task_log=False, table_elapsed={}),
             mock.call(
                 test.MatchType(context.RequestContext), 20, before=None,
-                task_log=False)
+                task_log=False, table_elapsed={})
         ])
 
     def test_archive_deleted_rows_until_stopped_quiet(self):
@@ -484,7 +485,7 @@ Archiving....stopped
         mock_db_archive.assert_called_once_with(
                 test.MatchType(context.RequestContext), 20,
                 before=datetime.datetime(2017, 1, 13),
-                task_log=False)
+                task_log=False, table_elapsed={})
         self.assertEqual(1, result)
 
     @mock.patch.object(db, 'archive_deleted_rows', return_value=({}, [], 0))
@@ -495,7 +496,7 @@ Archiving....stopped
                                                     purge=True)
         mock_db_archive.assert_called_once_with(
             test.MatchType(context.RequestContext), 20, before=None,
-            task_log=False)
+            task_log=False, table_elapsed={})
         output = self.output.getvalue()
         # If nothing was archived, there should be no purge messages
         self.assertIn('Nothing was archived.', output)
@@ -515,7 +516,7 @@ Archiving....stopped
 
         mock_db_archive.assert_called_once_with(
             test.MatchType(context.RequestContext), 20, before=None,
-            task_log=False)
+            task_log=False, table_elapsed={})
         output = self.output.getvalue()
         # If nothing was archived, there should be no purge messages
         self.assertIn('Nothing was archived.', output)
@@ -559,7 +560,7 @@ Archiving....stopped
         mock_db_archive.assert_has_calls([
             mock.call(
                 test.MatchType(context.RequestContext), 20, before=None,
-                task_log=False)
+                task_log=False, table_elapsed={})
         ])
         self.assertEqual(1, mock_reqspec_destroy.call_count)
         mock_members_destroy.assert_called_once()
@@ -581,6 +582,188 @@ Archiving....stopped
         else:
             self.assertEqual(0, len(output))
 
+    def _create_cell_mappings(self, count):
+        cell_dbs = nova_fixtures.CellDatabases()
+        for i in range(count):
+            cell_dbs.add_cell_database('fake:///db%d' % (i + 1))
+        self.useFixture(cell_dbs)
+        ctxt = context.RequestContext()
+        for i in range(count):
+            objects.CellMapping(context=ctxt,
+                                uuid=uuidutils.generate_uuid(),
+                                database_connection='fake:///db%d' % (i + 1),
+                                transport_url='fake:///mq%d' % (i + 1),
+                                name='cell%d' % (i + 1)).create()
+
+    @mock.patch.object(db, 'archive_deleted_rows')
+    def test_archive_deleted_rows_parallel(self, mock_db_archive):
+        def fake_archive(ctxt, max_rows, before, task_log, table_elapsed):
+            table_elapsed['instances'] = 2.0
+            return dict(instances=10, consoles=5), list(), 15
+
+        mock_db_archive.side_effect = fake_archive
+        self._create_cell_mappings(3)
+
+        # With --parallel, max_rows applies to each cell
+        result = self.commands.archive_deleted_rows(20, verbose=True,
+                                                    all_cells=True,
+                                                    parallel=2)
+
+        self.assertEqual(1, result)
+        self.assertEqual(3, mock_db_archive.call_count)
+        mock_db_archive.assert_called_with(
+            test.MatchType(context.RequestContext), 20, before=None,
+            task_log=False, table_elapsed=mock.ANY)
+        expected = '''\
++-----------------+-------------------------+
+| Table           | Number of Rows Archived |
++-----------------+-------------------------+
+| cell1.consoles  | 5                       |
+| cell1.instances | 10                      |
+| cell2.consoles  | 5                       |
+| cell2.instances | 10                      |
+| cell3.consoles  | 5                       |
+| cell3.instances | 10                      |
++-----------------+-------------------------+
++-----------------+--------------------------+
+| Table           | Rows Archived per Second |
++-----------------+--------------------------+
+| cell1.instances | 5.0                      |
+| cell2.instances | 5.0                      |
+| cell3.instances | 5.0                      |
++-----------------+--------------------------+
+'''
+        self.assertEqual(expected, self.output.getvalue())
+
+    @mock.patch.object(db, 'archive_deleted_rows')
+    def test_archive_deleted_rows_parallel_stopped(self, mock_db_archive):
+        def fake_archive(*args, **kwargs):
+            if mock_db_archive.call_count == 2:
+                raise KeyboardInterrupt
+            return {'instances': 10}, list(), 10
+
+        mock_db_archive.side_effect = fake_archive
+        self._create_cell_mappings(3)
+
+        result = self.commands.archive_deleted_rows(20, all_cells=True,
+                                                    until_complete=True,
+                                                    verbose=True,
+                                                    parallel=3)
+
+        self.assertEqual(1, result)
+        # Every cell stops after its current batch
+        self.assertLessEqual(mock_db_archive.call_count, 4)
+        self.assertIn('stopped', self.output.getvalue())
+
+    def test_archive_deleted_rows_invalid_limits(self):
+        self.assertEqual(2, self.commands.archive_deleted_rows(parallel=0))
+        self.assertEqual(
+            2, self.commands.archive_deleted_rows(max_rows_per_second=0))
+        self.assertEqual(
+            2, self.commands.archive_deleted_rows(max_replica_lag=-1))
+
+    @mock.patch.object(db, 'archive_deleted_rows')
+    def test_archive_deleted_rows_max_replica_lag_all_cells(
+            self, mock_db_archive):
+        self.assertEqual(
+            2, self.commands.archive_deleted_rows(max_replica_lag=10,
+                                                  all_cells=True))
+        self.assertIn('--all-cells', self.output.getvalue())
+        mock_db_archive.assert_not_called()
+
+    @mock.patch('time.sleep')
+    @mock.patch.object(db, 'get_replica_lag')
+    @mock.patch.object(db, 'archive_deleted_rows')
+    @mock.patch.object(objects.CellMappingList, 'get_all')
+    def test_archive_deleted_rows_throttled(self, mock_get_all,
+                                            mock_db_archive, mock_lag,
+                                            mock_sleep):
+        mock_db_archive.side_effect = [
+            ({'instances': 10, 'instance_extra': 5}, list(), 15),
+            ({}, list(), 0)]
+        mock_lag.side_effect = [30, None]
+
+        result = self.commands.archive_deleted_rows(
+            20, until_complete=True, max_rows_per_second=10,
+            max_replica_lag=10)
+
+        self.assertEqual(1, result)
+        self.assertEqual(2, mock_db_archive.call_count)
+        self.assertEqual(2, mock_lag.call_count)
+        # --sleep, then the rate limit, then the replica lag
+        self.assertEqual(3, mock_sleep.call_count)
+        self.assertEqual(mock.call(0), mock_sleep.call_args_list[0])
+        self.assertAlmostEqual(1.5, mock_sleep.call_args_list[1][0][0],
+                               places=1)
+        self.assertEqual(mock.call(20), mock_sleep.call_args_list[2])
+
+    @mock.patch.object(objects.InstanceGroup, 'destroy_members_bulk',
+                       return_value=0)
+    @mock.patch.object(objects.RequestSpec, 'destroy_bulk', return_value=0)
+    @mock.patch.object(objects.InstanceMappingList, 'destroy_bulk')
+    @mock.patch.object(db, 'archive_deleted_rows')
+    @mock.patch.object(objects.CellMappingList, 'get_all')
+    def test_archive_deleted_rows_checkpoint(self, mock_get_all,
+                                             mock_db_archive,
+                                             mock_mappings_destroy,
+                                             mock_reqspec_destroy,
+                                             mock_members_destroy):
+        path = self.useFixture(fixtures.TempDir()).join('archive.json')
+        uuids = [uuidsentinel.instance1, uuidsentinel.instance2]
+        mock_db_archive.return_value = ({'instances': 2}, uuids, 2)
+        mock_mappings_destroy.side_effect = KeyboardInterrupt
+
+        # Interrupted after archiving the instances from the cell database
+        result = self.commands.archive_deleted_rows(
+            20, until_complete=True, checkpoint=path)
+
+        self.assertEqual(1, result)
+        with open(path, 'rb') as f:
+            data = jsonutils.load(f)
+        self.assertEqual({'default': {'pending_instances': uuids}},
+                         data['cells'])
+
+        # Resuming removes the API database records of those instances first
+        mock_db_archive.reset_mock()
+        mock_db_archive.return_value = ({}, [], 0)
+        mock_mappings_destroy.reset_mock(side_effect=True)
+        mock_mappings_destroy.return_value = 2
+
+        result = self.commands.archive_deleted_rows(
+            20, until_complete=True, checkpoint=path)
+
+        self.assertEqual(1, result)
+        mock_mappings_destroy.assert_called_once_with(mock.ANY, uuids)
+        mock_db_archive.assert_called_once()
+        self.assertFalse(os.path.exists(path))
+
+    @mock.patch.object(db, 'archive_deleted_rows')
+    @mock.patch.object(objects.CellMappingList, 'get_all')
+    def test_archive_deleted_rows_checkpoint_complete(self, mock_get_all,
+                                                      mock_db_archive):
+        mock_db_archive.return_value = ({}, [], 0)
+        path = self.useFixture(fixtures.TempDir()).join('archive.json')
+        with open(path, 'w') as f:
+            jsonutils.dump({'options': {'before': None, 'task_log': False},
+                            'cells': {'default': {'complete': True}}}, f)
+
+        # Archived with other options, the cell is archived again
+        result = self.commands.archive_deleted_rows(
+            20, until_complete=True, checkpoint=path, task_log=True)
+        self.assertEqual(0, result)
+        mock_db_archive.assert_called_once()
+        self.assertFalse(os.path.exists(path))
+
+        with open(path, 'w') as f:
+            jsonutils.dump({'options': {'before': None, 'task_log': False},
+                            'cells': {'default': {'complete': True}}}, f)
+        mock_db_archive.reset_mock()
+        result = self.commands.archive_deleted_rows(
+            20, until_complete=True, checkpoint=path)
+        self.assertEqual(0, result)
+        mock_db_archive.assert_not_called()
+        self.assertFalse(os.path.exists(path))
+
     @mock.patch.object(objects.CellMappingList, 'get_all',
                        side_effect=db_exc.CantStartEngineError)
     def test_archive_deleted_rows_without_api_connection_configured(self,
@@ -668,6 +851,61 @@ Cell %s: 456
         self.assertEqual(4, ret)
         self.assertIn('Unable to get cell list', self.output.getvalue())
 
+    @mock.patch('nova.db.main.api.purge_shadow_tables')
+    def test_purge_batch_size(self, mock_purge):
+        mock_purge.return_value = 1
+        ret = self.commands.purge(purge_all=True, batch_size=100,
+                                  max_rows_per_second=50)
+        self.assertEqual(0, ret)
+        mock_purge.assert_called_once_with(mock.ANY, None, status_fn=mock.ANY,
+                                           batch_size=100,
+                                           max_rows_per_second=50)
+
+    @mock.patch('nova.db.main.api.purge_shadow_tables')
+    def test_purge_max_rows_per_second_requires_batch_size(self, mock_purge):
+        ret = self.commands.purge(purge_all=True, max_rows_per_second=50)
+        self.assertEqual(1, ret)
+        self.assertIn('--max-rows-per-second requires --batch-size',
+                      self.output.getvalue())
+        mock_purge.assert_not_called()
+
+    @mock.patch('nova.db.main.api.purge_shadow_tables')
+    def test_purge_invalid_limits(self, mock_purge):
+        for kwargs in ({'batch_size': 0},
+                       {'batch_size': 10, 'max_rows_per_second': -1},
+                       {'interval': 0}):
+            ret = self.commands.purge(purge_all=True, **kwargs)
+            self.assertEqual(2, ret)
+        self.assertIn('Invalid value for --interval: 0',
+                      self.output.getvalue())
+        mock_purge.assert_not_called()
+
+    @mock.patch('time.sleep')
+    @mock.patch('nova.db.main.api.purge_shadow_tables')
+    def test_purge_interval(self, mock_purge, mock_sleep):
+        mock_purge.side_effect = [0, 2, 0]
+        # The command runs until interrupted
+        mock_sleep.side_effect = [None, None, KeyboardInterrupt]
+        with mock.patch('oslo_utils.timeutils.StopWatch.elapsed',
+                        side_effect=[0, 3600, 7200]):
+            ret = self.commands.purge(before='oct 21 2015', interval=3600)
+        self.assertEqual(0, ret)
+        self.assertEqual(3, mock_purge.call_count)
+        mock_sleep.assert_has_calls([mock.call(3600)] * 3)
+        # The date moves forward, keeping the age of the rows to purge
+        self.assertEqual(
+            [datetime.datetime(2015, 10, 21),
+             datetime.datetime(2015, 10, 21, 1),
+             datetime.datetime(2015, 10, 21, 2)],
+            [call.args[1] for call in mock_purge.call_args_list])
+
+    @mock.patch('time.sleep', side_effect=KeyboardInterrupt)
+    @mock.patch('nova.db.main.api.purge_shadow_tables', return_value=0)
+    def test_purge_interval_nothing_deleted(self, mock_purge, mock_sleep):
+        ret = self.commands.purge(purge_all=True, interval=60)
+        self.assertEqual(3, ret)
+        mock_purge.assert_called_once_with(mock.ANY, None, status_fn=mock.ANY)
+
     @mock.patch.object(migration, 'db_version', return_value=2)
     def test_version(self, mock_db_version):
         self.commands.version()
@@ -4118,6 +4356,68 @@ class LibvirtCommandsTestCase(test.NoDBTestCase):
         self.assertIn(uuidsentinel.instance, output)
 
 
+class HostCommandsTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.output = StringIO()
+        self.useFixture(fixtures.MonkeyPatch('sys.stdout', self.output))
+        self.commands = manage.HostCommands()
+
+    @mock.patch('nova.compute.api.HostAPI.drain_host')
+    @mock.patch('nova.context.get_admin_context')
+    def test_drain(self, mock_get_context, mock_drain):
+        mock_get_context.return_value = mock.sentinel.admin_context
+        ret = self.commands.drain(host='host1', concurrency=2)
+        self.assertEqual(0, ret)
+        mock_drain.assert_called_once_with(
+            mock.sentinel.admin_context, 'host1', concurrency=2)
+        self.assertIn('Draining host host1', self.output.getvalue())
+
+    @mock.patch('nova.compute.api.HostAPI.drain_host')
+    @mock.patch('nova.context.get_admin_context', new=mock.Mock())
+    def test_drain_errors(self, mock_drain):
+        for error, code in (
+                (exception.HostMappingNotFound(name='host1'), 2),
+                (exception.ComputeHostNotFound(host='host1'), 2),
+                (exception.ComputeServiceUnavailable(host='host1'), 3),
+                (exception.ServiceTooOld('nova-conductor too old'), 4),
+                (Exception('oops'), 1)):
+            mock_drain.side_effect = error
+            self.assertEqual(code, self.commands.drain(host='host1'))
+        self.assertIn(
+            'Unexpected error, see nova-manage.log for the full trace: oops',
+            self.output.getvalue())
+
+    @mock.patch('nova.compute.api.HostAPI.get_drain_host_progress')
+    @mock.patch('nova.context.get_admin_context')
+    def test_drain_progress(self, mock_get_context, mock_progress):
+        mock_get_context.return_value = mock.sentinel.admin_context
+        mock_progress.return_value = {
+            'instances': 2, 'migrations': 1, 'memory_total': 1024,
+            'memory_processed': 512, 'memory_remaining': 512,
+            'throughput': 256, 'eta': 6}
+
+        self.assertEqual(3, self.commands.drain_progress(host='host1'))
+        mock_progress.assert_called_once_with(
+            mock.sentinel.admin_context, 'host1')
+        self.assertIn('memory_remaining', self.output.getvalue())
+
+        mock_progress.return_value = dict(
+            mock_progress.return_value, instances=0, migrations=0)
+        self.assertEqual(0, self.commands.drain_progress(host='host1'))
+
+    @mock.patch('nova.compute.api.HostAPI.get_drain_host_progress')
+    @mock.patch('nova.context.get_admin_context', new=mock.Mock())
+    def test_drain_progress_errors(self, mock_progress):
+        for error, code in (
+                (exception.HostMappingNotFound(name='host1'), 2),
+                (Exception('oops'), 1)):
+            mock_progress.side_effect = error
+            self.assertEqual(code,
+                             self.commands.drain_progress(host='host1'))
+
+
 class ImagePropertyCommandsTestCase(test.NoDBTestCase):
 
     def setUp(self):
@@ -28,6 +28,7 @@ from oslo_utils.fixture import uuidsentinel as uuids
 from oslo_utils import timeutils
 from oslo_utils import uuidutils
 
+from nova.api.metadata import base as metadata_base
 from nova.compute import api as compute_api
 from nova.compute import flavors
 from nova.compute import instance_actions
@@ -4576,6 +4577,36 @@ class _ComputeAPIUnitTestMixIn(object):
                                                           metadata)
         self.assertEqual(0, limit_check.call_count)
 
+    @mock.patch.object(utils, 'spawn')
+    @mock.patch('nova.objects.Quotas.limit_check')
+    def test_update_instance_metadata_warms_cache(self, limit_check,
+                                                  mock_spawn):
+        self.flags(metadata_cache_warming=True, group='api')
+        instance = self._create_instance_obj(params={'metadata': {}})
+        with mock.patch.object(instance, 'save'):
+            self.compute_api.update_instance_metadata(
+                self.context, instance, {'key': 'value'})
+        self.assertEqual({'key': 'value'}, instance.metadata)
+        mock_spawn.assert_called_once_with(
+            metadata_base.warm_cache, instance)
+
+        mock_spawn.reset_mock()
+        with mock.patch.object(instance, 'delete_metadata_key'):
+            self.compute_api.delete_instance_metadata(
+                self.context, instance, 'key')
+        mock_spawn.assert_called_once_with(
+            metadata_base.warm_cache, instance)
+
+    @mock.patch.object(utils, 'spawn')
+    @mock.patch('nova.objects.Quotas.limit_check')
+    def test_update_instance_metadata_no_cache_warming(self, limit_check,
+                                                       mock_spawn):
+        instance = self._create_instance_obj(params={'metadata': {}})
+        with mock.patch.object(instance, 'save'):
+            self.compute_api.update_instance_metadata(
+                self.context, instance, {'key': 'value'})
+        mock_spawn.assert_not_called()
+
     @mock.patch('nova.objects.Quotas.limit_check')
     def test_check_injected_file_quota_with_empty_list(self,
                                                        limit_check):
@@ -5336,7 +5367,7 @@ class _ComputeAPIUnitTestMixIn(object):
 
         @mock.patch.object(self.compute_api, '_get_volumes_for_bdms')
         @mock.patch.object(self.compute_api,
-                           '_create_reqspec_buildreq_instmapping',
+                           '_create_reqspecs_buildreqs_instmappings',
                            new=mock.MagicMock())
         @mock.patch('nova.compute.utils.check_num_instances_quota')
         @mock.patch('nova.network.security_group_api')
@@ -5374,7 +5405,7 @@ class _ComputeAPIUnitTestMixIn(object):
 
         @mock.patch.object(self.compute_api, '_get_volumes_for_bdms')
         @mock.patch.object(
-            self.compute_api, '_create_reqspec_buildreq_instmapping',
+            self.compute_api, '_create_reqspecs_buildreqs_instmappings',
             new=mock.MagicMock())
         @mock.patch('nova.compute.utils.check_num_instances_quota')
         @mock.patch('nova.network.security_group_api')
@@ -5433,7 +5464,7 @@ class _ComputeAPIUnitTestMixIn(object):
     def test_provision_instances_creates_build_request(self):
         @mock.patch.object(self.compute_api, '_get_volumes_for_bdms')
         @mock.patch.object(self.compute_api,
-                           '_create_reqspec_buildreq_instmapping')
+                           '_create_reqspecs_buildreqs_instmappings')
         @mock.patch.object(objects.Instance, 'create')
         @mock.patch('nova.compute.utils.check_num_instances_quota')
         @mock.patch.object(objects.RequestSpec, 'from_components')
@@ -5529,14 +5560,16 @@ class _ComputeAPIUnitTestMixIn(object):
                                  br.instance.project_id)
                 self.assertEqual(1, br.block_device_mappings[0].id)
                 self.assertEqual(br.instance.uuid, br.tags[0].resource_id)
-                mock_create_rs_br_im.assert_any_call(ctxt, rs, br, im)
+            # All the records are created at once
+            mock_create_rs_br_im.assert_called_once_with(
+                ctxt, instances_to_build)
 
         do_test()
 
     def test_provision_instances_creates_instance_mapping(self):
         @mock.patch.object(self.compute_api, '_get_volumes_for_bdms')
         @mock.patch.object(self.compute_api,
-                           '_create_reqspec_buildreq_instmapping',
+                           '_create_reqspecs_buildreqs_instmappings',
                            new=mock.MagicMock())
         @mock.patch('nova.compute.utils.check_num_instances_quota')
         @mock.patch.object(objects.Instance, 'create', new=mock.MagicMock())
@@ -5628,7 +5661,7 @@ class _ComputeAPIUnitTestMixIn(object):
             _mock_bdm, _mock_cinder_attach_create,
             _mock_cinder_check_availability_zone, _mock_cinder_get):
         @mock.patch.object(self.compute_api,
-                           '_create_reqspec_buildreq_instmapping')
+                           '_create_reqspecs_buildreqs_instmappings')
         @mock.patch('nova.compute.utils.check_num_instances_quota')
         @mock.patch.object(objects, 'Instance')
         @mock.patch.object(objects.RequestSpec, 'from_components')
@@ -5706,13 +5739,11 @@ class _ComputeAPIUnitTestMixIn(object):
                               shutdown_terminate, instance_group,
                               check_server_group_quota, filter_properties,
                               None, tags, trusted_certs, False)
-            # First instance, build_req, mapping is created and destroyed
-            mock_create_rs_br_im.assert_called_once_with(ctxt, req_spec_mock,
-                                                         build_req_mocks[0],
-                                                         inst_map_mocks[0])
-            self.assertTrue(build_req_mocks[0].destroy.called)
-            self.assertTrue(inst_map_mocks[0].destroy.called)
-            # Second instance, build_req, mapping is not created nor destroyed
+            # The records are only created once every instance has been
+            # validated, so nothing is created nor destroyed
+            mock_create_rs_br_im.assert_not_called()
+            self.assertFalse(build_req_mocks[0].destroy.called)
+            self.assertFalse(inst_map_mocks[0].destroy.called)
             self.assertFalse(inst_mocks[1].create.called)
             self.assertFalse(inst_mocks[1].destroy.called)
             self.assertFalse(build_req_mocks[1].destroy.called)
@@ -5722,7 +5753,7 @@ class _ComputeAPIUnitTestMixIn(object):
 
     def test_provision_instances_creates_reqspec_with_secgroups(self):
         @mock.patch.object(self.compute_api,
-                           '_create_reqspec_buildreq_instmapping',
+                           '_create_reqspecs_buildreqs_instmappings',
                            new=mock.MagicMock())
         @mock.patch('nova.compute.utils.check_num_instances_quota')
         @mock.patch('nova.network.security_group_api'
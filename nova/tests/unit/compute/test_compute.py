@@ -3406,7 +3406,7 @@ class ComputeTestCase(BaseTestCase,
     @mock.patch.object(compute_manager.ComputeManager,
                        '_notify_about_instance_usage')
     @mock.patch.object(compute_manager.ComputeManager, '_instance_update')
-    @mock.patch.object(db, 'instance_update_and_get_original')
+    @mock.patch.object(db, 'instance_update_on_match')
     @mock.patch.object(compute_manager.ComputeManager, '_get_power_state')
     @mock.patch('nova.compute.utils.notify_about_instance_action')
     def _test_reboot(self, soft, mock_notify_action, mock_get_power,
@@ -3488,8 +3488,8 @@ class ComputeTestCase(BaseTestCase,
         mock_get_nw.return_value = fake_nw_model
         self.compute.network_api.get_instance_nw_info = mock_get_nw
         mock_get_power.side_effect = [fake_power_state1]
-        mock_get_orig.side_effect = [(None, updated_dbinstance1),
-                                     (None, updated_dbinstance1)]
+        mock_get_orig.side_effect = [updated_dbinstance1,
+                                     updated_dbinstance1]
         notify_call_list = [mock.call(econtext, instance, 'reboot.start')]
         notify_action_call_list = [
             mock.call(econtext, instance, 'fake-mini', action='reboot',
@@ -3500,11 +3500,11 @@ class ComputeTestCase(BaseTestCase,
                                   {'task_state': task_pending,
                                    'expected_task_state': expected_tasks,
                                    'power_state': fake_power_state1},
-                                  columns_to_join=['system_metadata']),
+                                  columns_to_join=[], extra_values={}),
                         mock.call(econtext, updated_dbinstance1['uuid'],
                                   {'task_state': task_started,
                                    'expected_task_state': task_pending},
-                                  columns_to_join=['system_metadata'])]
+                                  columns_to_join=[], extra_values={})]
         expected_nw_info = fake_nw_model
 
         # Annoying.  driver.reboot is wrapped in a try/except, and
@@ -3555,7 +3555,7 @@ class ComputeTestCase(BaseTestCase,
                           {'power_state': new_power_state,
                            'task_state': None,
                            'vm_state': vm_states.ACTIVE},
-                          columns_to_join=['system_metadata']))
+                          columns_to_join=[], extra_values={}))
             notify_call_list.append(mock.call(econtext, instance,
                                               'reboot.end'))
             notify_action_call_list.append(
@@ -3567,16 +3567,16 @@ class ComputeTestCase(BaseTestCase,
             db_call_list.append(
                 mock.call(econtext, updated_dbinstance1['uuid'],
                           {'vm_state': vm_states.ERROR},
-                          columns_to_join=['system_metadata'], ))
+                          columns_to_join=[], extra_values={}))
         else:
             mock_get_orig.side_effect = chain(mock_get_orig.side_effect,
-                                              [(None, updated_dbinstance2)])
+                                              [updated_dbinstance2])
             db_call_list.append(
                 mock.call(econtext, updated_dbinstance1['uuid'],
                           {'power_state': new_power_state,
                            'task_state': None,
                            'vm_state': vm_states.ACTIVE},
-                          columns_to_join=['system_metadata'], ))
+                          columns_to_join=[], extra_values={}))
             if fail_running:
                 notify_call_list.append(mock.call(econtext, instance,
                                                   'reboot.error', fault=fault))
@@ -9503,6 +9503,43 @@ class ComputeAPITestCase(BaseTestCase):
         group = objects.InstanceGroup.get_by_uuid(self.context, group.uuid)
         self.assertIn(refs[0]['uuid'], group.members)
 
+    @mock.patch('nova.objects.quotas.Quotas.check_deltas')
+    @mock.patch('nova.compute.api.API._get_requested_instance_group')
+    def test_create_multiple_instance_group_members_quota_checked_once(
+            self, get_group_mock, check_deltas_mock):
+        self.stub_out('nova.tests.fixtures.GlanceFixture.show', self.fake_show)
+        self.flags(recheck_quota=False, group='quota')
+
+        group = objects.InstanceGroup(self.context)
+        group.uuid = uuids.fake
+        group.project_id = self.context.project_id
+        group.user_id = self.context.user_id
+        group.create()
+        get_group_mock.return_value = group
+
+        with mock.patch.object(
+                objects.InstanceGroup, 'add_members',
+                wraps=objects.InstanceGroup.add_members) as add_members:
+            (refs, resv_id) = self.compute_api.create(
+                self.context, self.default_flavor, self.fake_image['id'],
+                min_count=3, max_count=3,
+                scheduler_hints={'group': group.uuid},
+                check_server_group_quota=True)
+        self.assertEqual(3, len(refs))
+
+        # The server group members quota is checked and the members are
+        # added once for the whole request.
+        self.assertEqual(2, check_deltas_mock.call_count)
+        check_deltas_mock.assert_called_with(
+            self.context, {'server_group_members': 3}, group,
+            self.context.user_id)
+        add_members.assert_called_once_with(
+            self.context, group.uuid, [ref['uuid'] for ref in refs])
+
+        group = objects.InstanceGroup.get_by_uuid(self.context, group.uuid)
+        self.assertEqual(sorted(ref['uuid'] for ref in refs),
+                         sorted(group.members))
+
     def test_instance_create_with_group_uuid_fails_group_not_exist(self):
         self.stub_out('nova.tests.fixtures.GlanceFixture.show', self.fake_show)
 
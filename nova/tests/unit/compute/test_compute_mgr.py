@@ -35,6 +35,7 @@ from oslo_utils import uuidutils
 import testtools
 
 import nova
+from nova.api.metadata import base as metadata_base
 from nova.compute import build_results
 from nova.compute import manager
 from nova.compute import power_state
@@ -10780,8 +10781,8 @@ class ComputeManagerBuildInstanceTestCase(test.NoDBTestCase):
         instance = fake_instance.fake_db_instance()
 
         @mock.patch.object(self.compute.rt, 'instance_claim')
-        @mock.patch.object(db, 'instance_update_and_get_original',
-                return_value=({}, instance))
+        @mock.patch.object(db, 'instance_update_on_match',
+                return_value=instance)
         @mock.patch.object(self.compute.driver, 'spawn')
         @mock.patch.object(self.compute, '_build_networks_for_instance',
                 return_value=fake_network.fake_get_instance_nw_info(self))
@@ -10802,13 +10803,35 @@ class ComputeManagerBuildInstanceTestCase(test.NoDBTestCase):
                     mock.ANY, 'expected_task_state': 'spawning'}
             expected_call = mock.call(self.context, self.instance.uuid,
                     updates, columns_to_join=['metadata', 'system_metadata',
-                        'info_cache', 'tags'])
+                        'info_cache', 'tags'], extra_values=mock.ANY)
             last_update_call = mock_db_update.call_args_list[
                 mock_db_update.call_count - 1]
             self.assertEqual(expected_call, last_update_call)
 
         _check_access_ip()
 
+    @mock.patch.object(utils, 'spawn')
+    def test_metadata_cache_warmed_when_instance_set_to_active(
+            self, mock_spawn):
+        self.flags(metadata_cache_warming=True, group='api')
+        with test.nested(
+            mock.patch.object(self.compute.rt, 'instance_claim'),
+            mock.patch.object(self.compute.driver, 'spawn'),
+            mock.patch.object(self.compute, '_build_networks_for_instance',
+                              return_value=[]),
+            mock.patch.object(self.instance, 'save'),
+            mock.patch.object(self.compute, '_notify_about_instance_usage'),
+            mock.patch.object(self.compute,
+                              '_update_scheduler_instance_info'),
+        ):
+            self.compute._build_and_run_instance(self.context, self.instance,
+                    self.image, self.injected_files, self.admin_pass,
+                    self.requested_networks, self.security_groups,
+                    self.block_device_mapping, self.node, self.limits,
+                    self.filter_properties, self.accel_uuids)
+        self.assertEqual(vm_states.ACTIVE, self.instance.vm_state)
+        mock_spawn.assert_any_call(metadata_base.warm_cache, self.instance)
+
     @mock.patch('nova.compute.resource_tracker.ResourceTracker.instance_claim')
     @mock.patch.object(manager.ComputeManager, '_instance_update')
     def test_create_error_on_instance_delete(self, mock_instance_update,
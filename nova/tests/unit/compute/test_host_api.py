@@ -118,6 +118,42 @@ class ComputeHostAPITestCase(test.TestCase):
                               self.host_api.get_host_uptime, self.ctxt,
                               'fake_host')
 
+    @mock.patch.object(compute.HostAPI, '_assert_host_exists',
+                       return_value='fake_host')
+    def test_drain_host(self, mock_assert_host_exists):
+        with mock.patch.object(self.host_api.compute_task_api,
+                               'drain_host') as mock_drain:
+            self.host_api.drain_host(self.ctxt, 'fake_host', concurrency=2)
+        mock_assert_host_exists.assert_called_once_with(
+            self.ctxt, 'fake_host', must_be_up=True)
+        mock_drain.assert_called_once_with(
+            self.ctxt, 'fake_host', concurrency=2)
+
+    @mock.patch('nova.db.main.api.service_get_by_compute_host')
+    def test_drain_host_service_down(self, mock_get_service):
+        mock_get_service.return_value = dict(
+            test_service.fake_service, id=1)
+        with test.nested(
+            mock.patch.object(self.host_api.servicegroup_api,
+                              'service_is_up', return_value=False),
+            mock.patch.object(self.host_api.compute_task_api, 'drain_host'),
+        ) as (mock_is_up, mock_drain):
+            self.assertRaises(exception.ComputeServiceUnavailable,
+                              self.host_api.drain_host, self.ctxt,
+                              'fake_host')
+        mock_drain.assert_not_called()
+
+    @mock.patch('nova.compute.utils.get_drain_host_progress',
+                return_value=mock.sentinel.progress)
+    @mock.patch.object(compute.HostAPI, '_assert_host_exists',
+                       return_value='fake_host')
+    def test_get_drain_host_progress(self, mock_assert_host_exists,
+                                     mock_progress):
+        self.assertEqual(
+            mock.sentinel.progress,
+            self.host_api.get_drain_host_progress(self.ctxt, 'fake_host'))
+        mock_progress.assert_called_once_with(self.ctxt, 'fake_host')
+
     def test_host_power_action(self):
 
         @mock.patch.object(self.host_api.rpcapi, 'host_power_action',
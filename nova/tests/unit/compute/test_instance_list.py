@@ -41,7 +41,8 @@ class TestInstanceList(test.NoDBTestCase):
             insts[cell.uuid] = list([
                 dict(
                     uuid=getattr(uuids, '%s-inst%i' % (cell.name, i)),
-                    hostname='%s-inst%i' % (cell.name, i))
+                    hostname='%s-inst%i' % (cell.name, i),
+                    created_at=None, id=i)
                 for i in range(0, 3)])
 
         self.cells = cells
@@ -87,6 +88,44 @@ class TestInstanceList(test.NoDBTestCase):
 
         self.assertEqual(insts_one, insts_two)
 
+    @mock.patch('nova.db.main.api.instance_get_by_sort_filters')
+    @mock.patch('nova.db.main.api.instance_get_by_uuid')
+    @mock.patch('nova.objects.InstanceMapping.get_by_instance_uuid')
+    @mock.patch('nova.db.main.api.instance_get_all_by_filters_sort')
+    @mock.patch('nova.objects.CellMappingList.get_all')
+    def test_get_instances_sorted_marker(self, mock_cells, mock_inst,
+                                         mock_im, mock_get, mock_by_values):
+        mock_cells.return_value = self.cells
+        mock_im.return_value.cell_mapping = self.cells[0]
+        mock_get.return_value = {'hostname': 'cell0-inst0',
+                                 'uuid': uuids.marker}
+        # Each cell returns one batch, and then nothing more
+        mock_inst.side_effect = list(self.insts.values()) + [[], [], []]
+
+        obj, insts = instance_list.get_instances_sorted(self.context, {},
+                                                        None, uuids.marker,
+                                                        [], ['hostname'],
+                                                        ['asc'], batch_size=3)
+        self.assertEqual(9, len(list(insts)))
+
+        # Each cell is queried for the instances after the sort key values
+        # of the marker, without looking for an equivalent marker in it
+        mock_by_values.assert_not_called()
+        self.assertEqual(6, mock_inst.call_count)
+        marker_values = [c[1]['marker_values']
+                         for c in mock_inst.call_args_list]
+        self.assertEqual([['cell0-inst0', uuids.marker]] * 3,
+                         marker_values[:3])
+        # Later batches start after the last instance of the previous one
+        self.assertEqual(
+            sorted([['cell%i-inst2' % i, getattr(uuids, 'cell%i-inst2' % i)]
+                    for i in range(0, 3)]),
+            sorted(marker_values[3:]))
+        mock_inst.assert_called_with(
+            test.MatchType(nova_context.RequestContext), {}, limit=3,
+            marker_values=mock.ANY, sort_keys=['hostname', 'uuid'],
+            sort_dirs=['asc', 'asc'], columns_to_join=[])
+
     @mock.patch('nova.objects.BuildRequestList.get_by_filters')
     @mock.patch('nova.compute.instance_list.get_instances_sorted')
     @mock.patch('nova.objects.CellMappingList.get_by_project_id')
@@ -13,6 +13,7 @@
 from contextlib import contextmanager
 import copy
 import datetime
+import functools
 from unittest import mock
 
 from oslo_utils.fixture import uuidsentinel as uuids
@@ -80,6 +81,46 @@ class TestUtils(test.NoDBTestCase):
                                                 ['asc', 'desc'])
         self.assertEqual(1, ctx.compare_records(inst1, inst2))
 
+    def test_sort_key(self):
+        dt1 = datetime.datetime(2015, 11, 5, 20, 30, 00)
+        dt2 = datetime.datetime(1955, 10, 25, 1, 21, 00)
+        insts = [
+            {'key0': 'foo', 'key1': 'd', 'key2': 456, 'key4': dt1},
+            {'key0': 'foo', 'key1': 's', 'key2': 123, 'key4': dt2},
+            {'key0': 'bar', 'key1': 's', 'key2': 123, 'key4': dt1},
+            {'key0': 'foo', 'key1': 'd', 'key2': 123, 'key4': dt2},
+        ]
+
+        for sort_keys, sort_dirs in [
+                (['key0', 'key2'], ['asc', 'asc']),
+                (['key0', 'key2'], ['desc', 'asc']),
+                (['key4', 'key1', 'key2'], ['desc', 'desc', 'asc']),
+                (['key1', 'key4', 'key2'], ['asc', 'desc', 'asc']),
+                (['key4', 'key2', 'key0'], ['desc', 'desc', 'desc'])]:
+            ctx = multi_cell_list.RecordSortContext(sort_keys, sort_dirs)
+            self.assertEqual(sort_dirs.count('desc') > 1, ctx.reverse)
+            # Ordering by the sort keys must be the same as ordering with
+            # compare_records()
+            expected = sorted(insts,
+                              key=functools.cmp_to_key(ctx.compare_records))
+            actual = sorted(insts, key=ctx.get_sort_key,
+                            reverse=ctx.reverse)
+            self.assertEqual(expected, actual,
+                             '%s %s' % (sort_keys, sort_dirs))
+
+    def test_sort_key_custom_compare(self):
+        class ReverseContext(multi_cell_list.RecordSortContext):
+            def compare_records(self, rec1, rec2):
+                return -super(ReverseContext, self).compare_records(rec1,
+                                                                    rec2)
+
+        insts = [{'key0': i} for i in range(0, 5)]
+        ctx = ReverseContext(['key0'], ['desc'])
+        # We must fall back to compare_records() if it was overridden
+        self.assertFalse(ctx.reverse)
+        self.assertEqual(insts, sorted(reversed(insts),
+                                       key=ctx.get_sort_key))
+
     def test_wrapper(self):
         inst1 = {'key0': 'foo', 'key1': 'd', 'key2': 456}
         inst2 = {'key0': 'foo', 'key1': 's', 'key2': 123}
@@ -311,9 +352,10 @@ class TestBatching(test.NoDBTestCase):
         summary = lister.call_summary('get_by_filters')
 
         # Since we got everything from one cell (due to how things are sorting)
-        # we should have made 500 / 10 calls to one cell, and 1 call to
-        # the rest
-        calls_expected = [1 for cell in self._cells[1:]] + [500 / 10]
+        # we should have made two calls to one cell, the second one sized
+        # for the rest of the results based on that cell providing all of the
+        # first batch, and 1 call to the rest
+        calls_expected = [1 for cell in self._cells[1:]] + [2]
         self.assertEqual(calls_expected, summary['count_by_cell'])
 
         # Since we got everything from one cell (due to how things are sorting)
@@ -324,11 +366,55 @@ class TestBatching(test.NoDBTestCase):
         # Since we got everything from one cell (due to how things are sorting)
         # we should have a bunch of calls for batches of 10, one each for
         # every cell except the one that served the bulk of the requests which
-        # should have 500 / 10 batches of 10.
+        # should have a batch of 10 followed by a batch of the remaining 490.
         limit_expected = ([[10] for cell in self._cells[1:]] +
-                          [[10 for i in range(0, 500 // 10)]])
+                          [[10, 490]])
         self.assertEqual(limit_expected, summary['limit_by_cell'])
 
+    def test_batch_size_adapts_to_cell_share(self):
+        lister = TestLister(self._data, [], [],
+                            cells=self._cells, batch_size=10)
+        # Nothing returned yet, so we use the configured batch size
+        self.assertEqual(10, lister._get_batch_size(uuids.cell0, 100, 10))
+        # Never more than the limit
+        self.assertEqual(5, lister._get_batch_size(uuids.cell0, 5, 10))
+        # Unlimited always uses the configured batch size
+        self.assertEqual(10, lister._get_batch_size(uuids.cell0, None, 10))
+
+        # cell0 provided a quarter of the 40 results so far, so expect it
+        # to provide a quarter (plus some slack) of the 60 remaining
+        lister._records_returned = 40
+        lister._cell_records_returned = {uuids.cell0: 10, uuids.cell1: 30}
+        self.assertEqual(17, lister._get_batch_size(uuids.cell0, 100, 10))
+        self.assertEqual(50, lister._get_batch_size(uuids.cell1, 100, 10))
+        # A cell which has not provided anything yet gets the batch size,
+        # and we never shrink below it
+        self.assertEqual(10, lister._get_batch_size(uuids.cell2, 100, 10))
+        self.assertEqual(20, lister._get_batch_size(uuids.cell0, 100, 20))
+        # Nor do we ask for more than could still be returned
+        lister._cell_records_returned = {uuids.cell0: 40}
+        self.assertEqual(60, lister._get_batch_size(uuids.cell0, 100, 10))
+
+    def test_exhausted_cells_not_polled(self):
+        lister = TestLister(self._data[:25], [], [],
+                            cells=self._cells, batch_size=10)
+        ctx = context.RequestContext()
+        res = list(lister.get_records_sorted(ctx, {}, 100, None))
+        self.assertEqual(25, len(res))
+        summary = lister.call_summary('get_by_filters')
+        # The two cells which returned full batches are polled again, but
+        # the one which came up short is not since that tells us it has
+        # nothing more
+        self.assertEqual(len(self._cells) + 2, summary['total'])
+
+        lister = TestLister(self._data[:25], [], [], cells=self._cells)
+        res = list(lister.get_records_sorted(ctx, {}, None, None))
+        # An unlimited query returns all of the data in every cell
+        self.assertEqual(25 * len(self._cells), len(res))
+        summary = lister.call_summary('get_by_filters')
+        # Unlimited queries always return everything there is
+        self.assertEqual(len(self._cells), summary['total'])
+
     def test_no_batches(self):
         lister = TestLister(self._data, [], [],
                             cells=self._cells)
@@ -350,6 +436,64 @@ class TestBatching(test.NoDBTestCase):
         self.assertEqual(limit_expected, summary['limit_by_cell'])
 
 
+class KeysetLister(TestLister):
+    keyset_pagination = True
+
+    def get_by_sort_values(self, ctx, filters, limit, values, **kwargs):
+        self._method_called(ctx, 'get_by_sort_values', values)
+        return self.get_by_filters(ctx, filters, limit, None, **kwargs)
+
+
+@mock.patch('nova.context.target_cell', new=target_cell_cheater)
+class TestKeysetPagination(test.NoDBTestCase):
+    def setUp(self):
+        super(TestKeysetPagination, self).setUp()
+
+        self._data = [{'id': 'foo-%i' % i, 'key': i}
+                      for i in range(0, 100)]
+        self._cells = [objects.CellMapping(uuid=getattr(uuids, 'cell%i' % i),
+                                           name='cell%i' % i)
+                       for i in range(0, 2)]
+
+    def test_marker(self):
+        lister = KeysetLister(self._data, ['key'], ['asc'],
+                              cells=self._cells, batch_size=10)
+        ctx = context.RequestContext()
+        res = list(lister.get_records_sorted(ctx, {}, 30, 'foo-0'))
+        self.assertEqual(30, len(res))
+
+        # We only needed to look up the marker record once, and never
+        # had to find an equivalent marker in any cell
+        self.assertEqual(
+            1, lister.call_summary('get_marker_record')['total'])
+        self.assertEqual(
+            0, lister.call_summary('get_marker_by_values')['total'])
+        summary = lister.call_summary('get_by_sort_values')
+        self.assertEqual(len(self._cells), len(summary['called_in_cell']))
+        # Every cell starts after the values of the marker record, and any
+        # further batch starts after the last record of the previous one
+        for values in summary['limit_by_cell']:
+            self.assertEqual([0], values[0])
+            for prev, cur in zip(values, values[1:]):
+                self.assertGreater(cur, prev)
+
+    def test_null_values(self):
+        for record in self._data:
+            record['key'] = None
+        lister = KeysetLister(self._data, ['key'], ['asc'],
+                              cells=self._cells, batch_size=10)
+        ctx = context.RequestContext()
+        res = list(lister.get_records_sorted(ctx, {}, 30, 'foo-0'))
+        self.assertEqual(30, len(res))
+
+        # NULL values cannot be compared by the database, so we need to
+        # fall back to markers
+        self.assertEqual(
+            0, lister.call_summary('get_by_sort_values')['total'])
+        self.assertEqual(
+            1, lister.call_summary('get_marker_by_values')['total'])
+
+
 class FailureListContext(multi_cell_list.RecordSortContext):
     def compare_records(self, rec1, rec2):
         return 0
@@ -387,7 +531,7 @@ class TestBaseClass(test.NoDBTestCase):
                                      name='cell%i' % i)
                  for i in range(0, 3)]
 
-        lister = FailureLister(data, [], [], cells=cells)
+        lister = FailureLister(data, [], [], cells=cells, batch_size=10)
         # Two of the cells will fail, one with timeout and one
         # with an error
         lister.set_fails(uuids.cell0, [context.did_not_respond_sentinel])
@@ -397,7 +541,7 @@ class TestBaseClass(test.NoDBTestCase):
         lister.set_fails(uuids.cell1, exception.InstanceNotFound(
             instance_id='fake'))
         ctx = context.RequestContext()
-        result = lister.get_records_sorted(ctx, {}, 50, None, batch_size=10)
+        result = lister.get_records_sorted(ctx, {}, 50, None)
         # We should still have 50 results since there are enough from the
         # good cells to fill our limit.
         self.assertEqual(50, len(list(result)))
@@ -412,7 +556,7 @@ class TestBaseClass(test.NoDBTestCase):
                                      name='cell%i' % i)
                  for i in range(0, 3)]
 
-        lister = FailureLister(data, [], [], cells=cells)
+        lister = FailureLister(data, [], [], cells=cells, batch_size=5)
         # One cell will succeed and then time out, one will fail immediately,
         # and the last will always work
         lister.set_fails(uuids.cell0, [None, context.did_not_respond_sentinel])
@@ -422,8 +566,7 @@ class TestBaseClass(test.NoDBTestCase):
         lister.set_fails(uuids.cell1, exception.BuildAbortException(
             instance_uuid='fake', reason='fake'))
         ctx = context.RequestContext()
-        result = lister.get_records_sorted(ctx, {}, 50, None,
-                                           batch_size=5)
+        result = lister.get_records_sorted(ctx, {}, 50, None)
         # We should still have 50 results since there are enough from the
         # good cells to fill our limit.
         self.assertEqual(50, len(list(result)))
@@ -23,8 +23,11 @@ import socket
 import string
 from unittest import mock
 
+import fixtures as std_fixtures
+import oslo_messaging as messaging
 from oslo_serialization import jsonutils
 from oslo_utils.fixture import uuidsentinel as uuids
+from oslo_utils import units
 from oslo_utils import uuidutils
 
 from nova.accelerator.cyborg import _CyborgClient as cyborgclient
@@ -1804,3 +1807,329 @@ class CheckAttachAndReserverVolumeTestCase(test.NoDBTestCase):
                           compute_utils.check_attach_and_reserve_volume,
                           self.context, mock_volume_api, volume, instance, bdm,
                           supports_multiattach=False)
+
+
+class DrainHostProgressTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(DrainHostProgressTestCase, self).setUp()
+        self.context = context.RequestContext('fake', 'fake')
+
+    @mock.patch('nova.objects.MigrationList.get_by_filters')
+    def test_get_live_migration_dirty_ratios(self, mock_get_migrations):
+        mock_get_migrations.return_value = objects.MigrationList(objects=[
+            objects.Migration(instance_uuid=uuids.busy,
+                              memory_total=1000, memory_processed=2500),
+            # An older migration of the same instance is ignored
+            objects.Migration(instance_uuid=uuids.busy,
+                              memory_total=1000, memory_processed=5000),
+            objects.Migration(instance_uuid=uuids.idle,
+                              memory_total=1000, memory_processed=900),
+            objects.Migration(instance_uuid=uuids.unknown,
+                              memory_total=None, memory_processed=None),
+        ])
+        ratios = compute_utils.get_live_migration_dirty_ratios(
+            self.context, [uuids.busy, uuids.idle, uuids.unknown, uuids.new])
+        self.assertEqual({uuids.busy: 2.5, uuids.idle: 1.0,
+                          uuids.unknown: 1.0, uuids.new: 1.0}, ratios)
+        mock_get_migrations.assert_called_once_with(
+            self.context,
+            {'instance_uuid': [uuids.busy, uuids.idle, uuids.unknown,
+                               uuids.new],
+             'migration_type': 'live-migration', 'status': 'completed'},
+            sort_keys=['created_at'], sort_dirs=['desc'])
+
+    @mock.patch('oslo_utils.timeutils.utcnow')
+    @mock.patch('nova.objects.MigrationList.get_by_filters')
+    @mock.patch('nova.objects.InstanceList.get_by_host')
+    def test_get_drain_host_progress(self, mock_get_instances,
+                                     mock_get_migrations, mock_utcnow):
+        created_at = datetime.datetime(2024, 1, 1,
+                                       tzinfo=datetime.timezone.utc)
+        mock_utcnow.return_value = created_at + datetime.timedelta(
+            seconds=10)
+        flavor = objects.Flavor(memory_mb=1)
+        mock_get_instances.return_value = objects.InstanceList(objects=[
+            objects.Instance(uuid=uuids.migrating, flavor=flavor,
+                             vm_state=vm_states.ACTIVE),
+            objects.Instance(uuid=uuids.pending, flavor=flavor,
+                             vm_state=vm_states.PAUSED),
+            # Stopped instances are not live migrated
+            objects.Instance(uuid=uuids.stopped, flavor=flavor,
+                             vm_state=vm_states.STOPPED),
+        ])
+        mock_get_migrations.return_value = objects.MigrationList(objects=[
+            objects.Migration(instance_uuid=uuids.migrating,
+                              created_at=created_at,
+                              memory_total=2 * units.Mi,
+                              memory_processed=units.Mi,
+                              memory_remaining=units.Mi),
+        ])
+        progress = compute_utils.get_drain_host_progress(
+            self.context, 'host1')
+        self.assertEqual({'instances': 2, 'other_instances': 1,
+                          'migrations': 1,
+                          'memory_total': 2 * units.Mi,
+                          'memory_processed': units.Mi,
+                          'memory_remaining': units.Mi,
+                          'throughput': units.Mi // 10,
+                          'eta': 20}, progress)
+        mock_get_instances.assert_called_once_with(
+            self.context, 'host1', expected_attrs=['flavor'])
+        mock_get_migrations.assert_called_once_with(
+            self.context, {
+                'source_compute': 'host1',
+                'migration_type': 'live-migration',
+                'status': list(
+                    compute_utils.LIVE_MIGRATION_IN_PROGRESS_STATUSES)})
+
+    @mock.patch('nova.objects.MigrationList.get_by_filters',
+                return_value=objects.MigrationList(objects=[]))
+    @mock.patch('nova.objects.InstanceList.get_by_host')
+    def test_get_drain_host_progress_only_stopped(self, mock_get_instances,
+                                                  mock_get_migrations):
+        flavor = objects.Flavor(memory_mb=1)
+        mock_get_instances.return_value = objects.InstanceList(objects=[
+            objects.Instance(uuid=uuids.stopped, flavor=flavor,
+                             vm_state=vm_state)
+            for vm_state in (vm_states.STOPPED, vm_states.SHELVED,
+                             vm_states.ERROR)])
+
+        progress = compute_utils.get_drain_host_progress(
+            self.context, 'host1')
+
+        # The host is drained, the remaining instances are not moved
+        self.assertEqual(0, progress['instances'])
+        self.assertEqual(3, progress['other_instances'])
+        self.assertIsNone(progress['eta'])
+
+    @mock.patch('nova.objects.MigrationList.get_by_filters',
+                return_value=objects.MigrationList(objects=[]))
+    @mock.patch('nova.objects.InstanceList.get_by_host',
+                return_value=objects.InstanceList(objects=[]))
+    def test_get_drain_host_progress_idle(self, mock_get_instances,
+                                          mock_get_migrations):
+        progress = compute_utils.get_drain_host_progress(
+            self.context, 'host1')
+        self.assertEqual(0, progress['instances'])
+        self.assertEqual(0, progress['other_instances'])
+        self.assertEqual(0, progress['migrations'])
+        self.assertEqual(0, progress['throughput'])
+        self.assertIsNone(progress['eta'])
+
+
+class InstanceEventBufferTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(InstanceEventBufferTestCase, self).setUp()
+        self.context = context.RequestContext('fake', 'fake')
+        self.flags(instance_event_buffer_delay=60,
+                   instance_event_buffer_size=3, group='compute')
+        self.flags(host='fake-host')
+        self.buffer = compute_utils._InstanceEventBuffer()
+        self.useFixture(std_fixtures.MockPatchObject(
+            compute_utils, '_EVENT_BUFFER', self.buffer))
+        patcher = mock.patch.dict(
+            compute_utils._EVENT_BUFFER_STATS,
+            {stat: 0 for stat in compute_utils._EVENT_BUFFER_STATS})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.useFixture(std_fixtures.MockPatchObject(
+            base.NovaObject, 'indirection_api', mock.sentinel.conductor))
+        self.mock_timer = self.useFixture(std_fixtures.MockPatch(
+            'threading.Timer')).mock
+        self.mock_record = self.useFixture(std_fixtures.MockPatchObject(
+            objects.InstanceActionEventList, 'record_bulk',
+            return_value=0)).mock
+        self.mock_create = self.useFixture(std_fixtures.MockPatchObject(
+            objects.InstanceFaultList, 'create_bulk', return_value=0)).mock
+
+    @mock.patch.object(objects.InstanceActionEvent, 'event_start')
+    @mock.patch.object(objects.InstanceActionEvent,
+                       'event_finish_with_failure')
+    def test_event_reporter_buffered(self, mock_finish, mock_start):
+        try:
+            with compute_utils.EventReporter(self.context, 'fake_event',
+                                             'fake.host', uuids.instance):
+                raise test.TestingException('oops')
+        except test.TestingException:
+            pass
+
+        mock_start.assert_not_called()
+        mock_finish.assert_not_called()
+        self.mock_record.assert_not_called()
+        self.mock_timer.assert_called_once_with(60, self.buffer.flush)
+        self.mock_timer.return_value.start.assert_called_once_with()
+        self.assertEqual(2, len(self.buffer))
+
+        compute_utils.flush_instance_event_buffer()
+
+        self.mock_timer.return_value.cancel.assert_called_once_with()
+        self.mock_record.assert_called_once_with(mock.ANY, mock.ANY)
+        records = self.mock_record.call_args.args[1]
+        self.assertEqual([False, True], [r['finish'] for r in records])
+        for record in records:
+            self.assertEqual(uuids.instance,
+                             record['values']['instance_uuid'])
+            self.assertEqual(self.context.request_id,
+                             record['values']['request_id'])
+            self.assertFalse(record['find_last_action'])
+        self.assertEqual('fake.host', records[0]['values']['host'])
+        self.assertEqual('Error', records[1]['values']['result'])
+        self.assertEqual('TestingException',
+                         records[1]['values']['details'])
+        self.assertIsInstance(records[1]['values']['traceback'], str)
+        self.mock_create.assert_not_called()
+        self.assertEqual({'buffered': 2, 'written': 2, 'skipped': 0,
+                          'dropped': 0, 'flushes': 1, 'errors': 0,
+                          'pending': 0},
+                         compute_utils.get_instance_event_buffer_stats())
+
+    @mock.patch.object(objects.InstanceActionEvent, 'event_start')
+    @mock.patch.object(objects.InstanceActionEvent,
+                       'event_finish_with_failure')
+    def test_event_reporter_not_buffered_without_conductor(
+            self, mock_finish, mock_start):
+        base.NovaObject.indirection_api = None
+        with compute_utils.EventReporter(self.context, 'fake_event',
+                                         'fake.host', uuids.instance):
+            pass
+
+        mock_start.assert_called_once_with(
+            self.context, uuids.instance, 'fake_event', want_result=False,
+            host='fake.host')
+        mock_finish.assert_called_once_with(
+            self.context, uuids.instance, 'fake_event', exc_val=None,
+            exc_tb=None, want_result=False)
+        self.assertEqual(0, len(self.buffer))
+
+    @mock.patch.object(objects.InstanceFault, 'create')
+    def test_add_instance_fault_from_exc_buffered(self, mock_create):
+        instance = fake_instance.fake_instance_obj(self.context)
+        compute_utils.add_instance_fault_from_exc(
+            self.context, instance, exception.NovaException('oops'))
+
+        mock_create.assert_not_called()
+        compute_utils.flush_instance_event_buffer()
+
+        self.mock_create.assert_called_once_with(mock.ANY, mock.ANY)
+        faults = self.mock_create.call_args.args[1]
+        self.assertEqual(1, len(faults))
+        self.assertEqual(
+            {'instance_uuid': instance.uuid, 'code': 500, 'message': 'oops',
+             'details': '', 'host': 'fake-host', 'created_at': mock.ANY},
+            faults[0])
+        self.mock_record.assert_not_called()
+
+    @mock.patch.object(objects.InstanceFault, 'create')
+    def test_add_instance_fault_from_exc_not_buffered(self, mock_create):
+        self.flags(instance_event_buffer_delay=0, group='compute')
+        instance = fake_instance.fake_instance_obj(self.context)
+        compute_utils.add_instance_fault_from_exc(
+            self.context, instance, exception.NovaException('oops'))
+
+        mock_create.assert_called_once_with()
+        self.assertEqual(0, len(self.buffer))
+
+    def test_flush_when_full(self):
+        for uuid in (uuids.instance1, uuids.instance2):
+            self.buffer.add_event({'finish': False, 'values': uuid})
+        self.mock_record.assert_not_called()
+
+        self.buffer.add_fault({'instance_uuid': uuids.instance3})
+
+        self.mock_record.assert_called_once_with(
+            mock.ANY, [{'finish': False, 'values': uuids.instance1},
+                       {'finish': False, 'values': uuids.instance2}])
+        self.mock_create.assert_called_once_with(
+            mock.ANY, [{'instance_uuid': uuids.instance3}])
+        self.mock_timer.return_value.cancel.assert_called_once_with()
+        self.assertEqual(0, len(self.buffer))
+
+    def test_flush_nothing_buffered(self):
+        compute_utils.flush_instance_event_buffer()
+        self.mock_record.assert_not_called()
+        self.mock_create.assert_not_called()
+        self.assertEqual(
+            0, compute_utils.get_instance_event_buffer_stats()['flushes'])
+
+    def test_flush_error_requeues(self):
+        self.buffer.add_event({'finish': False, 'values': uuids.instance1})
+        self.buffer.add_fault({'instance_uuid': uuids.instance2})
+        self.mock_record.side_effect = messaging.MessagingTimeout()
+
+        self.buffer.flush()
+
+        # The faults are written, the events are kept to be retried before
+        # the ones buffered since.
+        self.mock_create.assert_called_once_with(
+            mock.ANY, [{'instance_uuid': uuids.instance2}])
+        self.assertEqual(1, len(self.buffer))
+        self.assertEqual(2, self.mock_timer.call_count)
+        self.buffer.add_event({'finish': True, 'values': uuids.instance1})
+
+        self.mock_record.side_effect = None
+        self.mock_record.reset_mock()
+        self.buffer.flush()
+
+        self.mock_record.assert_called_once_with(
+            mock.ANY, [{'finish': False, 'values': uuids.instance1},
+                       {'finish': True, 'values': uuids.instance1}])
+        self.assertEqual({'buffered': 3, 'written': 3, 'skipped': 0,
+                          'dropped': 0, 'flushes': 2, 'errors': 1,
+                          'pending': 0},
+                         compute_utils.get_instance_event_buffer_stats())
+
+    @mock.patch.object(compute_utils, '_EVENT_BUFFER_MAX_BATCHES', new=1)
+    def test_flush_error_drops_oldest(self):
+        self.flags(instance_event_buffer_size=2, group='compute')
+        self.mock_record.side_effect = messaging.MessagingTimeout()
+        self.buffer.add_event({'finish': False, 'values': uuids.instance1})
+        self.buffer.add_event({'finish': False, 'values': uuids.instance2})
+        self.assertEqual(2, len(self.buffer))
+
+        self.buffer.add_event({'finish': False, 'values': uuids.instance3})
+
+        self.assertEqual(2, self.mock_record.call_count)
+        self.assertEqual([{'finish': False, 'values': uuids.instance2},
+                          {'finish': False, 'values': uuids.instance3}],
+                         self.buffer._events)
+        stats = compute_utils.get_instance_event_buffer_stats()
+        self.assertEqual(1, stats['dropped'])
+        self.assertEqual(2, stats['errors'])
+        self.assertEqual(2, stats['pending'])
+
+    def test_skipped_records_counted(self):
+        self.mock_record.return_value = 1
+        self.buffer.add_event({'finish': False, 'values': uuids.instance1})
+        self.buffer.add_event({'finish': True, 'values': uuids.instance1})
+
+        self.buffer.flush()
+
+        stats = compute_utils.get_instance_event_buffer_stats()
+        self.assertEqual(1, stats['written'])
+        self.assertEqual(1, stats['skipped'])
+
+    def test_skipped_faults_counted(self):
+        # A fault which cannot be created, e.g. because its instance was
+        # purged, is skipped rather than retried with the whole batch.
+        self.mock_create.return_value = 1
+        self.buffer.add_fault({'instance_uuid': uuids.instance1})
+        self.buffer.add_fault({'instance_uuid': uuids.instance2})
+        self.buffer.add_event({'finish': False, 'values': uuids.instance2})
+
+        self.assertEqual(0, len(self.buffer))
+        self.assertEqual({'buffered': 3, 'written': 2, 'skipped': 1,
+                          'dropped': 0, 'flushes': 1, 'errors': 0,
+                          'pending': 0},
+                         compute_utils.get_instance_event_buffer_stats())
+
+    def test_get_instance_event_buffer_report(self):
+        self.buffer.add_event({'finish': False, 'values': uuids.instance1})
+
+        report = compute_utils.get_instance_event_buffer_report()
+        report.set_current_view_type('text')
+
+        report = str(report)
+        self.assertIn('buffered = 1', report)
+        self.assertIn('pending = 1', report)
@@ -458,6 +458,27 @@ class LiveMigrationTaskTestCase(test.NoDBTestCase):
         mock_check.assert_called_once_with('host1')
         mock_call.assert_called_once_with('host1', {})
 
+    @mock.patch.object(live_migrate.LiveMigrationTask,
+                       '_call_livem_checks_on_host')
+    @mock.patch.object(live_migrate.LiveMigrationTask,
+                       '_check_compatible_with_source_hypervisor')
+    @mock.patch.object(query.SchedulerQueryClient, 'select_destinations',
+                       return_value=[[fake_selection1]])
+    @mock.patch.object(objects.RequestSpec, 'reset_forced_destinations')
+    @mock.patch.object(scheduler_utils, 'setup_instance_group')
+    @mock.patch.object(objects.RequestSpec,
+                       'generate_request_groups_from_pci_requests')
+    def test_find_destination_keeps_ignore_hosts(
+            self, mock_gengrp, mock_setup, mock_reset, mock_select,
+            mock_check, mock_call):
+        self.fake_spec.ignore_hosts = ['busy1', 'busy2']
+        self.assertEqual(("host1", "node1", fake_limits1),
+                         self.task._find_destination())
+        self.assertEqual([self.instance_host, 'busy1', 'busy2'],
+                         self.fake_spec.ignore_hosts)
+        mock_select.assert_called_once_with(self.context, self.fake_spec,
+            [self.instance.uuid], return_objects=True, return_alternates=False)
+
     @mock.patch.object(live_migrate.LiveMigrationTask,
                        '_call_livem_checks_on_host')
     @mock.patch.object(live_migrate.LiveMigrationTask,
@@ -19,6 +19,7 @@ import copy
 import ddt
 from unittest import mock
 
+import futurist
 from keystoneauth1 import exceptions as ks_exc
 from oslo_db import exception as db_exc
 from oslo_limit import exception as limit_exceptions
@@ -31,6 +32,7 @@ from oslo_versionedobjects import exception as ovo_exc
 from nova.accelerator import cyborg
 from nova import block_device
 from nova.compute import flavors
+from nova.compute import instance_actions
 from nova.compute import rpcapi as compute_rpcapi
 from nova.compute import task_states
 from nova.compute import utils as compute_utils
@@ -2654,6 +2656,80 @@ class ConductorTaskTestCase(_BaseTaskTestCase, test_compute.BaseTestCase):
         self.assertEqual(2, build_and_run_instance.call_count)
         self.assertEqual(2, len(instance_cells))
 
+    @mock.patch('nova.compute.utils.notify_about_instance_action')
+    @mock.patch('nova.compute.utils.notify_about_instance_usage')
+    @mock.patch('nova.compute.rpcapi.ComputeAPI.build_and_run_instance')
+    @mock.patch('nova.scheduler.rpcapi.SchedulerAPI.select_destinations')
+    def test_schedule_and_build_multiple_instances_batched(
+            self, select_destinations, build_and_run_instance, legacy_notify,
+            notify):
+        """Tests that the instance mappings and build requests of several
+        instances are updated and deleted in batches, and that an instance
+        which build request is deleted during scheduling is cleaned up
+        without stopping the build of the others.
+        """
+        select_destinations.return_value = [
+            [fake_selection1], [fake_selection1], [fake_selection1]]
+        params = self.params
+        self.start_service('compute', host='host1')
+
+        # create two additional build requests for a total of three
+        for x in range(2):
+            build_request = fake_build_request.fake_req_obj(self.ctxt)
+            del build_request.instance.id
+            build_request.create()
+            params['build_requests'].objects.append(build_request)
+            objects.InstanceMapping(
+                self.ctxt, instance_uuid=build_request.instance.uuid,
+                cell_mapping=None, project_id=self.ctxt.project_id).create()
+            params['request_specs'].append(objects.RequestSpec(
+                instance_uuid=build_request.instance_uuid,
+                instance_group=None))
+        instance_uuids = [br.instance_uuid for br in params['build_requests']]
+
+        # Delete the second build request once the instances were created,
+        # as if the user deleted the server while it was being scheduled.
+        deleted_uuid = instance_uuids[1]
+        orig_get_uuids = objects.BuildRequestList.get_instance_uuids
+
+        def fake_get_instance_uuids(ctxt, uuids):
+            existing = orig_get_uuids(ctxt, uuids)
+            objects.BuildRequest.get_by_instance_uuid(
+                ctxt, deleted_uuid).destroy()
+            return existing
+
+        with test.nested(
+            mock.patch.object(objects.BuildRequestList, 'get_instance_uuids',
+                              side_effect=fake_get_instance_uuids),
+            mock.patch.object(objects.InstanceMappingList, 'update_cell_bulk',
+                wraps=objects.InstanceMappingList.update_cell_bulk),
+            mock.patch.object(objects.BuildRequestList, 'destroy_bulk',
+                wraps=objects.BuildRequestList.destroy_bulk),
+        ) as (get_uuids, update_cell_bulk, destroy_bulk):
+            self.conductor.schedule_and_build_instances(**params)
+
+        get_uuids.assert_called_once_with(self.ctxt, instance_uuids)
+        update_cell_bulk.assert_called_once_with(
+            self.ctxt, instance_uuids, test.MatchType(objects.CellMapping))
+        destroy_bulk.assert_called_once_with(self.ctxt, instance_uuids)
+        self.assertEqual(
+            set(instance_uuids) - {deleted_uuid},
+            {c[1]['instance'].uuid
+             for c in build_and_run_instance.call_args_list})
+        cell1 = self.cell_mappings['cell1']
+        for uuid in instance_uuids:
+            inst_mapping = objects.InstanceMapping.get_by_instance_uuid(
+                self.ctxt, uuid)
+            self.assertEqual(cell1.uuid, inst_mapping.cell_mapping.uuid)
+            self.assertRaises(exc.BuildRequestNotFound,
+                              objects.BuildRequest.get_by_instance_uuid,
+                              self.ctxt, uuid)
+        # The instance which build request was deleted is gone from the cell.
+        with context.target_cell(self.ctxt, cell1) as cctxt:
+            self.assertRaises(exc.InstanceNotFound,
+                              main_db_api.instance_get_by_uuid,
+                              cctxt, deleted_uuid)
+
     @mock.patch('nova.compute.utils.notify_about_compute_task_error')
     @mock.patch('nova.scheduler.rpcapi.SchedulerAPI.select_destinations')
     def test_schedule_and_build_scheduler_failure(self, select_destinations,
@@ -2683,7 +2759,8 @@ class ConductorTaskTestCase(_BaseTaskTestCase, test_compute.BaseTestCase):
     @mock.patch('nova.compute.utils.notify_about_instance_usage')
     @mock.patch('nova.compute.rpcapi.ComputeAPI.build_and_run_instance')
     @mock.patch('nova.scheduler.rpcapi.SchedulerAPI.select_destinations')
-    @mock.patch('nova.objects.BuildRequest.destroy')
+    @mock.patch('nova.objects.BuildRequestList.destroy_bulk',
+                return_value=set())
     @mock.patch('nova.conductor.manager.ComputeTaskManager._bury_in_cell0')
     def test_schedule_and_build_delete_during_scheduling(self,
                                                          bury,
@@ -2695,7 +2772,6 @@ class ConductorTaskTestCase(_BaseTaskTestCase, test_compute.BaseTestCase):
                                                          taglist_create,
                                                          taglist_destroy):
 
-        br_destroy.side_effect = exc.BuildRequestNotFound(uuid='foo')
         self.start_service('compute', host='host1')
         select_destinations.return_value = [[fake_selection1]]
         taglist_create.return_value = self.params['tags']
@@ -2721,13 +2797,13 @@ class ConductorTaskTestCase(_BaseTaskTestCase, test_compute.BaseTestCase):
     @mock.patch('nova.compute.utils.notify_about_instance_usage')
     @mock.patch('nova.compute.rpcapi.ComputeAPI.build_and_run_instance')
     @mock.patch('nova.scheduler.rpcapi.SchedulerAPI.select_destinations')
-    @mock.patch('nova.objects.BuildRequest.destroy')
+    @mock.patch('nova.objects.BuildRequestList.destroy_bulk',
+                return_value=set())
     @mock.patch('nova.conductor.manager.ComputeTaskManager._bury_in_cell0')
     def test_schedule_and_build_delete_during_scheduling_host_changed(
             self, bury, br_destroy, select_destinations,
             build_and_run, legacy_notify, instance_destroy, notify):
 
-        br_destroy.side_effect = exc.BuildRequestNotFound(uuid='foo')
         instance_destroy.side_effect = [
             exc.ObjectActionError(action='destroy',
                                   reason='host changed'),
@@ -2754,13 +2830,13 @@ class ConductorTaskTestCase(_BaseTaskTestCase, test_compute.BaseTestCase):
     @mock.patch('nova.compute.utils.notify_about_instance_usage')
     @mock.patch('nova.compute.rpcapi.ComputeAPI.build_and_run_instance')
     @mock.patch('nova.scheduler.rpcapi.SchedulerAPI.select_destinations')
-    @mock.patch('nova.objects.BuildRequest.destroy')
+    @mock.patch('nova.objects.BuildRequestList.destroy_bulk',
+                return_value=set())
     @mock.patch('nova.conductor.manager.ComputeTaskManager._bury_in_cell0')
     def test_schedule_and_build_delete_during_scheduling_instance_not_found(
             self, bury, br_destroy, select_destinations,
             build_and_run, legacy_notify, instance_destroy, notify):
 
-        br_destroy.side_effect = exc.BuildRequestNotFound(uuid='foo')
         instance_destroy.side_effect = [
             exc.InstanceNotFound(instance_id='fake'),
             None,
@@ -2782,20 +2858,20 @@ class ConductorTaskTestCase(_BaseTaskTestCase, test_compute.BaseTestCase):
 
     @mock.patch('nova.compute.rpcapi.ComputeAPI.build_and_run_instance')
     @mock.patch('nova.scheduler.rpcapi.SchedulerAPI.select_destinations')
-    @mock.patch('nova.objects.BuildRequest.get_by_instance_uuid')
-    @mock.patch('nova.objects.BuildRequest.destroy')
+    @mock.patch('nova.objects.BuildRequestList.get_instance_uuids',
+                return_value=set())
+    @mock.patch('nova.objects.BuildRequestList.destroy_bulk')
     @mock.patch('nova.conductor.manager.ComputeTaskManager._bury_in_cell0')
     @mock.patch('nova.objects.Instance.create')
     def test_schedule_and_build_delete_before_scheduling(self, inst_create,
                                                          bury, br_destroy,
-                                                         br_get_by_inst,
+                                                         br_get_uuids,
                                                          select_destinations,
                                                          build_and_run):
         """Tests the case that the build request is deleted before the instance
         is created, so we do not create the instance.
         """
         inst_uuid = self.params['build_requests'][0].instance.uuid
-        br_get_by_inst.side_effect = exc.BuildRequestNotFound(uuid=inst_uuid)
         self.start_service('compute', host='host1')
         select_destinations.return_value = [[fake_selection1]]
         self.conductor.schedule_and_build_instances(**self.params)
@@ -2807,6 +2883,7 @@ class ConductorTaskTestCase(_BaseTaskTestCase, test_compute.BaseTestCase):
         self.assertFalse(bury.called)
         # we don't don't destroy the build request since it's already gone
         self.assertFalse(br_destroy.called)
+        br_get_uuids.assert_called_once_with(self.ctxt, [inst_uuid])
         # Make sure the instance mapping is gone.
         self.assertRaises(exc.InstanceMappingNotFound,
                           objects.InstanceMapping.get_by_instance_uuid,
@@ -3391,14 +3468,48 @@ class ConductorTaskTestCase(_BaseTaskTestCase, test_compute.BaseTestCase):
         inst_mapping.cell_mapping = self.cell_mappings['cell0']
         inst_mapping.save()
         cell1 = self.cell_mappings['cell1']
-        inst_mapping = self.conductor._map_instance_to_cell(
-            self.ctxt, instance, cell1)
+        inst_mappings = self.conductor._map_instances_to_cell(
+            self.ctxt, [instance], cell1)
         # Assert that the instance mapping was updated to point at cell1 but
         # also that an error was logged.
+        self.assertEqual(cell1.uuid, inst_mappings[0].cell_mapping.uuid)
+        inst_mapping = objects.InstanceMapping.get_by_instance_uuid(
+            self.ctxt, instance.uuid)
         self.assertEqual(cell1.uuid, inst_mapping.cell_mapping.uuid)
         self.assertIn('During scheduling instance is already mapped to '
                       'another cell', self.stdlog.logger.output)
 
+    def test_map_instances_to_cell(self):
+        """Tests that the mappings of several instances are updated at once
+        and that a missing mapping is an error.
+        """
+        instances = []
+        for x in range(3):
+            build_request = fake_build_request.fake_req_obj(self.ctxt)
+            objects.InstanceMapping(
+                self.ctxt, instance_uuid=build_request.instance_uuid,
+                cell_mapping=None, project_id=self.ctxt.project_id).create()
+            instances.append(build_request.get_new_instance(self.ctxt))
+        cell1 = self.cell_mappings['cell1']
+        with mock.patch.object(
+                objects.InstanceMappingList, 'update_cell_bulk',
+                wraps=objects.InstanceMappingList.update_cell_bulk) as update:
+            self.conductor._map_instances_to_cell(self.ctxt, instances, cell1)
+        update.assert_called_once_with(
+            self.ctxt, test.MatchType(list), cell1)
+        for instance in instances:
+            inst_mapping = objects.InstanceMapping.get_by_instance_uuid(
+                self.ctxt, instance.uuid)
+            self.assertEqual(cell1.uuid, inst_mapping.cell_mapping.uuid)
+        self.assertNotIn('During scheduling instance is already mapped to '
+                         'another cell', self.stdlog.logger.output)
+
+        # An instance without a mapping fails the update.
+        build_request = fake_build_request.fake_req_obj(self.ctxt)
+        self.assertRaises(
+            exc.InstanceMappingNotFound, self.conductor._map_instances_to_cell,
+            self.ctxt, [build_request.get_new_instance(self.ctxt)], cell1)
+
     @mock.patch('nova.objects.InstanceMapping.get_by_instance_uuid')
     def test_cleanup_build_artifacts(self, inst_map_get):
         """Simple test to ensure the order of operations in the cleanup method
@@ -5014,6 +5125,19 @@ class ConductorTaskRPCAPITestCase(_BaseTaskTestCase,
                               self.context, mock.sentinel.aggregate,
                               [mock.sentinel.image])
 
+    def test_drain_host(self):
+        with mock.patch.object(self.conductor, 'client') as client:
+            self.conductor.drain_host(self.context, 'host1', concurrency=2)
+            client.prepare.return_value.cast.assert_called_once_with(
+                self.context, 'drain_host', host='host1', concurrency=2)
+            client.prepare.assert_called_once_with(version='1.27')
+
+        with mock.patch.object(self.conductor.client, 'can_send_version') as v:
+            v.return_value = False
+            self.assertRaises(exc.ServiceTooOld,
+                              self.conductor.drain_host,
+                              self.context, 'host1')
+
     def test_migrate_server(self):
         self.flags(rpc_response_timeout=10, long_rpc_timeout=120)
         instance = objects.Instance()
@@ -5309,6 +5433,262 @@ class ConductorTaskAPITestCase(_BaseTaskTestCase, test_compute.BaseTestCase):
         self.assertIn('host3\' because it is not up', logtext)
         self.assertIn('image1 failed 1 times', logtext)
 
+    def test_drain_host(self):
+        with mock.patch.object(self.conductor.conductor_compute_rpcapi,
+                               'drain_host') as mock_drain:
+            self.conductor.drain_host(self.context, 'host1', concurrency=2)
+        mock_drain.assert_called_once_with(
+            self.context, 'host1', concurrency=2)
+
+    @mock.patch('nova.utils.spawn_on')
+    def test_drain_host_in_background(self, mock_spawn):
+        future = futurist.Future()
+        mock_spawn.return_value = future
+
+        self.conductor_manager.drain_host(self.context, 'host1', 3)
+        mock_spawn.assert_called_once_with(
+            mock.ANY, self.conductor_manager._drain_host_in_cell,
+            self.context, 'host1', 3)
+
+        # A host is only drained once at a time by a worker
+        self.conductor_manager.drain_host(self.context, 'host1', 3)
+        self.assertEqual(1, mock_spawn.call_count)
+        self.assertIn('Host host1 is already being drained',
+                      self.stdlog.logger.output)
+        self.conductor_manager.drain_host(self.context, 'host2', 3)
+        self.assertEqual(2, mock_spawn.call_count)
+
+        future.set_result(None)
+        self.conductor_manager.drain_host(self.context, 'host1', 3)
+        self.assertEqual(3, mock_spawn.call_count)
+
+    @mock.patch('nova.objects.HostMapping.get_by_host')
+    @mock.patch('nova.context.target_cell')
+    def test_drain_host_targets_cell(self, mock_target, mock_gbh):
+        mock_target.return_value.__enter__.return_value = mock.sentinel.cctxt
+        fake_cell = objects.CellMapping(uuid=uuids.cell,
+                                        database_connection='',
+                                        transport_url='')
+        mock_gbh.return_value = objects.HostMapping(cell_mapping=fake_cell)
+        with mock.patch.object(self.conductor_manager,
+                               '_drain_host') as mock_drain:
+            self.conductor_manager._drain_host_in_cell(
+                self.context, 'host1', 3)
+        mock_gbh.assert_called_once_with(self.context, 'host1')
+        mock_target.assert_called_once_with(self.context, fake_cell)
+        mock_drain.assert_called_once_with(mock.sentinel.cctxt, 'host1', 3)
+
+    @mock.patch('nova.objects.HostMapping.get_by_host',
+                side_effect=exc.HostMappingNotFound(name='host1'))
+    def test_drain_host_in_cell_fails(self, mock_gbh):
+        self.conductor_manager._drain_host_in_cell(self.context, 'host1', 3)
+        self.assertIn('Failed to drain host host1',
+                      self.stdlog.logger.output)
+
+    def _fake_drain_instance(self, uuid, memory_mb):
+        return objects.Instance(
+            uuid=uuid, flavor=objects.Flavor(memory_mb=memory_mb))
+
+    @mock.patch('time.sleep')
+    @mock.patch('nova.compute.utils.get_drain_host_progress')
+    @mock.patch('nova.objects.Migration.get_by_id')
+    @mock.patch('nova.compute.utils.get_live_migration_dirty_ratios')
+    @mock.patch('nova.objects.InstanceList.get_by_filters')
+    @mock.patch('nova.objects.MigrationList.get_by_filters',
+                return_value=objects.MigrationList(objects=[]))
+    def test_drain_host_ordering_and_concurrency(
+            self, mock_get_migrations, mock_get_instances, mock_ratios,
+            mock_get_migration, mock_progress, mock_sleep):
+        self.flags(max_concurrent_live_migrations=2)
+        instances = [self._fake_drain_instance(uuids.big, 4096),
+                     self._fake_drain_instance(uuids.busy, 1024),
+                     self._fake_drain_instance(uuids.small, 512),
+                     self._fake_drain_instance(uuids.gone, 256)]
+        mock_get_instances.return_value = objects.InstanceList(
+            objects=instances)
+        mock_ratios.return_value = {uuids.big: 1.0, uuids.busy: 2.5,
+                                    uuids.small: 1.0, uuids.gone: 1.0}
+        mock_progress.return_value = {
+            'instances': 1, 'migrations': 1, 'memory_remaining': 0,
+            'throughput': 0, 'eta': None}
+
+        migrations = {
+            uuids.small: objects.Migration(id=1, dest_compute='dest1'),
+            uuids.busy: objects.Migration(id=2, dest_compute='dest2'),
+            uuids.big: objects.Migration(id=3, dest_compute='dest1'),
+        }
+        # The migration of the smallest instance completes at the first
+        # poll, the others fail and complete at the second poll.
+        statuses = {1: ['completed'], 2: ['running', 'failed'],
+                    3: ['completed']}
+
+        def fake_get_migration(context, migration_id):
+            return objects.Migration(
+                id=migration_id, status=statuses[migration_id].pop(0))
+
+        mock_get_migration.side_effect = fake_get_migration
+        started = []
+
+        def fake_drain_live_migrate(context, instance, ignore_hosts):
+            started.append(instance.uuid)
+            return migrations.get(instance.uuid)
+
+        with test.nested(
+            mock.patch.object(self.conductor_manager, '_drain_live_migrate',
+                              side_effect=fake_drain_live_migrate),
+            mock.patch.object(self.conductor_manager,
+                              '_get_busy_destinations', return_value=[]),
+        ) as (mock_migrate, mock_busy):
+            self.conductor_manager._drain_host(self.context, 'host1', None)
+
+        mock_get_instances.assert_called_once_with(
+            self.context, {'host': 'host1', 'deleted': False,
+                           'vm_state': [vm_states.ACTIVE, vm_states.PAUSED]},
+            expected_attrs=['flavor'])
+        # The cheapest instances to move go first, where the cost of the
+        # 1G instance is inflated by how much memory it dirtied.
+        self.assertEqual(
+            [uuids.gone, uuids.small, uuids.busy, uuids.big], started)
+        # 'gone' is skipped so 'small' and 'busy' start first; 'big' only
+        # starts once 'small' completed.
+        self.assertEqual(
+            [mock.call(1), mock.call(2), mock.call(2), mock.call(3)],
+            [mock.call(c[0][1]) for c in mock_get_migration.call_args_list])
+        self.assertEqual(2, mock_sleep.call_count)
+        self.assertEqual(4, mock_busy.call_count)
+        logtext = self.stdlog.logger.output
+        self.assertIn('2 instances migrated, 1 failed, 1 skipped', logtext)
+
+    @mock.patch('time.sleep')
+    @mock.patch('nova.compute.utils.get_drain_host_progress')
+    @mock.patch('nova.objects.Migration.get_by_id')
+    @mock.patch('nova.compute.utils.get_live_migration_dirty_ratios')
+    @mock.patch('nova.objects.InstanceList.get_by_filters')
+    @mock.patch('nova.objects.MigrationList.get_by_filters')
+    def test_drain_host_resume(
+            self, mock_get_migrations, mock_get_instances, mock_ratios,
+            mock_get_migration, mock_progress, mock_sleep):
+        self.flags(max_concurrent_live_migrations=1)
+        # The live migration of an instance started by an interrupted drain
+        # of the host is still running
+        mock_get_migrations.return_value = objects.MigrationList(objects=[
+            objects.Migration(id=1, instance_uuid=uuids.migrating)])
+        mock_get_instances.return_value = objects.InstanceList(objects=[
+            self._fake_drain_instance(uuids.migrating, 512),
+            self._fake_drain_instance(uuids.instance, 512)])
+        mock_ratios.return_value = {uuids.instance: 1.0}
+        mock_progress.return_value = {
+            'instances': 2, 'migrations': 1, 'memory_remaining': 0,
+            'throughput': 0, 'eta': None}
+        statuses = {1: ['running', 'completed'], 2: ['completed']}
+        mock_get_migration.side_effect = (
+            lambda context, migration_id: objects.Migration(
+                id=migration_id, status=statuses[migration_id].pop(0)))
+
+        with test.nested(
+            mock.patch.object(self.conductor_manager, '_drain_live_migrate',
+                              return_value=objects.Migration(id=2)),
+            mock.patch.object(self.conductor_manager,
+                              '_get_busy_destinations', return_value=[]),
+        ) as (mock_migrate, mock_busy):
+            self.conductor_manager._drain_host(self.context, 'host1', None)
+
+        mock_get_migrations.assert_called_once_with(
+            self.context, {
+                'source_compute': 'host1',
+                'migration_type': 'live-migration',
+                'status': list(
+                    compute_utils.LIVE_MIGRATION_IN_PROGRESS_STATUSES)})
+        # The instance being migrated is not migrated again, and the other
+        # one waits for its live migration to complete.
+        mock_migrate.assert_called_once_with(
+            self.context, mock_get_instances.return_value[1], [])
+        self.assertEqual(
+            [mock.call(1), mock.call(1), mock.call(2)],
+            [mock.call(c[0][1]) for c in mock_get_migration.call_args_list])
+        self.assertIn('2 instances migrated, 0 failed, 0 skipped',
+                      self.stdlog.logger.output)
+
+    @mock.patch('nova.objects.MigrationList.get_by_filters')
+    def test_drain_host_busy_destinations(self, mock_get_migrations):
+        mock_get_migrations.return_value = objects.MigrationList(objects=[
+            objects.Migration(dest_compute='dest1'),
+            objects.Migration(dest_compute='dest1'),
+            objects.Migration(dest_compute='dest2'),
+            objects.Migration(dest_compute=None),
+        ])
+        self.assertEqual(
+            ['dest1'],
+            self.conductor_manager._get_busy_destinations(self.context, 2))
+        mock_get_migrations.assert_called_once_with(
+            self.context, {
+                'migration_type': 'live-migration',
+                'status': list(
+                    compute_utils.LIVE_MIGRATION_IN_PROGRESS_STATUSES)})
+
+        mock_get_migrations.reset_mock()
+        self.assertEqual(
+            [], self.conductor_manager._get_busy_destinations(self.context, 0))
+        mock_get_migrations.assert_not_called()
+
+    @mock.patch('nova.compute.utils.EventReporter')
+    @mock.patch('nova.objects.RequestSpec.get_by_instance_uuid')
+    @mock.patch('nova.objects.InstanceAction.action_start')
+    def test_drain_live_migrate(self, mock_action, mock_get_spec,
+                                mock_reporter):
+        instance = self._fake_drain_instance(uuids.instance, 512)
+        request_spec = objects.RequestSpec()
+        mock_get_spec.return_value = request_spec
+        with test.nested(
+            mock.patch.object(instance, 'save'),
+            mock.patch.object(self.conductor_manager, '_live_migrate',
+                              return_value=mock.sentinel.migration),
+        ) as (mock_save, mock_live_migrate):
+            self.assertEqual(
+                mock.sentinel.migration,
+                self.conductor_manager._drain_live_migrate(
+                    self.context, instance, ['dest1']))
+        self.assertEqual(task_states.MIGRATING, instance.task_state)
+        mock_save.assert_called_once_with(expected_task_state=[None])
+        mock_action.assert_called_once_with(
+            self.context, uuids.instance, instance_actions.LIVE_MIGRATION,
+            want_result=False)
+        self.assertEqual(['dest1'], request_spec.ignore_hosts)
+        mock_live_migrate.assert_called_once_with(
+            self.context, instance, {'host': None}, block_migration=None,
+            disk_over_commit=None, request_spec=request_spec)
+
+    def test_drain_live_migrate_busy_instance(self):
+        instance = self._fake_drain_instance(uuids.instance, 512)
+        with test.nested(
+            mock.patch.object(
+                instance, 'save',
+                side_effect=exc.UnexpectedTaskStateError(
+                    instance_uuid=uuids.instance, expected=None,
+                    actual=task_states.REBOOTING)),
+            mock.patch.object(self.conductor_manager, '_live_migrate'),
+        ) as (mock_save, mock_live_migrate):
+            self.assertIsNone(self.conductor_manager._drain_live_migrate(
+                self.context, instance, []))
+        mock_live_migrate.assert_not_called()
+
+    @mock.patch('nova.compute.utils.EventReporter')
+    @mock.patch('nova.objects.RequestSpec.get_by_instance_uuid')
+    @mock.patch('nova.objects.InstanceAction.action_start')
+    def test_drain_live_migrate_fails(self, mock_action, mock_get_spec,
+                                      mock_reporter):
+        instance = self._fake_drain_instance(uuids.instance, 512)
+        mock_get_spec.return_value = objects.RequestSpec()
+        with test.nested(
+            mock.patch.object(instance, 'save'),
+            mock.patch.object(self.conductor_manager, '_live_migrate',
+                              side_effect=exc.NoValidHost(reason='')),
+        ) as (mock_save, mock_live_migrate):
+            self.assertIsNone(self.conductor_manager._drain_live_migrate(
+                self.context, instance, []))
+        self.assertIn('Failed to live migrate instance while draining',
+                      self.stdlog.logger.output)
+
 
 @ddt.ddt
 class TestConductorTaskManager(test.NoDBTestCase):
@@ -18,9 +18,11 @@
 
 import copy
 import datetime
+import os
 from unittest import mock
 
 from dateutil import parser as dateutil_parser
+import fixtures
 import netaddr
 from oslo_db import api as oslo_db_api
 from oslo_db import exception as db_exc
@@ -298,6 +300,189 @@ class DecoratorTestCase(test.TestCase):
         self._test_pick_context_manager_disable_db_access(func)
 
 
+class ReplicaRoutingTestCase(test.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.flags(read_paths=['servers-detail'], group='database_replica')
+        self.ctxt = context.get_admin_context()
+        self.ctxt.replica_read_path = 'servers-detail'
+        self.addCleanup(db._REPLICA_LAG_CACHE.clear)
+
+    @mock.patch.object(enginefacade._TransactionContextManager, 'using')
+    @mock.patch.object(enginefacade._TransactionContextManager, '_clone')
+    def _test_reader_mode(self, decorator, expected_mode, mock_clone,
+                          mock_using):
+        @decorator
+        def func(context):
+            pass
+
+        mock_clone.return_value = enginefacade._TransactionContextManager()
+        func(self.ctxt)
+
+        mock_clone.assert_called_once_with(mode=expected_mode)
+        mock_using.assert_called_once_with(self.ctxt)
+
+    def test_pick_context_manager_reader(self):
+        self._test_reader_mode(
+            db.pick_context_manager_reader, enginefacade._ASYNC_READER)
+
+    def test_pick_context_manager_reader_allow_async(self):
+        self._test_reader_mode(
+            db.pick_context_manager_reader_allow_async,
+            enginefacade._ASYNC_READER)
+
+    def test_select_db_reader_mode(self):
+        self._test_reader_mode(
+            db.select_db_reader_mode, enginefacade._ASYNC_READER)
+
+    def test_path_not_configured(self):
+        self.ctxt.replica_read_path = 'hypervisors'
+        self.assertFalse(db._use_replica(self.ctxt))
+        self._test_reader_mode(
+            db.pick_context_manager_reader, enginefacade._READER)
+
+    def test_no_path(self):
+        self.ctxt.replica_read_path = None
+        self.assertFalse(db._use_replica(self.ctxt))
+
+    def test_read_your_writes(self):
+        other_ctxt = context.get_admin_context()
+        other_ctxt.replica_read_path = 'servers-detail'
+        self.assertTrue(db._use_replica(self.ctxt))
+
+        @db.pick_context_manager_writer
+        def func(context):
+            pass
+
+        func(self.ctxt)
+        # Reads now go to the primary for this request only
+        self.assertFalse(db._use_replica(self.ctxt))
+        self.assertTrue(db._use_replica(other_ctxt))
+        # Including for its contexts targeting cells
+        with context.target_cell(self.ctxt, None) as cctxt:
+            self.assertFalse(db._use_replica(cctxt))
+
+    def test_read_your_writes_target_cell(self):
+        @db.pick_context_manager_writer
+        def func(context):
+            pass
+
+        with context.target_cell(self.ctxt, None) as cctxt:
+            func(cctxt)
+        # The write made through the copy targeting a cell is seen by the
+        # request and its later copies.
+        self.assertFalse(db._use_replica(self.ctxt))
+        with context.target_cell(self.ctxt, None) as cctxt:
+            self.assertFalse(db._use_replica(cctxt))
+
+    def test_write_without_path_not_recorded(self):
+        self.ctxt.replica_read_path = None
+        db._record_replica_write(self.ctxt)
+        self.assertFalse(self.ctxt.db_written)
+
+    @mock.patch.object(db, 'get_replica_lag')
+    def test_max_lag(self, mock_lag):
+        self.flags(max_lag=30, group='database_replica')
+        mock_lag.return_value = 10
+        self.assertTrue(db._use_replica(self.ctxt))
+        mock_lag.assert_called_once_with(self.ctxt)
+
+        # The lag is cached
+        mock_lag.return_value = 60
+        self.assertTrue(db._use_replica(self.ctxt))
+        mock_lag.assert_called_once_with(self.ctxt)
+
+        db._REPLICA_LAG_CACHE.clear()
+        self.assertFalse(db._use_replica(self.ctxt))
+
+        # The lag is unknown
+        db._REPLICA_LAG_CACHE.clear()
+        mock_lag.return_value = None
+        self.assertFalse(db._use_replica(self.ctxt))
+
+    @mock.patch('time.monotonic')
+    @mock.patch.object(db, 'get_replica_lag', return_value=10)
+    def test_max_lag_check_interval(self, mock_lag, mock_monotonic):
+        self.flags(max_lag=30, lag_check_interval=5, group='database_replica')
+        mock_monotonic.return_value = 100
+        self.assertTrue(db._use_replica(self.ctxt))
+        mock_monotonic.return_value = 104
+        self.assertTrue(db._use_replica(self.ctxt))
+        self.assertEqual(1, mock_lag.call_count)
+        mock_monotonic.return_value = 105
+        self.assertTrue(db._use_replica(self.ctxt))
+        self.assertEqual(2, mock_lag.call_count)
+
+    @mock.patch.object(db, 'get_replica_lag', side_effect=db_exc.DBError)
+    def test_max_lag_error(self, mock_lag):
+        self.flags(max_lag=30, group='database_replica')
+        self.assertFalse(db._use_replica(self.ctxt))
+
+    def test_query(self):
+        # Without a replica, the asynchronous reader uses the primary
+        db.instance_create(context.get_admin_context(), {})
+        self.assertEqual(1, len(db.instance_get_all(self.ctxt)))
+
+
+class ReplicaRoutingCellsTestCase(test.NoDBTestCase):
+    """Test the replica routing of contexts targeting cell databases.
+
+    This does not use the cell databases fixture, which replaces the context
+    managers of the cells.
+    """
+
+    def setUp(self):
+        super().setUp()
+        tmpdir = self.useFixture(fixtures.TempDir()).path
+        self.urls = {
+            name: 'sqlite:///' + os.path.join(tmpdir, name + '.db')
+            for name in ('cell1', 'cell2', 'replica')}
+        self.flags(read_paths=['servers-detail'], group='database_replica')
+        self.flags(connection=self.urls['cell1'],
+                   slave_connection=self.urls['replica'], group='database')
+        self.ctxt = context.get_admin_context()
+        self.ctxt.replica_read_path = 'servers-detail'
+
+    def test_only_main_database_routed(self):
+        cell1 = db.create_context_manager()
+        cell1_by_url = db.create_context_manager(self.urls['cell1'])
+        cell2 = db.create_context_manager(self.urls['cell2'])
+
+        self.assertTrue(db._use_replica(self.ctxt))
+        for ctxt_mgr, expected in ((cell1, True), (cell1_by_url, True),
+                                   (cell2, False)):
+            self.ctxt.db_connection = ctxt_mgr
+            self.assertEqual(expected, db._use_replica(self.ctxt))
+        # Context managers which were not created for a cell connection are
+        # not routed either
+        self.ctxt.db_connection = enginefacade.transaction_context()
+        self.assertFalse(db._use_replica(self.ctxt))
+
+    def test_get_replica_lag_other_cell(self):
+        # The lag of the [database] replica is not the one of another cell
+        self.ctxt.db_connection = db.create_context_manager(
+            self.urls['cell2'])
+        self.assertIsNone(db.get_replica_lag(self.ctxt))
+
+    @mock.patch.object(enginefacade._TransactionContextManager, 'using')
+    @mock.patch.object(enginefacade._TransactionContextManager, '_clone')
+    def test_other_cell_reads_from_cell(self, mock_clone, mock_using):
+        # Every cell context manager is configured with [database]
+        # slave_connection, so its asynchronous reader must not be used for
+        # the other cells.
+        self.ctxt.db_connection = db.create_context_manager(
+            self.urls['cell2'])
+        mock_clone.return_value = enginefacade._TransactionContextManager()
+
+        @db.pick_context_manager_reader
+        def func(context):
+            pass
+
+        func(self.ctxt)
+
+        mock_clone.assert_called_once_with(mode=enginefacade._READER)
+
+
 def _get_fake_aggr_values():
     return {'name': 'fake_aggregate'}
 
@@ -531,6 +716,50 @@ class UnsupportedDbRegexpTestCase(DbTestCase):
                     marker = insts[-1]['uuid']
                     self.assertEqual(correct[-1]['uuid'], marker)
 
+    def test_instance_get_all_by_filters_sort_keys_paginate_by_values(self,
+            mock_get_regexp):
+        '''Verifies sort order with keyset pagination.'''
+        test1_active = self.create_instance_with_args(
+                            display_name='test1',
+                            vm_state=vm_states.ACTIVE)
+        test1_error = self.create_instance_with_args(
+                           display_name='test1',
+                           vm_state=vm_states.ERROR)
+        test2_active = self.create_instance_with_args(
+                            display_name='test2',
+                            vm_state=vm_states.ACTIVE)
+        test2_error = self.create_instance_with_args(
+                           display_name='test2',
+                           vm_state=vm_states.ERROR)
+        sort_keys = ['display_name', 'vm_state', 'uuid']
+        sort_dirs = ['asc', 'desc', 'asc']
+        correct_order = [test1_error, test1_active,
+                         test2_error, test2_active]
+
+        for limit in range(1, 4):
+            marker_values = None
+            for i in range(0, 5, limit):
+                correct = correct_order[i:i + limit]
+                insts = db.instance_get_all_by_filters_sort(
+                    self.context, {}, limit=limit, sort_keys=sort_keys,
+                    sort_dirs=sort_dirs, marker_values=marker_values)
+                self.assertEqual([inst['uuid'] for inst in correct],
+                                 [inst['uuid'] for inst in insts])
+                if correct:
+                    marker_values = [insts[-1][key] for key in sort_keys]
+
+        # The values need not match an existing instance
+        insts = db.instance_get_all_by_filters_sort(
+            self.context, {}, sort_keys=sort_keys, sort_dirs=sort_dirs,
+            marker_values=['test1z'])
+        self.assertEqual([test2_error['uuid'], test2_active['uuid']],
+                         [inst['uuid'] for inst in insts])
+
+        self.assertRaises(exception.InvalidInput,
+                          db.instance_get_all_by_filters_sort,
+                          self.context, {}, marker=test1_error['uuid'],
+                          marker_values=['test1'])
+
     def test_instance_get_deleted_by_filters_sort_keys_paginate(self,
             mock_get_regexp):
         '''Verifies sort order with pagination for deleted instances.'''
@@ -769,6 +998,21 @@ class SqlAlchemyDbApiTestCase(DbTestCase):
         self.assertIn('info_cache', instance)
         self.assertIn('security_groups', instance)
 
+    def test_instance_get_all_by_host_fills_metadata(self):
+        self.create_instance_with_args(metadata={'foo': 'bar'},
+                                       system_metadata={'baz': 'qux'})
+
+        result = db.instance_get_all_by_host(
+            context.get_admin_context(), 'host1')
+
+        self.assertEqual(1, len(result))
+        self.assertEqual([('foo', 'bar')],
+                         [(row['key'], row['value'])
+                          for row in result[0]['metadata']])
+        self.assertEqual([('baz', 'qux')],
+                         [(row['key'], row['value'])
+                          for row in result[0]['system_metadata']])
+
     def test_instance_get_all_by_host_no_joins(self):
         """Tests that we don't join on the info_cache and security_groups
         tables if columns_to_join is an empty list.
@@ -787,6 +1031,38 @@ class SqlAlchemyDbApiTestCase(DbTestCase):
         self.assertNotIn('info_cache', instance)
         self.assertNotIn('security_groups', instance)
 
+    def test_instance_get_all_by_host_read_deleted(self):
+        ctxt = context.get_admin_context()
+        self.create_instance_with_args()
+        instance = self.create_instance_with_args()
+        db.instance_destroy(ctxt, instance['uuid'])
+
+        self.assertEqual(1, len(db.instance_get_all_by_host(ctxt, 'host1')))
+        # The statement for each value of read_deleted is cached separately
+        ctxt.read_deleted = 'yes'
+        self.assertEqual(2, len(db.instance_get_all_by_host(ctxt, 'host1')))
+        ctxt.read_deleted = 'only'
+        result = db.instance_get_all_by_host(ctxt, 'host1')
+        self.assertEqual([instance['uuid']], [i['uuid'] for i in result])
+
+    def test_cached_statement(self):
+        build = mock.Mock(side_effect=[mock.sentinel.stmt1,
+                                       mock.sentinel.stmt2])
+        self.addCleanup(db._STATEMENT_CACHE.pop, ('test', 1), None)
+        self.addCleanup(db._STATEMENT_CACHE.pop, ('test', 2), None)
+
+        self.assertEqual(mock.sentinel.stmt1,
+                         db._cached_statement(('test', 1), build))
+        self.assertEqual(mock.sentinel.stmt1,
+                         db._cached_statement(('test', 1), build))
+        self.assertEqual(mock.sentinel.stmt2,
+                         db._cached_statement(('test', 2), build))
+        self.assertEqual(2, build.call_count)
+
+    def test_model_select_invalid_read_deleted(self):
+        self.assertRaises(ValueError, db._model_select, models.Instance,
+                          'maybe')
+
     def test_instance_get_all_uuids_by_hosts(self):
         ctxt = context.get_admin_context()
         self.create_instance_with_args()
@@ -2423,6 +2699,97 @@ class InstanceTestCase(test.TestCase, ModelsObjectComparatorMixin):
         else:
             self.fail('UnexpectedDeletingTaskStateError was not raised')
 
+    def test_instance_update_on_match(self):
+        instance = self.create_instance_with_args(
+            task_state=task_states.SCHEDULING)
+
+        new = db.instance_update_on_match(
+            self.ctxt, instance['uuid'], {
+                'host': 'h2', 'metadata': {'mk1': 'mv3'},
+                'expected_task_state': [task_states.SCHEDULING, None],
+                'task_state': None,
+            }, expected={'host': 'h1'},
+            extra_values={'numa_topology': 'changed'})
+
+        self.assertEqual('h2', new['host'])
+        self.assertIsNone(new['task_state'])
+        self.assertEqual({'mk1': 'mv3'}, utils.metadata_to_dict(
+            new['metadata']))
+        inst_extra = db.instance_extra_get_by_instance_uuid(
+            self.ctxt, instance['uuid'])
+        self.assertEqual('changed', inst_extra.numa_topology)
+
+    def test_instance_update_on_match_expected_none(self):
+        instance = self.create_instance_with_args(host=None)
+
+        new = db.instance_update_on_match(
+            self.ctxt, instance['uuid'],
+            {'host': 'h1', 'expected_task_state': None},
+            expected={'host': None})
+        self.assertEqual('h1', new['host'])
+
+    def test_instance_update_on_match_expected_task_state_fail(self):
+        instance = self.create_instance_with_args(
+            task_state=task_states.DELETING)
+
+        try:
+            db.instance_update_on_match(
+                self.ctxt, instance['uuid'], {
+                    'host': None,
+                    'expected_task_state': [task_states.SCHEDULING, None]
+                }, extra_values={'numa_topology': 'changed'})
+        except exception.UnexpectedDeletingTaskStateError as ex:
+            self.assertEqual(ex.kwargs['instance_uuid'], instance['uuid'])
+            self.assertEqual(ex.kwargs['actual'],
+                             {'task_state': task_states.DELETING})
+            self.assertEqual(ex.kwargs['expected'],
+                             {'task_state': [task_states.SCHEDULING, None]})
+        else:
+            self.fail('UnexpectedDeletingTaskStateError was not raised')
+
+        # Nothing was updated
+        inst = db.instance_get_by_uuid(self.ctxt, instance['uuid'])
+        self.assertEqual('h1', inst['host'])
+        inst_extra = db.instance_extra_get_by_instance_uuid(
+            self.ctxt, instance['uuid'])
+        self.assertIsNone(inst_extra.numa_topology)
+
+    def test_instance_update_on_match_expected_host_fail(self):
+        instance = self.create_instance_with_args()
+
+        try:
+            db.instance_update_on_match(
+                self.ctxt, instance['uuid'], {'host': None},
+                expected={'host': 'h2'})
+        except exception.InstanceUpdateConflict as ex:
+            self.assertEqual(ex.kwargs['actual'], {'host': 'h1'})
+            self.assertEqual(ex.kwargs['expected'], {'host': ['h2']})
+        else:
+            self.fail('InstanceUpdateConflict was not raised')
+
+    def test_instance_update_on_match_not_found(self):
+        self.assertRaises(exception.InstanceNotFound,
+                          db.instance_update_on_match, self.ctxt,
+                          uuidsentinel.uuid1, {'host': None})
+
+    def test_instance_update_on_match_deleted(self):
+        instance = self.create_instance_with_args()
+        db.instance_destroy(self.ctxt, instance['uuid'])
+
+        self.assertRaises(exception.InstanceNotFound,
+                          db.instance_update_on_match, self.ctxt,
+                          instance['uuid'], {'host': None})
+
+    def test_instance_update_on_match_other_project(self):
+        instance = self.create_instance_with_args()
+        ctxt = context.RequestContext('user1', 'other_project')
+
+        self.assertRaises(exception.InstanceNotFound,
+                          db.instance_update_on_match, ctxt,
+                          instance['uuid'], {'host': None})
+        inst = db.instance_get_by_uuid(self.ctxt, instance['uuid'])
+        self.assertEqual('h1', inst['host'])
+
     def test_instance_update_unique_name(self):
         context1 = context.RequestContext('user1', 'p1')
         context2 = context.RequestContext('user2', 'p2')
@@ -3548,6 +3915,69 @@ class InstanceActionTestCase(test.TestCase, ModelsObjectComparatorMixin):
                                              self.ctxt.request_id)
         self.assertNotEqual('Error', action['message'])
 
+    def test_instance_action_events_record(self):
+        """Start and finish instance action events in one call."""
+        uuid1 = uuidsentinel.uuid1
+        uuid2 = uuidsentinel.uuid2
+
+        action1 = db.action_start(self.ctxt,
+                                  self._create_action_values(uuid1))
+        action2 = db.action_start(self.ctxt,
+                                  self._create_action_values(uuid2))
+        finish_values = {
+            'finish_time': timeutils.utcnow() + datetime.timedelta(seconds=5),
+            'result': 'Error'
+        }
+        records = [
+            {'finish': False, 'find_last_action': False,
+             'values': self._create_event_values(uuid1)},
+            {'finish': False, 'find_last_action': False,
+             'values': self._create_event_values(uuid2)},
+            {'finish': True, 'find_last_action': False,
+             'values': self._create_event_values(uuid1,
+                                                 extra=finish_values)},
+        ]
+
+        self.assertEqual(0, db.action_events_record(self.ctxt, records))
+
+        events = db.action_events_get(self.ctxt, action1['id'])
+        self.assertEqual(1, len(events))
+        self.assertEqual('Error', events[0]['result'])
+        action1 = db.action_get_by_request_id(self.ctxt, uuid1,
+                                              self.ctxt.request_id)
+        self.assertEqual('Error', action1['message'])
+        events = db.action_events_get(self.ctxt, action2['id'])
+        self.assertEqual(1, len(events))
+        self.assertIsNone(events[0]['result'])
+
+    def test_instance_action_events_record_skips_missing(self):
+        """Records without an action or event are skipped."""
+        uuid1 = uuidsentinel.uuid1
+        uuid2 = uuidsentinel.uuid2
+
+        action = db.action_start(self.ctxt, self._create_action_values(uuid1))
+        finish_values = {
+            'finish_time': timeutils.utcnow() + datetime.timedelta(seconds=5),
+            'result': 'Success'
+        }
+        records = [
+            # No action for this instance.
+            {'finish': False, 'find_last_action': False,
+             'values': self._create_event_values(uuid2)},
+            # No started event to finish.
+            {'finish': True, 'find_last_action': False,
+             'values': self._create_event_values(
+                 uuid1, event='other', extra=finish_values)},
+            {'finish': False, 'find_last_action': False,
+             'values': self._create_event_values(uuid1)},
+        ]
+
+        self.assertEqual(2, db.action_events_record(self.ctxt, records))
+
+        events = db.action_events_get(self.ctxt, action['id'])
+        self.assertEqual(1, len(events))
+        self.assertEqual('schedule', events[0]['event'])
+
     def test_instance_action_event_finish_error(self):
         """Finish an instance action event with an error."""
         uuid = uuidsentinel.uuid1
@@ -3785,6 +4215,57 @@ class InstanceFaultTestCase(test.TestCase, ModelsObjectComparatorMixin):
         self.assertEqual(1, len(faults[uuid]))
         self._assertEqualObjects(fault, faults[uuid][0])
 
+    def test_instance_faults_create(self):
+        """Ensure we can create several instance faults at once."""
+        uuids = [uuidsentinel.uuid1, uuidsentinel.uuid2]
+        values_list = []
+        for uuid in uuids:
+            db.instance_create(self.ctxt, {'uuid': uuid})
+            values = self._create_fault_values(uuid)
+            values['created_at'] = timeutils.utcnow()
+            values_list.append(values)
+
+        db.instance_faults_create(self.ctxt, values_list)
+
+        faults = db.instance_fault_get_by_instance_uuids(self.ctxt, uuids)
+        ignored_keys = ['deleted', 'created_at', 'updated_at',
+                        'deleted_at', 'id']
+        for values in values_list:
+            uuid = values['instance_uuid']
+            self.assertEqual(1, len(faults[uuid]))
+            self._assertEqualObjects(values, faults[uuid][0], ignored_keys)
+            self.assertIsNotNone(faults[uuid][0]['created_at'])
+
+    def test_instance_faults_create_skips_failing_faults(self):
+        uuids = [uuidsentinel.uuid1, uuidsentinel.uuid2, uuidsentinel.uuid3]
+        values_list = []
+        for uuid in uuids:
+            db.instance_create(self.ctxt, {'uuid': uuid})
+            values = self._create_fault_values(uuid)
+            values['created_at'] = timeutils.utcnow()
+            values_list.append(values)
+
+        orig_execute = sqla_session.Session.execute
+
+        def fake_execute(session, statement, params=None, *args, **kwargs):
+            # Fail the inserts of the fault of the second instance, as the
+            # foreign key would if it had been purged
+            if params and any(values['instance_uuid'] == uuidsentinel.uuid2
+                              for values in params):
+                raise db_exc.DBReferenceError(
+                    'instance_faults', 'fkey', 'instance_uuid', 'instances')
+            return orig_execute(session, statement, params, *args, **kwargs)
+
+        with mock.patch.object(sqla_session.Session, 'execute',
+                               fake_execute):
+            skipped = db.instance_faults_create(self.ctxt, values_list)
+
+        self.assertEqual(1, skipped)
+        faults = db.instance_fault_get_by_instance_uuids(self.ctxt, uuids)
+        self.assertEqual(1, len(faults[uuidsentinel.uuid1]))
+        self.assertEqual([], faults[uuidsentinel.uuid2])
+        self.assertEqual(1, len(faults[uuidsentinel.uuid3]))
+
     def test_instance_fault_get_by_instance(self):
         """Ensure we can retrieve faults for instance."""
         uuids = [uuidsentinel.uuid1, uuidsentinel.uuid2]
@@ -6081,6 +6562,84 @@ class ArchiveTestCase(test.TestCase, ModelsObjectComparatorMixin):
         self._assert_shadow_tables_empty_except(
             'shadow_instance_id_mappings')
 
+    def test_archive_deleted_rows_table_elapsed(self):
+        for uuidstr in self.uuidstrs:
+            with self.engine.connect() as conn, conn.begin():
+                conn.execute(self.instance_id_mappings.insert().values(
+                    uuid=uuidstr, deleted=1,
+                    deleted_at=timeutils.utcnow()))
+
+        table_elapsed = {}
+        results = db.archive_deleted_rows(max_rows=2,
+                                          table_elapsed=table_elapsed)
+        self.assertEqual({'instance_id_mappings': 2}, results[0])
+        self.assertEqual({'instance_id_mappings'}, set(table_elapsed))
+        elapsed = table_elapsed['instance_id_mappings']
+        self.assertGreater(elapsed, 0)
+
+        # Time is added up, for the tables rows were archived from
+        db.archive_deleted_rows(max_rows=2, table_elapsed=table_elapsed)
+        self.assertEqual({'instance_id_mappings'}, set(table_elapsed))
+        self.assertGreater(table_elapsed['instance_id_mappings'], elapsed)
+
+    def test_get_replica_lag_no_replica(self):
+        self.assertIsNone(db.get_replica_lag(context.get_admin_context()))
+
+    def _insert_shadow_instance_id_mappings(self, deleted_at):
+        for uuidstr in self.uuidstrs:
+            with self.engine.connect() as conn, conn.begin():
+                conn.execute(self.shadow_instance_id_mappings.insert().values(
+                    uuid=uuidstr, deleted=1, deleted_at=deleted_at))
+
+    def _count_shadow_instance_id_mappings(self):
+        with self.engine.connect() as conn:
+            return conn.execute(sa.select(sa.func.count()).select_from(
+                self.shadow_instance_id_mappings)).scalar()
+
+    def test_purge_shadow_tables_batch_size(self):
+        self._insert_shadow_instance_id_mappings(
+            timeutils.parse_strtime('2017-01-01T00:00:00.0'))
+        # Rows deleted after the date are kept
+        with self.engine.connect() as conn, conn.begin():
+            conn.execute(self.shadow_instance_id_mappings.update().where(
+                self.shadow_instance_id_mappings.c.uuid == self.uuidstrs[2]
+            ).values(deleted_at=timeutils.parse_strtime(
+                '2019-01-01T00:00:00.0')))
+
+        lines = []
+        deleted = db.purge_shadow_tables(
+            context.get_admin_context(),
+            timeutils.parse_strtime('2018-01-01T00:00:00.0'),
+            status_fn=lines.append, batch_size=2)
+        self.assertEqual(5, deleted)
+        self.assertEqual(1, self._count_shadow_instance_id_mappings())
+        lines = [line for line in lines
+                 if 'shadow_instance_id_mappings' in line]
+        # The rows are purged in 3 ranges of at most 2 rows
+        self.assertEqual(3, len(lines))
+        self.assertTrue(lines[0].startswith(
+            'Deleted 2 rows from shadow_instance_id_mappings with id up to'))
+        self.assertTrue(lines[2].startswith(
+            'Deleted 1 rows from shadow_instance_id_mappings'))
+
+    @mock.patch('time.sleep')
+    def test_purge_shadow_tables_max_rows_per_second(self, mock_sleep):
+        self._insert_shadow_instance_id_mappings(timeutils.utcnow())
+
+        deleted = db.purge_shadow_tables(
+            context.get_admin_context(), None, batch_size=2,
+            max_rows_per_second=1)
+        self.assertEqual(6, deleted)
+        self.assertEqual(0, self._count_shadow_instance_id_mappings())
+        # We sleep after each of the 3 batches, to stay close to a row per
+        # second. Other calls yield to other threads, with no delay.
+        delays = [call.args[0] for call in mock_sleep.call_args_list
+                  if call.args[0]]
+        self.assertEqual(3, len(delays))
+        for delay, rows in zip(delays, (2, 4, 6)):
+            self.assertLessEqual(delay, rows)
+            self.assertGreater(delay, rows - 1)
+
     def test_archive_deleted_rows_before(self):
         # Add 6 rows to table
         for uuidstr in self.uuidstrs:
@@ -55,6 +55,9 @@ class TestGetUsage(test.NoDBTestCase):
         expected = {'class:MEMORY_MB': 0, 'class:VCPU': 1, 'servers': 42,
                     'class:CUSTOM_BAREMETAL': 2}
         self.assertDictEqual(expected, usage)
+        # usages used for enforcement are never served from the cache
+        mock_placement.assert_called_once_with(
+            self.context, uuids.project, use_cache=False)
 
     def test_get_usage_bad_resources(self):
         bad_resource = ["unknown_resource"]
@@ -351,3 +354,5 @@ class GetLegacyLimitsTest(test.NoDBTestCase):
         counts = placement_limits.get_legacy_counts(
             "context", uuids.project_id)
         self.assertEqual(self.legacy, counts)
+        mock_placement.assert_called_once_with(
+            "context", uuids.project_id, use_cache=True)
@@ -518,6 +518,7 @@ class _TestInstanceObject(object):
                           mock_db_instance_info_cache_update,
                           mock_notifications_send_update):
         """Common code for testing save() for cells/non-cells."""
+        self.flags(notify_on_state_change='vm_state', group='notifications')
         old_ref = dict(self.fake_instance, host='oldhost', user_data='old',
                        vm_state='old', task_state='old')
         fake_uuid = old_ref['uuid']
@@ -578,11 +579,43 @@ class _TestInstanceObject(object):
     def test_save_exp_task_state(self):
         self._save_test_helper({'expected_task_state': ['meow']})
 
+    @mock.patch.object(notifications, 'send_update')
+    @mock.patch.object(db, 'instance_update_and_get_original')
+    @mock.patch.object(db, 'instance_extra_update_by_uuid')
+    @mock.patch.object(db, 'instance_update_on_match')
+    @mock.patch.object(db, 'instance_get_by_uuid')
+    def test_save_without_state_change_notifications(
+            self, mock_get, mock_update, mock_extra_update,
+            mock_update_and_get, mock_send):
+        old_ref = dict(self.fake_instance, vm_state='old', task_state='old')
+        fake_uuid = old_ref['uuid']
+        new_ref = dict(old_ref, vm_state='meow', task_state=None)
+        mock_get.return_value = old_ref
+        mock_update.return_value = new_ref
+
+        inst = objects.Instance.get_by_uuid(self.context, fake_uuid)
+        inst.vm_state = 'meow'
+        inst.task_state = None
+        inst.save(expected_task_state=['old'])
+
+        self.assertEqual('meow', inst.vm_state)
+        self.assertIsNone(inst.task_state)
+        self.assertEqual(set(), inst.obj_what_changed() - set(['flavor']))
+        mock_update.assert_called_once_with(
+            self.context, fake_uuid,
+            dict(vm_state='meow', task_state=None,
+                 expected_task_state=['old']),
+            columns_to_join=['info_cache'], extra_values={})
+        mock_extra_update.assert_not_called()
+        mock_update_and_get.assert_not_called()
+        mock_send.assert_not_called()
+
     @mock.patch.object(db, 'instance_update_and_get_original')
     @mock.patch.object(db, 'instance_get_by_uuid')
     @mock.patch.object(notifications, 'send_update')
     def test_save_rename_sends_notification(self, mock_send, mock_get,
                                             mock_update_and_get):
+        self.flags(notify_on_state_change='vm_state', group='notifications')
         old_ref = dict(self.fake_instance, display_name='hello')
         fake_uuid = old_ref['uuid']
         expected_updates = dict(display_name='goodbye')
@@ -639,7 +672,7 @@ class _TestInstanceObject(object):
         inst.save()
         self.assertFalse(mock_instance_extra_update.called)
 
-    @mock.patch('nova.db.main.api.instance_update_and_get_original')
+    @mock.patch('nova.db.main.api.instance_update_on_match')
     @mock.patch.object(instance.Instance, '_from_db_object')
     def test_save_does_not_refresh_pci_devices(self, mock_fdo, mock_update):
         # NOTE(danms): This tests that we don't update the pci_devices
@@ -647,7 +680,7 @@ class _TestInstanceObject(object):
         # don't necessarily want to, but because the way pci_devices is
         # currently implemented it causes versioning issues. When that is
         # resolved, this test should go away.
-        mock_update.return_value = None, None
+        mock_update.return_value = None
         inst = objects.Instance(context=self.context, id=123)
         inst.uuid = uuids.test_instance_not_refresh
         inst.pci_devices = pci_device.PciDeviceList()
@@ -656,7 +689,7 @@ class _TestInstanceObject(object):
                          mock_fdo.call_args_list[0][1]['expected_attrs'])
 
     @mock.patch('nova.db.main.api.instance_extra_update_by_uuid')
-    @mock.patch('nova.db.main.api.instance_update_and_get_original')
+    @mock.patch('nova.db.main.api.instance_update_on_match')
     @mock.patch.object(instance.Instance, '_from_db_object')
     def test_save_updates_numa_topology(self, mock_fdo, mock_update,
             mock_extra_update):
@@ -669,7 +702,7 @@ class _TestInstanceObject(object):
         fake_obj_numa_topology.instance_uuid = uuids.instance
         jsonified = fake_obj_numa_topology._to_json()
 
-        mock_update.return_value = None, None
+        mock_update.return_value = None
         inst = objects.Instance(
             context=self.context, id=123, uuid=uuids.instance)
         inst.numa_topology = fake_obj_numa_topology
@@ -682,9 +715,12 @@ class _TestInstanceObject(object):
         # orders. So we can't have mock do the comparison. Instead
         # manually compare the final parameter using our json equality
         # operator which does the right thing here.
-        mock_extra_update.assert_called_once_with(
-            self.context, inst.uuid, mock.ANY)
-        called_arg = mock_extra_update.call_args_list[0][0][2]['numa_topology']
+        # The extra values are updated along with the instance columns.
+        mock_extra_update.assert_not_called()
+        mock_update.assert_called_once_with(
+            self.context, inst.uuid, mock.ANY, columns_to_join=mock.ANY,
+            extra_values=mock.ANY)
+        called_arg = mock_update.call_args[1]['extra_values']['numa_topology']
         self.assertJsonEqual(called_arg, jsonified)
 
         mock_extra_update.reset_mock()
@@ -1937,6 +1973,58 @@ class _TestInstanceListObject(object):
         mock_fault_get.assert_called_once_with(self.context,
             [x['uuid'] for x in fake_insts])
 
+    @mock.patch.object(db, 'instance_tag_get_by_instance_uuid')
+    @mock.patch.object(db, 'instance_get_all_by_filters')
+    def test_lazy_load_bulk(self, mock_get_all, mock_get_tags):
+        inst_uuids = [uuids.inst1, uuids.inst2, uuids.inst3]
+        fakes = [self.fake_instance(i, {'uuid': inst_uuid})
+                 for i, inst_uuid in enumerate(inst_uuids)]
+        fakes_with_tags = [
+            self.fake_instance(i, {
+                'uuid': inst_uuid,
+                'tags': [{'resource_id': inst_uuid, 'tag': 'tag%i' % i}]})
+            for i, inst_uuid in enumerate(inst_uuids)]
+        # The instance already having tags should not be loaded again
+        del fakes_with_tags[0]
+        mock_get_all.side_effect = [fakes, fakes_with_tags]
+
+        inst_list = objects.InstanceList.get_by_filters(
+            self.context, {}, 'uuid', 'asc')
+        inst_list[0].tags = objects.TagList()
+        inst_list[0].obj_reset_changes()
+
+        # Loading the tags of one instance loads them for the others too
+        self.assertEqual(['tag1'], [t.tag for t in inst_list[1].tags])
+        self.assertEqual(['tag2'], [t.tag for t in inst_list[2].tags])
+        self.assertEqual([], [t.tag for t in inst_list[0].tags])
+        mock_get_all.assert_called_with(
+            test.MatchType(context.RequestContext),
+            {'uuid': [uuids.inst2, uuids.inst3]}, 'created_at', 'desc',
+            limit=None, marker=None, columns_to_join=['tags'])
+        self.assertEqual(2, mock_get_all.call_count)
+        mock_get_tags.assert_not_called()
+        for inst in inst_list:
+            self.assertEqual(set(), inst.obj_what_changed())
+        self.assertEqual(['tags'], inst_list._lazy_loads)
+
+    @mock.patch.object(db, 'instance_tag_get_by_instance_uuid')
+    @mock.patch.object(db, 'instance_get_all_by_filters')
+    def test_lazy_load_bulk_single(self, mock_get_all, mock_get_tags):
+        fakes = [self.fake_instance(1, {'uuid': uuids.inst1}),
+                 self.fake_instance(2, {'uuid': uuids.inst2})]
+        mock_get_all.return_value = fakes
+        mock_get_tags.return_value = []
+
+        inst_list = objects.InstanceList.get_by_filters(
+            self.context, {}, 'uuid', 'asc')
+        inst_list[0].tags = objects.TagList()
+
+        # Only one instance needs the tags, so they are loaded the usual way
+        self.assertEqual([], [t.tag for t in inst_list[1].tags])
+        mock_get_all.assert_called_once()
+        mock_get_tags.assert_called_once_with(
+            test.MatchType(context.RequestContext), uuids.inst2)
+
     @mock.patch('nova.context.scatter_gather_all_cells')
     def test_fill_faults(self, mock_sg):
         inst1 = objects.Instance(uuid=uuids.db_fault_1)
@@ -427,6 +427,36 @@ class _TestInstanceActionEventObject(object):
         self.assertIn('host', primitive)
         self.assertNotIn('details', primitive)
 
+    def test_pack_record(self):
+        values = {'event': 'fake-event', 'instance_uuid': 'fake-uuid'}
+        record = instance_action.InstanceActionEventList.pack_record(
+            self.context, values, finish=True)
+        self.assertEqual({'finish': True, 'values': values,
+                          'find_last_action': False}, record)
+
+    def test_pack_record_no_project(self):
+        self.context.project_id = None
+        values = {'event': 'fake-event', 'instance_uuid': 'fake-uuid'}
+        record = instance_action.InstanceActionEventList.pack_record(
+            self.context, values)
+        self.assertEqual({'finish': False, 'values': values,
+                          'find_last_action': True}, record)
+
+    @mock.patch.object(db, 'action_events_record', return_value=1)
+    def test_record_bulk(self, mock_record):
+        records = [
+            {'finish': False, 'find_last_action': False,
+             'values': {'event': 'fake-event', 'instance_uuid': 'fake-uuid',
+                        'request_id': 'fake-request'}},
+            {'finish': True, 'find_last_action': False,
+             'values': {'event': 'fake-event', 'instance_uuid': 'fake-uuid',
+                        'request_id': 'fake-request', 'result': 'Success'}},
+        ]
+        skipped = instance_action.InstanceActionEventList.record_bulk(
+            self.context, records)
+        self.assertEqual(1, skipped)
+        mock_record.assert_called_once_with(self.context, records)
+
 
 class TestInstanceActionEventObject(test_objects._LocalTest,
                                     _TestInstanceActionEventObject):
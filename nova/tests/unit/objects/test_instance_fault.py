@@ -97,6 +97,20 @@ class _TestInstanceFault(object):
         self.assertRaises(exception.ObjectActionError,
                           fault.create)
 
+    @mock.patch('nova.db.main.api.instance_faults_create', return_value=1)
+    def test_create_bulk(self, mock_create):
+        faults = [
+            {'instance_uuid': uuids.faults_instance, 'code': 456,
+             'message': 'foo', 'details': 'you screwed up',
+             'host': 'myhost'},
+            {'instance_uuid': uuids.faults_instance2, 'code': 500,
+             'message': 'bar', 'details': '', 'host': 'myhost'},
+        ]
+        skipped = instance_fault.InstanceFaultList.create_bulk(
+            self.context, faults)
+        self.assertEqual(1, skipped)
+        mock_create.assert_called_once_with(self.context, faults)
+
 
 class TestInstanceFault(test_objects._LocalTest,
                         _TestInstanceFault):
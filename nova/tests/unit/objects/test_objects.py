@@ -30,6 +30,7 @@ from oslo_versionedobjects import fixture
 
 from nova import context
 from nova import exception
+from nova.network import model as network_model
 from nova import objects
 from nova.objects import base
 from nova.objects import fields
@@ -820,6 +821,100 @@ class TestObjectMisc(_BaseTestCase):
         self.assertEqual('Service<123>', base.object_id(obj3))
 
 
+class TestObjToPrimitiveFastPath(_BaseTestCase):
+    def _sort_changes(self, primitive):
+        # NOTE: changes are built from a set, so their order is arbitrary
+        if isinstance(primitive, dict):
+            for key, value in primitive.items():
+                if key == 'nova_object.changes':
+                    value.sort()
+                else:
+                    self._sort_changes(value)
+        elif isinstance(primitive, list):
+            for value in primitive:
+                self._sort_changes(value)
+        return primitive
+
+    def _assertPrimitiveEqual(self, expected, actual):
+        self.assertEqual(self._sort_changes(expected),
+                         self._sort_changes(actual))
+
+    def _ovo_to_primitive(self, obj, *args, **kwargs):
+        ovo_cls = ovo_base.VersionedObject
+        with mock.patch.multiple(
+                base.NovaObject,
+                obj_to_primitive=ovo_cls.obj_to_primitive,
+                obj_what_changed=ovo_cls.obj_what_changed,
+                obj_attr_is_set=ovo_cls.obj_attr_is_set):
+            return obj.obj_to_primitive(*args, **kwargs)
+
+    def test_primitive_plan(self):
+        plan = {name: passthrough
+                for name, attrname, field, passthrough
+                in MyObj._obj_primitive_plan()}
+        self.assertEqual(set(MyObj.fields), set(plan))
+        self.assertTrue(plan['foo'])
+        self.assertTrue(plan['bar'])
+        self.assertFalse(plan['created_at'])
+        self.assertFalse(plan['rel_object'])
+        self.assertFalse(plan['mutable_default'])
+        self.assertIs(MyObj._obj_primitive_plan(),
+                      MyObj._obj_primitive_plan())
+
+    def test_matches_ovo(self):
+        obj = MyObj(foo=1, bar='bar', created_at=timeutils.utcnow(),
+                    rel_object=MyOwnedObject(baz=1),
+                    rel_objects=[MyOwnedObject(baz=2)],
+                    mutable_default=['a'])
+        obj.obj_reset_changes(recursive=True)
+        self._assertPrimitiveEqual(self._ovo_to_primitive(obj),
+                                   obj.obj_to_primitive())
+        self.assertNotIn('nova_object.changes', obj.obj_to_primitive())
+
+        obj.rel_object.baz = 3
+        primitive = obj.obj_to_primitive()
+        self._assertPrimitiveEqual(self._ovo_to_primitive(obj), primitive)
+        self.assertEqual(['rel_object'], primitive['nova_object.changes'])
+        self.assertEqual(['baz'],
+                         primitive['nova_object.data']['rel_object'][
+                             'nova_object.changes'])
+
+    def test_matches_ovo_backport(self):
+        obj = MyObj(foo=1, bar='bar', mutable_default=['a'])
+        self._assertPrimitiveEqual(self._ovo_to_primitive(obj, '1.1'),
+                                   obj.obj_to_primitive('1.1'))
+        self.assertEqual('oldbar',
+                         obj.obj_to_primitive('1.1')['nova_object.data'][
+                             'bar'])
+        self.assertRaises(ovo_exc.InvalidTargetVersion,
+                          obj.obj_to_primitive, '1.7')
+
+    def test_matches_ovo_nova_objects(self):
+        inst = objects.Instance(
+            uuid=uuids.instance, host='host', vm_state='active',
+            metadata={'foo': 'bar'}, launched_at=timeutils.utcnow(),
+            flavor=objects.Flavor(flavorid='1', extra_specs={'a': 'b'}),
+            info_cache=objects.InstanceInfoCache(
+                network_info=network_model.NetworkInfo()))
+        inst.obj_reset_changes(recursive=True)
+        inst.metadata['foo'] = 'baz'
+        inst.flavor.extra_specs['a'] = 'c'
+        spec = objects.RequestSpec(
+            flavor=inst.flavor, image=objects.ImageMeta(
+                properties=objects.ImageMetaProps(hw_cpu_policy='shared')),
+            scheduler_hints={'group': ['foo']}, num_instances=1)
+        insts = objects.InstanceList(objects=[inst, inst.obj_clone()])
+        manifest = ovo_base.obj_tree_get_versions('RequestSpec')
+        manifest['Flavor'] = '1.0'
+        for obj, kwargs in ((inst, {}), (insts, {}), (spec, {}),
+                            (spec, {'version_manifest': manifest})):
+            self._assertPrimitiveEqual(self._ovo_to_primitive(obj, **kwargs),
+                                       obj.obj_to_primitive(**kwargs))
+
+    def test_obj_attr_is_set_unknown(self):
+        self.assertRaises(AttributeError, MyObj().obj_attr_is_set, 'nope')
+
+
 class TestObjectSerializer(_BaseTestCase):
     def test_serialize_entity_primitive(self):
         ser = base.NovaObjectSerializer()
@@ -1109,12 +1204,12 @@ object_data = {
     'Instance': '2.8-2727dba5e4a078e6cc848c1f94f7eb24',
     'InstanceAction': '1.2-9a5abc87fdd3af46f45731960651efb5',
     'InstanceActionEvent': '1.4-5b1f361bd81989f8bb2c20bb7e8a4cb4',
-    'InstanceActionEventList': '1.1-13d92fb953030cdbfee56481756e02be',
+    'InstanceActionEventList': '1.2-12e57adbb5947729ce269dff2e620ae9',
     'InstanceActionList': '1.1-a2b2fb6006b47c27076d3a1d48baa759',
     'InstanceDeviceMetadata': '1.0-74d78dd36aa32d26d2769a1b57caf186',
     'InstanceExternalEvent': '1.5-1ec57351a9851c1eb43ccd90662d6dd0',
     'InstanceFault': '1.2-7ef01f16f1084ad1304a513d6d410a38',
-    'InstanceFaultList': '1.2-6bb72de2872fe49ded5eb937a93f2451',
+    'InstanceFaultList': '1.3-7db055cb8171466f3bce9e3bde5faabf',
     'InstanceGroup': '1.11-852ac511d30913ee88f3c3a869a8f30a',
     'InstanceGroupList': '1.8-90f8f1a445552bb3bbc9fa1ae7da27d4',
     'InstanceInfoCache': '1.5-cd8b96fefe0fc8d4d337243ba0bf0e1e',
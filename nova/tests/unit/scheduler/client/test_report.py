@@ -4781,6 +4781,108 @@ class TestUsages(SchedulerReportClientTestCase):
         self.assertDictEqual(expected, counts)
         self.assertEqual(1, mock_get.call_count)
 
+    @mock.patch('time.monotonic')
+    @mock.patch('nova.scheduler.client.report.SchedulerReportClient.get')
+    def test_get_usages_counts_cached(self, mock_get, mock_time):
+        self.flags(placement_usage_cache_ttl=10, group='quota')
+        mock_time.return_value = 100
+        project_response = fake_requests.FakeResponse(
+            200, content=jsonutils.dumps(
+                {'usages': {orc.VCPU: 2, orc.MEMORY_MB: 512}}))
+        user_response = fake_requests.FakeResponse(
+            200, content=jsonutils.dumps(
+                {'usages': {orc.VCPU: 1, orc.MEMORY_MB: 256}}))
+        mock_get.side_effect = [project_response, user_response]
+        expected = {'project': {'cores': 2, 'ram': 512},
+                    'user': {'cores': 1, 'ram': 256}}
+
+        counts = self.client.get_usages_counts_for_quota(
+            self.context, 'fake-project', user_id='fake-user',
+            use_cache=True)
+        self.assertDictEqual(expected, counts)
+        self.assertEqual(2, mock_get.call_count)
+
+        # The usages are served from the cache until the ttl expires.
+        mock_time.return_value = 109
+        counts = self.client.get_usages_counts_for_quota(
+            self.context, 'fake-project', user_id='fake-user',
+            use_cache=True)
+        self.assertDictEqual(expected, counts)
+        counts = self.client.get_usages_counts_for_limits(
+            self.context, 'fake-project', use_cache=True)
+        self.assertDictEqual({orc.VCPU: 2, orc.MEMORY_MB: 512}, counts)
+        self.assertEqual(2, mock_get.call_count)
+
+        mock_time.return_value = 110
+        mock_get.side_effect = [project_response]
+        self.client.get_usages_counts_for_limits(
+            self.context, 'fake-project', use_cache=True)
+        self.assertEqual(3, mock_get.call_count)
+        # The expired usages of the user were dropped from the cache.
+        self.assertEqual([('fake-project', None)],
+                         list(self.client._usages_cache))
+
+    @mock.patch('nova.scheduler.client.report.SchedulerReportClient.get')
+    def test_get_usages_counts_not_cached(self, mock_get):
+        mock_get.return_value = fake_requests.FakeResponse(
+            200, content=jsonutils.dumps({'usages': {orc.VCPU: 2}}))
+
+        for _ in range(2):
+            self.client.get_usages_counts_for_limits(
+                self.context, 'fake-project')
+
+        self.assertEqual(2, mock_get.call_count)
+        self.assertEqual({}, self.client._usages_cache)
+
+    @mock.patch('nova.scheduler.client.report.SchedulerReportClient.get')
+    def test_get_usages_counts_enforced_not_cached(self, mock_get):
+        self.flags(placement_usage_cache_ttl=10, group='quota')
+        mock_get.return_value = fake_requests.FakeResponse(
+            200, content=jsonutils.dumps({'usages': {orc.VCPU: 2}}))
+        self.client.get_usages_counts_for_limits(
+            self.context, 'fake-project', use_cache=True)
+
+        # Usages used to enforce quota are never served from the cache.
+        self.client.get_usages_counts_for_limits(
+            self.context, 'fake-project')
+        self.client.get_usages_counts_for_quota(
+            self.context, 'fake-project')
+
+        self.assertEqual(3, mock_get.call_count)
+
+    @mock.patch('nova.scheduler.client.report.SchedulerReportClient.get')
+    def test_get_usages_counts_failure_not_cached(self, mock_get):
+        self.flags(placement_usage_cache_ttl=10, group='quota')
+        mock_get.side_effect = [
+            fake_requests.FakeResponse(500),
+            fake_requests.FakeResponse(
+                200, content=jsonutils.dumps({'usages': {orc.VCPU: 2}}))]
+
+        self.assertRaises(exception.UsagesRetrievalFailed,
+                          self.client.get_usages_counts_for_limits,
+                          self.context, 'fake-project', use_cache=True)
+        counts = self.client.get_usages_counts_for_limits(
+            self.context, 'fake-project', use_cache=True)
+
+        self.assertEqual({orc.VCPU: 2}, counts)
+        self.assertEqual(2, mock_get.call_count)
+
+    def test_allocation_writes_invalidate_usages_cache(self):
+        self.flags(placement_usage_cache_ttl=10, group='quota')
+        for method, args in (
+                (self.client.put, ('/allocations/%s' % uuids.consumer, {})),
+                (self.client.post, ('/allocations', {})),
+                (self.client.delete, ('/allocations/%s' % uuids.consumer,))):
+            self.client._usages_cache = {('fake-project', None): (0, {})}
+            method(*args)
+            self.assertEqual({}, self.client._usages_cache)
+
+        # Other writes keep the cached usages.
+        self.client._usages_cache = {('fake-project', None): (0, {})}
+        self.client.put('/resource_providers/%s/traits' % uuids.rp, {})
+        self.assertEqual({('fake-project', None): (0, {})},
+                         self.client._usages_cache)
+
     @mock.patch('nova.scheduler.client.report.SchedulerReportClient.get')
     def test_get_usages_counts_for_limits_fails(self, mock_get):
         fake_failure_response = fake_requests.FakeResponse(500)
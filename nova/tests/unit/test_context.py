@@ -292,6 +292,7 @@ class ContextTestCase(test.NoDBTestCase):
             timestamp='2015-03-02T22:31:56.641629')
         values2 = ctx.to_dict()
         expected_values = {'auth_token': None,
+                           'db_written': False,
                            'domain': None,
                            'is_admin': False,
                            'is_admin_project': True,
@@ -302,6 +303,7 @@ class ContextTestCase(test.NoDBTestCase):
                            'read_deleted': 'no',
                            'read_only': False,
                            'remote_address': None,
+                           'replica_read_path': None,
                            'request_id':
                                'req-679033b7-1755-4929-bf85-eb3bfaef7e0b',
                            'resource_uuid': None,
@@ -318,6 +320,17 @@ class ContextTestCase(test.NoDBTestCase):
             self.assertIn(k, values2)
             self.assertEqual(values2[k], v)
 
+    def test_replica_read_path_from_dict(self):
+        ctx = context.RequestContext(
+            '111', '222', replica_read_path='servers-detail')
+        ctx2 = context.RequestContext.from_dict(ctx.to_dict())
+        self.assertEqual('servers-detail', ctx2.replica_read_path)
+        self.assertFalse(ctx2.db_written)
+
+        ctx.db_written = True
+        ctx2 = context.RequestContext.from_dict(ctx.to_dict())
+        self.assertTrue(ctx2.db_written)
+
     @mock.patch.object(context.policy, 'authorize')
     def test_can(self, mock_authorize):
         mock_authorize.return_value = True
@@ -22,8 +22,11 @@ import hmac
 import os
 import pickle
 import re
+import threading
 from unittest import mock
 
+import fixtures
+import futurist
 from keystoneauth1 import exceptions as ks_exceptions
 from keystoneauth1 import session
 from oslo_config import cfg
@@ -860,6 +863,27 @@ class OpenStackMetadataTestCase(test.TestCase):
         mdjson = mdinst.lookup("/openstack/2012-08-10/meta_data.json")
         self.assertNotIn("random_seed", jsonutils.loads(mdjson))
 
+    def test_prerender(self):
+        fakes.stub_out_key_pair_funcs(self)
+        mdinst = fake_InstanceMetadata(self, self.instance.obj_clone())
+        mdinst.prerender()
+        self.assertEqual(set(base.OPENSTACK_VERSIONS),
+                         set(mdinst.rendered_metadata))
+        # The pre-rendered object must still be cacheable.
+        pickle.dumps(mdinst, protocol=0)
+
+        with mock.patch.object(mdinst, '_render_metadata') as mock_render:
+            first = jsonutils.loads(
+                mdinst.lookup("/openstack/latest/meta_data.json"))
+            second = jsonutils.loads(
+                mdinst.lookup("/openstack/latest/meta_data.json"))
+        mock_render.assert_not_called()
+        self.assertEqual(self.instance.uuid, first['uuid'])
+        # The random seed is not part of the pre-rendered document.
+        self.assertNotEqual(first.pop('random_seed'),
+                            second.pop('random_seed'))
+        self.assertEqual(first, second)
+
     def test_project_id(self):
         fakes.stub_out_key_pair_funcs(self)
         mdinst = fake_InstanceMetadata(self, self.instance)
@@ -1056,6 +1080,104 @@ class OpenStackMetadataTestCase(test.TestCase):
                           self._test_vendordata2_response_inner_exceptional,
                           request_mock, log_mock, ks_exceptions.SSLError)
 
+    @mock.patch.object(session.Session, 'request')
+    def test_vendor_data_response_vendordata2_memoized(self, request_mock):
+        request_mock.return_value = fake_requests.FakeResponse(
+            requests.codes.OK, content='{"color": "blue"}')
+        self.flags(vendordata_providers=['DynamicJSON'],
+                   vendordata_dynamic_targets=['web@http://fake.com/foobar'],
+                   group='api')
+        mdinst = fake_InstanceMetadata(self, self.instance.obj_clone())
+
+        for version in ('2016-10-06', 'latest', 'latest'):
+            vd = jsonutils.loads(mdinst.lookup(
+                "/openstack/%s/vendor_data2.json" % version))
+            self.assertEqual({'web': {'color': 'blue'}}, vd)
+        request_mock.assert_called_once()
+
+    def _test_vendordata_dynamic_targets(self, do_request):
+        self.flags(vendordata_dynamic_targets=[
+                       'first@http://fake.com/first',
+                       'second@http://fake.com/second',
+                       'nameless',
+                       'first@http://fake.com/duplicate'],
+                   group='api')
+        provider = vendordata_dynamic.DynamicVendorData(
+            instance=self.instance)
+        with test.nested(
+            mock.patch.object(vendordata_dynamic, '_load_ks_session'),
+            mock.patch.object(provider, '_do_request',
+                              side_effect=do_request),
+        ) as (mock_session, mock_request):
+            vd = provider.get()
+        mock_session.assert_called_once_with(CONF)
+        self.assertEqual(2, mock_request.call_count)
+        mock_request.assert_has_calls([
+            mock.call('first', 'http://fake.com/first'),
+            mock.call('second', 'http://fake.com/second')], any_order=True)
+        return provider, vd
+
+    def test_vendordata_dynamic_concurrent_targets(self):
+        def do_request(name, url):
+            return {'url': url}
+
+        provider, vd = self._test_vendordata_dynamic_targets(do_request)
+        self.assertEqual({'first': {'url': 'http://fake.com/first'},
+                          'second': {'url': 'http://fake.com/second'}}, vd)
+        # The caller gets a copy of the memoized vendordata
+        vd.clear()
+        self.assertEqual(2, len(provider.get()))
+
+    @mock.patch('futurist.waiters.wait_for_all')
+    def test_vendordata_dynamic_total_timeout(self, mock_wait):
+        self.flags(vendordata_dynamic_total_timeout=1, group='api')
+        late = futurist.Future()
+
+        def fake_spawn_on(executor, func, name, url):
+            if name == 'second':
+                return late
+            future = futurist.Future()
+            future.set_result(func(name, url))
+            return future
+
+        self.useFixture(fixtures.MockPatch(
+            'nova.utils.spawn_on', side_effect=fake_spawn_on))
+        self.flags(vendordata_dynamic_targets=[
+                       'first@http://fake.com/first',
+                       'second@http://fake.com/second'],
+                   group='api')
+        provider = vendordata_dynamic.DynamicVendorData(
+            instance=self.instance)
+        with test.nested(
+            mock.patch.object(vendordata_dynamic, '_load_ks_session'),
+            mock.patch.object(provider, '_do_request',
+                              side_effect=lambda name, url: {'url': url}),
+            mock.patch.object(vendordata_dynamic.LOG, 'warning'),
+        ) as (mock_session, mock_request, mock_warning):
+            self.assertEqual({'first': {'url': 'http://fake.com/first'},
+                              'second': {}}, provider.get())
+        self.assertEqual(1, mock_wait.call_args[1]['timeout'])
+        self.assertIn('did not return data within',
+                      mock_warning.call_args[0][0])
+
+        # The late data is added to the memoized vendordata
+        late.set_result({'url': 'http://fake.com/second'})
+        self.assertEqual({'first': {'url': 'http://fake.com/first'},
+                          'second': {'url': 'http://fake.com/second'}},
+                         provider.get())
+        mock_request.assert_called_once_with('first', 'http://fake.com/first')
+
+    @mock.patch('futurist.waiters.wait_for_all')
+    def test_vendordata_dynamic_total_timeout_fatal(self, mock_wait):
+        self.flags(vendordata_dynamic_total_timeout=1,
+                   vendordata_dynamic_failure_fatal=True, group='api')
+
+        def do_request(name, url):
+            return {'url': url}
+
+        self._test_vendordata_dynamic_targets(do_request)
+        self.assertIsNone(mock_wait.call_args[1]['timeout'])
+
     def test_network_data_presence(self):
         inst = self.instance.obj_clone()
         mdinst = fake_InstanceMetadata(self, inst)
@@ -1094,6 +1216,71 @@ class OpenStackMetadataTestCase(test.TestCase):
             self.assertEqual(nw[k], v)
 
 
+class MetadataCacheWarmingTestCase(test.TestCase):
+    def setUp(self):
+        super(MetadataCacheWarmingTestCase, self).setUp()
+        self.context = context.RequestContext('fake', 'fake')
+        self.instance = fake_inst_obj(self.context)
+        self.instance.info_cache.network_info = (
+            fake_network.fake_get_instance_nw_info(self))
+        fakes.stub_out_secgroup_api(self)
+        self.flags(metadata_cache_warming=True, group='api')
+        self.flags(enabled=True, group='cache')
+        self.cache = mock.Mock()
+        self.useFixture(fixtures.MockPatch(
+            'nova.api.metadata.base._get_cache', return_value=self.cache))
+
+    def test_warm_cache(self):
+        base.warm_cache(self.instance)
+
+        # Only the entry keyed by the instance UUID is warmed, fixed IP
+        # addresses may overlap between projects.
+        self.cache.set.assert_called_once_with(
+            base.CACHE_KEY % self.instance.uuid, mock.ANY)
+        mdinst = self.cache.set.call_args[0][1]
+        self.assertIsNone(mdinst.address)
+        self.assertEqual(set(base.OPENSTACK_VERSIONS),
+                         set(mdinst.rendered_metadata))
+
+    def test_warm_cache_disabled(self):
+        for group, flags in (('api', {'metadata_cache_warming': False}),
+                             ('api', {'metadata_cache_expiration': 0}),
+                             ('cache', {'enabled': False})):
+            self.flags(group=group, **flags)
+            base.warm_cache(self.instance)
+        self.cache.set.assert_not_called()
+
+    @mock.patch.object(base, 'InstanceMetadata',
+                       side_effect=test.TestingException)
+    def test_warm_cache_fails(self, mock_md):
+        base.warm_cache(self.instance)
+        self.cache.set.assert_not_called()
+        self.assertIn('Failed to warm the metadata cache',
+                      self.stdlog.logger.output)
+
+    def test_warm_cache_vendordata_of_metadata_api(self):
+        # The warming service points at a vendordata file it does not have
+        self.flags(vendordata_providers=['StaticJSON'],
+                   vendordata_jsonfile_path='/nonexistent/vendordata.json',
+                   group='api')
+        base.warm_cache(self.instance)
+
+        self.cache.set.assert_called_once_with(
+            base.CACHE_KEY % self.instance.uuid, mock.ANY)
+        mdinst = pickle.loads(pickle.dumps(self.cache.set.call_args[0][1]))
+
+        # The metadata API serves the vendordata of its own configuration
+        with utils.tempdir() as tmpdir:
+            jsonfile = os.path.join(tmpdir, 'vendordata.json')
+            with open(jsonfile, 'w') as f:
+                f.write(jsonutils.dumps({'ldap': '10.0.0.1'}))
+            self.flags(vendordata_jsonfile_path=jsonfile, group='api')
+
+            vd = jsonutils.loads(
+                mdinst.lookup('/openstack/latest/vendor_data.json'))
+        self.assertEqual({'ldap': '10.0.0.1'}, vd)
+
+
 class MetadataHandlerTestCase(test.TestCase):
     """Test that metadata is returning proper values."""
 
@@ -1513,6 +1700,95 @@ class MetadataHandlerTestCase(test.TestCase):
         self.flags(metadata_cache_expiration=0, group='api')
         self._test__handler_with_provider_id(2)
 
+    @mock.patch.object(base, 'get_metadata_by_address',
+                       side_effect=exception.NotFound)
+    def test_metadata_handler_negative_cache(self, get_by_address):
+        self.flags(metadata_cache_expiration=15,
+                   metadata_negative_cache_expiration=5, group='api')
+        hnd = handler.MetadataRequestHandler()
+        with mock.patch('oslo_utils.timeutils.utcnow_ts',
+                        return_value=100.0) as mock_now:
+            self.assertIsNone(
+                hnd.get_metadata_by_remote_address('192.192.192.2'))
+            self.assertIsNone(
+                hnd.get_metadata_by_remote_address('192.192.192.2'))
+            self.assertEqual(1, get_by_address.call_count)
+
+            # The miss is looked up again once its cache entry expired
+            mock_now.return_value = 105.0
+            get_by_address.side_effect = None
+            get_by_address.return_value = self.mdinst
+            self.assertEqual(
+                self.mdinst,
+                hnd.get_metadata_by_remote_address('192.192.192.2'))
+            self.assertEqual(
+                self.mdinst,
+                hnd.get_metadata_by_remote_address('192.192.192.2'))
+            self.assertEqual(2, get_by_address.call_count)
+
+    @mock.patch.object(base, 'get_metadata_by_instance_id',
+                       side_effect=exception.NotFound)
+    def test_metadata_handler_negative_cache_disabled(self, get_by_uuid):
+        self.flags(metadata_cache_expiration=15,
+                   metadata_negative_cache_expiration=0, group='api')
+        hnd = handler.MetadataRequestHandler()
+        self.assertIsNone(
+            hnd.get_metadata_by_instance_id(uuids.instance, '192.192.192.2'))
+        self.assertIsNone(
+            hnd.get_metadata_by_instance_id(uuids.instance, '192.192.192.2'))
+        self.assertEqual(2, get_by_uuid.call_count)
+
+    def test_metadata_handler_negative_cache_with_provider_id(self):
+        self.flags(service_metadata_proxy=True, group='neutron')
+        self.flags(metadata_cache_expiration=15, group='api')
+        hnd = handler.MetadataRequestHandler()
+        error = webob.exc.HTTPBadRequest(explanation='no port')
+        with mock.patch.object(hnd, '_get_instance_id_from_lb',
+                               side_effect=error) as mock_get_id:
+            for i in range(2):
+                response = fake_request(
+                    None, self.mdinst,
+                    relpath="/2009-04-04/user-data",
+                    address="192.192.192.2",
+                    app=hnd,
+                    headers={'X-Forwarded-For': '192.192.192.2',
+                             'X-Metadata-Provider': 'edge-x'})
+                self.assertEqual(400, response.status_int)
+                self.assertIn('no port', response.text)
+        mock_get_id.assert_called_once_with('edge-x', '192.192.192.2')
+
+    def test_metadata_handler_coalesces_requests(self):
+        self.flags(metadata_cache_expiration=15, group='api')
+        hnd = handler.MetadataRequestHandler()
+        started = threading.Event()
+        release = threading.Event()
+
+        def fake_get_metadata(address):
+            started.set()
+            release.wait()
+            return self.mdinst
+
+        results = []
+
+        def get_metadata():
+            results.append(hnd.get_metadata_by_remote_address(
+                '192.192.192.2'))
+
+        with mock.patch.object(base, 'get_metadata_by_address',
+                               side_effect=fake_get_metadata) as mock_get:
+            threads = [threading.Thread(target=get_metadata)
+                       for i in range(3)]
+            threads[0].start()
+            started.wait()
+            for thread in threads[1:]:
+                thread.start()
+            release.set()
+            for thread in threads:
+                thread.join()
+
+        mock_get.assert_called_once_with('192.192.192.2')
+        self.assertEqual([self.mdinst] * 3, results)
+
     @mock.patch.object(neutronapi, 'get_client', return_value=mock.Mock())
     def test_metadata_lb_proxy_chain(self, mock_get_client):
 
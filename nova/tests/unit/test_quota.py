@@ -771,6 +771,47 @@ class DbQuotaDriverTestCase(test.TestCase):
                     'server_group_members': {'in_use': 0}}
         self.assertEqual(expected, actual)
 
+    def test_get_usages_counted_once_per_request(self):
+        resources = self._get_fake_countable_resources()
+        count = mock.Mock(side_effect=resources['instances'].count_as_dict)
+        for name in ('instances', 'cores', 'ram'):
+            resources[name].count_as_dict = count
+        ctxt = FakeContext('test_project', 'default')
+
+        user_usages = self.driver._get_usages(
+            ctxt, resources, 'test_project', user_id='fake_user')
+        project_usages = self.driver._get_usages(
+            ctxt, resources, 'test_project')
+
+        # The project usages are taken from the count done for the user.
+        count.assert_called_once_with(ctxt, 'test_project',
+                                      user_id='fake_user')
+        self.assertEqual({'in_use': 1}, user_usages['instances'])
+        self.assertEqual({'in_use': 2}, project_usages['instances'])
+
+        # Another request counts again.
+        self.driver._get_usages(FakeContext('test_project', 'default'),
+                                resources, 'test_project')
+        self.assertEqual(2, count.call_count)
+
+    def test_get_usages_reporting(self):
+        resources = self._get_fake_countable_resources()
+        reporting = []
+
+        def fake_count(ctxt, project_id, user_id=None):
+            reporting.append(ctxt.reporting_quota_usages)
+            return {'project': {'instances': 2}}
+
+        resources['instances'].count_as_dict = fake_count
+        ctxt = FakeContext('test_project', 'default')
+
+        self.driver._get_usages(ctxt, {'instances': resources['instances']},
+                                'test_project')
+
+        # The usages are only counted to be reported, not enforced.
+        self.assertEqual([True], reporting)
+        self.assertFalse(ctxt.reporting_quota_usages)
+
     @mock.patch('nova.quota.DbQuotaDriver._get_usages',
                 side_effect=_get_fake_get_usages())
     def test_get_user_quotas(self, mock_get_usages):
@@ -1532,9 +1573,9 @@ class DbQuotaDriverTestCase(test.TestCase):
 
         self.assertEqual(self.calls, [
                 'quota_get_all_by_project',
-                'get_project_quotas',
                 'quota_get_all_by_project_and_user',
                 '_process_quotas',
+                'get_project_quotas',
                 ])
         self.assertEqual(result, {
                 'instances': {
@@ -1672,9 +1713,9 @@ class DbQuotaDriverTestCase(test.TestCase):
 
         self.assertEqual(self.calls, [
                 'quota_get_all_by_project',
-                'get_project_quotas',
                 'quota_get_all_by_project_and_user',
                 '_process_quotas',
+                'get_project_quotas',
                 ])
         self.assertEqual(result, {
                 'instances': {
@@ -2108,14 +2149,24 @@ class QuotaCountTestCase(test.NoDBTestCase):
     @mock.patch('nova.scheduler.client.report.SchedulerReportClient.'
                 'get_usages_counts_for_quota')
     def test_cores_ram_count_placement(self, mock_get_usages):
+        ctxt = context.RequestContext('fake-user', 'fake-project')
         usages = quota._cores_ram_count_placement(
-            mock.sentinel.context, mock.sentinel.project_id,
+            ctxt, mock.sentinel.project_id,
             user_id=mock.sentinel.user_id)
         mock_get_usages.assert_called_once_with(
-            mock.sentinel.context, mock.sentinel.project_id,
-            user_id=mock.sentinel.user_id)
+            ctxt, mock.sentinel.project_id,
+            user_id=mock.sentinel.user_id, use_cache=False)
         self.assertEqual(mock_get_usages.return_value, usages)
 
+    @mock.patch('nova.scheduler.client.report.SchedulerReportClient.'
+                'get_usages_counts_for_quota')
+    def test_cores_ram_count_placement_reporting(self, mock_get_usages):
+        ctxt = context.RequestContext('fake-user', 'fake-project')
+        ctxt.reporting_quota_usages = True
+        quota._cores_ram_count_placement(ctxt, mock.sentinel.project_id)
+        mock_get_usages.assert_called_once_with(
+            ctxt, mock.sentinel.project_id, user_id=None, use_cache=True)
+
     @mock.patch('nova.objects.InstanceMappingList.get_counts')
     @mock.patch('nova.quota._cores_ram_count_placement')
     def test_instances_cores_ram_count_api_db_placement(
@@ -12,6 +12,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import base64
+import os
 from unittest import mock
 
 import oslo_messaging as messaging
@@ -20,6 +22,8 @@ from oslo_serialization import jsonutils
 
 import nova.conf
 from nova import context
+from nova import exception
+from nova.objects import service as service_obj
 from nova import rpc
 from nova import test
 
@@ -223,7 +227,7 @@ class TestRPC(test.NoDBTestCase):
 
         client = rpc.get_client(tgt, version_cap='1.0', serializer='foo')
 
-        mock_ser.assert_called_once_with('foo')
+        mock_ser.assert_called_once_with('foo', compress=True)
         mock_get.assert_called_once_with(mock_TRANSPORT,
                                          tgt, version_cap='1.0',
                                          call_monitor_timeout=None,
@@ -243,7 +247,7 @@ class TestRPC(test.NoDBTestCase):
 
         server = rpc.get_server(tgt, ends, serializer='foo')
 
-        mock_ser.assert_called_once_with('foo')
+        mock_ser.assert_called_once_with('foo', compress=True)
         access_policy = dispatcher.DefaultRPCAccessPolicy
         mock_get.assert_called_once_with(mock_TRANSPORT, tgt, ends,
                                          executor='eventlet', serializer=ser,
@@ -266,7 +270,7 @@ class TestRPC(test.NoDBTestCase):
 
         server = rpc.get_server(tgt, ends, serializer='foo')
 
-        mock_ser.assert_called_once_with('foo')
+        mock_ser.assert_called_once_with('foo', compress=True)
         access_policy = dispatcher.DefaultRPCAccessPolicy
         mock_get.assert_called_once_with(mock_TRANSPORT, tgt, ends,
                                          executor='threading', serializer=ser,
@@ -286,7 +290,7 @@ class TestRPC(test.NoDBTestCase):
 
         client = rpc.get_client(tgt, version_cap='1.0', serializer='foo')
 
-        mock_ser.assert_called_once_with('foo')
+        mock_ser.assert_called_once_with('foo', compress=True)
         mock_get.assert_called_once_with(mock_TRANSPORT,
                                          tgt, version_cap='1.0',
                                          call_monitor_timeout=None,
@@ -308,7 +312,7 @@ class TestRPC(test.NoDBTestCase):
 
         server = rpc.get_server(tgt, ends, serializer='foo')
 
-        mock_ser.assert_called_once_with('foo')
+        mock_ser.assert_called_once_with('foo', compress=True)
         access_policy = dispatcher.DefaultRPCAccessPolicy
         mock_get.assert_called_once_with(mock_TRANSPORT, tgt, ends,
                                          executor='eventlet', serializer=ser,
@@ -349,6 +353,50 @@ class TestRPC(test.NoDBTestCase):
                                                url=mock.sentinel.url,
                                                allowed_remote_exmods=exmods)
 
+    @mock.patch.object(rpc, '_COMPRESSION_ALLOWED', new=True)
+    @mock.patch('nova.objects.service.Service.get_minimum_version_multi')
+    def test_update_compression_allowed_disabled(self, mock_min):
+
+        self.assertFalse(rpc.update_compression_allowed(mock.sentinel.ctxt))
+        self.assertFalse(rpc._COMPRESSION_ALLOWED)
+        mock_min.assert_not_called()
+
+    @mock.patch.object(rpc, '_COMPRESSION_ALLOWED', new=False)
+    @mock.patch('nova.objects.service.Service.get_minimum_version_multi')
+    def test_update_compression_allowed(self, mock_min):
+        self.flags(rpc_compression_threshold=1000)
+        self.flags(connection=None, group='api_database')
+        mock_min.return_value = service_obj.RPC_PAYLOAD_COMPRESSION_VERSION
+
+        self.assertTrue(rpc.update_compression_allowed(mock.sentinel.ctxt))
+        self.assertTrue(rpc._COMPRESSION_ALLOWED)
+        mock_min.assert_called_once_with(
+            mock.sentinel.ctxt, rpc._COMPRESSION_BINARIES)
+
+        mock_min.return_value -= 1
+        self.assertFalse(rpc.update_compression_allowed(mock.sentinel.ctxt))
+        self.assertFalse(rpc._COMPRESSION_ALLOWED)
+
+    @mock.patch.object(rpc, '_COMPRESSION_ALLOWED', new=False)
+    @mock.patch('nova.objects.service.Service.get_minimum_version_multi')
+    @mock.patch('nova.objects.service.get_minimum_version_all_cells')
+    def test_update_compression_allowed_all_cells(self, mock_all, mock_min):
+        self.flags(rpc_compression_threshold=1000)
+        self.flags(connection='sqlite://', group='api_database')
+        mock_all.return_value = service_obj.RPC_PAYLOAD_COMPRESSION_VERSION - 1
+
+        self.assertFalse(rpc.update_compression_allowed(mock.sentinel.ctxt))
+        mock_all.assert_called_once_with(
+            mock.sentinel.ctxt, rpc._COMPRESSION_BINARIES)
+        mock_min.assert_not_called()
+
+        # Services which cannot look at the other cells check their own
+        mock_all.side_effect = exception.DBNotAllowed(binary='nova-compute')
+        mock_min.return_value = service_obj.RPC_PAYLOAD_COMPRESSION_VERSION
+        self.assertTrue(rpc.update_compression_allowed(mock.sentinel.ctxt))
+        mock_min.assert_called_once_with(
+            mock.sentinel.ctxt, rpc._COMPRESSION_BINARIES)
+
 
 class TestJsonPayloadSerializer(test.NoDBTestCase):
     def test_serialize_entity(self):
@@ -416,6 +464,108 @@ class TestRequestContextSerializer(test.NoDBTestCase):
 
         mock_req.from_dict.assert_called_once_with('context')
 
+    @mock.patch.object(rpc, '_COMPRESSION_ALLOWED', new=True)
+    def test_serialize_entity_compress(self):
+        self.flags(rpc_compression_threshold=100)
+        payload = {'nova_object.name': 'Instance',
+                   'nova_object.data': {'foo': 'bar' * 100}}
+        self.mock_base.serialize_entity.return_value = payload
+        ser = rpc.RequestContextSerializer(self.mock_base, compress=True)
+
+        ser_ent = ser.serialize_entity('context', 'entity')
+
+        self.assertEqual({'nova_compressed.version',
+                          'nova_compressed.codec',
+                          'nova_compressed.data'}, set(ser_ent))
+        self.assertEqual('zlib', ser_ent['nova_compressed.codec'])
+        self.assertLess(len(ser_ent['nova_compressed.data']),
+                        len(jsonutils.dumps(payload)))
+        # The payload must survive the trip through the transport
+        ser_ent = jsonutils.loads(jsonutils.dumps(ser_ent))
+
+        self.mock_base.deserialize_entity.side_effect = lambda c, e: e
+        self.assertEqual(payload, ser.deserialize_entity('context', ser_ent))
+        # Services deserialize compressed payloads even if they would not
+        # compress their own
+        self.assertEqual(payload,
+                         self.ser.deserialize_entity('context', ser_ent))
+
+        stats = rpc.get_compression_stats()['Instance']
+        self.assertGreaterEqual(stats['count'], 1)
+        self.assertGreater(stats['raw_bytes'], stats['compressed_bytes'])
+
+    @mock.patch.object(rpc, '_COMPRESSION_ALLOWED', new=True)
+    def test_serialize_entity_compress_below_threshold(self):
+        self.flags(rpc_compression_threshold=1000)
+        ser = rpc.RequestContextSerializer(self.mock_base, compress=True)
+        for entity in (None, True, 1, 'foo', ['foo'], {'foo': 'bar' * 100},
+                       # Incompressible
+                       {'foo': base64.b64encode(os.urandom(900)).decode()}):
+            self.mock_base.serialize_entity.return_value = entity
+            self.assertEqual(entity,
+                             ser.serialize_entity('context', 'entity'))
+
+    @mock.patch.object(rpc, '_COMPRESSION_ALLOWED', new=True)
+    @mock.patch.object(jsonutils, 'dump_as_bytes')
+    def test_serialize_entity_compress_below_threshold_not_encoded(
+            self, mock_dump):
+        self.flags(rpc_compression_threshold=1000)
+        ser = rpc.RequestContextSerializer(self.mock_base, compress=True)
+        entity = {'nova_object.name': 'Instance',
+                  'nova_object.data': {'foo': ['bar'] * 100}}
+        self.mock_base.serialize_entity.return_value = entity
+
+        self.assertEqual(entity, ser.serialize_entity('context', 'entity'))
+        mock_dump.assert_not_called()
+
+    def test_serialize_entity_compress_disabled(self):
+        payload = {'foo': 'bar' * 1000}
+        self.mock_base.serialize_entity.return_value = payload
+        ser = rpc.RequestContextSerializer(self.mock_base, compress=True)
+
+        self.assertEqual(payload, ser.serialize_entity('context', 'entity'))
+        self.flags(rpc_compression_threshold=100)
+        with mock.patch.object(rpc, '_COMPRESSION_ALLOWED', new=True):
+            self.assertEqual(payload,
+                             self.ser.serialize_entity('context', 'entity'))
+
+    @mock.patch.object(rpc, '_COMPRESSION_ALLOWED', new=False)
+    def test_serialize_entity_compress_not_allowed(self):
+        self.flags(rpc_compression_threshold=100)
+        payload = {'foo': 'bar' * 1000}
+        self.mock_base.serialize_entity.return_value = payload
+        ser = rpc.RequestContextSerializer(self.mock_base, compress=True)
+
+        self.assertEqual(payload, ser.serialize_entity('context', 'entity'))
+
+    def test_is_payload_larger(self):
+        for entity in ('foo', ['foo', 1, None], {'foo': {'bar': [1, 2]}},
+                       {'foo': 'bar' * 100}, ['foo'] * 100):
+            size = len(jsonutils.dumps(entity))
+            # The estimate is never larger than the actual size
+            self.assertFalse(rpc._is_payload_larger(entity, size + 1))
+            self.assertTrue(rpc._is_payload_larger(entity, size // 2))
+
+    def test_get_compression_report(self):
+        with mock.patch.object(rpc, '_COMPRESSION_STATS', new={
+                'Instance': {'count': 1, 'raw_bytes': 2000,
+                             'compressed_bytes': 500}}):
+            report = rpc.get_compression_report()
+        report.set_current_view_type('text')
+        report = str(report)
+
+        self.assertIn('Instance', report)
+        self.assertIn('raw_bytes = 2000', report)
+
+    def test_deserialize_entity_unsupported_compression(self):
+        entity = {'nova_compressed.version': 2,
+                  'nova_compressed.codec': 'zlib',
+                  'nova_compressed.data': ''}
+
+        self.assertRaises(exception.UnsupportedRPCPayloadCompression,
+                          self.ser.deserialize_entity, 'context', entity)
+        self.mock_base.deserialize_entity.assert_not_called()
+
 
 class TestProfilerRequestContextSerializer(test.NoDBTestCase):
     def setUp(self):
@@ -174,6 +174,20 @@ class ServiceTestCase(test.NoDBTestCase):
         self.assertEqual(1, service_obj.save.call_count)
         self.assertEqual(objects.service.SERVICE_VERSION, service_obj.version)
 
+    @mock.patch('nova.rpc.update_compression_allowed')
+    @mock.patch('nova.objects.service.Service.get_by_host_and_binary')
+    def test_start_updates_compression_allowed(
+            self, mock_get_by_host_and_binary, mock_update):
+        serv = service.Service(self.host, self.binary, self.topic,
+                              'nova.tests.unit.test_service.FakeManager')
+        self.addCleanup(serv.stop)
+        with mock.patch.object(serv.manager, 'pre_start_hook') as mock_hook:
+            mock_hook.side_effect = lambda *a: mock_update.assert_called_once()
+            serv.start()
+            mock_hook.assert_called_once()
+
+        mock_update.assert_called_once_with(mock.ANY)
+
     @mock.patch.object(objects.Service, 'create')
     @mock.patch.object(objects.Service, 'get_by_host_and_binary')
     def _test_service_check_create_race(self, ex,
@@ -253,6 +267,26 @@ class ServiceTestCase(test.NoDBTestCase):
         # Check service with one RPC server calls manager graceful_shutdown
         serv.manager.graceful_shutdown.assert_called_once_with()
 
+    @mock.patch('nova.servicegroup.API')
+    @mock.patch('nova.objects.service.Service.get_by_host_and_binary')
+    @mock.patch('nova.compute.utils.flush_instance_event_buffer')
+    def test_service_stop_flushes_instance_event_buffer(
+            self, mock_flush, mock_svc_get_by_host_and_binary, mock_API):
+        mock_manager = mock.Mock(target=None)
+        serv = service.Service(self.host,
+                               self.binary,
+                               self.topic,
+                               'nova.tests.unit.test_service.FakeManager')
+        serv.manager = mock_manager
+        serv.manager.additional_endpoints = []
+        serv.manager.graceful_shutdown.side_effect = (
+            lambda: mock_flush.assert_not_called())
+
+        serv.start()
+        serv.stop()
+        serv.manager.graceful_shutdown.assert_called_once_with()
+        mock_flush.assert_called_once_with()
+
     @mock.patch('nova.servicegroup.API')
     @mock.patch('nova.objects.service.Service.get_by_host_and_binary')
     @mock.patch.object(rpc, 'get_server')
@@ -456,9 +490,13 @@ class ServiceTestCase(test.NoDBTestCase):
                                self.binary,
                                self.topic,
                                'nova.tests.unit.test_service.FakeManager')
-        with mock.patch.object(serv.manager, 'reset') as mock_reset:
+        with test.nested(
+            mock.patch.object(serv.manager, 'reset'),
+            mock.patch('nova.rpc.update_compression_allowed'),
+        ) as (mock_reset, mock_update):
             serv.reset()
             mock_reset.assert_called_once_with()
+            mock_update.assert_called_once_with(mock.ANY)
 
     @mock.patch('nova.conductor.api.API.wait_until_ready')
     @mock.patch('nova.utils.raise_if_old_compute')
@@ -15740,6 +15740,108 @@ class LibvirtConnTestCase(test.NoDBTestCase,
                                             mock.call(50),
                                             mock.call(200)])
 
+    @mock.patch.object(fakelibvirt.virDomain, "migrateSetMaxDowntime")
+    def test_live_migration_monitor_adaptive_convergence(
+            self, mock_set_downtime):
+        self.flags(live_migration_adaptive_convergence=True,
+                   live_migration_downtime=500,
+                   live_migration_completion_timeout=1000000,
+                   group='libvirt')
+        # The remaining memory can be copied in 250ms
+        converging = libvirt_guest.JobInfo(
+            type=fakelibvirt.VIR_DOMAIN_JOB_UNBOUNDED,
+            memory_total=4 * units.Gi, memory_remaining=256 * units.Mi,
+            memory_bps=units.Gi)
+        domain_info_records = [
+            libvirt_guest.JobInfo(
+                type=fakelibvirt.VIR_DOMAIN_JOB_NONE),
+        ] + [converging] * 12 + [
+            "thread-finish",
+            "domain-stop",
+            libvirt_guest.JobInfo(
+                type=fakelibvirt.VIR_DOMAIN_JOB_COMPLETED),
+        ]
+
+        self._test_live_migration_monitoring(domain_info_records,
+                                             list(range(14)),
+                                             self.EXPECT_SUCCESS)
+
+        # The static downtime steps are not used
+        mock_set_downtime.assert_called_once_with(250)
+
+    @mock.patch.object(fakelibvirt.virDomain, "migrateSetMaxDowntime")
+    def test_live_migration_monitor_adaptive_convergence_abort(
+            self, mock_set_downtime):
+        self.flags(live_migration_adaptive_convergence=True,
+                   live_migration_downtime=500,
+                   group='libvirt')
+        # The guest dirties its memory as fast as it is copied
+        stuck = libvirt_guest.JobInfo(
+            type=fakelibvirt.VIR_DOMAIN_JOB_UNBOUNDED,
+            memory_total=4 * units.Gi, memory_remaining=2 * units.Gi,
+            memory_bps=units.Gi, memory_dirty_rate=units.Mi,
+            memory_page_size=units.Ki)
+        domain_info_records = [
+            libvirt_guest.JobInfo(
+                type=fakelibvirt.VIR_DOMAIN_JOB_NONE),
+        ] + [stuck] * 20 + [
+            "thread-finish",
+            "domain-stop",
+            libvirt_guest.JobInfo(
+                type=fakelibvirt.VIR_DOMAIN_JOB_CANCELLED),
+        ]
+
+        # The migration is aborted long before the completion timeout
+        self._test_live_migration_monitoring(domain_info_records,
+                                             list(range(22)),
+                                             self.EXPECT_ABORT,
+                                             expected_mig_status='cancelled')
+
+        # The max downtime is tried first
+        mock_set_downtime.assert_called_once_with(500)
+
+    @mock.patch.object(fakelibvirt.virDomain, "migrateSetMaxDowntime")
+    def test_live_migration_monitor_adaptive_convergence_timeout(
+            self, mock_set_downtime):
+        self.flags(live_migration_adaptive_convergence=True,
+                   live_migration_downtime=500,
+                   live_migration_completion_timeout=100,
+                   group='libvirt')
+        stuck = libvirt_guest.JobInfo(
+            type=fakelibvirt.VIR_DOMAIN_JOB_UNBOUNDED,
+            memory_total=4 * units.Gi, memory_remaining=2 * units.Gi,
+            memory_bps=units.Gi, memory_dirty_rate=units.Mi,
+            memory_page_size=units.Ki)
+        domain_info_records = [
+            libvirt_guest.JobInfo(
+                type=fakelibvirt.VIR_DOMAIN_JOB_NONE),
+        ] + [stuck] * 25 + [
+            "thread-finish",
+            "domain-stop",
+            libvirt_guest.JobInfo(
+                type=fakelibvirt.VIR_DOMAIN_JOB_CANCELLED),
+        ]
+        # The completion timeout expires while the migration is still
+        # being aborted by the convergence controller
+        fake_times = list(range(21)) + [10000] * 6
+        timeout_actions = []
+        timeout_action = libvirt_driver.LibvirtDriver.\
+            _live_migration_timeout_action
+
+        def fake_timeout_action(drvr, instance, guest):
+            timeout_actions.append(instance.uuid)
+            timeout_action(drvr, instance, guest)
+
+        with mock.patch.object(libvirt_driver.LibvirtDriver,
+                               '_live_migration_timeout_action',
+                               fake_timeout_action):
+            self._test_live_migration_monitoring(
+                domain_info_records, fake_times, self.EXPECT_ABORT,
+                expected_mig_status='cancelled')
+
+        # The timeout action is only taken once
+        self.assertEqual(1, len(timeout_actions))
+
     def test_live_migration_monitor_completion(self):
         self.flags(live_migration_completion_timeout=100,
                    group='libvirt')
@@ -17670,6 +17772,46 @@ class LibvirtConnTestCase(test.NoDBTestCase,
                                       filename=ephemeral_file_name,
                                       mkfs=True)
 
+    def test_run_disk_creation_tasks_serial(self):
+        self.flags(disk_creation_concurrency=1, group='libvirt')
+        tasks = [mock.Mock(return_value=i) for i in range(3)]
+        with mock.patch.object(utils, 'create_executor') as mock_executor:
+            results = libvirt_driver.LibvirtDriver._run_disk_creation_tasks(
+                mock.sentinel.instance, tasks)
+        self.assertEqual([0, 1, 2], results)
+        mock_executor.assert_not_called()
+        for task in tasks:
+            task.assert_called_once_with()
+
+    def test_run_disk_creation_tasks_concurrent(self):
+        self.flags(disk_creation_concurrency=4, group='libvirt')
+        tasks = [mock.Mock(return_value=i) for i in range(3)]
+        with mock.patch.object(
+            utils, 'create_executor', wraps=utils.create_executor,
+        ) as mock_executor:
+            results = libvirt_driver.LibvirtDriver._run_disk_creation_tasks(
+                mock.sentinel.instance, tasks)
+        self.assertEqual([0, 1, 2], results)
+        # the pool is not larger than the number of tasks
+        mock_executor.assert_called_once_with(3)
+        for task in tasks:
+            task.assert_called_once_with()
+
+    def test_run_disk_creation_tasks_concurrent_failure(self):
+        self.flags(disk_creation_concurrency=4, group='libvirt')
+        tasks = [
+            mock.Mock(side_effect=test.TestingException),
+            mock.Mock(return_value=1),
+            mock.Mock(side_effect=exception.InvalidDiskInfo(reason='foo')),
+        ]
+        self.assertRaises(
+            test.TestingException,
+            libvirt_driver.LibvirtDriver._run_disk_creation_tasks,
+            mock.sentinel.instance, tasks)
+        # every task ran to completion before the error was propagated
+        for task in tasks:
+            task.assert_called_once_with()
+
     def test_create_image_initrd(self):
         kernel_id = uuids.kernel_id
         ramdisk_id = uuids.ramdisk_id
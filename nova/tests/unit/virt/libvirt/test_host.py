@@ -20,6 +20,7 @@ from unittest import mock
 import ddt
 import eventlet
 from eventlet import tpool
+import fixtures
 from lxml import etree
 from oslo_utils.fixture import uuidsentinel as uuids
 from oslo_utils import uuidutils
@@ -1604,6 +1605,103 @@ Active:          8381604 kB
             self.assertEqual(node_devs, ret)
         mock_list_all_devices.assert_called_once_with(42)
 
+    def _enable_node_device_cache(self):
+        self.host.get_connection()
+        self.host._nodedev_events_supported = True
+        self.useFixture(fixtures.MockPatchObject(
+            host.Host, '_get_node_device_generation', return_value=1))
+
+    @mock.patch.object(fakelibvirt.virConnect, 'nodeDeviceEventRegisterAny',
+                       create=True)
+    def test_register_node_device_events(self, mock_register):
+        self.host.get_connection()
+        mock_register.assert_called_once_with(
+            None, fakelibvirt.VIR_NODE_DEVICE_EVENT_ID_LIFECYCLE,
+            self.host._event_node_device_lifecycle_callback, self.host)
+        self.assertTrue(self.host._nodedev_events_supported)
+
+    def test_node_device_cache_disabled_without_events(self):
+        # the fake connection does not support node device events
+        self.host.get_connection()
+        self.assertFalse(self.host._nodedev_events_supported)
+        with mock.patch.object(
+            self.host.get_connection(), 'listDevices', return_value=['foo'],
+        ) as mock_list:
+            self.host.list_pci_devices()
+            self.host.list_pci_devices()
+        self.assertEqual(2, mock_list.call_count)
+
+    def test_list_devices_cached(self):
+        self._enable_node_device_cache()
+        with mock.patch.object(
+            self.host.get_connection(), 'listDevices', return_value=['foo'],
+        ) as mock_list:
+            self.assertEqual(['foo'], self.host.list_pci_devices())
+            self.assertEqual(['foo'], self.host.list_pci_devices())
+            mock_list.assert_called_once_with('pci', 0)
+
+            # a node device event invalidates the cache
+            self.host._event_node_device_lifecycle_callback(
+                None, None, 0, 0, self.host)
+            self.assertEqual(['foo'], self.host.list_pci_devices())
+            self.assertEqual(2, mock_list.call_count)
+
+    def test_list_all_devices_cached(self):
+        self._enable_node_device_cache()
+        pci_dev = fakelibvirt.NodeDevice(
+            None, xml=fake_libvirt_data._fake_NodeDevXml['pci_0000_04_11_7'])
+        with mock.patch.object(
+            self.host.get_connection(), 'listAllDevices',
+            return_value=[pci_dev],
+        ) as mock_list:
+            self.assertEqual([pci_dev], self.host.list_all_devices(flags=42))
+            self.assertEqual([pci_dev], self.host.list_all_devices(flags=42))
+            mock_list.assert_called_once_with(42)
+
+            # a different set of flags is a different listing
+            self.host.list_all_devices(flags=2)
+            self.assertEqual(2, mock_list.call_count)
+
+    def test_list_devices_sysfs_generation_change(self):
+        self._enable_node_device_cache()
+        with mock.patch.object(
+            self.host.get_connection(), 'listDevices', return_value=['foo'],
+        ) as mock_list:
+            self.host.list_pci_devices()
+            host.Host._get_node_device_generation.return_value = 2
+            self.host.list_pci_devices()
+        self.assertEqual(2, mock_list.call_count)
+
+    def test_get_node_device_config_cached(self):
+        self._enable_node_device_cache()
+        # populate the cache generation
+        self.host._check_node_device_cache()
+        pci_dev = fakelibvirt.NodeDevice(
+            None, xml=fake_libvirt_data._fake_NodeDevXml['pci_0000_04_11_7'])
+        with mock.patch.object(
+            pci_dev, 'XMLDesc', wraps=pci_dev.XMLDesc,
+        ) as mock_xml:
+            cfgdev = self.host.get_node_device_config(pci_dev)
+            self.assertEqual('pci_0000_04_11_7', cfgdev.name)
+            self.assertIs(cfgdev, self.host.get_node_device_config(pci_dev))
+            self.assertIs(
+                cfgdev,
+                self.host.get_node_device_config_by_name('pci_0000_04_11_7'))
+            mock_xml.assert_called_once_with(0)
+
+            self.host._invalidate_node_device_cache()
+            self.host._check_node_device_cache()
+            self.assertIsNot(
+                cfgdev, self.host.get_node_device_config(pci_dev))
+            self.assertEqual(2, mock_xml.call_count)
+
+    @mock.patch.object(fakelibvirt.virConnect, 'nodeDeviceCreateXML')
+    def test_device_create_invalidates_cache(self, mock_create):
+        self._enable_node_device_cache()
+        self.host._check_node_device_cache()
+        self.host.device_create(vconfig.LibvirtConfigNodeDevice())
+        self.assertTrue(self.host._nodedev_cache_stale)
+
     def test_list_all_devices_raises(self):
         with mock.patch.object(
                 self.host.get_connection(),
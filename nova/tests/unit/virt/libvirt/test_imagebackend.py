@@ -517,6 +517,24 @@ class Qcow2TestCase(_ImageTestCase, test.NoDBTestCase):
         fn.assert_called_once_with(target=self.TEMPLATE_PATH, safe=False)
         mock_exists.assert_has_calls(exist_calls)
 
+    @mock.patch('nova.virt.libvirt.imagecache.fetch_deduplicated')
+    @mock.patch.object(os.path, 'exists')
+    def test_cache_deduplicated(self, mock_exists, mock_fetch_dedup):
+        self.flags(deduplicate_base_images=True, group='image_cache')
+        mock_exists.side_effect = [False, True, True, False, False]
+        image = self.image_class(self.INSTANCE, self.NAME)
+
+        def create_image(fn, base, size, safe=False, *args, **kwargs):
+            fn(target=base, *args, **kwargs)
+        image.create_image = create_image
+
+        image.cache(libvirt_utils.fetch_image, self.TEMPLATE,
+                    context=self.CONTEXT, image_id=uuids.image_id)
+
+        mock_fetch_dedup.assert_called_once_with(
+            libvirt_utils.fetch_image, target=self.TEMPLATE_PATH,
+            context=self.CONTEXT, image_id=uuids.image_id)
+
     @mock.patch.object(os.path, 'exists')
     def test_cache_image_exists(self, mock_exists):
         mock_exists.side_effect = [False, True, True, True, True]
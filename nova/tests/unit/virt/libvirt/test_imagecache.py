@@ -15,11 +15,14 @@
 
 
 import contextlib
+import hashlib
 import io
 import os
+import struct
 import time
 from unittest import mock
 
+import fixtures
 from oslo_concurrency import lockutils
 from oslo_concurrency import processutils
 from oslo_log import formatters
@@ -800,3 +803,309 @@ class ImageCacheManagerTestCase(test.NoDBTestCase):
         manager = imagecache.ImageCacheManager()
 
         self.assertEqual(0, manager.get_disk_usage())
+
+
+class ContentStoreTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(ContentStoreTestCase, self).setUp()
+        self.tmpdir = self.useFixture(fixtures.TempDir()).path
+        self.flags(instances_path=self.tmpdir)
+        self.base_dir = os.path.join(
+            self.tmpdir, CONF.image_cache.subdirectory_name)
+        os.mkdir(self.base_dir)
+        self.content_dir = os.path.join(
+            self.base_dir, imagecache.CONTENT_SUBDIRECTORY_NAME)
+        self.image_data = b'image data'
+        self.image_hash = hashlib.sha512(self.image_data).hexdigest()
+        self.image_meta = {
+            'os_hash_algo': 'sha512', 'os_hash_value': self.image_hash,
+            'checksum': 'def', 'properties': {}}
+        self.mock_get_info = self.useFixture(fixtures.MockPatch(
+            'nova.virt.images.get_info',
+            side_effect=lambda ctxt, image_id: self.image_meta)).mock
+
+    def _fake_fetch(self, context, target, image_id, trusted_certs=None):
+        with open(target, 'wb') as f:
+            f.write(self.image_data)
+
+    def test_get_content_fname(self):
+        self.flags(force_raw_images=False)
+        self.assertEqual(
+            'sha512_%s' % self.image_hash,
+            imagecache.get_content_fname(self.image_meta))
+
+    def test_get_content_fname_force_raw(self):
+        self.flags(force_raw_images=True)
+        self.assertEqual(
+            'sha512_%s_raw' % self.image_hash,
+            imagecache.get_content_fname(self.image_meta))
+
+    def test_get_content_fname_legacy_checksum(self):
+        self.flags(force_raw_images=False)
+        self.assertEqual(
+            'md5_def', imagecache.get_content_fname({'checksum': 'def'}))
+        self.assertIsNone(imagecache.get_content_fname({}))
+
+    def test_fetch_deduplicated(self):
+        self.flags(force_raw_images=False)
+        fetch = mock.Mock(side_effect=self._fake_fetch)
+        first = os.path.join(self.base_dir, 'first')
+        second = os.path.join(self.base_dir, 'second')
+
+        imagecache.fetch_deduplicated(
+            fetch, context=mock.sentinel.ctxt, target=first,
+            image_id=uuids.first)
+        fetch.assert_called_once_with(
+            context=mock.sentinel.ctxt, target=first, image_id=uuids.first,
+            trusted_certs=None)
+        content = os.path.join(self.content_dir,
+                               'sha512_%s' % self.image_hash)
+        self.assertTrue(os.path.samefile(first, content))
+
+        # the second image has the same content so it is not fetched
+        with mock.patch('nova.privsep.path.utime') as mock_utime:
+            imagecache.fetch_deduplicated(
+                fetch, context=mock.sentinel.ctxt, target=second,
+                image_id=uuids.second)
+        self.assertEqual(1, fetch.call_count)
+        self.assertTrue(os.path.samefile(second, content))
+        mock_utime.assert_called_once_with(second)
+
+    def test_fetch_deduplicated_hash_mismatch(self):
+        self.flags(force_raw_images=False)
+        # The image service reports the hash of another image.
+        self.image_data = b'other data'
+        fetch = mock.Mock(side_effect=self._fake_fetch)
+        target = os.path.join(self.base_dir, 'target')
+
+        imagecache.fetch_deduplicated(
+            fetch, context=mock.sentinel.ctxt, target=target,
+            image_id=uuids.image)
+
+        fetch.assert_called_once()
+        self.assertTrue(os.path.exists(target))
+        self.assertEqual([], os.listdir(self.content_dir))
+
+    def test_fetch_deduplicated_unknown_hash_algo(self):
+        self.flags(force_raw_images=False)
+        self.image_meta['os_hash_algo'] = 'unknown'
+        fetch = mock.Mock(side_effect=self._fake_fetch)
+        target = os.path.join(self.base_dir, 'target')
+
+        imagecache.fetch_deduplicated(
+            fetch, context=mock.sentinel.ctxt, target=target,
+            image_id=uuids.image)
+
+        fetch.assert_called_once()
+        self.assertEqual([], os.listdir(self.content_dir))
+
+    def test_fetch_deduplicated_unknown_content(self):
+        self.image_meta = {'properties': {}}
+        fetch = mock.Mock(side_effect=self._fake_fetch)
+        target = os.path.join(self.base_dir, 'target')
+
+        imagecache.fetch_deduplicated(
+            fetch, context=mock.sentinel.ctxt, target=target,
+            image_id=uuids.image)
+
+        fetch.assert_called_once_with(
+            context=mock.sentinel.ctxt, target=target, image_id=uuids.image,
+            trusted_certs=None)
+        self.assertFalse(os.path.exists(self.content_dir))
+
+    def test_fetch_deduplicated_signed_image(self):
+        self.image_meta['properties']['img_signature'] = 'signature'
+        fetch = mock.Mock(side_effect=self._fake_fetch)
+        target = os.path.join(self.base_dir, 'target')
+
+        imagecache.fetch_deduplicated(
+            fetch, context=mock.sentinel.ctxt, target=target,
+            image_id=uuids.image)
+
+        fetch.assert_called_once()
+        self.assertFalse(os.path.exists(self.content_dir))
+
+    def test_age_content_store(self):
+        os.mkdir(self.content_dir)
+        used = os.path.join(self.content_dir, 'used')
+        unused = os.path.join(self.content_dir, 'unused')
+        for path in (used, unused):
+            open(path, 'w').close()
+        os.link(used, os.path.join(self.base_dir, 'image'))
+
+        manager = imagecache.ImageCacheManager()
+        with mock.patch.object(
+            manager, '_remove_old_enough_file',
+        ) as mock_remove:
+            manager._age_content_store(self.base_dir)
+
+        mock_remove.assert_called_once_with(
+            unused,
+            CONF.image_cache.remove_unused_original_minimum_age_seconds,
+            unlinked_only=True)
+
+    def test_age_content_store_linked_while_waiting_for_lock(self):
+        os.mkdir(self.content_dir)
+        content = os.path.join(self.content_dir, 'content')
+        open(content, 'w').close()
+        os.utime(content, (0, 0))
+        manager = imagecache.ImageCacheManager()
+
+        def fake_synchronized(*args, **kwargs):
+            def wrap(f):
+                def inner(*a, **k):
+                    # An image is linked to the entry before the lock is
+                    # acquired.
+                    os.link(content, os.path.join(self.base_dir, 'image'))
+                    return f(*a, **k)
+                return inner
+            return wrap
+
+        with mock.patch('nova.utils.synchronized', fake_synchronized):
+            manager._age_content_store(self.base_dir)
+
+        self.assertTrue(os.path.exists(content))
+
+    def test_get_disk_usage_content_store(self):
+        self.flags(deduplicate_base_images=True, group='image_cache')
+        os.mkdir(self.content_dir)
+        image = os.path.join(self.base_dir, 'image')
+        with open(image, 'wb') as f:
+            f.write(b'x' * 4096)
+            f.flush()
+            os.fsync(f.fileno())
+        os.link(image, os.path.join(self.content_dir, 'content'))
+
+        manager = imagecache.ImageCacheManager()
+
+        # the hard linked file is only counted once
+        self.assertEqual(
+            os.stat(image).st_blocks * 512, manager.get_disk_usage())
+
+
+class BackingIndexTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(BackingIndexTestCase, self).setUp()
+        self.tmpdir = self.useFixture(fixtures.TempDir()).path
+        self.flags(instances_path=self.tmpdir)
+        self.instance = fake_instance.fake_instance_obj(
+            None, uuid=uuids.instance)
+        self.instance_dir = os.path.join(self.tmpdir, uuids.instance)
+        os.mkdir(self.instance_dir)
+        with open(os.path.join(self.instance_dir, 'disk'), 'w'):
+            pass
+        self.mock_get_backing = self.useFixture(fixtures.MockPatch(
+            'nova.virt.libvirt.utils.get_disk_backing_file',
+            return_value='image')).mock
+        self.backing_path = os.path.join(
+            self.tmpdir, CONF.image_cache.subdirectory_name, 'image')
+
+    def _list_backing_images(self, manager):
+        manager.unexplained_images = []
+        manager.instance_names = {uuids.instance}
+        return manager._list_backing_images()
+
+    def test_list_backing_images_uses_index(self):
+        manager = imagecache.ImageCacheManager()
+
+        self.assertEqual(
+            [self.backing_path], self._list_backing_images(manager))
+        self.assertEqual(
+            [self.backing_path], self._list_backing_images(manager))
+        self.mock_get_backing.assert_called_once_with(
+            os.path.join(self.instance_dir, 'disk'))
+
+        # the index is persisted and used by a new manager too
+        manager = imagecache.ImageCacheManager()
+        self.assertEqual(
+            [self.backing_path], self._list_backing_images(manager))
+        self.mock_get_backing.assert_called_once()
+
+    def test_list_backing_images_disk_changed(self):
+        manager = imagecache.ImageCacheManager()
+        self._list_backing_images(manager)
+
+        # recreating the disk changes its inode and the instance dir ctime
+        disk_path = os.path.join(self.instance_dir, 'disk')
+        os.rename(disk_path, disk_path + '.old')
+        with open(disk_path, 'w'):
+            pass
+        self.mock_get_backing.return_value = 'other'
+
+        self.assertEqual(
+            [os.path.join(os.path.dirname(self.backing_path), 'other')],
+            self._list_backing_images(manager))
+        self.assertEqual(2, self.mock_get_backing.call_count)
+
+    def _write_qcow2_header(self, backing_file):
+        # overwrite the disk in place, keeping its inode
+        with open(os.path.join(self.instance_dir, 'disk'), 'r+b') as f:
+            f.write(imagecache.QCOW2_MAGIC + struct.pack(
+                '>IQI', 3, 72, len(backing_file)))
+            f.seek(72)
+            f.write(backing_file.encode('utf-8'))
+
+    def test_list_backing_images_rebased_in_place(self):
+        self._write_qcow2_header('image')
+        manager = imagecache.ImageCacheManager()
+        self._list_backing_images(manager)
+
+        # an in place rebase neither changes the inode of the disk nor the
+        # ctime of the instance directory
+        self._write_qcow2_header('other')
+        self.mock_get_backing.return_value = 'other'
+        manager = imagecache.ImageCacheManager()
+
+        self.assertEqual(
+            [os.path.join(os.path.dirname(self.backing_path), 'other')],
+            self._list_backing_images(manager))
+        self.assertEqual(2, self.mock_get_backing.call_count)
+
+    def test_read_qcow2_backing_file(self):
+        disk_path = os.path.join(self.instance_dir, 'disk')
+        read = imagecache.ImageCacheManager._read_qcow2_backing_file
+
+        # raw disk
+        self.assertIsNone(read(disk_path))
+
+        self._write_qcow2_header('image')
+        self.assertEqual('image', read(disk_path))
+
+    def test_list_backing_images_prunes_index(self):
+        manager = imagecache.ImageCacheManager()
+        self._list_backing_images(manager)
+        self.assertIn(uuids.instance, manager._backing_index)
+
+        manager.instance_names = set()
+        self.assertEqual([], manager._list_backing_images())
+        self.assertEqual({}, manager._backing_index)
+        self.assertEqual({}, imagecache.ImageCacheManager()
+                         ._load_backing_index())
+
+    def test_invalidate_backing_images(self):
+        manager = imagecache.ImageCacheManager()
+        self._list_backing_images(manager)
+
+        manager.invalidate_backing_images(self.instance)
+
+        self.assertEqual({}, manager._backing_index)
+        self._list_backing_images(manager)
+        self.assertEqual(2, self.mock_get_backing.call_count)
+
+    def test_load_backing_index_corrupted(self):
+        manager = imagecache.ImageCacheManager()
+        os.makedirs(os.path.dirname(manager._backing_index_path))
+        with open(manager._backing_index_path, 'w') as f:
+            f.write('not json')
+
+        self.assertEqual({}, manager._load_backing_index())
+
+    @mock.patch('os.replace', side_effect=OSError)
+    def test_save_backing_index_error(self, mock_replace):
+        manager = imagecache.ImageCacheManager()
+
+        self.assertEqual(
+            [self.backing_path], self._list_backing_images(manager))
+        mock_replace.assert_called_once()
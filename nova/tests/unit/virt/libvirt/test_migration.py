@@ -1546,6 +1546,124 @@ class MigrationMonitorTestCase(test.NoDBTestCase):
         self.assertEqual(newdt, 200)
         mock_dt.assert_called_once_with(200)
 
+    def _get_convergence_controller(self, *samples):
+        self.flags(live_migration_downtime=500, group='libvirt')
+        controller = migration.ConvergenceController(
+            self.instance, objects.Migration(id=1), window=len(samples))
+        for now, info in enumerate(samples):
+            controller.sample(info, now)
+        return controller
+
+    def test_convergence_controller_not_enough_samples(self):
+        info = libvirt_guest.JobInfo(memory_remaining=units.Mi,
+                                     memory_bps=units.Gi)
+        controller = self._get_convergence_controller(info, info)
+        controller._samples.popleft()
+
+        self.assertEqual((controller.WAIT, None),
+                         controller.decide(None, 100))
+
+    def test_convergence_controller_switch_over(self):
+        info = libvirt_guest.JobInfo(memory_remaining=100 * units.Mi,
+                                     memory_bps=units.Gi)
+        controller = self._get_convergence_controller(info, info)
+
+        # 100MiB at 1GiB/s need 98ms of downtime
+        self.assertEqual((controller.DOWNTIME, 98),
+                         controller.decide(None, 100))
+        # the samples are discarded after every decision
+        self.assertEqual((controller.WAIT, 98),
+                         controller.decide(98, 100))
+
+        controller.sample(info, 2)
+        controller.sample(info, 3)
+        self.assertEqual((controller.WAIT, 200),
+                         controller.decide(200, 100))
+
+    def test_convergence_controller_switch_over_min_downtime(self):
+        info = libvirt_guest.JobInfo(memory_remaining=0,
+                                     memory_bps=units.Gi)
+        controller = self._get_convergence_controller(info, info)
+
+        # the downtime is not set below the first downtime step, 500ms / 10
+        self.assertEqual((controller.DOWNTIME, 50),
+                         controller.decide(None, 100))
+
+        # nor below the current downtime
+        controller.sample(info, 2)
+        controller.sample(info, 3)
+        self.assertEqual((controller.WAIT, 200),
+                         controller.decide(200, 100))
+
+    def test_convergence_controller_converging(self):
+        # 1GB/s of bandwidth and 500MB/s of dirty rate
+        info = libvirt_guest.JobInfo(
+            memory_remaining=10 * units.G, memory_bps=units.G,
+            memory_dirty_rate=500 * units.k, memory_page_size=units.k)
+        controller = self._get_convergence_controller(info, info)
+
+        # converging in 19 secs
+        self.assertEqual((controller.WAIT, 50),
+                         controller.decide(50, 20))
+        self.assertEqual((controller.WAIT, 50),
+                         controller.decide(50, None))
+
+    def test_convergence_controller_converging_too_slowly(self):
+        # 1GB/s of bandwidth and 500MB/s of progress computed from the
+        # samples
+        controller = self._get_convergence_controller(
+            libvirt_guest.JobInfo(memory_remaining=10 * units.G,
+                                  memory_processed=0),
+            libvirt_guest.JobInfo(memory_remaining=9500 * units.M,
+                                  memory_processed=units.G))
+
+        # converging in 18 secs
+        self.assertEqual((controller.DOWNTIME, 500),
+                         controller.decide(50, 10))
+        self.assertFalse(controller.escalated)
+
+    def test_convergence_controller_escalate(self):
+        info = libvirt_guest.JobInfo(
+            memory_remaining=10 * units.G, memory_bps=units.G,
+            memory_dirty_rate=units.M, memory_page_size=units.k)
+        controller = self._get_convergence_controller(info, info)
+
+        self.assertEqual((controller.DOWNTIME, 500),
+                         controller.decide(50, 1000))
+        controller.sample(info, 2)
+        controller.sample(info, 3)
+        self.assertEqual((controller.ESCALATE, 500),
+                         controller.decide(500, 1000))
+        self.assertTrue(controller.escalated)
+
+        # nothing is done once escalated
+        controller.sample(info, 4)
+        controller.sample(info, 5)
+        self.assertEqual((controller.WAIT, 500),
+                         controller.decide(500, 1000))
+
+    def test_convergence_controller_no_completion_timeout(self):
+        info = libvirt_guest.JobInfo(
+            memory_remaining=10 * units.G, memory_bps=units.G,
+            memory_dirty_rate=units.M, memory_page_size=units.k)
+        controller = self._get_convergence_controller(info, info)
+
+        self.assertEqual((controller.WAIT, 500),
+                         controller.decide(500, None))
+        self.assertFalse(controller.escalated)
+
+    @mock.patch.object(libvirt_guest.Guest,
+                       "migrate_configure_max_downtime")
+    def test_live_migration_set_downtime_err(self, mock_dt):
+        mock_dt.side_effect = fakelibvirt.make_libvirtError(
+            fakelibvirt.libvirtError,
+            "Failed to set downtime",
+            error_code=fakelibvirt.VIR_ERR_INTERNAL_ERROR)
+
+        self.assertFalse(
+            migration.set_downtime(self.guest, self.instance, 200))
+        mock_dt.assert_called_once_with(200)
+
     @mock.patch.object(objects.Instance, "save")
     @mock.patch.object(objects.Migration, "save")
     def test_live_migration_save_stats(self, mock_isave, mock_msave):
@@ -28,6 +28,7 @@ from nova import test
 from nova.tests.unit import fake_block_device
 from nova.tests.unit import fake_instance
 from nova.tests.unit import matchers
+from nova import utils
 from nova.virt import block_device as driver_block_device
 from nova.virt import driver
 from nova.virt import fake as fake_virt
@@ -1417,6 +1418,41 @@ class TestDriverBlockDevice(test.NoDBTestCase):
         self.assertFalse(hasattr(test_eph, 'refresh_connection_info'))
         self.assertFalse(hasattr(test_swap, 'refresh_connection_info'))
 
+    @mock.patch('nova.utils.create_executor')
+    def test_map_volumes_serial(self, mock_create_executor):
+        self.flags(volume_connection_concurrency=1, group='compute')
+
+        self.assertEqual(
+            [2, 4, 6], driver_block_device.map_volumes(
+                lambda volume: volume * 2, [1, 2, 3]))
+        mock_create_executor.assert_not_called()
+
+    def test_map_volumes_concurrent(self):
+        self.flags(volume_connection_concurrency=2, group='compute')
+
+        with mock.patch('nova.utils.create_executor',
+                        wraps=utils.create_executor) as mock_create_executor:
+            self.assertEqual(
+                [2, 4, 6], driver_block_device.map_volumes(
+                    lambda volume: volume * 2, [1, 2, 3]))
+        mock_create_executor.assert_called_once_with(2)
+
+    def test_map_volumes_concurrent_failure(self):
+        self.flags(volume_connection_concurrency=4, group='compute')
+        called = []
+
+        def func(volume):
+            called.append(volume)
+            if volume > 1:
+                raise test.TestingException(volume)
+
+        ex = self.assertRaises(
+            test.TestingException, driver_block_device.map_volumes,
+            func, [1, 2, 3])
+        # every volume was processed and the first error is raised
+        self.assertEqual([1, 2, 3], sorted(called))
+        self.assertEqual('2', str(ex))
+
     def test_proxy_as_attr(self):
         class A(driver_block_device.DriverBlockDevice):
             pass
@@ -15,6 +15,7 @@
 import functools
 import itertools
 
+import futurist.waiters
 from os_brick import encryptors
 from os_brick.initiator import utils as brick_utils
 from oslo_log import log as logging
@@ -25,6 +26,7 @@ from oslo_utils import excutils
 from nova import block_device
 import nova.conf
 from nova import exception
+from nova import utils
 
 CONF = nova.conf.CONF
 
@@ -939,6 +941,38 @@ def convert_volume(volume_bdm):
         pass
 
 
+def map_volumes(func, volumes):
+    """Call func on each of the independent volumes given.
+
+    Up to [compute]volume_connection_concurrency calls are run in parallel.
+    All the calls are always waited for before returning or raising, so the
+    caller sees the volumes in the same state as with serial calls and can
+    roll them back the same way.
+
+    :param func: a callable taking a single volume
+    :param volumes: a list of volumes, typically block devices or their
+        driver representation
+    :returns: the list of the results, in the order of the volumes
+    :raises: the exception of the first failed call, in the order of the
+        volumes
+    """
+    concurrency = min(CONF.compute.volume_connection_concurrency,
+                      len(volumes))
+    if concurrency <= 1:
+        return [func(volume) for volume in volumes]
+
+    executor = utils.create_executor(concurrency)
+    executor.name = 'volume_connection'
+    try:
+        futures = [utils.spawn_on(executor, func, volume)
+                   for volume in volumes]
+        futurist.waiters.wait_for_all(futures)
+    finally:
+        executor.shutdown()
+
+    return [future.result() for future in futures]
+
+
 def attach_block_devices(block_device_mapping, *attach_args, **attach_kwargs):
     def _log_and_attach(bdm):
         instance = attach_args[1]
@@ -967,17 +1001,19 @@ def attach_block_devices(block_device_mapping, *attach_args, **attach_kwargs):
 
         bdm.attach(*attach_args, **attach_kwargs)
 
-    for device in block_device_mapping:
-        _log_and_attach(device)
+    map_volumes(_log_and_attach, block_device_mapping)
     return block_device_mapping
 
 
 def refresh_conn_infos(block_device_mapping, *refresh_args, **refresh_kwargs):
-    for device in block_device_mapping:
-        # NOTE(lyarwood): At present only DriverVolumeBlockDevice derived
-        # devices provide a refresh_connection_info method.
-        if hasattr(device, 'refresh_connection_info'):
-            device.refresh_connection_info(*refresh_args, **refresh_kwargs)
+    # NOTE(lyarwood): At present only DriverVolumeBlockDevice derived
+    # devices provide a refresh_connection_info method.
+    devices = [device for device in block_device_mapping
+               if hasattr(device, 'refresh_connection_info')]
+    map_volumes(
+        lambda device: device.refresh_connection_info(
+            *refresh_args, **refresh_kwargs),
+        devices)
     return block_device_mapping
 
 
@@ -49,6 +49,7 @@ import uuid
 
 from castellan import key_manager
 from copy import deepcopy
+import futurist.waiters
 from lxml import etree
 from os_brick import encryptors
 from os_brick.encryptors import luks as luks_encryptor
@@ -5218,6 +5219,7 @@ class LibvirtDriver(driver.ComputeDriver):
             fileutils.ensure_tree(libvirt_utils.get_instance_path(instance))
 
         LOG.info('Creating image(s)', instance=instance)
+        self.image_cache_manager.invalidate_backing_images(instance)
 
         flavor = instance.get_flavor()
         swap_mb = 0
@@ -5264,22 +5266,28 @@ class LibvirtDriver(driver.ComputeDriver):
         # to use raw, which means they will always be cleaned up with the
         # instance directory. We must not consider them for created_disks,
         # which may not be using the instance directory.
+        # The disks below do not depend on each other so we only collect the
+        # work here and run it with _run_disk_creation_tasks() at the end.
+        disk_tasks = []
         if disk_images['kernel_id']:
             fname = imagecache.get_cache_fname(disk_images['kernel_id'])
-            raw('kernel').cache(fetch_func=libvirt_utils.fetch_raw_image,
-                                context=context,
-                                filename=fname,
-                                image_id=disk_images['kernel_id'])
+            disk_tasks.append(functools.partial(
+                raw('kernel').cache,
+                fetch_func=libvirt_utils.fetch_raw_image, context=context,
+                filename=fname, image_id=disk_images['kernel_id']))
             if disk_images['ramdisk_id']:
                 fname = imagecache.get_cache_fname(disk_images['ramdisk_id'])
-                raw('ramdisk').cache(fetch_func=libvirt_utils.fetch_raw_image,
-                                     context=context,
-                                     filename=fname,
-                                     image_id=disk_images['ramdisk_id'])
+                disk_tasks.append(functools.partial(
+                    raw('ramdisk').cache,
+                    fetch_func=libvirt_utils.fetch_raw_image, context=context,
+                    filename=fname, image_id=disk_images['ramdisk_id']))
 
-        created_disks = self._create_and_inject_local_root(
+        root_task = functools.partial(
+            self._create_and_inject_local_root,
             context, instance, disk_mapping, booted_from_volume, suffix,
             disk_images, injection_info, fallback_from_host)
+        disk_tasks.append(root_task)
+        created_disks = False
 
         # Lookup the filesystem type if required
         os_type_with_default = nova.privsep.fs.get_fs_type_for_os_type(
@@ -5305,9 +5313,10 @@ class LibvirtDriver(driver.ComputeDriver):
                                    vm_mode=vm_mode)
             fname = "ephemeral_%s_%s" % (ephemeral_gb, file_extension)
             size = ephemeral_gb * units.Gi
-            disk_image.cache(
+            disk_tasks.append(functools.partial(
+                disk_image.cache,
                 fetch_func=fn, context=context, filename=fname, size=size,
-                ephemeral_size=ephemeral_gb, safe=True)
+                ephemeral_size=ephemeral_gb, safe=True))
 
         for idx, eph in enumerate(driver.block_device_info_get_ephemerals(
                 block_device_info)):
@@ -5329,10 +5338,11 @@ class LibvirtDriver(driver.ComputeDriver):
                                    vm_mode=vm_mode)
             size = eph['size'] * units.Gi
             fname = "ephemeral_%s_%s" % (eph['size'], file_extension)
-            disk_image.cache(
+            disk_tasks.append(functools.partial(
+                disk_image.cache,
                 fetch_func=fn, context=context, filename=fname, size=size,
                 ephemeral_size=eph['size'], specified_fs=specified_fs,
-                safe=True)
+                safe=True))
 
         if swap_mb > 0:
             size = swap_mb * units.Mi
@@ -5340,10 +5350,14 @@ class LibvirtDriver(driver.ComputeDriver):
             swap = image('disk.swap', disk_info_mapping=disk_info_mapping)
             # Short circuit the exists() tests if we already created a disk
             created_disks = created_disks or not swap.exists()
-            swap.cache(
+            disk_tasks.append(functools.partial(
+                swap.cache,
                 fetch_func=self._create_swap, context=context,
                 filename="swap_%s" % swap_mb, size=size, swap_mb=swap_mb,
-                safe=True)
+                safe=True))
+
+        results = self._run_disk_creation_tasks(instance, disk_tasks)
+        created_disks = created_disks or results[disk_tasks.index(root_task)]
 
         if created_disks:
             LOG.debug('Created local disks', instance=instance)
@@ -5352,6 +5366,38 @@ class LibvirtDriver(driver.ComputeDriver):
 
         return (created_instance_dir, created_disks)
 
+    @staticmethod
+    def _run_disk_creation_tasks(instance, tasks):
+        """Runs independent disk creation tasks.
+
+        Up to [libvirt]disk_creation_concurrency tasks are run in parallel.
+        All the tasks are always waited for, so no disk is still being written
+        when an error is propagated to the caller, which is then free to clean
+        up the instance disks.
+
+        :param instance: the instance the disks are created for
+        :param tasks: a list of callables, each creating a single disk
+        :returns: the list of the task results, in the order of the tasks
+        :raises: the exception of the first failed task, in the order of the
+            tasks
+        """
+        concurrency = min(CONF.libvirt.disk_creation_concurrency, len(tasks))
+        if concurrency <= 1:
+            return [task() for task in tasks]
+
+        LOG.debug('Creating %(count)d disks with a concurrency of %(conc)d',
+                  {'count': len(tasks), 'conc': concurrency},
+                  instance=instance)
+        executor = utils.create_executor(concurrency)
+        executor.name = 'disk_creation'
+        try:
+            futures = [utils.spawn_on(executor, task) for task in tasks]
+            futurist.waiters.wait_for_all(futures)
+        finally:
+            executor.shutdown()
+
+        return [future.result() for future in futures]
+
     def _create_and_inject_local_root(self, context, instance, disk_mapping,
                                       booted_from_volume, suffix, disk_images,
                                       injection_info, fallback_from_host):
@@ -5473,6 +5519,8 @@ class LibvirtDriver(driver.ComputeDriver):
 
         LOG.info('Rebasing disk image.', instance=instance)
         self._rebase_with_qemu_img(backend.path, base_backing_fname)
+        # The disk is rebased in place, so its inode does not change.
+        self.image_cache_manager.invalidate_backing_images(instance)
 
     def _create_configdrive(self, context, instance, injection_info,
                             rescue=False):
@@ -6134,12 +6182,20 @@ class LibvirtDriver(driver.ComputeDriver):
                     self._get_disk_config_image_type())
                 devices.append(diskconfig)
 
-        for vol in block_device.get_bdms_to_connect(block_device_mapping,
-                                                   mount_rootfs):
+        def _connect_and_save(vol):
+            connection_info = vol['connection_info']
+            self._connect_volume(context, connection_info, instance)
+            vol['connection_info'] = connection_info
+            vol.save()
+
+        vols = list(block_device.get_bdms_to_connect(block_device_mapping,
+                                                     mount_rootfs))
+        driver_block_device.map_volumes(_connect_and_save, vols)
+
+        for vol in vols:
             connection_info = vol['connection_info']
             vol_dev = block_device.prepend_dev(vol['mount_device'])
             info = disk_mapping[vol_dev]
-            self._connect_volume(context, connection_info, instance)
             if scsi_controller and scsi_controller.model == 'virtio-scsi':
                 # Check if this is the bootable volume when in a
                 # boot-from-volume instance, and if so, ensure the unit
@@ -6151,8 +6207,6 @@ class LibvirtDriver(driver.ComputeDriver):
                     disk_mapping['unit'] += 1
             cfg = self._get_volume_config(instance, connection_info, info)
             devices.append(cfg)
-            vol['connection_info'] = connection_info
-            vol.save()
 
         for d in devices:
             self._set_cache_mode(d)
@@ -8958,10 +9012,7 @@ class LibvirtDriver(driver.ComputeDriver):
 
         :param types: Only return those specific types.
         """
-        virtdev = self._host.device_lookup_by_name(devname)
-        xmlstr = virtdev.XMLDesc(0)
-        cfgdev = vconfig.LibvirtConfigNodeDevice()
-        cfgdev.parse_str(xmlstr)
+        cfgdev = self._host.get_node_device_config_by_name(devname)
 
         device = {
             "dev_id": cfgdev.name,
@@ -9028,9 +9079,7 @@ class LibvirtDriver(driver.ComputeDriver):
             LOG.debug('Found requested device %s as %s. Using that.',
                       devname, mdevs[0])
             virtdev = self._host.device_lookup_by_name(mdevs[0])
-        xmlstr = virtdev.XMLDesc(0)
-        cfgdev = vconfig.LibvirtConfigNodeDevice()
-        cfgdev.parse_str(xmlstr)
+        cfgdev = self._host.get_node_device_config(virtdev)
         # Starting with Libvirt 7.3, the uuid information is available in the
         # node device information. If its there, use that. Otherwise,
         # fall back to the previous behavior of parsing the uuid from the
@@ -11503,6 +11552,10 @@ class LibvirtDriver(driver.ComputeDriver):
         downtime_steps = list(libvirt_migrate.downtime_steps(data_gb))
         migration = migrate_data.migration
         curdowntime = None
+        controller = None
+        if CONF.libvirt.live_migration_adaptive_convergence:
+            controller = libvirt_migrate.ConvergenceController(
+                instance, migration)
 
         migration_flags = self._get_migration_flags(
                                   migrate_data.block_migration)
@@ -11553,26 +11606,33 @@ class LibvirtDriver(driver.ComputeDriver):
                 # set to ``force_complete``, the post-copy will be triggered
                 # if available else the VM will be suspended, otherwise the
                 # live migrate operation will be aborted.
-                if libvirt_migrate.should_trigger_timeout_action(
-                        instance, elapsed, completion_timeout,
-                        migration.status):
-                    timeout_act = CONF.libvirt.live_migration_timeout_action
-                    if timeout_act == 'force_complete':
-                        self.live_migration_force_complete(instance)
-                    else:
-                        # timeout action is 'abort'
-                        try:
-                            guest.abort_job()
-                        except libvirt.libvirtError as e:
-                            LOG.warning("Failed to abort migration %s",
-                                    e,
-                                    instance=instance)
-                            self._clear_empty_migration(instance)
-                            raise
-
-                curdowntime = libvirt_migrate.update_downtime(
-                    guest, instance, curdowntime,
-                    downtime_steps, elapsed)
+                # The convergence controller may already have taken the
+                # timeout action before the timeout expired.
+                if ((controller is None or not controller.escalated) and
+                        libvirt_migrate.should_trigger_timeout_action(
+                            instance, elapsed, completion_timeout,
+                            migration.status)):
+                    self._live_migration_timeout_action(instance, guest)
+                    if controller:
+                        controller.escalated = True
+
+                if controller is None:
+                    curdowntime = libvirt_migrate.update_downtime(
+                        guest, instance, curdowntime,
+                        downtime_steps, elapsed)
+                elif migration.status != 'running (post-copy)':
+                    controller.sample(info, now)
+                    time_left = None
+                    if completion_timeout:
+                        time_left = completion_timeout - elapsed
+                    action, downtime = controller.decide(
+                        curdowntime, time_left)
+                    if action == controller.DOWNTIME:
+                        if libvirt_migrate.set_downtime(
+                                guest, instance, downtime):
+                            curdowntime = downtime
+                    elif action == controller.ESCALATE:
+                        self._live_migration_timeout_action(instance, guest)
 
                 # We loop every 500ms, so don't log on every
                 # iteration to avoid spamming logs for long
@@ -11659,6 +11719,22 @@ class LibvirtDriver(driver.ComputeDriver):
             time.sleep(0.5)
         self._clear_empty_migration(instance)
 
+    def _live_migration_timeout_action(self, instance, guest):
+        """Take the configured live migration timeout action"""
+        timeout_act = CONF.libvirt.live_migration_timeout_action
+        if timeout_act == 'force_complete':
+            self.live_migration_force_complete(instance)
+        else:
+            # timeout action is 'abort'
+            try:
+                guest.abort_job()
+            except libvirt.libvirtError as e:
+                LOG.warning("Failed to abort migration %s",
+                        e,
+                        instance=instance)
+                self._clear_empty_migration(instance)
+                raise
+
     def _clear_empty_migration(self, instance):
         try:
             del self.active_migrations[instance.uuid]
@@ -11974,9 +12050,10 @@ class LibvirtDriver(driver.ComputeDriver):
             LOG.debug('Connecting volumes before live migration.',
                       instance=instance)
 
-        for bdm in block_device_mapping:
-            connection_info = bdm['connection_info']
-            self._connect_volume(context, connection_info, instance)
+        driver_block_device.map_volumes(
+            lambda bdm: self._connect_volume(
+                context, bdm['connection_info'], instance),
+            block_device_mapping)
 
         self._pre_live_migration_plug_vifs(
             instance, network_info, migrate_data)
@@ -12119,6 +12196,7 @@ class LibvirtDriver(driver.ComputeDriver):
         if not disk_info:
             disk_info = []
 
+        self.image_cache_manager.invalidate_backing_images(instance)
         for info in disk_info:
             base = os.path.basename(info['path'])
             # Get image type and create empty disk image, and
@@ -13356,6 +13434,7 @@ class LibvirtDriver(driver.ComputeDriver):
         # state is not None and the task state should be set to something
         # other than None by the time this method is invoked.
         target_del = target + '_del'
+        self.image_cache_manager.invalidate_backing_images(instance)
         for i in range(2):
             try:
                 os.rename(target, target_del)
@@ -943,6 +943,8 @@ class JobInfo(object):
         self.memory_normal = kwargs.get("memory_normal", 0)
         self.memory_normal_bytes = kwargs.get("memory_normal_bytes", 0)
         self.memory_bps = kwargs.get("memory_bps", 0)
+        self.memory_dirty_rate = kwargs.get("memory_dirty_rate", 0)
+        self.memory_page_size = kwargs.get("memory_page_size", 0)
         self.disk_total = kwargs.get("disk_total", 0)
         self.disk_processed = kwargs.get("disk_processed", 0)
         self.disk_remaining = kwargs.get("disk_remaining", 0)
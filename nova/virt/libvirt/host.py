@@ -82,6 +82,16 @@ SEV_KERNEL_PARAM_FILE = '/sys/module/kvm_amd/parameters/%s'
 
 MIN_QEMU_SEV_ES_VERSION = (8, 0, 0)
 
+# sysfs directories whose listings change whenever PCI devices, SR-IOV VFs,
+# mediated devices or netdevs appear or disappear on the host. They are used
+# as a cheap generation check for the node device cache in case a libvirt
+# node device event was missed.
+NODE_DEVICE_SYSFS_DIRS = (
+    '/sys/bus/pci/devices',
+    '/sys/bus/mdev/devices',
+    '/sys/class/net',
+)
+
 
 class LibvirtEventHandler:
     def __init__(self, conn_event_handler=None, lifecycle_event_handler=None):
@@ -333,6 +343,17 @@ class Host(object):
 
         self._has_hyperthreading: bool | None = None
 
+        # Node device inventory cache. This is only used if the connection
+        # supports node device lifecycle events, as those are what tells us
+        # that the cached device listings and parsed XML are out of date.
+        self._nodedev_events_supported = False
+        self._nodedev_cache_stale = True
+        self._nodedev_cache_generation: int | None = None
+        self._nodedev_cache_lock = threading.Lock()
+        self._nodedev_lists: dict[tuple, list] = {}
+        self._nodedev_configs: dict[
+            str, vconfig.LibvirtConfigNodeDevice] = {}
+
     @staticmethod
     def _get_libvirt_proxy_classes(libvirt_module):
         """Return a tuple for tpool.Proxy's autowrap argument containing all
@@ -406,6 +427,22 @@ class Host(object):
         self._event_handler._queue_event(
             libvirtevent.DeviceRemovalFailedEvent(uuid, dev))
 
+    @staticmethod
+    def _event_node_device_lifecycle_callback(
+        conn, dev, event, detail, opaque,
+    ):
+        """Receives node device lifecycle events from libvirt.
+
+        NB: this method is executing in a native thread, not
+        an eventlet coroutine. It can only invoke other libvirt
+        APIs, or use self._event_handler._queue_event(). Any use of logging
+        APIs in particular is forbidden.
+        """
+        self = opaque
+        # NOTE: Flipping a flag is atomic, the cache itself is rebuilt lazily
+        # by the next caller listing node devices.
+        self._nodedev_cache_stale = True
+
     @staticmethod
     def _event_lifecycle_callback(conn, dom, event, detail, opaque):
         """Receives lifecycle events from libvirt.
@@ -581,6 +618,23 @@ class Host(object):
             LOG.warning("URI %(uri)s does not support events: %(error)s",
                         {'uri': self._uri, 'error': e})
 
+        # Any node device event emitted while we were disconnected is lost so
+        # start from an empty node device cache for the new connection.
+        self._nodedev_cache_stale = True
+        try:
+            LOG.debug("Registering for node device events %s", self)
+            wrapped_conn.nodeDeviceEventRegisterAny(
+                None,
+                libvirt.VIR_NODE_DEVICE_EVENT_ID_LIFECYCLE,
+                self._event_node_device_lifecycle_callback,
+                self)
+            self._nodedev_events_supported = True
+        except Exception as e:
+            self._nodedev_events_supported = False
+            LOG.info("URI %(uri)s does not support node device events, "
+                     "node devices will not be cached: %(error)s",
+                     {'uri': self._uri, 'error': e})
+
         try:
             LOG.debug("Registering for connection events: %s", str(self))
             wrapped_conn.registerCloseCallback(self._close_callback, None)
@@ -1339,6 +1393,7 @@ class Host(object):
         :returns: a virNodeDevice instance if successful, else None
         """
         device_xml = conf.to_xml()
+        self._invalidate_node_device_cache()
         return self.get_connection().nodeDeviceCreateXML(device_xml, flags=0)
 
     def device_define(self, conf):
@@ -1351,6 +1406,7 @@ class Host(object):
         :returns: a virNodeDevice instance if successful, else None
         """
         device_xml = conf.to_xml()
+        self._invalidate_node_device_cache()
         return self.get_connection().nodeDeviceDefineXML(device_xml, flags=0)
 
     def device_start(self, dev):
@@ -1361,6 +1417,7 @@ class Host(object):
         # extra flags; not used yet, so callers should always pass 0
         #   https://libvirt.org/html/libvirt-libvirt-nodedev.html
         flags = 0
+        self._invalidate_node_device_cache()
         result = dev.create(flags)
         if result == -1:
             msg = f'Failed to start node device {dev.name()}'
@@ -1391,9 +1448,7 @@ class Host(object):
         net_dev = {dev.parent(): dev for dev in net_devs}.get(dev.name(), None)
         if net_dev is None:
             return None
-        xmlstr = net_dev.XMLDesc(0)
-        cfgdev = vconfig.LibvirtConfigNodeDevice()
-        cfgdev.parse_str(xmlstr)
+        cfgdev = self.get_node_device_config(net_dev)
         return cfgdev.pci_capability.features
 
     def _get_vf_parent_pci_vpd_info(
@@ -1416,19 +1471,15 @@ class Host(object):
         if parent_dev is None:
             return None
 
-        xmlstr = parent_dev.XMLDesc(0)
-        cfgdev = vconfig.LibvirtConfigNodeDevice()
-        cfgdev.parse_str(xmlstr)
+        cfgdev = self.get_node_device_config(parent_dev)
         return cfgdev.pci_capability.vpd_capability
 
-    @staticmethod
     def _get_vpd_card_serial_number(
+        self,
         dev: 'libvirt.virNodeDevice',
     ) -> list[str] | None:
         """Returns a card serial number stored in PCI VPD (if present)."""
-        xmlstr = dev.XMLDesc(0)
-        cfgdev = vconfig.LibvirtConfigNodeDevice()
-        cfgdev.parse_str(xmlstr)
+        cfgdev = self.get_node_device_config(dev)
         vpd_cap = cfgdev.pci_capability.vpd_capability
         if not vpd_cap:
             return None
@@ -1625,9 +1676,7 @@ class Host(object):
 
             return caps
 
-        xmlstr = dev.XMLDesc(0)
-        cfgdev = vconfig.LibvirtConfigNodeDevice()
-        cfgdev.parse_str(xmlstr)
+        cfgdev = self.get_node_device_config(dev)
 
         address = "%04x:%02x:%02x.%1x" % (
             cfgdev.pci_capability.domain,
@@ -1678,10 +1727,7 @@ class Host(object):
             dev for dev in pci_info if dev['address'] == pci_address)
         vdpa_dev = next(
             dev for dev in vdpa_devs if dev.parent() == parent_dev['dev_id'])
-        xmlstr = vdpa_dev.XMLDesc(0)
-        cfgdev = vconfig.LibvirtConfigNodeDevice()
-        cfgdev.parse_str(xmlstr)
-        return cfgdev
+        return self.get_node_device_config(vdpa_dev)
 
     def get_vdpa_device_path(
         self, pci_address: str,
@@ -1695,6 +1741,92 @@ class Host(object):
         nodedev = self.get_vdpa_nodedev_by_address(pci_address)
         return nodedev.vdpa_capability.dev_path
 
+    def _invalidate_node_device_cache(self) -> None:
+        """Marks the cached node device inventory as out of date."""
+        self._nodedev_cache_stale = True
+
+    @staticmethod
+    def _get_node_device_generation() -> int:
+        """Returns a cheap fingerprint of the devices known to sysfs.
+
+        The fingerprint changes whenever a PCI device, a mediated device or
+        a netdev is added or removed, which lets us detect changes that
+        happened without us receiving the corresponding libvirt event.
+        """
+        entries: list[str] = []
+        for path in NODE_DEVICE_SYSFS_DIRS:
+            try:
+                entries.extend(os.path.join(path, e) for e in os.listdir(path))
+            except OSError:
+                continue
+        return hash(frozenset(entries))
+
+    def _check_node_device_cache(self) -> bool:
+        """Revalidates the node device cache.
+
+        The cache content is dropped if a node device lifecycle event was
+        received or if the sysfs generation changed since it was populated.
+
+        :returns: True if node devices can be served from the cache, False if
+            the libvirt connection does not support node device events.
+        """
+        if not self._nodedev_events_supported:
+            return False
+
+        generation = self._get_node_device_generation()
+        with self._nodedev_cache_lock:
+            if (self._nodedev_cache_stale or
+                    generation != self._nodedev_cache_generation):
+                # NOTE: Reset the flag before clearing the cache so an event
+                # received concurrently invalidates the cache again.
+                self._nodedev_cache_stale = False
+                self._nodedev_cache_generation = generation
+                self._nodedev_lists = {}
+                self._nodedev_configs = {}
+                LOG.debug('Node device cache invalidated')
+        return True
+
+    def get_node_device_config(
+        self, dev: 'libvirt.virNodeDevice',
+    ) -> vconfig.LibvirtConfigNodeDevice:
+        """Returns the parsed XML description of a node device.
+
+        The result is cached per device name until the node device cache is
+        invalidated so each device is only parsed once per inventory
+        generation. Callers must not modify the returned object.
+
+        :param dev: a virNodeDevice instance
+        :returns: a LibvirtConfigNodeDevice instance
+        """
+        use_cache = (
+            self._nodedev_events_supported and not self._nodedev_cache_stale)
+        if use_cache:
+            name = dev.name()
+            cfgdev = self._nodedev_configs.get(name)
+            if cfgdev is not None:
+                return cfgdev
+
+        xmlstr = dev.XMLDesc(0)
+        cfgdev = vconfig.LibvirtConfigNodeDevice()
+        cfgdev.parse_str(xmlstr)
+        if use_cache:
+            self._nodedev_configs[name] = cfgdev
+        return cfgdev
+
+    def get_node_device_config_by_name(
+        self, name: str,
+    ) -> vconfig.LibvirtConfigNodeDevice:
+        """Returns the parsed XML description of a node device by its name.
+
+        :param name: the name of the virNodeDevice
+        :returns: a LibvirtConfigNodeDevice instance
+        """
+        if self._nodedev_events_supported and not self._nodedev_cache_stale:
+            cfgdev = self._nodedev_configs.get(name)
+            if cfgdev is not None:
+                return cfgdev
+        return self.get_node_device_config(self.device_lookup_by_name(name))
+
     def list_pci_devices(self, flags: int = 0) -> list[str]:
         """Lookup pci devices.
 
@@ -1721,8 +1853,12 @@ class Host(object):
 
         :returns: a list of strings, names of the virNodeDevice instances
         """
+        use_cache = self._check_node_device_cache()
+        if use_cache and (cap, flags) in self._nodedev_lists:
+            return list(self._nodedev_lists[(cap, flags)])
+
         try:
-            return self.get_connection().listDevices(cap, flags)
+            devices = self.get_connection().listDevices(cap, flags)
         except libvirt.libvirtError as ex:
             error_code = ex.get_error_code()
             if error_code == libvirt.VIR_ERR_NO_SUPPORT:
@@ -1733,6 +1869,10 @@ class Host(object):
             else:
                 raise
 
+        if use_cache:
+            self._nodedev_lists[(cap, flags)] = list(devices)
+        return devices
+
     def list_all_devices(
         self, flags: int = 0,
     ) -> list['libvirt.virNodeDevice']:
@@ -1741,15 +1881,22 @@ class Host(object):
         :param flags: a bitmask of flags to filter the returned devices.
         :returns: a list of virNodeDevice instances.
         """
+        use_cache = self._check_node_device_cache()
+        if use_cache and (None, flags) in self._nodedev_lists:
+            return list(self._nodedev_lists[(None, flags)])
+
         try:
             alldevs = [
                 self._wrap_libvirt_proxy(dev)
                 for dev in self.get_connection().listAllDevices(flags)] or []
-            return alldevs
         except libvirt.libvirtError as ex:
             LOG.warning(ex)
             return []
 
+        if use_cache:
+            self._nodedev_lists[(None, flags)] = list(alldevs)
+        return alldevs
+
     def compare_cpu(self, xmlDesc, flags=0):
         """Compares the given CPU description with the host CPU."""
         return self.get_connection().compareCPU(xmlDesc, flags)
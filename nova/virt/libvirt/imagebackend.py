@@ -44,6 +44,7 @@ from nova.virt.disk import api as disk
 from nova.virt.image import model as imgmodel
 from nova.virt import images
 from nova.virt.libvirt import config as vconfig
+from nova.virt.libvirt import imagecache
 from nova.virt.libvirt.storage import dmcrypt
 from nova.virt.libvirt.storage import lvm
 from nova.virt.libvirt import utils as libvirt_utils
@@ -298,7 +299,13 @@ class Image(metaclass=abc.ABCMeta):
             # call fetch_func. The lock we're holding is also unnecessary in
             # that case, but it will not result in incorrect behaviour.
             if target != base or not os.path.exists(target):
-                fetch_func(target=target, *args, **kwargs)
+                if (CONF.image_cache.deduplicate_base_images and
+                        target == base and
+                        fetch_func is libvirt_utils.fetch_image):
+                    imagecache.fetch_deduplicated(
+                        fetch_func, target=target, *args, **kwargs)
+                else:
+                    fetch_func(target=target, *args, **kwargs)
 
         if not self.exists() or not os.path.exists(base):
             self.create_image(
@@ -23,23 +23,39 @@ http://wiki.openstack.org/nova-image-cache-management.
 import hashlib
 import os
 import re
+import struct
+import tempfile
 import time
 
 from oslo_concurrency import lockutils
 from oslo_concurrency import processutils
 from oslo_log import log as logging
+from oslo_serialization import jsonutils
 from oslo_utils import encodeutils
+from oslo_utils import fileutils
 
 import nova.conf
 import nova.privsep.path
 from nova import utils
 from nova.virt import imagecache
+from nova.virt import images
 from nova.virt.libvirt import utils as libvirt_utils
 
 LOG = logging.getLogger(__name__)
 
 CONF = nova.conf.CONF
 
+# Name of the content addressed store inside the image cache directory, see
+# [image_cache]deduplicate_base_images
+CONTENT_SUBDIRECTORY_NAME = 'content'
+# Name of the directory inside the image cache directory holding the backing
+# image index of each compute host, see ImageCacheManager._list_backing_images
+BACKING_INDEX_SUBDIRECTORY_NAME = 'backing_index'
+# qcow2 header magic and the largest backing file name QEMU accepts, used to
+# read the backing file of a disk without running qemu-img
+QCOW2_MAGIC = b'QFI\xfb'
+QCOW2_MAX_BACKING_FILE_SIZE = 1023
+
 
 def get_cache_fname(image_id):
     """Return a filename based on the SHA1 hash of a given image ID.
@@ -52,10 +68,137 @@ def get_cache_fname(image_id):
     return hashlib.sha1(image_id.encode('utf-8')).hexdigest()
 
 
+def get_content_fname(image_meta):
+    """Return the content store filename of an image.
+
+    The name is derived from the hash of the image data as reported by the
+    image service. As the image cache stores images converted to raw when
+    [DEFAULT]force_raw_images is enabled, this is part of the name too.
+
+    :param image_meta: the image metadata dict returned by the image API
+    :returns: the filename or None if the image service does not know the
+        hash of the image data
+    """
+    algo, value = _get_content_hash(image_meta)
+    if not value:
+        return None
+
+    fname = '%s_%s' % (algo, value)
+    if CONF.force_raw_images:
+        fname += '_raw'
+    return fname
+
+
+def _get_content_hash(image_meta):
+    """Return the hash algorithm and value of the image data."""
+    algo = image_meta.get('os_hash_algo')
+    value = image_meta.get('os_hash_value')
+    if not (algo and value):
+        # NOTE: Images uploaded before glance started to compute the multihash
+        # only have the legacy md5 checksum.
+        algo, value = 'md5', image_meta.get('checksum')
+    return algo, value
+
+
+def _content_matches(path, algo, value):
+    """Return whether the data of a file has the given hash."""
+    try:
+        digest = hashlib.new(algo, usedforsecurity=False)
+    except ValueError:
+        LOG.warning('Unsupported image hash algorithm %s', algo)
+        return False
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest() == value
+
+
+def fetch_deduplicated(fetch_func, context, target, image_id,
+                       trusted_certs=None):
+    """Fetch an image into the image cache through the content store.
+
+    If an image with the same content was already fetched, the image cache
+    entry of image_id is created as a hard link to the existing content store
+    entry and nothing is downloaded. Otherwise the image is fetched with
+    fetch_func and the result is published in the content store.
+
+    Signed images and images requiring certificate validation are always
+    fetched, as the validation happens during the download. A fetched image
+    is only published in the content store if its data matches the hash
+    reported by the image service, so that an image with a forged hash
+    cannot be used in place of another image. Images converted to raw while
+    being fetched are thus never published.
+
+    :param fetch_func: the function fetching the image, with the signature of
+        nova.virt.libvirt.utils.fetch_image
+    :param context: nova.context.RequestContext auth request context
+    :param target: path of the image cache entry of the image
+    :param image_id: id of the image to fetch
+    :param trusted_certs: optional objects.TrustedCerts for image validation
+    """
+    def _fetch():
+        fetch_func(context=context, target=target, image_id=image_id,
+                   trusted_certs=trusted_certs)
+
+    image_meta = images.get_info(context, image_id)
+    content_fname = get_content_fname(image_meta)
+    signed = 'img_signature' in image_meta.get('properties', {})
+    if content_fname is None or trusted_certs or signed:
+        _fetch()
+        return
+
+    content_dir = os.path.join(
+        os.path.dirname(target), CONTENT_SUBDIRECTORY_NAME)
+    fileutils.ensure_tree(content_dir)
+    content_path = os.path.join(content_dir, content_fname)
+    lock_path = os.path.join(CONF.instances_path, 'locks')
+
+    # NOTE: This is the same lock the image cache manager takes before
+    # removing an unused content store entry.
+    @utils.synchronized(content_fname, external=True, lock_path=lock_path)
+    def _fetch_or_link():
+        if os.path.exists(content_path):
+            try:
+                os.link(content_path, target)
+                LOG.info('Image %(image_id)s has the same content as the '
+                         'cached %(content)s, not fetching it',
+                         {'image_id': image_id, 'content': content_path})
+                nova.privsep.path.utime(target)
+                return
+            except OSError as e:
+                LOG.warning('Failed to link %(target)s to %(content)s, '
+                            'fetching the image instead: %(error)s',
+                            {'target': target, 'content': content_path,
+                             'error': e})
+
+        _fetch()
+
+        if os.path.exists(content_path):
+            return
+        if not _content_matches(target, *_get_content_hash(image_meta)):
+            LOG.info('Data of image %(image_id)s does not match the hash '
+                     'reported by the image service, not adding it to the '
+                     'image content store', {'image_id': image_id})
+            return
+        try:
+            os.link(target, content_path)
+        except OSError as e:
+            LOG.warning('Failed to add %(target)s to the image content '
+                        'store: %(error)s',
+                        {'target': target, 'error': e})
+
+    _fetch_or_link()
+
+
 class ImageCacheManager(imagecache.ImageCacheManager):
     def __init__(self):
         super(ImageCacheManager, self).__init__()
         self.lock_path = os.path.join(CONF.instances_path, 'locks')
+        # Persistent index of the backing files of the instance disks, keyed
+        # on the instance directory name. Lazy loaded from
+        # _backing_index_path, see _list_backing_images.
+        self._backing_index = None
+        self._backing_index_dirty = False
         self._reset_state()
 
     def _reset_state(self):
@@ -118,26 +261,134 @@ class ImageCacheManager(imagecache.ImageCacheManager):
                 self._store_swap_image(ent)
                 self._store_ephemeral_image(ent)
 
+    @property
+    def _backing_index_path(self):
+        return os.path.join(
+            self.cache_dir, BACKING_INDEX_SUBDIRECTORY_NAME,
+            '%s.json' % CONF.host)
+
+    def _load_backing_index(self):
+        """Return the backing image index, loading it if needed."""
+        if self._backing_index is None:
+            try:
+                with open(self._backing_index_path) as f:
+                    self._backing_index = jsonutils.loads(f.read())
+            except (OSError, ValueError) as e:
+                LOG.debug('Not using the backing image index %(path)s: '
+                          '%(error)s',
+                          {'path': self._backing_index_path, 'error': e})
+                self._backing_index = {}
+        return self._backing_index
+
+    def _save_backing_index(self, index):
+        """Persist the backing image index.
+
+        Each compute host only ever writes its own index file, so no locking
+        is needed even if the image cache is on shared storage.
+        """
+        self._backing_index = index
+        self._backing_index_dirty = False
+        index_dir = os.path.dirname(self._backing_index_path)
+        try:
+            fileutils.ensure_tree(index_dir)
+            with tempfile.NamedTemporaryFile(
+                    'w', dir=index_dir, delete=False) as f:
+                f.write(jsonutils.dumps(index))
+            os.replace(f.name, self._backing_index_path)
+        except OSError as e:
+            LOG.warning('Failed to save the backing image index %(path)s: '
+                        '%(error)s',
+                        {'path': self._backing_index_path, 'error': e})
+
+    def invalidate_backing_images(self, instance):
+        """Drop the indexed backing files of the disks of an instance.
+
+        This must be called whenever the disks of an instance are created,
+        moved or deleted on this host so the next image cache manager pass
+        inspects them again. Entries which are not loaded yet are validated
+        by their signature when the index is loaded.
+        """
+        index = self._backing_index
+        if index is None:
+            return
+        for name in (instance.uuid, instance.name):
+            for ent in (name, name + '_resize'):
+                if index.pop(ent, None) is not None:
+                    self._backing_index_dirty = True
+
+    @staticmethod
+    def _read_qcow2_backing_file(disk_path):
+        """Return the backing file name recorded in a qcow2 header.
+
+        Returns None if the disk is not a qcow2 image or has no backing file.
+        """
+        with open(disk_path, 'rb') as f:
+            header = f.read(20)
+            if len(header) < 20 or header[:4] != QCOW2_MAGIC:
+                return None
+            offset, size = struct.unpack('>QI', header[8:20])
+            if not offset or not 0 < size <= QCOW2_MAX_BACKING_FILE_SIZE:
+                return None
+            f.seek(offset)
+            return f.read(size).decode('utf-8', 'replace')
+
+    @classmethod
+    def _get_disk_signature(cls, instance_dir, disk_path):
+        """Return a cheap signature of an instance disk.
+
+        The inode of the disk changes when it is recreated, and the change
+        time of the instance directory changes when any file is created,
+        renamed or deleted in it, but neither changes when the guest writes
+        to its disk. A qcow2 disk can also be rebased in place, so the
+        backing file name found in its header is part of the signature too.
+        """
+        try:
+            return [os.stat(disk_path).st_ino,
+                    os.stat(instance_dir).st_ctime_ns,
+                    cls._read_qcow2_backing_file(disk_path)]
+        except OSError:
+            return None
+
     def _list_backing_images(self):
-        """List the backing images currently in use."""
+        """List the backing images currently in use.
+
+        Inspecting the backing file of every instance disk with qemu-img is
+        expensive, especially when the instances directory is on shared
+        storage, so the result is kept in a persistent index and the disks
+        are only inspected again if they changed since the previous pass.
+        """
         inuse_images = []
+        index = self._load_backing_index()
+        new_index = {}
         for ent in os.listdir(CONF.instances_path):
             if ent in self.instance_names:
                 LOG.debug('%s is a valid instance name', ent)
-                disk_path = os.path.join(CONF.instances_path, ent, 'disk')
+                instance_dir = os.path.join(CONF.instances_path, ent)
+                disk_path = os.path.join(instance_dir, 'disk')
                 if os.path.exists(disk_path):
                     LOG.debug('%s has a disk file', ent)
-                    try:
-                        backing_file = libvirt_utils.get_disk_backing_file(
-                            disk_path)
-                    except processutils.ProcessExecutionError:
-                        # (for bug 1261442)
-                        if not os.path.exists(disk_path):
-                            LOG.debug('Failed to get disk backing file: %s',
-                                      disk_path)
-                            continue
-                        else:
-                            raise
+                    signature = self._get_disk_signature(
+                        instance_dir, disk_path)
+                    entry = index.get(ent)
+                    if (signature is not None and entry is not None and
+                            entry['signature'] == signature):
+                        backing_file = entry['backing_file']
+                    else:
+                        try:
+                            backing_file = (
+                                libvirt_utils.get_disk_backing_file(
+                                    disk_path))
+                        except processutils.ProcessExecutionError:
+                            # (for bug 1261442)
+                            if not os.path.exists(disk_path):
+                                LOG.debug('Failed to get disk backing '
+                                          'file: %s', disk_path)
+                                continue
+                            else:
+                                raise
+                    if signature is not None:
+                        new_index[ent] = {'signature': signature,
+                                          'backing_file': backing_file}
                     LOG.debug('Instance %(instance)s is backed by '
                               '%(backing)s',
                               {'instance': ent,
@@ -158,6 +409,10 @@ class ImageCacheManager(imagecache.ImageCacheManager):
                                         {'instance': ent,
                                          'backing': backing_file})
                             self.unexplained_images.remove(backing_path)
+
+        # NOTE: Entries of instances which are gone are dropped here too.
+        if self._backing_index_dirty or new_index != index:
+            self._save_backing_index(new_index)
         return inuse_images
 
     def _find_base_file(self, base_dir, fingerprint):
@@ -197,8 +452,13 @@ class ImageCacheManager(imagecache.ImageCacheManager):
 
         return (True, age)
 
-    def _remove_old_enough_file(self, base_file, maxage, remove_lock=True):
-        """Remove a single swap, base or ephemeral file if it is old enough."""
+    def _remove_old_enough_file(self, base_file, maxage, remove_lock=True,
+                                unlinked_only=False):
+        """Remove a single swap, base or ephemeral file if it is old enough.
+
+        If unlinked_only is True, the file is only removed if it has no other
+        hard link, as checked while holding the lock of the file.
+        """
         exists, age = self._get_age_of_file(base_file)
         if not exists:
             return
@@ -214,6 +474,11 @@ class ImageCacheManager(imagecache.ImageCacheManager):
             exists, age = self._get_age_of_file(base_file)
             if not exists or age < maxage:
                 return
+            # A new image cache entry may have been linked to the file while
+            # we were waiting for the lock.
+            if unlinked_only and os.stat(base_file).st_nlink > 1:
+                LOG.debug('%s is in use again, not removing it', base_file)
+                return
 
             LOG.info('Removing base, swap or ephemeral file: %s', base_file)
             try:
@@ -369,6 +634,33 @@ class ImageCacheManager(imagecache.ImageCacheManager):
             return
         return base_dir
 
+    def _age_content_store(self, base_dir):
+        """Remove the content store entries which are not used anymore.
+
+        Every image cache entry fetched through the content store is a hard
+        link to its content store entry, so the link count of a content store
+        entry tells whether any image still references it.
+        """
+        content_dir = os.path.join(base_dir, CONTENT_SUBDIRECTORY_NAME)
+        if not os.path.isdir(content_dir):
+            return
+
+        LOG.debug('Verify content store')
+        maxage = CONF.image_cache.remove_unused_original_minimum_age_seconds
+        for ent in os.listdir(content_dir):
+            content_file = os.path.join(content_dir, ent)
+            try:
+                nlink = os.stat(content_file).st_nlink
+            except OSError:
+                continue
+            if nlink > 1:
+                continue
+            LOG.debug('Content store entry %s is not used by any image',
+                      content_file)
+            if self.remove_unused_base_images:
+                self._remove_old_enough_file(content_file, maxage,
+                                             unlinked_only=True)
+
     def update(self, context, all_instances):
         base_dir = self._get_base()
         if not base_dir:
@@ -387,6 +679,9 @@ class ImageCacheManager(imagecache.ImageCacheManager):
         self._age_and_verify_cached_images(context, all_instances, base_dir)
         self._age_and_verify_swap_images(context, base_dir)
         self._age_and_verify_ephemeral_images(context, base_dir)
+        # image cache entries are removed above, so their content store
+        # entries can be considered for removal now
+        self._age_content_store(base_dir)
 
     def get_disk_usage(self):
         try:
@@ -401,10 +696,25 @@ class ImageCacheManager(imagecache.ImageCacheManager):
             # size.
             # NOTE(gibi): st.blocks is always measured in 512 byte blocks see
             # man fstat
-            return sum(
-                os.stat(os.path.join(self.cache_dir, f)).st_blocks * 512
+            paths = [
+                os.path.join(self.cache_dir, f)
                 for f in os.listdir(self.cache_dir)
-                if os.path.isfile(os.path.join(self.cache_dir, f)))
+                if os.path.isfile(os.path.join(self.cache_dir, f))]
+            content_dir = os.path.join(
+                self.cache_dir, CONTENT_SUBDIRECTORY_NAME)
+            if (CONF.image_cache.deduplicate_base_images and
+                    os.path.isdir(content_dir)):
+                paths.extend(
+                    os.path.join(content_dir, f)
+                    for f in os.listdir(content_dir))
+
+            # NOTE: Files of the content store are hard linked from the cache
+            # directory, only count each of them once.
+            usage = {}
+            for path in paths:
+                st = os.stat(path)
+                usage[(st.st_dev, st.st_ino)] = st.st_blocks * 512
+            return sum(usage.values())
         except OSError:
             # NOTE(gibi): An error here can mean many things. E.g. the cache
             # dir does not exists yet, the cache dir is deleted between the
@@ -15,6 +15,7 @@
 """Utility methods to manage guests migration."""
 
 from collections import deque
+import math
 
 from lxml import etree
 from oslo_log import log as logging
@@ -681,12 +682,158 @@ def update_downtime(guest, instance,
               "waittime": thisstep[0]},
              instance=instance)
 
+    set_downtime(guest, instance, thisstep[1])
+    return thisstep[1]
+
+
+class ConvergenceController(object):
+    """Drive a running live migration towards convergence
+
+    The controller samples the memory transfer bandwidth and the rate at
+    which the guest dirties its memory from the job stats, predicts if and
+    when the migration will converge, and picks the next action for the
+    migration monitor instead of following the static downtime steps:
+
+    - raise the max downtime to what is needed to switch over right away, if
+      that fits in the configured live_migration_downtime
+    - wait, if the migration is predicted to converge before the completion
+      timeout
+    - otherwise raise the max downtime to live_migration_downtime and, if
+      that is still not enough, escalate to the completion timeout action
+      (post-copy, pause or abort) without waiting for the timeout to expire
+    """
+
+    WAIT = 'wait'
+    DOWNTIME = 'downtime'
+    ESCALATE = 'escalate'
+
+    def __init__(self, instance, migration, window=10):
+        """Create a new controller
+
+        :param instance: a nova.objects.Instance
+        :param migration: a nova.objects.Migration
+        :param window: number of job stats samples to base decisions on
+        """
+        self.instance = instance
+        self.migration = migration
+        self.max_downtime = CONF.libvirt.live_migration_downtime
+        # Never go below the first of the static downtime steps
+        self.min_downtime = next(downtime_steps(0))[1]
+        self.escalated = False
+        self._samples = deque(maxlen=window)
+
+    def sample(self, info, now):
+        """Record the job stats of the migration
+
+        :param info: a nova.virt.libvirt.guest.JobInfo
+        :param now: the time the stats were retrieved at
+        """
+        self._samples.append((now, info))
+
+    def _get_rates(self):
+        """Return the memory bandwidth and dirty rate in bytes per sec"""
+        first_time, first = self._samples[0]
+        last_time, last = self._samples[-1]
+        interval = last_time - first_time
+        if interval <= 0:
+            return 0, 0
+
+        # Prefer the rates measured by the hypervisor, if available
+        bandwidth = last.memory_bps or (
+            (last.memory_processed - first.memory_processed) / interval)
+        if last.memory_dirty_rate and last.memory_page_size:
+            dirty_rate = last.memory_dirty_rate * last.memory_page_size
+        else:
+            progress = (first.memory_remaining -
+                        last.memory_remaining) / interval
+            dirty_rate = max(bandwidth - progress, 0)
+        return bandwidth, dirty_rate
+
+    def _decide(self, action, downtime, reason, params):
+        params = dict(params, migration=self.migration.id, action=action,
+                      downtime=downtime)
+        LOG.info("Live migration %(migration)s convergence: %(action)s "
+                 "(max downtime %(downtime)s ms), " + reason, params,
+                 instance=self.instance)
+        # Base the next decision on the effect of this one
+        self._samples.clear()
+        return action, downtime
+
+    def decide(self, downtime, time_left):
+        """Choose the next action for the migration
+
+        :param downtime: the current max downtime in ms, or None
+        :param time_left: secs left before the completion timeout, or None
+            if there is no completion timeout
+        :returns: a (action, downtime) tuple where action is one of WAIT,
+            DOWNTIME and ESCALATE and downtime is the max downtime to set,
+            which is never lower than the current one
+        """
+        if (self.escalated or
+                len(self._samples) < self._samples.maxlen):
+            return self.WAIT, downtime
+
+        bandwidth, dirty_rate = self._get_rates()
+        if bandwidth <= 0:
+            return self.WAIT, downtime
+
+        remaining = self._samples[-1][1].memory_remaining
+        params = {'remaining': remaining, 'bandwidth': int(bandwidth),
+                  'dirty_rate': int(dirty_rate)}
+        stats = ("%(remaining)d bytes remaining, bandwidth %(bandwidth)d "
+                 "B/s, dirty rate %(dirty_rate)d B/s")
+
+        # The downtime needed to copy all the remaining memory at once
+        needed = max(math.ceil(1000 * remaining / bandwidth),
+                     self.min_downtime)
+        if needed <= self.max_downtime:
+            if downtime is None or needed > downtime:
+                return self._decide(
+                    self.DOWNTIME, needed,
+                    stats + ", switching over", params)
+            return self.WAIT, downtime
+
+        progress = bandwidth - dirty_rate
+        if progress > 0:
+            # Time until the remaining memory fits in the max downtime
+            eta = (remaining - self.max_downtime * bandwidth / 1000) / progress
+            if time_left is None or eta < time_left:
+                return self.WAIT, downtime
+            params['eta'] = eta
+            stats += ", predicted to converge in %(eta)d secs"
+        else:
+            stats += ", not converging"
+
+        if downtime is None or downtime < self.max_downtime:
+            return self._decide(self.DOWNTIME, self.max_downtime,
+                                stats, params)
+
+        if time_left is None:
+            # Without a completion timeout nothing is left to do
+            return self.WAIT, downtime
+
+        self.escalated = True
+        return self._decide(self.ESCALATE, downtime, stats, params)
+
+
+def set_downtime(guest, instance, downtime):
+    """Set the max downtime of a migration
+
+    :param guest: a nova.virt.libvirt.guest.Guest to set downtime for
+    :param instance: a nova.objects.Instance
+    :param downtime: the max downtime in ms
+
+    Any errors hit when updating downtime will be ignored
+
+    :returns: True if the downtime was set, False otherwise
+    """
     try:
-        guest.migrate_configure_max_downtime(thisstep[1])
+        guest.migrate_configure_max_downtime(downtime)
     except libvirt.libvirtError as e:
         LOG.warning("Unable to increase max downtime to %(time)d ms: %(e)s",
-                    {"time": thisstep[1], "e": e}, instance=instance)
-    return thisstep[1]
+                    {"time": downtime, "e": e}, instance=instance)
+        return False
+    return True
 
 
 def save_stats(instance, migration, info, remaining):
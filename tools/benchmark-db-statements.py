@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Microbenchmark for the query construction overhead of hot DB API calls.
+
+Runs DB API functions using cached statements against an in-memory SQLite
+database, both with the statement cache emptied before each call, so that
+the statements are built and their SQL cache keys generated again like an
+ORM query would be, and with the statement cache warm. The difference is
+the per call overhead saved by the cache. Run it from the top of the tree
+with the test requirements installed:
+
+    python tools/benchmark-db-statements.py [--number N] [--instances N]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+from oslo_utils import uuidutils  # noqa: E402
+
+import nova.conf  # noqa: E402
+from nova import config  # noqa: E402
+from nova import context  # noqa: E402
+from nova.db.main import api as db  # noqa: E402
+from nova.db.main import models  # noqa: E402
+
+CONF = nova.conf.CONF
+
+
+def _create_data(ctxt, count):
+    uuids = []
+    for i in range(count):
+        inst = db.instance_create(ctxt, {
+            'host': 'host1', 'node': 'node1',
+            'metadata': {'key%d' % k: 'value' for k in range(5)},
+            'system_metadata': {'key%d' % k: 'value' for k in range(10)},
+        })
+        uuids.append(inst['uuid'])
+        db.instance_fault_create(ctxt, {
+            'instance_uuid': inst['uuid'], 'code': 500, 'message': 'fault',
+            'host': 'host1'})
+        db.migration_create(ctxt, {
+            'instance_uuid': inst['uuid'], 'status': 'migrating',
+            'source_compute': 'host1', 'source_node': 'node1',
+            'dest_compute': 'host2', 'dest_node': 'node2'})
+    return uuids
+
+
+def _calls(ctxt, uuids):
+    return [
+        ('instance_get_all_by_host', lambda: db.instance_get_all_by_host(
+            ctxt, 'host1')),
+        ('instances_fill_metadata', lambda: db.instances_fill_metadata(
+            ctxt, [{'uuid': uuid} for uuid in uuids],
+            manual_joins=['metadata', 'system_metadata', 'pci_devices',
+                          'fault'])),
+        ('migration_get_in_progress', lambda:
+            db.migration_get_in_progress_by_host_and_node(
+                ctxt, 'host1', 'node1')),
+        ('instance_fault_get(latest)', lambda:
+            db.instance_fault_get_by_instance_uuids(
+                ctxt, uuids, latest=True)),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--number', type=int, default=500,
+                        help='Calls per function (default: 500)')
+    parser.add_argument('--instances', type=int, default=1,
+                        help='Number of instances in the database, few '
+                             'instances make the construction overhead '
+                             'stand out (default: 1)')
+    args = parser.parse_args()
+
+    config.parse_args(sys.argv[:1], default_config_files=[],
+                      configure_db=False, init_rpc=False)
+    CONF.set_override('connection', 'sqlite://', group='database')
+    db.configure(CONF)
+    models.BASE.metadata.create_all(db.get_engine())
+    ctxt = context.get_admin_context()
+    uuids = _create_data(ctxt, args.instances) or [
+        uuidutils.generate_uuid()]
+
+    print('%-28s %10s %10s %10s' % ('function', 'uncached', 'cached',
+                                     'saved'))
+    for name, call in _calls(ctxt, uuids):
+        call()
+
+        def uncached():
+            db._STATEMENT_CACHE.clear()
+            call()
+
+        cold = timeit.timeit(uncached, number=args.number) / args.number
+        warm = timeit.timeit(call, number=args.number) / args.number
+        print('%-28s %7.3f ms %7.3f ms %7.3f ms' % (
+            name, cold * 1000, warm * 1000, (cold - warm) * 1000))
+
+
+if __name__ == '__main__':
+    main()
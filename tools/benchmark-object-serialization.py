@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Microbenchmark for RPC serialization of common Nova objects.
+
+Measures NovaObjectSerializer round trips for an Instance with its usual
+sub-objects, a RequestSpec, a ComputeNode and an InstanceList. Run it from
+the top of the tree with the test requirements installed:
+
+    python tools/benchmark-object-serialization.py [--number N]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+from nova.tests.unit import fake_instance  # noqa: E402
+from nova.tests.unit import fake_request_spec  # noqa: E402
+from nova.tests.unit.objects import test_compute_node  # noqa: E402
+from nova.tests.unit.objects import test_instance_numa  # noqa: E402
+
+import nova.conf  # noqa: E402
+from nova import context  # noqa: E402
+from nova import objects  # noqa: E402
+from nova.objects import base  # noqa: E402
+
+
+def _build_payloads(ctxt):
+    inst = fake_instance.fake_instance_obj(
+        ctxt, expected_attrs=['flavor', 'info_cache', 'metadata',
+                              'numa_topology', 'pci_requests',
+                              'system_metadata'])
+    inst.numa_topology = test_instance_numa.fake_obj_numa_topology.obj_clone()
+    spec = fake_request_spec.fake_spec_obj()
+    node = objects.ComputeNode._from_db_object(
+        ctxt, objects.ComputeNode(), test_compute_node.fake_compute_node)
+    insts = objects.InstanceList(
+        objects=[inst.obj_clone() for i in range(50)])
+    return [('Instance', inst), ('RequestSpec', spec),
+            ('ComputeNode', node), ('InstanceList(50)', insts)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--number', type=int, default=200,
+                        help='Iterations per payload (default: 200)')
+    args = parser.parse_args()
+
+    nova.conf.CONF([], project='nova')
+    objects.register_all()
+    ctxt = context.get_admin_context()
+    serializer = base.NovaObjectSerializer()
+
+    print('%-18s %12s %12s' % ('payload', 'serialize', 'deserialize'))
+    for name, obj in _build_payloads(ctxt):
+        primitive = serializer.serialize_entity(ctxt, obj)
+        number = max(1, args.number // len(obj) if isinstance(
+            obj, base.ObjectListBase) else args.number)
+        to_prim = timeit.timeit(
+            lambda: serializer.serialize_entity(ctxt, obj),
+            number=number) / number
+        from_prim = timeit.timeit(
+            lambda: serializer.deserialize_entity(ctxt, primitive),
+            number=number) / number
+        print('%-18s %9.3f ms %9.3f ms' % (name, to_prim * 1000,
+                                           from_prim * 1000))
+
+
+if __name__ == '__main__':
+    main()